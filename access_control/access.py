@@ -0,0 +1,142 @@
+"""
+Lógica de decisión de acceso físico.
+Determina si un código puede abrir una puerta según el perfil y el seguro.
+"""
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .guests import invitados
+from .lockdown import confinamiento_activo
+from .models import UserProfile, LockState, ZoneClosure, hash_codigo
+from .policies import motores
+
+
+ResultadoAcceso = namedtuple('ResultadoAcceso', ['exitoso', 'perfil', 'motivo'])
+
+SEGURO_ACTIVO = 'Seguro activo'
+CONFINAMIENTO = 'Confinamiento activo'
+
+
+def seguro_activo(puerta):
+    """Indica si la puerta tiene el seguro activado"""
+    try:
+        return puerta.seguro.activo
+    except LockState.DoesNotExist:
+        return False
+
+
+def perfil_por_codigo(codigo, escuela_id):
+    """
+    Perfil de la escuela dueño del código (búsqueda por el índice único
+    (escuela, digest)) o None
+    """
+    return (
+        UserProfile.objects
+        .select_related('user')
+        .filter(escuela_id=escuela_id, codigo_hash=hash_codigo(codigo))
+        .first()
+    )
+
+
+def evaluar_acceso(puerta, codigo, cupo=None):
+    """
+    Evalúa un intento de acceso con código sobre una puerta.
+    - La puerta debe estar activa.
+    - El código debe pertenecer a un perfil activo de la escuela de la
+      puerta (búsqueda por el índice único de su digest HMAC).
+    - La política ABRIR_PUERTA (con los permisos de zona) debe permitirlo.
+    - Con el seguro activo (propio o heredado de una zona bloqueada) o
+      un confinamiento en curso en la escuela solo pueden pasar quienes
+      controlan el seguro.
+    Si el código no es de ningún perfil se busca entre los códigos de
+    invitado vigentes (en memoria, ver guests.py).
+    `cupo(puerta_id)` devuelve el motivo si la puerta o una de sus zonas
+    está llena (o None); se consulta al final, antes de contar el uso de
+    un invitado.
+    """
+    if not puerta.activa:
+        return ResultadoAcceso(False, None, 'Puerta inactiva')
+
+    perfil = perfil_por_codigo(codigo, puerta.escuela_id)
+    if perfil is None:
+        return evaluar_invitado(puerta, codigo, cupo)
+
+    if not perfil.activo:
+        return ResultadoAcceso(False, perfil, 'Usuario inactivo')
+
+    if not perfil.puede_abrir_puerta(puerta):
+        return ResultadoAcceso(False, perfil, 'Sin permiso para la puerta')
+
+    bloqueada = seguro_activo(puerta) or zona_bloqueada(puerta)
+    confinada = confinamiento_activo(puerta.escuela_id)
+    if (bloqueada or confinada) and not perfil.puede_controlar_seguro(puerta):
+        return ResultadoAcceso(False, perfil, SEGURO_ACTIVO if bloqueada else CONFINAMIENTO)
+
+    lleno = cupo(puerta.pk) if cupo else None
+    if lleno:
+        return ResultadoAcceso(False, perfil, lleno)
+
+    return ResultadoAcceso(True, perfil, 'Acceso concedido')
+
+
+def evaluar_invitado(puerta, codigo, cupo=None):
+    """
+    Código temporal de invitado: debe estar vigente, incluir la puerta y
+    tener usos disponibles. Con el seguro activo o un confinamiento en
+    curso los invitados no pasan.
+    El uso solo se cuenta si el acceso se concede (después de `cupo`).
+    """
+    registro = invitados(puerta.escuela_id)
+    invitado = registro.buscar(hash_codigo(codigo))
+    if invitado is None:
+        return ResultadoAcceso(False, None, 'Código inválido')
+
+    if puerta.pk not in invitado.puertas:
+        return ResultadoAcceso(False, None, 'Invitado sin acceso a esta puerta')
+
+    if invitado.desde > time.time():
+        return ResultadoAcceso(False, None, 'Código de invitado aún no vigente')
+
+    if seguro_activo(puerta) or zona_bloqueada(puerta):
+        return ResultadoAcceso(False, None, SEGURO_ACTIVO)
+
+    if confinamiento_activo(puerta.escuela_id):
+        return ResultadoAcceso(False, None, CONFINAMIENTO)
+
+    lleno = cupo(puerta.pk) if cupo else None
+    if lleno:
+        return ResultadoAcceso(False, None, lleno)
+
+    if not registro.consumir(invitado):
+        return ResultadoAcceso(False, None, 'Código de invitado expirado o agotado')
+
+    return ResultadoAcceso(True, None, f'Invitado: {invitado.nombre}'[:100])
+
+
+def zona_bloqueada(puerta):
+    """Indica si alguna zona que contiene a la puerta está bloqueada"""
+    if puerta.zona_id is None:
+        return False
+    return ZoneClosure.objects.filter(
+        descendiente_id=puerta.zona_id, ancestro__bloqueada=True
+    ).exists()
+
+
+def perfiles_permitidos(puerta, bloqueada=None):
+    """
+    Perfiles que pueden abrir la puerta en este momento
+    (base de la allowlist de los controladores).
+    `bloqueada` evita consultar el seguro si quien llama ya lo conoce.
+    """
+    motor = motores(puerta.escuela_id)
+    ids = motor.quien_puede(puerta.pk, 'ABRIR_PUERTA')
+    if bloqueada is None:
+        bloqueada = seguro_activo(puerta) or zona_bloqueada(puerta)
+    if bloqueada:
+        # Con seguro activo solo pasan quienes pueden controlarlo
+        ids = np.intersect1d(ids, motor.quien_puede(puerta.pk, 'CONTROLAR_SEGURO'))
+    # Un perfil recién movido a otra escuela puede seguir en los arreglos
+    # de este worker hasta la siguiente sincronización
+    return UserProfile.objects.filter(pk__in=ids.tolist(), escuela_id=puerta.escuela_id)
@@ -1,38 +1,180 @@
-from django.contrib import admin
+from collections import defaultdict
+from datetime import timedelta
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.core.validators import RegexValidator
+from django.db.models import Q
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import UserProfile, Door, LockState
+from .codes import asignador, asignar_codigo
+from .guests import asignar_codigo_invitado, digest_en_uso, invitados
+from .lockdown import cambiar_seguros, iniciar_confinamiento, levantar_confinamiento
+from .paginators import TablaGrandeAdmin
+from .summaries import invalidar_puertas, invalidar_puertas_escuelas
+from .tenancy import escuela_limitada
+from .models import (
+    UserProfile, Door, LockState, LockStateHistory, IoTDevice, Zone, ZonePermission, AccessPolicy,
+    ClassGroup, ClassSchedule, Lockdown, GuestCode, School, hash_codigo,
+)
+
+
+class UserProfileForm(forms.ModelForm):
+    """
+    Formulario de perfil con el código de acceso de solo escritura:
+    se guarda únicamente su digest HMAC y nunca se vuelve a mostrar.
+    """
+    codigo = forms.CharField(
+        required=False,
+        max_length=20,
+        validators=[
+            RegexValidator(
+                regex=r'^[0-9]+$',
+                message='El código de acceso solo puede contener números',
+            )
+        ],
+        widget=forms.PasswordInput(render_value=False),
+        label='Nuevo código de acceso',
+        help_text='Código numérico para acceso físico. Se guarda cifrado; '
+                  'déjalo vacío para conservar el actual (o generar uno).'
+    )
+    
+    class Meta:
+        model = UserProfile
+        fields = '__all__'
+    
+    def clean(self):
+        """El código debe estar libre en la escuela del perfil"""
+        cleaned_data = super().clean()
+        codigo = cleaned_data.get('codigo')
+        if not codigo:
+            return cleaned_data
+        escuela = cleaned_data.get('escuela')
+        escuela_id = escuela.pk if escuela else self.instance.escuela_id
+        digest = hash_codigo(codigo)
+        if UserProfile.objects.filter(escuela_id=escuela_id, codigo_hash=digest).exclude(pk=self.instance.pk).exists():
+            self.add_error('codigo', 'Este código de acceso ya está asignado.')
+        elif digest_en_uso(codigo, escuela_id):
+            self.add_error('codigo', 'Este código está en uso por un invitado.')
+        return cleaned_data
+    
+    def save(self, commit=True):
+        if self.cleaned_data.get('codigo'):
+            self.instance.establecer_codigo(self.cleaned_data['codigo'])
+        elif not self.instance.codigo_hash:
+            # Sin código: se toma uno de los bloques reservados
+            asignar_codigo(self.instance)
+        return super().save(commit)
+
+
+def avisar_codigo_generado(request, perfil):
+    """Muestra una única vez el código asignado automáticamente"""
+    codigo = getattr(perfil, 'codigo_generado', None)
+    if codigo:
+        messages.success(request, f'Código de acceso asignado a {perfil.user.username}: {codigo}')
+
+
+def puede_editar_codigo(request):
+    """Superusuarios y perfiles con la política EDITAR_CODIGO"""
+    if request.user.is_superuser:
+        return True
+    try:
+        return request.user.profile.puede('EDITAR_CODIGO')
+    except UserProfile.DoesNotExist:
+        return False
+
+
+def opciones_de_escuela(modelo, escuela_id):
+    """Filas de `modelo` que un staff limitado a `escuela_id` puede elegir, o None si no aplica"""
+    if modelo is School:
+        return School.objects.filter(pk=escuela_id)
+    if modelo is User:
+        return User.objects.filter(profile__escuela_id=escuela_id)
+    if modelo in (UserProfile, Door, Zone, ClassGroup):
+        return modelo.objects.filter(escuela_id=escuela_id)
+    return None
+
+
+class CamposPorEscuela:
+    """
+    Staff que no es superusuario: los campos de escuela, usuario, perfil,
+    puerta, zona o grupo solo ofrecen (y aceptan) los de su escuela.
+    """
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        escuela_id = escuela_limitada(request.user)
+        if escuela_id is not None:
+            opciones = opciones_de_escuela(db_field.related_model, escuela_id)
+            if opciones is not None:
+                kwargs['queryset'] = opciones
+                if db_field.related_model is School:
+                    # Una escuela vacía significa "todas" (confinamientos)
+                    kwargs['required'] = True
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+    
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        escuela_id = escuela_limitada(request.user)
+        if escuela_id is not None:
+            opciones = opciones_de_escuela(db_field.related_model, escuela_id)
+            if opciones is not None:
+                kwargs['queryset'] = opciones
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+
+class PorEscuelaAdmin(CamposPorEscuela):
+    """
+    Además, el listado, las acciones y la edición solo alcanzan las filas
+    de su escuela. `campo_escuela` es la ruta a la escuela desde el modelo.
+    """
+    campo_escuela = 'escuela'
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        escuela_id = escuela_limitada(request.user)
+        if escuela_id is None:
+            return queryset
+        return queryset.filter(**{f'{self.campo_escuela}_id': escuela_id})
 
 
 # Inline para UserProfile en User Admin
-class UserProfileInline(admin.StackedInline):
+class UserProfileInline(CamposPorEscuela, admin.StackedInline):
     model = UserProfile
     can_delete = False
     verbose_name_plural = 'Perfil de Control de Accesos'
     fk_name = 'user'
-    fields = ('rol', 'codigo_acceso', 'telefono', 'activo')
+    form = UserProfileForm
+    fields = ('escuela', 'rol', 'codigo', 'telefono', 'activo')
     
-    def get_readonly_fields(self, request, obj=None):
+    def get_fields(self, request, obj=None):
         """
-        El código de acceso es editable solo para:
-        - Superusuarios
+        El código de acceso solo se puede asignar con:
+        - Superusuario
         - Staff con permisos de cambio de UserProfile
+        (nunca se muestra: solo se guarda su digest)
         """
-        if request.user.is_superuser:
-            return []
-        if request.user.has_perm('access_control.change_userprofile'):
-            return []
-        # Para usuarios sin permisos, el código es solo lectura
-        return ['codigo_acceso']
+        fields = list(super().get_fields(request, obj))
+        if not (request.user.is_superuser or request.user.has_perm('access_control.change_userprofile')):
+            fields.remove('codigo')
+        return fields
 
 
 # Extender User Admin para incluir UserProfile
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(PorEscuelaAdmin, BaseUserAdmin):
+    campo_escuela = 'profile__escuela'
     inlines = (UserProfileInline,)
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'get_rol', 'cambiar_password_link')
-    list_filter = ('is_staff', 'is_superuser', 'is_active', 'groups', 'profile__rol')
+    list_filter = ('is_staff', 'is_superuser', 'is_active', 'groups', 'profile__escuela', 'profile__rol')
+    
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        try:
+            avisar_codigo_generado(request, form.instance.profile)
+        except UserProfile.DoesNotExist:
+            pass
     
     def get_rol(self, obj):
         """Mostrar el rol del perfil si existe"""
@@ -57,8 +199,8 @@ class UserAdmin(BaseUserAdmin):
             try:
                 profile = request.user.profile
                 
-                # MAESTRO no puede editar is_superuser, is_staff, groups, user_permissions
-                if profile.rol == 'MAESTRO':
+                # Por defecto MAESTRO no puede editar is_superuser, is_staff, groups, user_permissions
+                if not profile.puede('EDITAR_PERMISOS_SISTEMA'):
                     readonly.extend(['is_superuser', 'is_staff', 'groups', 'user_permissions'])
                 
                 # ALUMNO no puede acceder al admin (se maneja en has_view_permission)
@@ -100,8 +242,8 @@ class UserAdmin(BaseUserAdmin):
         
         try:
             profile = request.user.profile
-            # Solo ADMIN y DIRECTOR pueden crear usuarios
-            return profile.rol in ['ADMIN', 'DIRECTOR'] and profile.activo
+            # Por defecto solo ADMIN y DIRECTOR pueden crear usuarios
+            return profile.puede('CREAR_USUARIOS')
         except UserProfile.DoesNotExist:
             return False
     
@@ -112,8 +254,8 @@ class UserAdmin(BaseUserAdmin):
         
         try:
             profile = request.user.profile
-            # Solo ADMIN puede eliminar usuarios
-            return profile.rol == 'ADMIN' and profile.activo
+            # Por defecto solo ADMIN puede eliminar usuarios
+            return profile.puede('ELIMINAR_USUARIOS')
         except UserProfile.DoesNotExist:
             return False
 
@@ -129,23 +271,57 @@ admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
 
 
+@admin.register(School)
+class SchoolAdmin(admin.ModelAdmin):
+    """
+    Escuelas del despliegue. Perfiles, puertas, zonas, grupos y códigos
+    de invitado pertenecen a una; no se pueden eliminar mientras tengan datos.
+    """
+    list_display = ['nombre', 'clave', 'activa', 'fecha_creacion']
+    list_filter = ['activa']
+    search_fields = ['nombre', 'clave']
+    ordering = ['nombre']
+    readonly_fields = ['fecha_creacion']
+    prepopulated_fields = {'clave': ('nombre',)}
+
+
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(PorEscuelaAdmin, TablaGrandeAdmin):
     """
     Administración de perfiles de usuario con roles y códigos de acceso.
     """
+    form = UserProfileForm
     list_display = [
-        'get_nombre_completo', 'rol', 'codigo_acceso', 'telefono', 
+        'get_nombre_completo', 'escuela', 'rol', 'telefono', 
         'activo', 'fecha_creacion', 'cambiar_password_usuario'
     ]
-    list_filter = ['rol', 'activo', 'fecha_creacion']
+    list_filter = ['escuela', 'rol', 'activo', 'fecha_creacion']
     search_fields = [
         'user__username', 'user__first_name', 'user__last_name',
-        'user__email', 'codigo_acceso', 'telefono'
+        'user__email', 'telefono'
     ]
     ordering = ['user__username']
     readonly_fields = ['fecha_creacion', 'fecha_modificacion']
     list_per_page = 25
+    actions = ['generar_codigos']
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        avisar_codigo_generado(request, obj)
+    
+    def generar_codigos(self, request, queryset):
+        """Reemplaza el código de los perfiles por uno nuevo y los muestra una vez"""
+        if not puede_editar_codigo(request):
+            self.message_user(request, 'No tienes permiso para asignar códigos de acceso.', messages.ERROR)
+            return
+        perfiles = list(queryset.select_related('user'))
+        for perfil, codigo in zip(perfiles, asignador.reservar(len(perfiles))):
+            perfil.establecer_codigo(codigo)
+            perfil.codigo_generado = codigo
+        UserProfile.objects.bulk_update(perfiles, ['codigo_hash'], batch_size=500)
+        for perfil in perfiles:
+            avisar_codigo_generado(request, perfil)
+    generar_codigos.short_description = 'Generar nuevo código de acceso'
     
     def get_nombre_completo(self, obj):
         """Mostrar nombre completo o username"""
@@ -164,7 +340,7 @@ class UserProfileAdmin(admin.ModelAdmin):
             'fields': ('user',)
         }),
         ('Control de Acceso', {
-            'fields': ('rol', 'codigo_acceso', 'activo')
+            'fields': ('rol', 'codigo', 'activo')
         }),
         ('Información de Contacto', {
             'fields': ('telefono',)
@@ -175,26 +351,19 @@ class UserProfileAdmin(admin.ModelAdmin):
         }),
     )
     
-    def get_readonly_fields(self, request, obj=None):
+    def get_fieldsets(self, request, obj=None):
         """
-        Control de campos según el rol del usuario actual
+        Control de campos según el rol del usuario actual:
+        por defecto MAESTRO no puede asignar códigos de acceso
+        (DIRECTOR y ADMIN sí). El código nunca se muestra.
         """
-        readonly = list(self.readonly_fields)
-        
-        if not request.user.is_superuser:
-            try:
-                profile = request.user.profile
-                
-                # MAESTRO puede ver pero no modificar código de acceso
-                if profile.rol == 'MAESTRO':
-                    readonly.append('codigo_acceso')
-                
-                # DIRECTOR y ADMIN pueden editar código de acceso
-                
-            except UserProfile.DoesNotExist:
-                readonly.append('codigo_acceso')
-        
-        return readonly
+        fieldsets = super().get_fieldsets(request, obj)
+        if puede_editar_codigo(request):
+            return fieldsets
+        return [
+            (nombre, {**opciones, 'fields': tuple(f for f in opciones['fields'] if f != 'codigo')})
+            for nombre, opciones in fieldsets
+        ]
     
     def has_view_permission(self, request, obj=None):
         """Control de visualización según rol"""
@@ -227,8 +396,8 @@ class UserProfileAdmin(admin.ModelAdmin):
         
         try:
             profile = request.user.profile
-            # Solo ADMIN y DIRECTOR pueden crear perfiles
-            return profile.rol in ['ADMIN', 'DIRECTOR'] and profile.activo
+            # Por defecto solo ADMIN y DIRECTOR pueden crear perfiles
+            return profile.puede('CREAR_USUARIOS')
         except UserProfile.DoesNotExist:
             return False
     
@@ -239,33 +408,34 @@ class UserProfileAdmin(admin.ModelAdmin):
         
         try:
             profile = request.user.profile
-            # Solo ADMIN puede eliminar perfiles
-            return profile.rol == 'ADMIN' and profile.activo
+            # Por defecto solo ADMIN puede eliminar perfiles
+            return profile.puede('ELIMINAR_USUARIOS')
         except UserProfile.DoesNotExist:
             return False
 
 
 @admin.register(Door)
-class DoorAdmin(admin.ModelAdmin):
+class DoorAdmin(PorEscuelaAdmin, TablaGrandeAdmin):
     """
     Administración de puertas del sistema.
     """
     list_display = [
-        'nombre', 'ubicacion', 'estado', 'activa', 
+        'nombre', 'escuela', 'ubicacion', 'zona', 'estado', 'activa', 
         'fecha_creacion'
     ]
-    list_filter = ['estado', 'activa', 'fecha_creacion']
+    list_filter = ['escuela', 'estado', 'activa', 'zona', 'fecha_creacion']
     search_fields = ['nombre', 'ubicacion', 'descripcion']
     ordering = ['nombre']
     readonly_fields = ['fecha_creacion', 'fecha_modificacion']
+    list_select_related = ['escuela', 'zona']
     list_per_page = 20
     
     fieldsets = (
         ('Información Básica', {
-            'fields': ('nombre', 'ubicacion', 'descripcion')
+            'fields': ('escuela', 'nombre', 'ubicacion', 'zona', 'descripcion')
         }),
         ('Estado', {
-            'fields': ('estado', 'activa')
+            'fields': ('estado', 'activa', 'capacidad')
         }),
         ('Metadatos', {
             'fields': ('fecha_creacion', 'fecha_modificacion'),
@@ -275,36 +445,53 @@ class DoorAdmin(admin.ModelAdmin):
     
     actions = ['marcar_como_abierta', 'marcar_como_cerrada', 'activar_puertas', 'desactivar_puertas']
     
+    def _invalidar_resumenes(self, puertas):
+        """update() no dispara signals: descarta los resúmenes por escuela"""
+        por_escuela = defaultdict(list)
+        for escuela_id, puerta_id in puertas:
+            por_escuela[escuela_id].append(puerta_id)
+        for escuela_id, puertas_ids in por_escuela.items():
+            invalidar_puertas(escuela_id, puertas_ids)
+    
     def marcar_como_abierta(self, request, queryset):
         """Acción para abrir puertas seleccionadas"""
+        puertas = list(queryset.values_list('escuela_id', 'pk'))
         updated = queryset.update(estado='ABIERTA')
+        self._invalidar_resumenes(puertas)
         self.message_user(request, f'{updated} puerta(s) marcada(s) como ABIERTA.')
     marcar_como_abierta.short_description = "Marcar como ABIERTA"
     
     def marcar_como_cerrada(self, request, queryset):
         """Acción para cerrar puertas seleccionadas"""
+        puertas = list(queryset.values_list('escuela_id', 'pk'))
         updated = queryset.update(estado='CERRADA')
+        self._invalidar_resumenes(puertas)
         self.message_user(request, f'{updated} puerta(s) marcada(s) como CERRADA.')
     marcar_como_cerrada.short_description = "Marcar como CERRADA"
     
     def activar_puertas(self, request, queryset):
         """Acción para activar puertas"""
+        puertas = list(queryset.values_list('escuela_id', 'pk'))
         updated = queryset.update(activa=True)
+        self._invalidar_resumenes(puertas)
         self.message_user(request, f'{updated} puerta(s) activada(s).')
     activar_puertas.short_description = "Activar puertas seleccionadas"
     
     def desactivar_puertas(self, request, queryset):
         """Acción para desactivar puertas"""
+        puertas = list(queryset.values_list('escuela_id', 'pk'))
         updated = queryset.update(activa=False)
+        self._invalidar_resumenes(puertas)
         self.message_user(request, f'{updated} puerta(s) desactivada(s).')
     desactivar_puertas.short_description = "Desactivar puertas seleccionadas"
 
 
 @admin.register(LockState)
-class LockStateAdmin(admin.ModelAdmin):
+class LockStateAdmin(PorEscuelaAdmin, TablaGrandeAdmin):
     """
     Administración del estado de seguros de puertas.
     """
+    campo_escuela = 'puerta__escuela'
     list_display = [
         'puerta', 'activo', 'usuario_cambio', 
         'fecha_cambio'
@@ -330,15 +517,364 @@ class LockStateAdmin(admin.ModelAdmin):
     actions = ['activar_seguro', 'desactivar_seguro']
     
     def activar_seguro(self, request, queryset):
-        """Acción para activar seguros"""
-        for seguro in queryset:
-            seguro.activar(usuario=request.user, observacion="Activado desde admin")
-        self.message_user(request, f'{queryset.count()} seguro(s) activado(s).')
+        """Acción para activar seguros (un solo UPDATE, con historial)"""
+        cambiadas = cambiar_seguros(
+            Door.objects.filter(seguro__in=queryset), True, request.user, "Activado desde admin"
+        )
+        self.message_user(request, f'{len(cambiadas)} seguro(s) activado(s).')
     activar_seguro.short_description = "Activar seguros seleccionados"
     
     def desactivar_seguro(self, request, queryset):
-        """Acción para desactivar seguros"""
-        for seguro in queryset:
-            seguro.desactivar(usuario=request.user, observacion="Desactivado desde admin")
-        self.message_user(request, f'{queryset.count()} seguro(s) desactivado(s).')
+        """Acción para desactivar seguros (un solo UPDATE, con historial)"""
+        cambiadas = cambiar_seguros(
+            Door.objects.filter(seguro__in=queryset), False, request.user, "Desactivado desde admin"
+        )
+        self.message_user(request, f'{len(cambiadas)} seguro(s) desactivado(s).')
     desactivar_seguro.short_description = "Desactivar seguros seleccionados"
+
+
+
+@admin.register(Lockdown)
+class LockdownAdmin(PorEscuelaAdmin, admin.ModelAdmin):
+    """
+    Confinamientos de emergencia. "Agregar" inicia uno (bloquea todas las
+    puertas de la escuela, o de todas si se deja vacía); la acción
+    "Levantar" libera las puertas que bloqueó.
+    Solo superusuarios y perfiles que pueden desactivar el seguro.
+    """
+    list_display = [
+        'fecha_inicio', 'escuela', 'motivo', 'iniciado_por', 'total_puertas',
+        'duracion_ms', 'fecha_fin', 'levantado_por'
+    ]
+    list_filter = ['escuela', 'fecha_inicio']
+    ordering = ['-fecha_inicio']
+    list_select_related = ['escuela', 'iniciado_por', 'levantado_por']
+    readonly_fields = [
+        'iniciado_por', 'fecha_inicio', 'total_puertas', 'duracion_ms',
+        'levantado_por', 'fecha_fin'
+    ]
+    list_per_page = 20
+    
+    actions = ['levantar']
+    
+    def get_fields(self, request, obj=None):
+        return ['escuela', 'motivo'] if obj is None else ['escuela', 'motivo'] + self.readonly_fields
+    
+    def get_readonly_fields(self, request, obj=None):
+        return [] if obj is None else ['escuela', 'motivo'] + self.readonly_fields
+    
+    def puede_confinar(self, request):
+        if request.user.is_superuser:
+            return True
+        try:
+            return request.user.profile.puede_desactivar_seguro()
+        except UserProfile.DoesNotExist:
+            return False
+    
+    def has_add_permission(self, request):
+        return self.puede_confinar(request)
+    
+    def has_change_permission(self, request, obj=None):
+        """Los confinamientos no se editan (la acción los levanta)"""
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        """Registro de auditoría"""
+        return False
+    
+    def save_model(self, request, obj, form, change):
+        """Inicia el confinamiento en lugar de solo guardar la fila"""
+        confinamiento = iniciar_confinamiento(request.user, obj.motivo, obj.escuela)
+        obj.pk = confinamiento.pk
+        obj.refresh_from_db()
+        self.message_user(
+            request,
+            f'🔒 Confinamiento iniciado: {len(confinamiento.puertas_bloqueadas)} puerta(s) bloqueada(s) '
+            f'en {confinamiento.duracion_ms:.0f} ms.',
+            messages.WARNING,
+        )
+    
+    def levantar(self, request, queryset):
+        """Acción para levantar los confinamientos seleccionados"""
+        if not self.puede_confinar(request):
+            self.message_user(request, 'No tienes permiso para levantar confinamientos.', messages.ERROR)
+            return
+        liberadas = sum(levantar_confinamiento(c, request.user) for c in queryset.filter(fecha_fin__isnull=True))
+        self.message_user(request, f'🔓 {liberadas} puerta(s) liberada(s).')
+    levantar.short_description = "Levantar confinamientos seleccionados"
+
+
+@admin.register(LockStateHistory)
+class LockStateHistoryAdmin(PorEscuelaAdmin, TablaGrandeAdmin):
+    """
+    Consulta del historial de transiciones del seguro (solo lectura).
+    """
+    campo_escuela = 'puerta__escuela'
+    list_display = ['fecha', 'puerta', 'activo', 'usuario']
+    list_filter = ['activo', 'fecha']
+    search_fields = ['puerta__nombre', 'usuario__username']
+    ordering = ['-fecha']
+    list_select_related = ['puerta', 'usuario']
+    list_per_page = 25
+    
+    def has_add_permission(self, request):
+        """El historial solo se escribe al cambiar el seguro"""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        """El historial es inmutable"""
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        """El historial es inmutable"""
+        return False
+
+class ZonePermissionInline(CamposPorEscuela, admin.TabularInline):
+    model = ZonePermission
+    extra = 0
+    autocomplete_fields = ['perfil']
+    verbose_name_plural = 'Permisos de acceso (se heredan a las subzonas)'
+
+
+@admin.register(Zone)
+class ZoneAdmin(PorEscuelaAdmin, admin.ModelAdmin):
+    """
+    Administración de la jerarquía de zonas (campus, edificios y pisos).
+    """
+    list_display = ['nombre', 'tipo', 'padre', 'escuela', 'bloqueada', 'capacidad']
+    list_filter = ['escuela', 'tipo', 'bloqueada']
+    search_fields = ['nombre', 'padre__nombre']
+    ordering = ['tipo', 'nombre']
+    readonly_fields = ['fecha_creacion']
+    list_select_related = ['padre']
+    inlines = (ZonePermissionInline,)
+    list_per_page = 20
+    
+    actions = ['bloquear_zonas', 'desbloquear_zonas']
+    
+    def bloquear_zonas(self, request, queryset):
+        """Acción para bloquear zonas (se hereda a todas sus puertas)"""
+        escuelas = set(queryset.values_list('escuela_id', flat=True))
+        updated = queryset.update(bloqueada=True)
+        invalidar_puertas_escuelas(escuelas)
+        self.message_user(request, f'{updated} zona(s) bloqueada(s).')
+    bloquear_zonas.short_description = "Bloquear zonas seleccionadas"
+    
+    def desbloquear_zonas(self, request, queryset):
+        """Acción para retirar el bloqueo de zonas"""
+        escuelas = set(queryset.values_list('escuela_id', flat=True))
+        updated = queryset.update(bloqueada=False)
+        invalidar_puertas_escuelas(escuelas)
+        self.message_user(request, f'{updated} zona(s) desbloqueada(s).')
+    desbloquear_zonas.short_description = "Desbloquear zonas seleccionadas"
+
+
+class AccessPolicyForm(forms.ModelForm):
+    """Staff limitado a una escuela: la regla debe limitarse a una zona o puerta de ella"""
+    requiere_alcance = False
+    
+    class Meta:
+        model = AccessPolicy
+        fields = '__all__'
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.requiere_alcance and not (cleaned_data.get('zona') or cleaned_data.get('puerta')):
+            raise forms.ValidationError('Las reglas globales solo las edita un superusuario; elige una zona o puerta.')
+        return cleaned_data
+
+
+@admin.register(AccessPolicy)
+class AccessPolicyAdmin(CamposPorEscuela, admin.ModelAdmin):
+    """
+    Administración de las reglas de política (rol × acción × alcance).
+    Los cambios invalidan la tabla de decisión compilada. El staff de una
+    escuela ve las reglas globales, pero solo edita las de su escuela.
+    """
+    form = AccessPolicyForm
+    list_display = ['accion', 'rol', 'zona', 'puerta', 'permitido', 'fecha_modificacion']
+    list_filter = ['accion', 'rol', 'permitido']
+    search_fields = ['zona__nombre', 'puerta__nombre']
+    ordering = ['accion', 'rol']
+    readonly_fields = ['fecha_modificacion']
+    list_select_related = ['zona', 'puerta']
+    list_per_page = 50
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        escuela_id = escuela_limitada(request.user)
+        if escuela_id is None:
+            return queryset
+        return queryset.filter(
+            Q(zona__escuela_id=escuela_id) | Q(puerta__escuela_id=escuela_id)
+            | Q(zona__isnull=True, puerta__isnull=True)
+        )
+    
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        form.requiere_alcance = escuela_limitada(request.user) is not None
+        return form
+    
+    def has_change_permission(self, request, obj=None):
+        if obj is not None and not (obj.zona_id or obj.puerta_id) and escuela_limitada(request.user) is not None:
+            return False
+        return super().has_change_permission(request, obj)
+    
+    def has_delete_permission(self, request, obj=None):
+        if obj is not None and not (obj.zona_id or obj.puerta_id) and escuela_limitada(request.user) is not None:
+            return False
+        return super().has_delete_permission(request, obj)
+
+
+@admin.register(IoTDevice)
+class IoTDeviceAdmin(PorEscuelaAdmin, admin.ModelAdmin):
+    """
+    Administración de controladores IoT y sus claves de firma.
+    """
+    campo_escuela = 'puerta__escuela'
+    list_display = [
+        'identificador', 'nombre', 'puerta', 'activo',
+        'ultimo_heartbeat'
+    ]
+    list_filter = ['activo']
+    search_fields = ['identificador', 'nombre', 'puerta__nombre']
+    ordering = ['identificador']
+    readonly_fields = ['ultimo_heartbeat', 'fecha_creacion']
+    list_select_related = ['puerta']
+    list_per_page = 20
+    
+    fieldsets = (
+        ('Dispositivo', {
+            'fields': ('identificador', 'nombre', 'puerta', 'activo')
+        }),
+        ('Autenticación', {
+            'fields': ('clave_secreta',),
+            'classes': ('collapse',)
+        }),
+        ('Metadatos', {
+            'fields': ('ultimo_heartbeat', 'fecha_creacion'),
+            'classes': ('collapse',)
+        }),
+    )
+
+
+class GuestCodeForm(forms.ModelForm):
+    """Las puertas de un código de invitado deben ser de su escuela"""
+    
+    class Meta:
+        model = GuestCode
+        fields = '__all__'
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        escuela, puertas = cleaned_data.get('escuela'), cleaned_data.get('puertas')
+        if escuela and puertas and puertas.exclude(escuela=escuela).exists():
+            self.add_error('puertas', 'Todas las puertas deben ser de la escuela del invitado.')
+        return cleaned_data
+
+
+@admin.register(GuestCode)
+class GuestCodeAdmin(PorEscuelaAdmin, admin.ModelAdmin):
+    """
+    Códigos temporales de invitado. El código se genera al crear el
+    registro y se muestra una sola vez; desactivar lo revoca de inmediato.
+    """
+    form = GuestCodeForm
+    list_display = [
+        'nombre', 'escuela', 'motivo', 'valido_desde', 'expira', 'get_usos',
+        'activo', 'get_vigente', 'creado_por'
+    ]
+    list_filter = ['escuela', 'activo', 'expira']
+    search_fields = ['nombre', 'motivo']
+    ordering = ['-fecha_creacion']
+    readonly_fields = ['usos', 'creado_por', 'fecha_creacion']
+    list_select_related = ['escuela', 'creado_por']
+    filter_horizontal = ['puertas']
+    list_per_page = 25
+    
+    fieldsets = (
+        ('Invitado', {
+            'fields': ('escuela', 'nombre', 'motivo', 'puertas')
+        }),
+        ('Vigencia', {
+            'fields': ('valido_desde', 'expira', 'usos_maximos', 'usos', 'activo')
+        }),
+        ('Metadatos', {
+            'fields': ('creado_por', 'fecha_creacion'),
+            'classes': ('collapse',)
+        }),
+    )
+    
+    actions = ['desactivar']
+    
+    def get_changeform_initial_data(self, request):
+        inicial = super().get_changeform_initial_data(request)
+        inicial.setdefault('expira', timezone.now() + timedelta(hours=settings.GUEST_CODES['DEFAULT_HOURS']))
+        return inicial
+    
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.creado_por = request.user
+            asignar_codigo_invitado(obj)
+        super().save_model(request, obj, form, change)
+    
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        codigo = getattr(form.instance, 'codigo_generado', None)
+        if codigo:
+            self.message_user(
+                request,
+                f'Código de invitado para {form.instance.nombre}: {codigo} '
+                f'(válido hasta {timezone.localtime(form.instance.expira):%Y-%m-%d %H:%M}). '
+                'No se volverá a mostrar.',
+            )
+    
+    def get_usos(self, obj):
+        return f'{obj.usos} / {obj.usos_maximos}' if obj.usos_maximos is not None else str(obj.usos)
+    get_usos.short_description = 'Usos'
+    
+    def get_vigente(self, obj):
+        return obj.vigente
+    get_vigente.short_description = 'Vigente'
+    get_vigente.boolean = True
+    
+    def desactivar(self, request, queryset):
+        """Acción para revocar los códigos seleccionados"""
+        escuelas = set(queryset.values_list('escuela_id', flat=True))
+        actualizados = queryset.filter(activo=True).update(activo=False)
+        for escuela_id in escuelas:
+            invitados(escuela_id).invalidar()
+        self.message_user(request, f'{actualizados} código(s) de invitado revocado(s).')
+    desactivar.short_description = "Revocar códigos seleccionados"
+
+
+class ClassScheduleInline(CamposPorEscuela, admin.TabularInline):
+    model = ClassSchedule
+    extra = 0
+    autocomplete_fields = ['puerta']
+
+
+@admin.register(ClassGroup)
+class ClassGroupAdmin(CamposPorEscuela, admin.ModelAdmin):
+    """
+    Administración de grupos y sus horarios. Los maestros solo ven sus
+    grupos; la asistencia se consulta en /admin/asistencia/.
+    """
+    list_display = ['nombre', 'periodo', 'maestro', 'fecha_inicio', 'fecha_fin', 'activo', 'ver_asistencia']
+    list_filter = ['escuela', 'periodo', 'activo']
+    search_fields = ['nombre', 'maestro__username', 'maestro__last_name']
+    ordering = ['-periodo', 'nombre']
+    list_select_related = ['maestro']
+    filter_horizontal = ['alumnos']
+    inlines = (ClassScheduleInline,)
+    list_per_page = 25
+    
+    def get_queryset(self, request):
+        from audit.attendance import grupos_visibles
+        return grupos_visibles(request.user).select_related('maestro')
+    
+    def ver_asistencia(self, obj):
+        """Enlace al reporte de asistencia del grupo"""
+        url = reverse('admin-asistencia')
+        return format_html('<a href="{}?grupo={}">📋 Asistencia</a>', url, obj.pk)
+    ver_asistencia.short_description = 'Asistencia'
@@ -0,0 +1,21 @@
+"""
+Autenticación JWT de la API con revocación de tokens.
+"""
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .revocation import revocaciones
+
+
+class JWTRevocableAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que rechaza los tokens revocados.
+    La revisión es contra la copia en memoria: sin consulta por petición.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if revocaciones.esta_revocado(token.get(api_settings.JTI_CLAIM)):
+            raise InvalidToken({'detail': 'El token fue revocado', 'code': 'token_revoked'})
+        return token
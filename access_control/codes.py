@@ -0,0 +1,174 @@
+"""
+Asignación de códigos de acceso numéricos sin colisiones.
+
+Los códigos no se eligen al azar y se reintentan: salen de una secuencia
+de posiciones 0, 1, 2, ... (AccessCodeSequence) pasadas por una
+permutación secreta del espacio de códigos de ACCESS_CODES['DIGITS']
+dígitos (red de Feistel con HMAC y "cycle walking"). Al ser una
+biyección, dos posiciones distintas nunca dan el mismo código y los
+códigos consecutivos no se pueden adivinar. La clave de la permutación
+se deriva con HKDF de ACCESS_CODE_PERMUTATION_SECRET, que no sale del
+servidor: ACCESS_CODE_KEY está en todos los controladores y con ella
+se podrían recalcular todos los códigos emitidos.
+
+Cada worker reserva BLOCK_SIZE posiciones con un solo UPDATE y las
+entrega desde memoria; al reservar descarta, con una consulta por bloque,
+los códigos que ya se asignaron a mano. Las posiciones de un bloque que
+no se llegan a usar (reinicio del worker) simplemente se pierden.
+
+Si el bloque se reservó dentro de una transacción que luego se revierte,
+otro worker puede recibir las mismas posiciones; el índice único de
+codigo_hash lo detecta y guardar_con_codigo() toma el siguiente código.
+Las importaciones masivas reservan antes de abrir su transacción.
+"""
+import hashlib
+import hmac
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AccessCodeSequence, UserProfile, hash_codigo
+
+
+RONDAS = 4
+
+
+class SinCodigosDisponibles(Exception):
+    """Se agotaron las posiciones del espacio de códigos configurado"""
+
+
+def hkdf_sha256(secreto, info, longitud=32, sal=b''):
+    """HKDF (RFC 5869) con SHA-256: clave de `longitud` bytes para el uso `info`"""
+    prk = hmac.new(sal or bytes(32), secreto, hashlib.sha256).digest()
+    salida, bloque = b'', b''
+    for contador in range(1, -(-longitud // 32) + 1):
+        bloque = hmac.new(prk, bloque + info + bytes([contador]), hashlib.sha256).digest()
+        salida += bloque
+    return salida[:longitud]
+
+
+class Permutacion:
+    """Biyección secreta de [0, 10**digitos) sobre sí mismo"""
+
+    def __init__(self, secreto, digitos):
+        self.tamano = 10 ** digitos
+        bits = max(2, (self.tamano - 1).bit_length())
+        self.mitad = (bits + 1) // 2
+        self.mascara = (1 << self.mitad) - 1
+        self.clave = hkdf_sha256(secreto.encode(), b'control-accesos:permutacion-codigos')
+
+    def _ronda(self, ronda, valor):
+        digest = hmac.new(self.clave, bytes([ronda]) + valor.to_bytes(8, 'big'), hashlib.sha256).digest()
+        return int.from_bytes(digest[:8], 'big') & self.mascara
+
+    def _feistel(self, valor):
+        izquierda, derecha = valor >> self.mitad, valor & self.mascara
+        for ronda in range(RONDAS):
+            izquierda, derecha = derecha, izquierda ^ self._ronda(ronda, derecha)
+        return (izquierda << self.mitad) | derecha
+
+    def __call__(self, posicion):
+        # El dominio de la red (2**(2*mitad)) es a lo más 4 veces el espacio:
+        # se vuelve a aplicar hasta caer dentro (en promedio menos de 4 veces)
+        valor = self._feistel(posicion)
+        while valor >= self.tamano:
+            valor = self._feistel(valor)
+        return valor
+
+
+class AsignadorCodigos:
+    """Entrega códigos de bloques reservados por este proceso"""
+
+    def __init__(self):
+        self._disponibles = deque()
+        self._pid = os.getpid()
+        self._permutacion = None
+        self._lock = threading.Lock()
+
+    def _reservar_posiciones(self, cantidad):
+        """Reserva `cantidad` posiciones consecutivas; devuelve la primera"""
+        secuencia = AccessCodeSequence.objects.filter(pk=1)
+        cambios = {'siguiente': F('siguiente') + cantidad, 'fecha_modificacion': timezone.now()}
+        with transaction.atomic():
+            if not secuencia.update(**cambios):
+                # La migración crea la fila; por si se borró
+                AccessCodeSequence.objects.get_or_create(pk=1)
+                secuencia.update(**cambios)
+            siguiente = secuencia.values_list('siguiente', flat=True).get()
+        return siguiente - cantidad
+
+    def _reservar_bloque(self, cantidad):
+        """Agrega al menos `cantidad` códigos libres a los disponibles"""
+        digitos = settings.ACCESS_CODES['DIGITS']
+        if self._permutacion is None:
+            self._permutacion = Permutacion(settings.ACCESS_CODE_PERMUTATION_SECRET, digitos)
+        while cantidad > 0:
+            tamano = max(cantidad, settings.ACCESS_CODES['BLOCK_SIZE'])
+            inicio = self._reservar_posiciones(tamano)
+            if inicio + tamano > self._permutacion.tamano:
+                raise SinCodigosDisponibles(
+                    f'Se agotaron los códigos de {digitos} dígitos; aumenta ACCESS_CODES["DIGITS"]'
+                )
+            codigos = {
+                hash_codigo(codigo): codigo
+                for codigo in (
+                    str(self._permutacion(posicion)).zfill(digitos)
+                    for posicion in range(inicio, inicio + tamano)
+                )
+            }
+            # Códigos que alguien ya asignó a mano
+            ocupados = set(
+                UserProfile.objects.filter(codigo_hash__in=list(codigos)).values_list('codigo_hash', flat=True)
+            )
+            libres = [codigo for digest, codigo in codigos.items() if digest not in ocupados]
+            self._disponibles.extend(libres)
+            cantidad -= len(libres)
+
+    def reservar(self, cantidad):
+        """Lista de `cantidad` códigos sin asignar (importaciones masivas)"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Proceso hijo (fork): el bloque heredado también es del padre
+                self._disponibles.clear()
+                self._pid = os.getpid()
+            faltan = cantidad - len(self._disponibles)
+            if faltan > 0:
+                self._reservar_bloque(faltan)
+            return [self._disponibles.popleft() for _ in range(cantidad)]
+
+    def siguiente(self):
+        """Un código sin asignar"""
+        return self.reservar(1)[0]
+
+
+asignador = AsignadorCodigos()
+
+
+def asignar_codigo(perfil):
+    """
+    Asigna al perfil (sin guardarlo) un código nuevo y lo deja en
+    perfil.codigo_generado: es la única vez que se conoce en claro.
+    """
+    codigo = asignador.siguiente()
+    perfil.establecer_codigo(codigo)
+    perfil.codigo_generado = codigo
+    return codigo
+
+
+def guardar_con_codigo(perfil, intentos=5):
+    """Guarda el perfil con un código nuevo, tomando otro si ya estaba en uso"""
+    for _ in range(intentos):
+        asignar_codigo(perfil)
+        try:
+            with transaction.atomic():
+                perfil.save()
+            return perfil
+        except IntegrityError:
+            if not UserProfile.objects.filter(escuela_id=perfil.escuela_id, codigo_hash=perfil.codigo_hash).exists():
+                raise
+    raise IntegrityError('No se pudo asignar un código de acceso libre')
@@ -0,0 +1,92 @@
+"""
+Ruta ligera para el tráfico de controladores IoT.
+
+Las peticiones bajo DEVICE_URL_PREFIX no pasan por el MIDDLEWARE del
+navegador/admin (sesiones, CSRF, mensajes, clickjacking, CORS): se atienden
+con un handler propio que solo aplica DEVICE_MIDDLEWARE y resuelve
+contra DEVICE_URLCONF. Hay una versión WSGI (wsgi.py) y una ASGI
+(asgi.py); en ASGI la cadena, que es síncrona, corre en el hilo de
+sync_to_async como cualquier vista síncrona.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.exception import convert_exception_to_response
+from django.core.handlers.wsgi import WSGIHandler
+from django.utils.module_loading import import_string
+
+
+def construir_cadena(rutas_middleware, vista):
+    """
+    Envuelve una vista con la lista de middleware indicada, en el mismo
+    orden en que Django aplica settings.MIDDLEWARE.
+    """
+    handler = convert_exception_to_response(vista)
+    for ruta in reversed(rutas_middleware):
+        middleware = import_string(ruta)
+        handler = convert_exception_to_response(middleware(handler))
+    return handler
+
+
+class CadenaDispositivos:
+    """
+    Mezcla para los handlers de Django: la cadena mínima de middleware
+    para dispositivos.
+    """
+
+    def load_middleware(self, is_async=False):
+        """Construye la cadena a partir de DEVICE_MIDDLEWARE en lugar de MIDDLEWARE"""
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+        cadena = construir_cadena(settings.DEVICE_MIDDLEWARE, self._get_device_response)
+        self._middleware_chain = sync_to_async(cadena, thread_sensitive=True) if is_async else cadena
+
+    def _get_device_response(self, request):
+        """Resuelve la vista contra el urlconf de dispositivos"""
+        request.urlconf = settings.DEVICE_URLCONF
+        return self._get_response(request)
+
+
+class DeviceWSGIHandler(CadenaDispositivos, WSGIHandler):
+    """
+    Handler WSGI con la cadena mínima de middleware para dispositivos.
+    """
+
+
+class DeviceASGIHandler(CadenaDispositivos, ASGIHandler):
+    """
+    Handler ASGI con la cadena mínima de middleware para dispositivos.
+    """
+
+
+class DeviceDispatcher:
+    """
+    Aplicación WSGI que separa el tráfico de dispositivos del resto.
+    """
+
+    def __init__(self, aplicacion, aplicacion_dispositivos, prefijo=None):
+        self.aplicacion = aplicacion
+        self.aplicacion_dispositivos = aplicacion_dispositivos
+        self.prefijo = prefijo or settings.DEVICE_URL_PREFIX
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith(self.prefijo):
+            return self.aplicacion_dispositivos(environ, start_response)
+        return self.aplicacion(environ, start_response)
+
+
+class DeviceASGIDispatcher:
+    """
+    Aplicación ASGI que separa el tráfico de dispositivos del resto.
+    """
+
+    def __init__(self, aplicacion, aplicacion_dispositivos, prefijo=None):
+        self.aplicacion = aplicacion
+        self.aplicacion_dispositivos = aplicacion_dispositivos
+        self.prefijo = prefijo or settings.DEVICE_URL_PREFIX
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope.get('path', '').startswith(self.prefijo):
+            return await self.aplicacion_dispositivos(scope, receive, send)
+        return await self.aplicacion(scope, receive, send)
@@ -0,0 +1,16 @@
+"""
+URLconf de la ruta ligera para controladores IoT (DEVICE_URLCONF).
+"""
+from django.urls import path
+from . import device_views
+
+handler404 = 'access_control.device_views.no_encontrado'
+handler500 = 'access_control.device_views.error_servidor'
+
+urlpatterns = [
+    path('api/device/attempt/', device_views.registrar_intento, name='device-attempt'),
+    path('api/device/attempts/batch/', device_views.cargar_intentos, name='device-attempts-batch'),
+    path('api/device/forced-open/', device_views.apertura_forzada, name='device-forced-open'),
+    path('api/device/heartbeat/', device_views.heartbeat, name='device-heartbeat'),
+    path('api/device/allowlist/', device_views.sincronizar_allowlist, name='device-allowlist'),
+]
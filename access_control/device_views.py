@@ -0,0 +1,181 @@
+"""
+Vistas para controladores IoT.
+Se sirven por la ruta ligera (ver device_handler.py): sin sesiones, CSRF
+ni mensajes; el dispositivo llega autenticado en request.dispositivo.
+"""
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET, require_POST
+
+from audit.anomalies import analizar_intento
+from audit.heatmaps import acumulador
+from audit.models import AccessAttempt, SecurityAlert
+from audit.occupancy import DELTA, contadores
+from audit.offline import LoteInvalido, cargar_lote, leer_lote
+from audit.similarity import hash_perceptual
+from .access import SEGURO_ACTIVO, ResultadoAcceso, evaluar_acceso, perfil_por_codigo, perfiles_permitidos
+from .lockdown import confinamiento_activo
+from .models import Door, IoTDevice, hash_codigo
+from .notifications import avisar_apertura_forzada, avisar_seguro
+from .summaries import resumen_puerta
+
+
+@require_POST
+def registrar_intento(request):
+    """
+    Registra un intento de acceso con código (y foto opcional).
+    Campos multipart: codigo, imagen, sentido (ENTRADA por defecto o SALIDA).
+    Las salidas no se niegan y el código es opcional (solo identifica).
+    Las entradas se niegan si la puerta o una de sus zonas está llena.
+    """
+    dispositivo = request.dispositivo
+    codigo = request.POST.get('codigo', '').strip()
+    sentido = request.POST.get('sentido', 'ENTRADA').strip().upper()
+    if sentido not in DELTA:
+        return JsonResponse({'error': 'Sentido inválido'}, status=400)
+
+    if sentido == 'SALIDA':
+        perfil = perfil_por_codigo(codigo, request.escuela_id) if codigo else None
+        resultado = ResultadoAcceso(True, perfil, 'Salida')
+    elif not codigo:
+        return JsonResponse({'error': 'Falta el código'}, status=400)
+    else:
+        resultado = evaluar_acceso(dispositivo.puerta, codigo, cupo=contadores(request.escuela_id).verificar_cupo)
+
+    imagen = request.FILES.get('imagen')
+    intento = AccessAttempt.objects.create(
+        usuario=resultado.perfil.user if resultado.perfil else None,
+        puerta=dispositivo.puerta,
+        dispositivo_id=request.dispositivo_id,
+        exitoso=resultado.exitoso,
+        sentido=sentido,
+        codigo_usado=hash_codigo(codigo) if codigo else '',
+        motivo=resultado.motivo,
+        imagen=imagen,
+        phash=hash_perceptual(imagen) if imagen else None,
+        ip_address=request.META.get('REMOTE_ADDR'),
+    )
+    if intento.exitoso:
+        contadores(request.escuela_id).registrar(intento.puerta_id, sentido)
+        acumulador.registrar(intento.puerta_id, intento.fecha_hora)
+    elif resultado.motivo == SEGURO_ACTIVO:
+        avisar_seguro(dispositivo.puerta, intento, resultado.perfil)
+    analizar_intento(intento)
+    return JsonResponse({
+        'id': intento.id,
+        'acceso': resultado.exitoso,
+        'motivo': resultado.motivo,
+        'confinamiento': confinamiento_activo(request.escuela_id) is not None,
+    })
+
+
+@require_POST
+def cargar_intentos(request):
+    """
+    Recibe en lote los intentos que el controlador decidió sin conexión.
+    Cuerpo: {"intentos": [{clave, fecha_hora, acceso, sentido, codigo_hash,
+    motivo}, ...]}, opcionalmente con Content-Encoding gzip. La firma cubre
+    el cuerpo tal como se envía (comprimido). Con respuesta 200 el lote
+    queda registrado y el controlador puede borrarlo; reenviarlo no
+    duplica intentos.
+    """
+    try:
+        intentos = leer_lote(request.body, request.headers.get('Content-Encoding', ''))
+    except LoteInvalido as error:
+        return JsonResponse({'error': str(error)}, status=error.estado)
+    resultado = cargar_lote(
+        request.dispositivo_id, request.puerta_id, request.escuela_id, intentos,
+        ip=request.META.get('REMOTE_ADDR'),
+    )
+    return JsonResponse(resultado)
+
+
+@require_POST
+def apertura_forzada(request):
+    """
+    El sensor de la puerta detectó que se abrió sin un acceso concedido
+    por el controlador. Se registra como alerta de seguridad y se avisa a
+    quienes controlan el seguro de la puerta.
+    """
+    puerta = request.dispositivo.puerta
+    alerta = SecurityAlert.objects.create(
+        tipo='FORZADA',
+        fecha_hora=timezone.now(),
+        puerta=puerta,
+        detalle=f'Apertura forzada de {puerta.nombre}'[:255],
+    )
+    avisar_apertura_forzada(puerta, alerta.fecha_hora)
+    return JsonResponse({'alerta': alerta.pk})
+
+
+@require_POST
+def heartbeat(request):
+    """
+    Señal de vida del controlador.
+    Devuelve el estado actual de la puerta y su seguro, y en `sondeo`
+    los segundos hasta el siguiente heartbeat: si `seguro_activo` o
+    `confinamiento` cambiaron, el controlador pide la allowlist de
+    inmediato.
+    """
+    ahora = timezone.now()
+    IoTDevice.objects.filter(pk=request.dispositivo_id).update(ultimo_heartbeat=ahora)
+    puerta = resumen_puerta(request.escuela_id, request.puerta_id)
+    if puerta is None:
+        return puerta_eliminada()
+    confinamiento = confinamiento_activo(request.escuela_id) is not None
+    return JsonResponse({
+        'puerta': puerta['id'],
+        'estado': puerta['estado'],
+        'activa': puerta['activa'],
+        'seguro_activo': puerta['seguro_activo'] or puerta['zona_bloqueada'] or confinamiento,
+        'confinamiento': confinamiento,
+        'sondeo': settings.LOCKDOWN['POLL_INTERVAL'],
+        'hora_servidor': ahora.isoformat(),
+    })
+
+
+@require_GET
+def sincronizar_allowlist(request):
+    """
+    Lista de códigos que pueden abrir la puerta del dispositivo,
+    para que el controlador decida sin conexión. Se envían los digests
+    HMAC-SHA256 (clave ACCESS_CODE_KEY), nunca los códigos.
+    """
+    puerta = resumen_puerta(request.escuela_id, request.puerta_id)
+    if puerta is None:
+        return puerta_eliminada()
+    bloqueada = puerta['seguro_activo'] or puerta['zona_bloqueada'] or confinamiento_activo(request.escuela_id) is not None
+    codigos = []
+    if puerta['activa']:
+        codigos = list(
+            perfiles_permitidos(Door(pk=puerta['id'], escuela_id=puerta['escuela_id']), bloqueada)
+            .values_list('codigo_hash', flat=True)
+        )
+    return JsonResponse({
+        'puerta': puerta['id'],
+        'activa': puerta['activa'],
+        'seguro_activo': bloqueada,
+        'codigos': codigos,
+        'formato': 'hmac-sha256',
+        'sondeo': settings.LOCKDOWN['POLL_INTERVAL'],
+        'generado': timezone.now().isoformat(),
+    })
+
+
+def puerta_eliminada():
+    """
+    Respuesta 410: la credencial del dispositivo sigue en caché (hasta
+    DEVICE_CACHE_TTL) pero su puerta ya no existe
+    """
+    return JsonResponse({'error': 'La puerta del dispositivo ya no existe'}, status=410)
+
+
+def no_encontrado(request, exception=None):
+    """Respuesta 404 en JSON para la ruta de dispositivos"""
+    return JsonResponse({'error': 'Endpoint no encontrado'}, status=404)
+
+
+def error_servidor(request):
+    """Respuesta 500 en JSON para la ruta de dispositivos"""
+    return JsonResponse({'error': 'Error interno del servidor'}, status=500)
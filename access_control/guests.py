@@ -0,0 +1,184 @@
+"""
+Códigos temporales de invitado en la ruta de decisión de acceso.
+
+Cada worker guarda en memoria los códigos vigentes ({digest: Invitado})
+y un montículo mínimo ordenado por expiración. En cada búsqueda se sacan
+del montículo los que ya expiraron (O(log n) por código expirado), así
+que un código deja de abrir en el instante en que expira sin barridos
+periódicos de la tabla; las filas expiradas se quedan como registro.
+
+- La carga trae solo los vigentes (activo=True, expira > ahora), con el
+  índice (escuela, activo, expira), y sus puertas en una segunda consulta.
+- Crear, editar o desactivar un código sube una versión en la caché;
+  como en las revocaciones de tokens, cada worker la revisa cada
+  SYNC_INTERVAL segundos y recarga si cambió (o cada MAX_STALENESS
+  segundos si la caché no se comparte entre procesos).
+- Los usos se cuentan con un UPDATE condicionado (vigente y sin agotar),
+  que es la verificación definitiva: un código desactivado en otro
+  worker o agotado se niega aunque la memoria aún no lo sepa.
+
+Cada escuela tiene su propio registro (invitados(escuela_id)) con su
+propia versión en la caché: crear o revocar un código solo recarga los
+de su escuela.
+
+Los códigos de invitado solo se validan en línea: no entran en la
+allowlist de los controladores, que no podría respetar el límite de usos.
+"""
+import heapq
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .codes import asignador
+from .models import GuestCode, hash_codigo
+from .tenancy import PorEscuela, incrementar_version
+
+Invitado = namedtuple('Invitado', ['id', 'nombre', 'puertas', 'desde', 'expira'])
+
+
+def sin_agotar():
+    return Q(usos_maximos__isnull=True) | Q(usos__lt=F('usos_maximos'))
+
+
+class RegistroInvitados:
+    """Códigos de invitado vigentes de una escuela en memoria, expirados por montículo"""
+
+    def __init__(self, escuela_id):
+        self.escuela_id = escuela_id
+        self._clave_version = f'invitados:{escuela_id}:version'
+        self._codigos = {}  # digest → Invitado
+        self._monticulo = []  # (expira epoch, id, digest)
+        self._version = None
+        self._ultima_revision = 0.0
+        self._ultima_carga = None
+        self._lock = threading.Lock()
+
+    def buscar(self, digest):
+        """Invitado vigente con ese digest, o None"""
+        self._sincronizar()
+        with self._lock:
+            self._expirar(time.time())
+            return self._codigos.get(digest)
+
+    def consumir(self, invitado):
+        """Cuenta un uso si el código sigue vigente en la BD; si no, lo olvida"""
+        ahora = timezone.now()
+        usado = (
+            GuestCode.objects
+            .filter(sin_agotar(), pk=invitado.id, activo=True, valido_desde__lte=ahora, expira__gt=ahora)
+            .update(usos=F('usos') + 1)
+        )
+        if not usado:
+            with self._lock:
+                for digest, actual in list(self._codigos.items()):
+                    if actual.id == invitado.id:
+                        del self._codigos[digest]
+        return bool(usado)
+
+    def invalidar(self):
+        """Avisa a todos los workers (al confirmar la transacción)"""
+        self._ultima_carga = None
+        transaction.on_commit(self._publicar)
+
+    def _publicar(self):
+        incrementar_version(self._clave_version)
+
+    def _expirar(self, ahora):
+        while self._monticulo and self._monticulo[0][0] <= ahora:
+            _, pk, digest = heapq.heappop(self._monticulo)
+            actual = self._codigos.get(digest)
+            if actual is not None and actual.id == pk:
+                del self._codigos[digest]
+
+    def _sincronizar(self):
+        config = settings.GUEST_CODES
+        ahora = time.monotonic()
+        if self._ultima_carga is not None and ahora - self._ultima_revision < config['SYNC_INTERVAL']:
+            return
+        with self._lock:
+            if self._ultima_carga is not None and ahora - self._ultima_revision < config['SYNC_INTERVAL']:
+                return
+            self._ultima_revision = ahora
+            version = cache.get(self._clave_version)
+            if (
+                self._ultima_carga is None
+                or version != self._version
+                or ahora - self._ultima_carga >= config['MAX_STALENESS']
+            ):
+                self._version = version
+                self._cargar()
+
+    def _cargar(self):
+        vigentes = GuestCode.objects.filter(
+            sin_agotar(), escuela_id=self.escuela_id, activo=True, expira__gt=timezone.now()
+        )
+        filas = list(vigentes.values_list('pk', 'nombre', 'codigo_hash', 'valido_desde', 'expira'))
+        puertas = {}
+        relaciones = GuestCode.puertas.through.objects.filter(guestcode_id__in=[fila[0] for fila in filas])
+        for guestcode_id, door_id in relaciones.values_list('guestcode_id', 'door_id'):
+            puertas.setdefault(guestcode_id, set()).add(door_id)
+
+        self._codigos = {}
+        self._monticulo = []
+        for pk, nombre, digest, desde, expira in filas:
+            self._codigos[digest] = Invitado(
+                pk, nombre, frozenset(puertas.get(pk, ())), desde.timestamp(), expira.timestamp()
+            )
+            self._monticulo.append((expira.timestamp(), pk, digest))
+        heapq.heapify(self._monticulo)
+        self._ultima_carga = time.monotonic()
+
+    def __len__(self):
+        return len(self._codigos)
+
+
+invitados = PorEscuela(RegistroInvitados)
+
+
+def crear_codigo_invitado(escuela, nombre, puertas, expira=None, usos_maximos=None,
+                          valido_desde=None, motivo='', creado_por=None):
+    """
+    Crea un código de invitado de la escuela para las puertas dadas (por
+    defecto vence en GUEST_CODES['DEFAULT_HOURS'] horas). Devuelve
+    (GuestCode, código en claro): es la única vez que se conoce el código.
+    """
+    valido_desde = valido_desde or timezone.now()
+    invitado = GuestCode(
+        escuela=escuela,
+        nombre=nombre,
+        motivo=motivo,
+        valido_desde=valido_desde,
+        expira=expira or valido_desde + timedelta(hours=settings.GUEST_CODES['DEFAULT_HOURS']),
+        usos_maximos=usos_maximos,
+        creado_por=creado_por,
+    )
+    codigo = asignar_codigo_invitado(invitado)
+    with transaction.atomic():
+        invitado.save()
+        invitado.puertas.set(puertas)
+    return invitado, codigo
+
+
+def asignar_codigo_invitado(invitado):
+    """
+    Asigna un código de los bloques reservados (el mismo espacio que los
+    perfiles, así que nunca coincide con un código generado).
+    """
+    codigo = asignador.siguiente()
+    invitado.establecer_codigo(codigo)
+    invitado.codigo_generado = codigo
+    return codigo
+
+
+def digest_en_uso(codigo, escuela_id):
+    """Indica si algún código de invitado aún vigente de la escuela usa este código"""
+    return GuestCode.objects.filter(
+        escuela_id=escuela_id, codigo_hash=hash_codigo(codigo), activo=True, expira__gt=timezone.now()
+    ).exists()
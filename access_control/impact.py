@@ -0,0 +1,211 @@
+"""
+Análisis de impacto (simulación) de cambios de roles y políticas.
+
+Compara la matriz usuarios × puertas de una acción (ABRIR_PUERTA por
+defecto) antes y después de un cambio propuesto, sin escribir nada:
+
+- Cambios de reglas AccessPolicy y de permisos de zona: se compila una
+  segunda TablaDecision con las reglas modificadas en memoria.
+- Cambios de usuarios (mover perfiles a otro rol, activar/desactivar) y
+  de roles completos (todos los MAESTRO pasan a ALUMNO, por ejemplo): se
+  modifican copias de los arreglos de usuarios del motor.
+
+Cada escuela se compara con su propia tabla y sus propios usuarios (una
+escuela, o todas una tras otra) y los bloques se juntan al final.
+
+La matriz completa (50k × 2k) no se materializa. La fila de un usuario
+solo depende de su rol, de si está activo y de sus permisos de zona
+individuales, así que los usuarios se agrupan por esa clase antes y
+después (np.unique) y cada clase se evalúa una sola vez como un vector
+booleano sobre todas las puertas. El resultado son bloques exactos
+"estos perfiles ganan estas puertas y pierden estas otras".
+"""
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .models import ZonePermission
+from .policies import ABRIR, INDICE_ACCION, INDICE_ROL, cargar_usuarios, compilar_tabla, reglas_escuela
+from .tenancy import escuelas_ids
+
+
+Bloque = namedtuple('Bloque', ['perfiles', 'concedidas', 'revocadas'])
+Impacto = namedtuple('Impacto', ['accion', 'bloques', 'usuarios', 'puertas', 'segundos'])
+
+
+def _reglas_modificadas(cambios, escuela_id):
+    """Reglas de la escuela en la BD con las altas, cambios y bajas propuestas"""
+    reglas = {
+        (rol, accion, zona, puerta): (permitido, pk)
+        for rol, accion, zona, puerta, permitido, pk in reglas_escuela(escuela_id).values_list(
+            'rol', 'accion', 'zona_id', 'puerta_id', 'permitido', 'pk'
+        )
+    }
+    siguiente = max((pk for _, pk in reglas.values()), default=0) + 1
+    for cambio in cambios:
+        clave = (cambio['rol'], cambio['accion'], cambio.get('zona'), cambio.get('puerta'))
+        if cambio.get('eliminar'):
+            reglas.pop(clave, None)
+        elif clave in reglas:
+            reglas[clave] = (cambio['permitido'], reglas[clave][1])
+        else:
+            # Las reglas nuevas se aplican al final entre las del mismo alcance
+            reglas[clave] = (cambio['permitido'], siguiente)
+            siguiente += 1
+    return [clave + valor for clave, valor in reglas.items()]
+
+
+def _permisos_modificados(cambios, escuela_id):
+    permisos = list(
+        ZonePermission.objects.filter(zona__escuela_id=escuela_id).values_list('zona_id', 'rol', 'perfil_id')
+    )
+    for cambio in cambios:
+        permiso = (cambio['zona'], cambio.get('rol'), cambio.get('perfil'))
+        if cambio.get('eliminar'):
+            permisos = [actual for actual in permisos if actual != permiso]
+        else:
+            permisos.append(permiso)
+    return permisos
+
+
+def _usuarios_modificados(usuarios, cambios_usuarios, cambios_roles):
+    ids, roles, activos = usuarios
+    roles, activos = roles.copy(), activos.copy()
+    originales = usuarios[1]
+    for anterior, nuevo in cambios_roles.items():
+        roles[originales == INDICE_ROL[anterior]] = INDICE_ROL[nuevo]
+    for cambio in cambios_usuarios:
+        mascara = np.isin(ids, cambio['perfiles'])
+        if 'rol' in cambio:
+            roles[mascara] = INDICE_ROL[cambio['rol']]
+        if 'activo' in cambio:
+            activos[mascara] = cambio['activo']
+    return ids, roles, activos
+
+
+def _filas_concesion(tabla, ids):
+    """Fila de permisos individuales de cada perfil en la tabla, o -1"""
+    if len(tabla.concesiones_ids) == 0:
+        return np.full(len(ids), -1, dtype=np.int64)
+    filas = np.minimum(np.searchsorted(tabla.concesiones_ids, ids), len(tabla.concesiones_ids) - 1)
+    return np.where(tabla.concesiones_ids[filas] == ids, filas, -1)
+
+
+def _fila(tabla, accion, rol, activo, concesion):
+    """Vector de decisión sobre todas las puertas para una clase de usuario"""
+    if not activo:
+        return np.zeros(len(tabla.puertas_ids), dtype=bool)
+    if accion != ABRIR:
+        return tabla.matriz[accion, rol]
+    fila = tabla.abrir_rol[rol]
+    if concesion >= 0:
+        fila = fila | (tabla.matriz[ABRIR, rol] & tabla.concesiones[concesion])
+    return fila
+
+
+def comparar(tabla_antes, tabla_despues, usuarios_antes, usuarios_despues, accion='ABRIR_PUERTA'):
+    """
+    Bloques de concesiones y revocaciones entre dos estados (tablas y
+    arreglos de usuarios con los mismos ids y las mismas puertas).
+    """
+    a = INDICE_ACCION[accion]
+    ids, roles_antes, activos_antes = usuarios_antes
+    _, roles_despues, activos_despues = usuarios_despues
+    if len(ids) == 0:
+        return []
+    clases = np.column_stack([
+        roles_antes, activos_antes, _filas_concesion(tabla_antes, ids),
+        roles_despues, activos_despues, _filas_concesion(tabla_despues, ids),
+    ])
+    unicas, inversa = np.unique(clases, axis=0, return_inverse=True)
+    inversa = inversa.reshape(-1)
+    orden = np.argsort(inversa, kind='stable')
+    cortes = np.searchsorted(inversa[orden], np.arange(1, len(unicas)))
+    grupos = np.split(ids[orden], cortes)
+
+    puertas = tabla_antes.puertas_ids
+    bloques = []
+    for (rol_a, activo_a, conc_a, rol_d, activo_d, conc_d), perfiles in zip(unicas, grupos):
+        antes = _fila(tabla_antes, a, rol_a, activo_a, conc_a)
+        despues = _fila(tabla_despues, a, rol_d, activo_d, conc_d)
+        concedidas = puertas[despues & ~antes]
+        revocadas = puertas[antes & ~despues]
+        if len(concedidas) or len(revocadas):
+            bloques.append(Bloque(perfiles, concedidas, revocadas))
+    return bloques
+
+
+def simular(cambios):
+    """
+    Impacto de los cambios propuestos (validados con
+    ImpactoCambiosSerializer) en su escuela, o en todas si no indica una.
+    No modifica la BD ni los motores en uso.
+    """
+    inicio = time.perf_counter()
+    escuela = cambios.get('escuela')
+    bloques = []
+    total_usuarios = total_puertas = 0
+    for escuela_id in [escuela.pk] if escuela else escuelas_ids():
+        usuarios = cargar_usuarios(escuela_id)
+        tabla = compilar_tabla(escuela_id)
+        if cambios['politicas'] or cambios['permisos_zona']:
+            tabla_despues = compilar_tabla(
+                escuela_id,
+                _reglas_modificadas(cambios['politicas'], escuela_id),
+                _permisos_modificados(cambios['permisos_zona'], escuela_id),
+            )
+        else:
+            tabla_despues = tabla
+        usuarios_despues = _usuarios_modificados(usuarios, cambios['usuarios'], cambios['roles'])
+        bloques.extend(comparar(tabla, tabla_despues, usuarios, usuarios_despues, cambios['accion']))
+        total_usuarios += len(usuarios[0])
+        total_puertas += len(tabla.puertas_ids)
+    return Impacto(
+        cambios['accion'], bloques, total_usuarios, total_puertas,
+        time.perf_counter() - inicio,
+    )
+
+
+def totales(impacto):
+    """Pares concedidos y revocados, usuarios y puertas afectados"""
+    concesiones = sum(len(b.perfiles) * len(b.concedidas) for b in impacto.bloques)
+    revocaciones = sum(len(b.perfiles) * len(b.revocadas) for b in impacto.bloques)
+    usuarios = sum(len(b.perfiles) for b in impacto.bloques)
+    pierden = sum(len(b.perfiles) for b in impacto.bloques if len(b.revocadas))
+    puertas = np.unique(np.concatenate(
+        [b.concedidas for b in impacto.bloques] + [b.revocadas for b in impacto.bloques]
+    )) if impacto.bloques else []
+    return {
+        'concesiones': concesiones,
+        'revocaciones': revocaciones,
+        'usuarios_afectados': usuarios,
+        'usuarios_con_revocaciones': pierden,
+        'puertas_afectadas': len(puertas),
+    }
+
+
+def por_puerta(impacto):
+    """{puerta_id: (usuarios que la ganan, usuarios que la pierden)}"""
+    conteo = {}
+    for bloque in impacto.bloques:
+        n = len(bloque.perfiles)
+        for puerta in bloque.concedidas.tolist():
+            ganan, pierden = conteo.get(puerta, (0, 0))
+            conteo[puerta] = (ganan + n, pierden)
+        for puerta in bloque.revocadas.tolist():
+            ganan, pierden = conteo.get(puerta, (0, 0))
+            conteo[puerta] = (ganan, pierden + n)
+    return conteo
+
+
+def pares(impacto):
+    """(perfil_id, puerta_id, 'CONCEDE' o 'REVOCA') de cada cambio, en orden de bloque"""
+    for bloque in impacto.bloques:
+        for efecto, puertas in (('CONCEDE', bloque.concedidas), ('REVOCA', bloque.revocadas)):
+            if not len(puertas):
+                continue
+            puertas = puertas.tolist()
+            for perfil in bloque.perfiles.tolist():
+                for puerta in puertas:
+                    yield perfil, puerta, efecto
@@ -0,0 +1,183 @@
+"""
+Cambios masivos del seguro y confinamiento de emergencia.
+
+cambiar_seguros() activa o desactiva el seguro de muchas puertas con un
+solo UPDATE (en lugar de un save() por puerta), registra las transiciones
+en LockStateHistory con un solo INSERT e invalida los resúmenes en caché.
+
+iniciar_confinamiento() lo aplica a todas las puertas de una escuela (o
+de todas) y deja un registro Lockdown. Los controladores no mantienen una
+conexión abierta con el servidor (no hay canal de push): cada respuesta
+de heartbeat y de allowlist les indica en `sondeo` cada cuántos segundos
+enviar el heartbeat (LOCKDOWN['POLL_INTERVAL']) y trae el estado del
+confinamiento de su escuela (confinamiento_activo(), una lectura de
+caché); al verlo cambiar, el controlador bloquea la puerta y vuelve a
+pedir la allowlist de inmediato. Un controlador conectado se entera a lo
+más POLL_INTERVAL segundos después de confirmarse el cambio (más
+CHECK_INTERVAL sin caché compartida); las respuestas de los intentos
+también lo traen.
+Las decisiones de acceso en línea leen el seguro de la BD y además
+consultan confinamiento_activo(), así que se niegan desde que la
+transacción se confirma aunque se haya quitado el seguro de una puerta.
+Los confinamientos pueden traslaparse (uno de la escuela y uno general):
+al levantar uno, las puertas que otro en curso también cubre siguen
+bloqueadas y pasan a ese otro. El inicio y el fin se
+avisan por SMS/push (ver notifications.py) sin esperar al proveedor.
+"""
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Door, LockState, LockStateHistory, Lockdown
+from .notifications import avisar_confinamiento
+from .summaries import invalidar_puertas
+from .tenancy import escuelas_ids
+
+
+def _clave(escuela_id):
+    return f'confinamiento:{escuela_id}:activo'
+
+
+def _bloquear_en_curso(*incluir):
+    """
+    Bloquea (en orden de pk, el mismo en todos los procesos) los
+    confinamientos en curso y los indicados: iniciar y levantar se
+    serializan y cada uno ve a los demás.
+    """
+    return list(
+        Lockdown.objects.select_for_update()
+        .filter(Q(fecha_fin__isnull=True) | Q(pk__in=incluir))
+        .order_by('pk')
+    )
+
+
+def _en_curso(escuela_id):
+    """Confinamientos sin levantar que afectan a la escuela (propios o generales)"""
+    return Lockdown.objects.filter(
+        Q(escuela_id=escuela_id) | Q(escuela__isnull=True), fecha_fin__isnull=True
+    )
+
+
+def cambiar_seguros(puertas, activo, usuario=None, observacion=None):
+    """
+    Pone el seguro de las puertas (queryset de Door) en `activo`. Las
+    puertas sin registro de seguro lo obtienen. Devuelve los IDs de las
+    puertas que cambiaron de estado.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        # Puertas que aún no tienen fila de seguro (se crean desactivadas)
+        sin_seguro = list(puertas.filter(seguro__isnull=True).values_list('pk', flat=True))
+        if sin_seguro:
+            LockState.objects.bulk_create(
+                [LockState(puerta_id=pk, activo=False) for pk in sin_seguro],
+                batch_size=1000,
+                ignore_conflicts=True,
+            )
+        seguros = LockState.objects.filter(puerta__in=puertas, activo=not activo)
+        cambiadas = list(seguros.select_for_update().values_list('puerta_id', flat=True))
+        if cambiadas:
+            cambios = {'activo': activo, 'usuario_cambio': usuario, 'fecha_cambio': ahora}
+            if observacion:
+                cambios['observaciones'] = observacion
+            seguros.update(**cambios)
+            LockStateHistory.registrar_masivo(cambiadas, activo, usuario, ahora)
+            por_escuela = defaultdict(list)
+            for escuela_id, puerta_id in Door.objects.filter(pk__in=cambiadas).values_list('escuela_id', 'pk'):
+                por_escuela[escuela_id].append(puerta_id)
+            for escuela_id, puertas_ids in por_escuela.items():
+                invalidar_puertas(escuela_id, None if len(puertas_ids) > 100 else puertas_ids)
+    return cambiadas
+
+
+def confinamiento_activo(escuela_id):
+    """
+    Confinamiento en curso de la escuela (su ID) o None; se consulta en
+    cada heartbeat
+    """
+    clave = _clave(escuela_id)
+    valor = cache.get(clave)
+    if valor is None:
+        actual = _en_curso(escuela_id).values_list('pk', flat=True).first()
+        valor = actual or 0
+        cache.set(clave, valor, settings.LOCKDOWN['CHECK_INTERVAL'])
+    return valor or None
+
+
+def _publicar(escuela_id):
+    """
+    Avisa a los demás procesos (caché compartida) al confirmar la
+    transacción: la escuela (o todas, con None) vuelve a leer la BD.
+    """
+    ids = escuelas_ids() if escuela_id is None else [escuela_id]
+    transaction.on_commit(lambda: cache.delete_many([_clave(pk) for pk in ids]))
+
+
+def iniciar_confinamiento(usuario, motivo, escuela=None):
+    """
+    Activa el seguro de todas las puertas de la escuela (de todas las
+    escuelas sin ella). Devuelve el registro Lockdown con la duración
+    medida (de la primera consulta al registro final).
+    """
+    inicio = time.perf_counter()
+    puertas = Door.objects.all() if escuela is None else Door.objects.filter(escuela=escuela)
+    with transaction.atomic():
+        _bloquear_en_curso()
+        bloqueadas = cambiar_seguros(
+            puertas, True, usuario, observacion=f'Confinamiento: {motivo}'
+        )
+        confinamiento = Lockdown.objects.create(
+            escuela=escuela,
+            motivo=motivo,
+            iniciado_por=usuario,
+            puertas_bloqueadas=bloqueadas,
+            total_puertas=LockState.objects.filter(puerta__in=puertas, activo=True).count(),
+        )
+        confinamiento.duracion_ms = (time.perf_counter() - inicio) * 1000
+        confinamiento.save(update_fields=['duracion_ms'])
+        _publicar(confinamiento.escuela_id)
+        avisar_confinamiento(confinamiento)
+    return confinamiento
+
+
+def levantar_confinamiento(confinamiento, usuario):
+    """
+    Termina el confinamiento: libera solo las puertas que él bloqueó (las
+    que ya tenían seguro lo conservan). Las que cubre otro confinamiento
+    en curso (el más reciente de su escuela o general) siguen bloqueadas
+    y se le transfieren para liberarlas cuando se levante. Devuelve
+    cuántas se liberaron.
+    """
+    with transaction.atomic():
+        bloqueados = {c.pk: c for c in _bloquear_en_curso(confinamiento.pk)}
+        confinamiento = bloqueados.pop(confinamiento.pk, None)
+        if confinamiento is None or not confinamiento.activo:
+            return 0
+        otros = sorted(bloqueados.values(), key=lambda c: c.fecha_inicio, reverse=True)
+        transferidas = {}
+        liberar = []
+        puertas = Door.objects.filter(pk__in=confinamiento.puertas_bloqueadas).values_list('pk', 'escuela_id')
+        for puerta_id, escuela_id in puertas:
+            otro = next((c for c in otros if c.escuela_id in (None, escuela_id)), None)
+            if otro is None:
+                liberar.append(puerta_id)
+            else:
+                transferidas.setdefault(otro, []).append(puerta_id)
+        for otro, ids in transferidas.items():
+            otro.puertas_bloqueadas = otro.puertas_bloqueadas + ids
+            otro.save(update_fields=['puertas_bloqueadas'])
+        liberadas = cambiar_seguros(
+            Door.objects.filter(pk__in=liberar),
+            False, usuario, observacion='Fin de confinamiento',
+        ) if liberar else []
+        confinamiento.levantado_por = usuario
+        confinamiento.fecha_fin = timezone.now()
+        confinamiento.save(update_fields=['levantado_por', 'fecha_fin'])
+        _publicar(confinamiento.escuela_id)
+        avisar_confinamiento(confinamiento, iniciado=False)
+    return len(liberadas)
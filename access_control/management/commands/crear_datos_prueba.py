@@ -3,7 +3,7 @@ Management command para crear datos de prueba en el sistema de control de acceso
 """
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from access_control.models import UserProfile, Door, LockState
+from access_control.models import UserProfile, Door, LockState, hash_codigo
 
 
 class Command(BaseCommand):
@@ -12,7 +12,8 @@ class Command(BaseCommand):
     def handle(self, *args, **kwargs):
         self.stdout.write(self.style.SUCCESS('🚀 Iniciando creación de datos de prueba...'))
         
-        # Crear usuarios de prueba
+        # Crear usuarios de prueba (el signal ya les crea el perfil con un
+        # código generado; aquí se reemplaza por los códigos conocidos)
         self.stdout.write('📝 Creando usuarios...')
         
         # Crear usuario Director
@@ -24,12 +25,14 @@ class Command(BaseCommand):
                 first_name='María',
                 last_name='González Pérez'
             )
-            UserProfile.objects.create(
+            UserProfile.objects.update_or_create(
                 user=user_director,
-                rol='DIRECTOR',
-                codigo_acceso='1001',
-                telefono='+526141234567',
-                activo=True
+                defaults={
+                    'rol': 'DIRECTOR',
+                    'codigo_hash': hash_codigo('1001'),
+                    'telefono': '+526141234567',
+                    'activo': True
+                }
             )
             self.stdout.write(self.style.SUCCESS('  ✅ Director creado: director / director123'))
         
@@ -42,12 +45,14 @@ class Command(BaseCommand):
                 first_name='Carlos',
                 last_name='Ramírez López'
             )
-            UserProfile.objects.create(
+            UserProfile.objects.update_or_create(
                 user=user_maestro,
-                rol='MAESTRO',
-                codigo_acceso='2001',
-                telefono='+526142345678',
-                activo=True
+                defaults={
+                    'rol': 'MAESTRO',
+                    'codigo_hash': hash_codigo('2001'),
+                    'telefono': '+526142345678',
+                    'activo': True
+                }
             )
             self.stdout.write(self.style.SUCCESS('  ✅ Maestro creado: maestro / maestro123'))
         
@@ -68,12 +73,14 @@ class Command(BaseCommand):
                     first_name=first_name,
                     last_name=last_name
                 )
-                UserProfile.objects.create(
+                UserProfile.objects.update_or_create(
                     user=user_alumno,
-                    rol='ALUMNO',
-                    codigo_acceso=codigo,
-                    telefono=f'+52614{codigo}0000',
-                    activo=True
+                    defaults={
+                        'rol': 'ALUMNO',
+                        'codigo_hash': hash_codigo(codigo),
+                        'telefono': f'+52614{codigo}0000',
+                        'activo': True
+                    }
                 )
                 self.stdout.write(self.style.SUCCESS(f'  ✅ Alumno creado: {username} / alumno123'))
         
@@ -0,0 +1,33 @@
+"""
+Management command para consultar los aciertos y fallos de la caché de
+resúmenes de puertas y perfiles acumulados por todos los procesos.
+"""
+from django.core.management.base import BaseCommand
+
+from access_control.summaries import estadisticas, reiniciar_estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Muestra los contadores de aciertos/fallos de la caché de resúmenes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reiniciar',
+            action='store_true',
+            help='Poner los contadores en cero después de mostrarlos',
+        )
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write(self.style.SUCCESS('🗄️  Caché de resúmenes'))
+
+        for espacio, datos in estadisticas().items():
+            self.stdout.write(f'\n📊 {espacio.upper()}:')
+            self.stdout.write(f'  Aciertos: {datos["aciertos"]}')
+            self.stdout.write(f'  Servidos vencidos (recalculando): {datos["vencidos"]}')
+            self.stdout.write(f'  Fallos (recalculados): {datos["fallos"]}')
+            self.stdout.write(f'  Calculados sin guardar (otro recalculaba): {datos["concurrentes"]}')
+            self.stdout.write(f'  Tasa de aciertos: {datos["tasa_aciertos"]:.1%}')
+
+        if kwargs['reiniciar']:
+            reiniciar_estadisticas()
+            self.stdout.write(self.style.SUCCESS('\n✅ Contadores reiniciados'))
@@ -0,0 +1,47 @@
+"""
+Management command para construir la jerarquía de zonas a partir del
+texto libre de Door.ubicacion ("Edificio Principal, Piso 2, Sala 201").
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from access_control.models import Door, Zone
+
+
+class Command(BaseCommand):
+    help = 'Crea zonas Campus → Edificio → Piso desde la ubicación de las puertas sin zona'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--campus',
+            default='Campus Principal',
+            help='Nombre del campus raíz (default: "Campus Principal")',
+        )
+
+    def obtener_zona(self, nombre, tipo, padre):
+        zona, creada = Zone.objects.get_or_create(nombre=nombre, padre=padre, defaults={'tipo': tipo})
+        if creada:
+            self.stdout.write(self.style.SUCCESS(f'  ✅ {zona}'))
+        return zona
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        self.stdout.write(self.style.SUCCESS('🏫 Generando zonas desde la ubicación de las puertas...'))
+
+        campus = self.obtener_zona(kwargs['campus'], 'CAMPUS', None)
+        asignadas = 0
+
+        for puerta in Door.objects.filter(zona__isnull=True):
+            partes = [parte.strip() for parte in puerta.ubicacion.split(',') if parte.strip()]
+            if not partes:
+                self.stdout.write(self.style.WARNING(f'  ⚠️  Sin ubicación: {puerta.nombre}'))
+                continue
+
+            zona = self.obtener_zona(partes[0], 'EDIFICIO', campus)
+            if len(partes) > 1:
+                zona = self.obtener_zona(partes[1], 'PISO', zona)
+
+            puerta.zona = zona
+            puerta.save(update_fields=['zona'])
+            asignadas += 1
+
+        self.stdout.write(f'\n📊 Puertas asignadas a una zona: {asignadas}')
@@ -0,0 +1,118 @@
+"""
+Management command para dar de alta usuarios en lote desde un CSV
+(inscripciones) con códigos de acceso asignados de bloques reservados.
+
+Columnas: username, email, first_name, last_name, rol (opcional, ALUMNO
+por defecto). Los perfiles se crean en la escuela de --escuela (la
+escuela por defecto si se omite). Los códigos generados se escriben en
+el CSV de salida: es la única vez que se conocen en claro.
+"""
+import csv
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from access_control.codes import asignador
+from access_control.models import School, UserProfile, escuela_predeterminada
+from access_control.policies import motores
+from access_control.summaries import invalidar_perfiles
+
+
+class Command(BaseCommand):
+    help = 'Importa usuarios desde un CSV y les asigna códigos de acceso'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='CSV con username, email, first_name, last_name, rol')
+        parser.add_argument(
+            '--salida',
+            required=True,
+            help='CSV donde se escriben username y código asignado',
+        )
+        parser.add_argument(
+            '--escuela',
+            help='Clave de la escuela de los perfiles (default: la escuela por defecto)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Filas por inserción (default: 1000)',
+        )
+
+    def leer(self, archivo):
+        roles = {rol for rol, _ in UserProfile.ROLE_CHOICES}
+        filas = []
+        with open(archivo, newline='', encoding='utf-8') as f:
+            for numero, fila in enumerate(csv.DictReader(f), start=2):
+                username = (fila.get('username') or '').strip()
+                rol = (fila.get('rol') or 'ALUMNO').strip().upper()
+                if not username:
+                    raise CommandError(f'Línea {numero}: falta username')
+                if rol not in roles:
+                    raise CommandError(f'Línea {numero}: rol inválido "{rol}"')
+                filas.append({
+                    'username': username,
+                    'email': (fila.get('email') or '').strip(),
+                    'first_name': (fila.get('first_name') or '').strip(),
+                    'last_name': (fila.get('last_name') or '').strip(),
+                    'rol': rol,
+                })
+        return filas
+
+    def handle(self, *args, **kwargs):
+        if kwargs['escuela']:
+            try:
+                escuela_id = School.objects.get(clave=kwargs['escuela']).pk
+            except School.DoesNotExist:
+                raise CommandError(f'No existe la escuela "{kwargs["escuela"]}"')
+        else:
+            escuela_id = escuela_predeterminada()
+        self.stdout.write(self.style.SUCCESS('📥 Importando usuarios...'))
+        filas = self.leer(kwargs['archivo'])
+
+        existentes = set(
+            User.objects.filter(username__in=[fila['username'] for fila in filas])
+            .values_list('username', flat=True)
+        )
+        nuevas = list({fila['username']: fila for fila in filas if fila['username'] not in existentes}.values())
+        if not nuevas:
+            self.stdout.write('No hay usuarios nuevos')
+            return
+
+        # Los códigos se reservan antes de la transacción (ver access_control/codes.py)
+        codigos = asignador.reservar(len(nuevas))
+
+        with transaction.atomic():
+            usuarios = []
+            for fila in nuevas:
+                usuario = User(**{campo: fila[campo] for campo in ('username', 'email', 'first_name', 'last_name')})
+                usuario.set_unusable_password()
+                usuarios.append(usuario)
+            # bulk_create no dispara el signal que crea perfiles
+            User.objects.bulk_create(usuarios, batch_size=kwargs['lote'])
+            ids = dict(
+                User.objects.filter(username__in=[fila['username'] for fila in nuevas])
+                .values_list('username', 'id')
+            )
+            perfiles = []
+            for fila, codigo in zip(nuevas, codigos):
+                perfil = UserProfile(
+                    user_id=ids[fila['username']], escuela_id=escuela_id, rol=fila['rol'], activo=True
+                )
+                perfil.establecer_codigo(codigo)
+                perfiles.append(perfil)
+            UserProfile.objects.bulk_create(perfiles, batch_size=kwargs['lote'])
+            motores(escuela_id).invalidar_usuarios()
+            invalidar_perfiles(escuela_id)
+
+        with open(kwargs['salida'], 'w', newline='', encoding='utf-8') as f:
+            escritor = csv.writer(f)
+            escritor.writerow(['username', 'codigo'])
+            for fila, codigo in zip(nuevas, codigos):
+                escritor.writerow([fila['username'], codigo])
+
+        self.stdout.write('\n📊 RESUMEN:')
+        self.stdout.write(f'  Usuarios creados: {len(nuevas)}')
+        self.stdout.write(f'  Ya existentes (omitidos): {len(filas) - len(nuevas)}')
+        self.stdout.write(self.style.SUCCESS(f'✅ Códigos escritos en {kwargs["salida"]}'))
@@ -0,0 +1,79 @@
+"""
+Management command para medir el tiempo hasta el bloqueo total de un
+confinamiento con N puertas (por defecto 2000) frente al objetivo
+LOCKDOWN['BUDGET_SECONDS']. Las puertas se crean en una escuela temporal,
+dentro de una transacción que se revierte al terminar: el confinamiento
+se limita a esa escuela y no bloquea los seguros reales (los heartbeats
+de otras conexiones no esperan), y los avisos y la publicación en la
+caché, que van en on_commit, no llegan a enviarse.
+"""
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from access_control.lockdown import iniciar_confinamiento, levantar_confinamiento
+from access_control.models import Door, LockState, School
+
+
+PREFIJO = '__medicion_confinamiento__'
+
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo de un confinamiento total con N puertas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--puertas',
+            type=int,
+            default=2000,
+            help='Número de puertas de prueba (default: 2000)',
+        )
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=5,
+            help='Confinamientos medidos (default: 5)',
+        )
+
+    def handle(self, *args, **kwargs):
+        total = kwargs['puertas']
+        objetivo = settings.LOCKDOWN['BUDGET_SECONDS'] * 1000
+        self.stdout.write(self.style.SUCCESS(f'⏱️  Confinamiento con {total} puertas de prueba...\n'))
+
+        tiempos, liberaciones = [], []
+        with transaction.atomic():
+            escuela = School.objects.create(nombre=PREFIJO, clave=PREFIJO.strip('_').replace('_', '-'))
+            Door.objects.bulk_create(
+                [Door(escuela=escuela, nombre=f'{PREFIJO}{i}', ubicacion='-') for i in range(total)],
+                batch_size=1000,
+            )
+            # La mitad con fila de seguro, la otra mitad la obtiene en el confinamiento
+            ids = Door.objects.filter(escuela=escuela).values_list('pk', flat=True)
+            LockState.objects.bulk_create(
+                [LockState(puerta_id=pk) for pk in list(ids)[::2]], batch_size=1000
+            )
+            for _ in range(kwargs['repeticiones']):
+                inicio = time.perf_counter()
+                confinamiento = iniciar_confinamiento(None, 'Medición', escuela=escuela)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+                inicio = time.perf_counter()
+                levantar_confinamiento(confinamiento, None)
+                liberaciones.append((time.perf_counter() - inicio) * 1000)
+            bloqueadas = len(confinamiento.puertas_bloqueadas)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'  Puertas bloqueadas por confinamiento: {bloqueadas}')
+        self.stdout.write(
+            f'  Confinamiento  media: {statistics.mean(tiempos):8.1f} ms   máximo: {max(tiempos):8.1f} ms'
+        )
+        self.stdout.write(
+            f'  Levantamiento  media: {statistics.mean(liberaciones):8.1f} ms   máximo: {max(liberaciones):8.1f} ms'
+        )
+        self.stdout.write('\n📊 RESUMEN:')
+        if max(tiempos) <= objetivo:
+            self.stdout.write(self.style.SUCCESS(f'  ✅ Dentro del objetivo de {objetivo:.0f} ms'))
+        else:
+            self.stdout.write(self.style.ERROR(f'  ❌ Excede el objetivo de {objetivo:.0f} ms'))
@@ -0,0 +1,104 @@
+"""
+Management command para medir el costo por petición de la cadena de
+middleware del navegador/admin frente a la ruta ligera de dispositivos.
+"""
+import secrets
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from access_control.device_handler import construir_cadena
+from access_control.middleware import firmar_peticion
+from access_control.models import Door, IoTDevice
+
+
+def vista_vacia(request):
+    """Vista trivial: aísla el costo del middleware"""
+    return HttpResponse('ok')
+
+
+class Command(BaseCommand):
+    help = 'Mide el overhead por petición de MIDDLEWARE frente a DEVICE_MIDDLEWARE'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--peticiones',
+            type=int,
+            default=2000,
+            help='Número de peticiones por cadena (default: 2000)',
+        )
+
+    def medir(self, cadena, construir_peticion, total):
+        """Ejecuta la cadena `total` veces y devuelve los tiempos en µs"""
+        tiempos = []
+        for _ in range(total):
+            request = construir_peticion()
+            inicio = time.perf_counter()
+            response = cadena(request)
+            tiempos.append((time.perf_counter() - inicio) * 1_000_000)
+            if response.status_code != 200:
+                raise RuntimeError(f'Respuesta inesperada: {response.status_code}')
+        return tiempos
+
+    def reportar(self, nombre, tiempos):
+        tiempos.sort()
+        p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+        self.stdout.write(
+            f'  {nombre:<12} media: {statistics.mean(tiempos):8.1f} µs   '
+            f'p50: {statistics.median(tiempos):8.1f} µs   p95: {p95:8.1f} µs'
+        )
+
+    def handle(self, *args, **kwargs):
+        total = kwargs['peticiones']
+        # Host aceptado por ALLOWED_HOSTS para que CommonMiddleware no rechace la petición
+        hosts = [h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*']
+        factory = RequestFactory(SERVER_NAME=hosts[0] if hosts else 'localhost')
+        ruta = settings.DEVICE_URL_PREFIX + 'heartbeat/'
+
+        self.stdout.write(self.style.SUCCESS(f'⏱️  Midiendo {total} peticiones por cadena...\n'))
+
+        # Los datos de medición se crean dentro de una transacción que se revierte
+        with transaction.atomic():
+            puerta = Door.objects.create(nombre='__medicion_middleware__', ubicacion='-')
+            dispositivo = IoTDevice.objects.create(
+                identificador='__medicion_middleware__', nombre='Medición', puerta=puerta
+            )
+
+            def peticion_navegador():
+                return factory.get(ruta)
+
+            def peticion_dispositivo():
+                timestamp = str(int(time.time()))
+                nonce = secrets.token_hex(16)
+                firma = firmar_peticion(dispositivo.clave_secreta, timestamp, nonce, 'GET', ruta, b'')
+                return factory.get(ruta, headers={
+                    'X-Device-Id': dispositivo.identificador,
+                    'X-Device-Timestamp': timestamp,
+                    'X-Device-Nonce': nonce,
+                    'X-Device-Signature': firma,
+                })
+
+            completa = construir_cadena(settings.MIDDLEWARE, vista_vacia)
+            ligera = construir_cadena(settings.DEVICE_MIDDLEWARE, vista_vacia)
+
+            # Calentamiento para no medir imports ni cachés frías
+            self.medir(completa, peticion_navegador, 50)
+            self.medir(ligera, peticion_dispositivo, 50)
+
+            tiempos_completa = self.medir(completa, peticion_navegador, total)
+            tiempos_ligera = self.medir(ligera, peticion_dispositivo, total)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write('📊 Overhead por petición:')
+        self.reportar('MIDDLEWARE', tiempos_completa)
+        self.reportar('DEVICE', tiempos_ligera)
+        self.stdout.write(
+            f'\n  MIDDLEWARE: {len(settings.MIDDLEWARE)} capas   '
+            f'DEVICE_MIDDLEWARE: {len(settings.DEVICE_MIDDLEWARE)} capas (incluye firma HMAC)'
+        )
@@ -0,0 +1,327 @@
+"""
+Management command que simula una flotilla de controladores ESP32 contra
+un servidor en ejecución, para planear capacidad antes de cada semestre.
+
+Cada controlador simulado es una tarea asyncio que firma sus peticiones
+como un dispositivo real (HMAC) y envía:
+- intentos de acceso con código, con llegadas de Poisson cuya tasa se
+  multiplica en los cambios de clase (picos periódicos);
+- heartbeats periódicos con desfase aleatorio;
+- sincronizaciones de la allowlist, concentradas también en los cambios
+  de clase (los controladores refrescan al iniciar cada bloque).
+
+Al final reporta por endpoint: peticiones, errores, throughput promedio
+y pico por segundo, y percentiles de latencia.
+"""
+import asyncio
+import json
+import math
+import random
+import secrets
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from access_control.middleware import firmar_peticion
+from access_control.models import Door, IoTDevice
+
+
+PREFIJO_SIMULADOS = 'carga-'
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Estadisticas:
+    """Latencias y errores de un endpoint"""
+
+    def __init__(self):
+        self.latencias = []
+        self.errores = Counter()
+        self.por_segundo = Counter()
+
+    def registrar(self, segundo, latencia, error=None):
+        self.por_segundo[segundo] += 1
+        if error is None:
+            self.latencias.append(latencia)
+        else:
+            self.errores[error] += 1
+
+    @property
+    def total(self):
+        return len(self.latencias) + sum(self.errores.values())
+
+    def percentil(self, p):
+        if not self.latencias:
+            return 0.0
+        ordenadas = sorted(self.latencias)
+        return ordenadas[min(len(ordenadas) - 1, math.ceil(len(ordenadas) * p / 100) - 1)]
+
+
+class Simulacion:
+    """Estado compartido por todos los controladores simulados"""
+
+    def __init__(self, url, dispositivos, codigos, opciones):
+        partes = urlsplit(url)
+        if partes.scheme != 'http':
+            raise CommandError('Solo se admite http:// (servidor local)')
+        self.host = partes.hostname
+        self.puerto = partes.port or 80
+        self.cabecera_host = partes.netloc
+        self.prefijo = settings.DEVICE_URL_PREFIX
+        self.dispositivos = dispositivos
+        self.codigos = codigos
+        self.opciones = opciones
+        self.estadisticas = defaultdict(Estadisticas)
+        self.conexiones = asyncio.Semaphore(opciones['conexiones'])
+        self.en_vuelo = set()
+        self.inicio = None
+        self.fin = None
+
+    # --- Curva de llegadas ------------------------------------------------
+
+    def factor_pico(self, instante):
+        """
+        Multiplicador de la tasa en `instante` (segundos desde el inicio):
+        campana gaussiana centrada en cada cambio de clase.
+        """
+        periodo = self.opciones['periodo']
+        desfase = (instante % periodo)
+        distancia = min(desfase, periodo - desfase)
+        ancho = self.opciones['ancho_pico'] / 2
+        return 1 + (self.opciones['multiplicador_pico'] - 1) * math.exp(-0.5 * (distancia / ancho) ** 2)
+
+    async def esperar_llegada(self, tasa_base):
+        """
+        Espera hasta la siguiente llegada de un proceso de Poisson no
+        homogéneo (método de adelgazamiento con la tasa máxima del pico).
+        """
+        tasa_maxima = tasa_base * self.opciones['multiplicador_pico']
+        while True:
+            espera = random.expovariate(tasa_maxima)
+            if time.monotonic() + espera >= self.fin:
+                return False
+            await asyncio.sleep(espera)
+            ahora = time.monotonic()
+            if random.random() * tasa_maxima <= tasa_base * self.factor_pico(ahora - self.inicio):
+                return True
+
+    # --- HTTP -------------------------------------------------------------
+
+    async def peticion(self, dispositivo, endpoint, metodo, cuerpo=b''):
+        ruta = f'{self.prefijo}{endpoint}/'
+        timestamp = str(int(time.time()))
+        nonce = secrets.token_hex(16)
+        firma = firmar_peticion(dispositivo['clave_secreta'], timestamp, nonce, metodo, ruta, cuerpo)
+        cabeceras = [
+            f'{metodo} {ruta} HTTP/1.1',
+            f'Host: {self.cabecera_host}',
+            'Connection: close',
+            f'X-Device-Id: {dispositivo["identificador"]}',
+            f'X-Device-Timestamp: {timestamp}',
+            f'X-Device-Nonce: {nonce}',
+            f'X-Device-Signature: {firma}',
+        ]
+        if metodo == 'POST':
+            cabeceras += [
+                'Content-Type: application/x-www-form-urlencoded',
+                f'Content-Length: {len(cuerpo)}',
+            ]
+        mensaje = ('\r\n'.join(cabeceras) + '\r\n\r\n').encode() + cuerpo
+
+        async with self.conexiones:
+            inicio = time.perf_counter()
+            error = None
+            try:
+                estado = await asyncio.wait_for(self._enviar(mensaje), self.opciones['timeout'])
+                if not 200 <= estado < 300:
+                    error = f'HTTP {estado}'
+            except asyncio.TimeoutError:
+                error = 'timeout'
+            except OSError as exc:
+                error = type(exc).__name__
+            latencia = (time.perf_counter() - inicio) * 1000
+        segundo = int(time.monotonic() - self.inicio)
+        self.estadisticas[endpoint].registrar(segundo, latencia, error)
+
+    async def _enviar(self, mensaje):
+        reader, writer = await asyncio.open_connection(self.host, self.puerto)
+        try:
+            writer.write(mensaje)
+            await writer.drain()
+            linea = await reader.readline()
+            await reader.read()  # Cuerpo completo (el servidor cierra la conexión)
+        finally:
+            writer.close()
+        partes = linea.split()
+        if len(partes) < 2 or not partes[1].isdigit():
+            raise ConnectionError('Respuesta HTTP inválida')
+        return int(partes[1])
+
+    # --- Controladores ----------------------------------------------------
+
+    def codigo(self):
+        if not self.codigos or random.random() < self.opciones['tasa_invalidos']:
+            return str(random.randint(10**7, 10**8 - 1))
+        return random.choice(self.codigos)
+
+    async def intentos(self, dispositivo):
+        tasa = self.opciones['intentos_por_minuto'] / 60
+        while await self.esperar_llegada(tasa):
+            cuerpo = urlencode({'codigo': self.codigo()}).encode()
+            # Los intentos no esperan al anterior: las llegadas no dependen de la latencia
+            tarea = asyncio.ensure_future(self.peticion(dispositivo, 'attempt', 'POST', cuerpo))
+            self.en_vuelo.add(tarea)
+            tarea.add_done_callback(self.en_vuelo.discard)
+
+    async def heartbeats(self, dispositivo):
+        intervalo = self.opciones['heartbeat']
+        await asyncio.sleep(random.uniform(0, intervalo))
+        while time.monotonic() < self.fin:
+            await self.peticion(dispositivo, 'heartbeat', 'POST')
+            espera = intervalo * random.uniform(0.9, 1.1)
+            if time.monotonic() + espera >= self.fin:
+                return
+            await asyncio.sleep(espera)
+
+    async def sincronizaciones(self, dispositivo):
+        # Una sincronización por periodo, poco después de cada cambio de clase
+        periodo = self.opciones['periodo']
+        while True:
+            transcurrido = time.monotonic() - self.inicio
+            siguiente = (transcurrido // periodo + 1) * periodo
+            retraso = siguiente - transcurrido + abs(random.gauss(0, self.opciones['ancho_pico'] / 4))
+            if time.monotonic() + retraso >= self.fin:
+                return
+            await asyncio.sleep(retraso)
+            await self.peticion(dispositivo, 'allowlist', 'GET')
+
+    async def controlador(self, dispositivo):
+        await asyncio.gather(
+            self.intentos(dispositivo),
+            self.heartbeats(dispositivo),
+            self.sincronizaciones(dispositivo),
+        )
+
+    async def ejecutar(self):
+        self.inicio = time.monotonic()
+        self.fin = self.inicio + self.opciones['duracion']
+        await asyncio.gather(*(self.controlador(d) for d in self.dispositivos))
+        # Esperar los intentos que siguen en vuelo
+        if self.en_vuelo:
+            await asyncio.wait(set(self.en_vuelo), timeout=self.opciones['timeout'])
+        return time.monotonic() - self.inicio
+
+
+class Command(BaseCommand):
+    help = 'Simula N controladores IoT (intentos, heartbeats y allowlist) contra un servidor local'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Servidor a probar (default: http://127.0.0.1:8000)')
+        parser.add_argument('--controladores', type=int, default=100, help='Controladores simulados (default: 100)')
+        parser.add_argument('--duracion', type=float, default=60, help='Segundos de simulación (default: 60)')
+        parser.add_argument('--intentos-por-minuto', type=float, default=2, help='Intentos por controlador fuera de pico (default: 2)')
+        parser.add_argument('--periodo', type=float, default=60, help='Segundos entre cambios de clase (default: 60, horario comprimido)')
+        parser.add_argument('--ancho-pico', type=float, default=10, help='Segundos que dura el pico de cada cambio de clase (default: 10)')
+        parser.add_argument('--multiplicador-pico', type=float, default=15, help='Tasa en el pico / tasa base (default: 15)')
+        parser.add_argument(
+            '--heartbeat', type=float, default=settings.LOCKDOWN['POLL_INTERVAL'],
+            help='Segundos entre heartbeats (default: LOCKDOWN["POLL_INTERVAL"], el que piden las respuestas)',
+        )
+        parser.add_argument('--codigos', help='Archivo con códigos válidos, uno por línea (sin él, todos son aleatorios)')
+        parser.add_argument('--tasa-invalidos', type=float, default=0.1, help='Fracción de códigos inválidos (default: 0.1)')
+        parser.add_argument('--conexiones', type=int, default=500, help='Conexiones simultáneas máximas (default: 500)')
+        parser.add_argument('--timeout', type=float, default=10, help='Timeout por petición en segundos (default: 10)')
+        parser.add_argument('--crear-dispositivos', action='store_true', help=f'Crear dispositivos "{PREFIJO_SIMULADOS}NNNN" si faltan')
+        parser.add_argument('--limpiar', action='store_true', help='Eliminar los dispositivos simulados al terminar')
+        parser.add_argument('--json', help='Guardar el reporte en este archivo JSON')
+
+    def preparar_dispositivos(self, total, crear):
+        dispositivos = list(
+            IoTDevice.objects.filter(activo=True)
+            .order_by('pk')
+            .values('identificador', 'clave_secreta')[:total]
+        )
+        faltantes = total - len(dispositivos)
+        if faltantes > 0 and crear:
+            puertas = list(Door.objects.filter(activa=True).values_list('pk', flat=True))
+            if not puertas:
+                raise CommandError('No hay puertas activas para asignar a los dispositivos simulados')
+            existentes = IoTDevice.objects.filter(identificador__startswith=PREFIJO_SIMULADOS).count()
+            nuevos = IoTDevice.objects.bulk_create([
+                IoTDevice(
+                    identificador=f'{PREFIJO_SIMULADOS}{existentes + i:04d}',
+                    nombre=f'Controlador simulado {existentes + i}',
+                    puerta_id=puertas[i % len(puertas)],
+                )
+                for i in range(faltantes)
+            ])
+            dispositivos += [{'identificador': d.identificador, 'clave_secreta': d.clave_secreta} for d in nuevos]
+            self.stdout.write(self.style.SUCCESS(f'  ✅ {len(nuevos)} dispositivo(s) simulado(s) creado(s)'))
+        elif faltantes > 0:
+            self.stdout.write(self.style.WARNING(
+                f'  ⚠️  Solo hay {len(dispositivos)} dispositivo(s) activo(s); usa --crear-dispositivos para completar {total}'
+            ))
+        if not dispositivos:
+            raise CommandError('No hay dispositivos activos para simular')
+        return dispositivos
+
+    def reportar(self, simulacion, duracion):
+        reporte = {'duracion_s': round(duracion, 2), 'controladores': len(simulacion.dispositivos), 'endpoints': {}}
+        self.stdout.write('\n📊 RESUMEN:')
+        self.stdout.write(f'  Controladores: {len(simulacion.dispositivos)}   Duración: {duracion:.1f} s')
+        for endpoint in ('attempt', 'heartbeat', 'allowlist'):
+            datos = simulacion.estadisticas.get(endpoint)
+            if datos is None or not datos.total:
+                continue
+            errores = sum(datos.errores.values())
+            fila = {
+                'peticiones': datos.total,
+                'errores': errores,
+                'tasa_error': errores / datos.total,
+                'throughput_rps': datos.total / duracion,
+                'pico_rps': max(datos.por_segundo.values()),
+                'latencia_ms': {f'p{p}': round(datos.percentil(p), 2) for p in PERCENTILES},
+                'detalle_errores': dict(datos.errores),
+            }
+            fila['latencia_ms']['max'] = round(max(datos.latencias, default=0.0), 2)
+            reporte['endpoints'][endpoint] = fila
+
+            self.stdout.write(f'\n  /{endpoint}/')
+            self.stdout.write(
+                f'    Peticiones: {fila["peticiones"]}   Errores: {errores} ({fila["tasa_error"]:.2%})'
+            )
+            self.stdout.write(
+                f'    Throughput: {fila["throughput_rps"]:.1f} req/s (pico {fila["pico_rps"]} req/s)'
+            )
+            latencias = '   '.join(f'{clave}: {valor:.1f} ms' for clave, valor in fila['latencia_ms'].items())
+            self.stdout.write(f'    Latencia  {latencias}')
+            for error, total in datos.errores.most_common(5):
+                self.stdout.write(self.style.WARNING(f'    ⚠️  {error}: {total}'))
+        return reporte
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write(self.style.SUCCESS(
+            f'🚦 Simulando {kwargs["controladores"]} controladores contra {kwargs["url"]}...'
+        ))
+
+        dispositivos = self.preparar_dispositivos(kwargs['controladores'], kwargs['crear_dispositivos'])
+        # Los códigos solo se guardan como digest: los válidos vienen de un archivo
+        codigos = []
+        if kwargs['codigos']:
+            with open(kwargs['codigos'], encoding='utf-8') as archivo:
+                codigos = [linea.strip() for linea in archivo if linea.strip()]
+        simulacion = Simulacion(kwargs['url'], dispositivos, codigos, kwargs)
+
+        try:
+            duracion = asyncio.run(simulacion.ejecutar())
+            reporte = self.reportar(simulacion, duracion)
+            if kwargs['json']:
+                with open(kwargs['json'], 'w', encoding='utf-8') as archivo:
+                    json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+                self.stdout.write(self.style.SUCCESS(f'\n✅ Reporte guardado en {kwargs["json"]}'))
+        finally:
+            if kwargs['limpiar']:
+                eliminados, _ = IoTDevice.objects.filter(identificador__startswith=PREFIJO_SIMULADOS).delete()
+                self.stdout.write(f'🧹 Dispositivos simulados eliminados: {eliminados}')
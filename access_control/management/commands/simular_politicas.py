@@ -0,0 +1,109 @@
+"""
+Management command para simular un cambio de roles, reglas o permisos
+de zona antes de aplicarlo: calcula qué accesos se conceden y cuáles se
+revocan sobre la matriz usuarios × puertas (ver access_control/impact.py).
+No modifica la base de datos.
+
+El cambio se describe con un JSON (mismo formato que POST
+/api/policies/impact/) o, para los casos comunes, con opciones:
+
+    python manage.py simular_politicas --rol MAESTRO=ALUMNO
+    python manage.py simular_politicas --perfiles 10,11,12 --nuevo-rol ALUMNO
+    python manage.py simular_politicas cambios.json --salida pares.csv
+    python manage.py simular_politicas --rol MAESTRO=ALUMNO --escuela norte
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from access_control.impact import pares, por_puerta, simular, totales
+from access_control.models import Door, School, UserProfile
+from access_control.serializers import ImpactoCambiosSerializer
+from audit.exports import csv_en_flujo
+
+
+class Command(BaseCommand):
+    help = 'Simula un cambio de roles o políticas y reporta los accesos que concede y revoca'
+
+    def add_arguments(self, parser):
+        parser.add_argument('cambios', nargs='?', help='Archivo JSON con el cambio propuesto')
+        parser.add_argument('--rol', action='append', default=[], metavar='DE=A',
+                            help='Todos los perfiles del rol DE pasan al rol A (se puede repetir)')
+        parser.add_argument('--perfiles', help='IDs de perfil separados por comas (con --nuevo-rol)')
+        parser.add_argument('--nuevo-rol', help='Rol al que se mueven los --perfiles')
+        parser.add_argument('--accion', default='ABRIR_PUERTA', help='Acción a comparar (default: ABRIR_PUERTA)')
+        parser.add_argument('--escuela', help='Clave de la escuela a simular (default: todas)')
+        parser.add_argument('--salida', help='CSV con cada par (usuario, puerta) concedido o revocado')
+        parser.add_argument('--top', type=int, default=10, help='Puertas más afectadas a mostrar (default: 10)')
+
+    def cargar_cambios(self, kwargs):
+        datos = {}
+        if kwargs['cambios']:
+            try:
+                with open(kwargs['cambios'], encoding='utf-8') as archivo:
+                    datos = json.load(archivo)
+            except (OSError, ValueError) as error:
+                raise CommandError(f'No se pudo leer {kwargs["cambios"]}: {error}')
+        datos.setdefault('accion', kwargs['accion'])
+        if kwargs['escuela']:
+            escuela = School.objects.filter(clave=kwargs['escuela']).values_list('pk', flat=True).first()
+            if escuela is None:
+                raise CommandError(f'No existe la escuela "{kwargs["escuela"]}"')
+            datos['escuela'] = escuela
+        for par in kwargs['rol']:
+            anterior, _, nuevo = par.partition('=')
+            datos.setdefault('roles', {})[anterior.strip().upper()] = nuevo.strip().upper()
+        if kwargs['perfiles'] or kwargs['nuevo_rol']:
+            if not (kwargs['perfiles'] and kwargs['nuevo_rol']):
+                raise CommandError('--perfiles y --nuevo-rol se usan juntos')
+            try:
+                perfiles = [int(valor) for valor in kwargs['perfiles'].split(',') if valor.strip()]
+            except ValueError:
+                raise CommandError('--perfiles debe ser una lista de IDs separados por comas')
+            datos.setdefault('usuarios', []).append({'perfiles': perfiles, 'rol': kwargs['nuevo_rol'].upper()})
+
+        serializer = ImpactoCambiosSerializer(data=datos)
+        if not serializer.is_valid():
+            raise CommandError(f'Cambio inválido: {json.dumps(serializer.errors, ensure_ascii=False)}')
+        return serializer.validated_data
+
+    def handle(self, *args, **kwargs):
+        cambios = self.cargar_cambios(kwargs)
+        impacto = simular(cambios)
+        resumen = totales(impacto)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'🧪 Simulación de {impacto.accion}: {impacto.usuarios} usuarios × {impacto.puertas} puertas '
+            f'en {impacto.segundos:.2f} s'
+        ))
+        self.stdout.write('\n📊 RESUMEN:')
+        self.stdout.write(f'  Usuarios afectados: {resumen["usuarios_afectados"]}')
+        self.stdout.write(f'  Puertas afectadas: {resumen["puertas_afectadas"]}')
+        self.stdout.write(f'  Accesos concedidos: {resumen["concesiones"]}')
+        self.stdout.write(f'  Accesos revocados: {resumen["revocaciones"]}')
+
+        conteo = por_puerta(impacto)
+        if conteo:
+            nombres = dict(Door.objects.filter(pk__in=list(conteo)).values_list('pk', 'nombre'))
+            self.stdout.write('\n🚪 Puertas más afectadas:')
+            for puerta, (ganan, pierden) in sorted(conteo.items(), key=lambda par: -sum(par[1]))[:kwargs['top']]:
+                self.stdout.write(f'  {nombres.get(puerta, puerta)}: +{ganan} / -{pierden}')
+
+        if kwargs['salida']:
+            usuarios = dict(UserProfile.objects.values_list('pk', 'user__username'))
+            puertas = dict(Door.objects.values_list('pk', 'nombre'))
+            filas = (
+                [perfil, usuarios.get(perfil, ''), puerta, puertas.get(puerta, ''), efecto]
+                for perfil, puerta, efecto in pares(impacto)
+            )
+            with open(kwargs['salida'], 'wb') as archivo:
+                for parte in csv_en_flujo(['Perfil', 'Usuario', 'Puerta', 'Nombre de puerta', 'Efecto'], filas):
+                    archivo.write(parte)
+            self.stdout.write(f'\n📄 Pares escritos en {kwargs["salida"]}')
+
+        if resumen['revocaciones']:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  El cambio quitaría {resumen["revocaciones"]} acceso(s) a {resumen["usuarios_con_revocaciones"]} usuario(s)'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ El cambio no revoca ningún acceso'))
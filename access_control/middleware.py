@@ -0,0 +1,201 @@
+"""
+Middleware de la app access_control.
+Autenticación HMAC de los controladores IoT y perfilado bajo demanda.
+"""
+import cProfile
+import hashlib
+import hmac
+import logging
+import random
+import re
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.utils.functional import SimpleLazyObject
+
+from .models import IoTDevice
+from .profiling import guardar_perfil
+
+
+logger = logging.getLogger(__name__)
+
+
+NONCE = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+Credencial = namedtuple('Credencial', ['pk', 'puerta_id', 'escuela_id', 'clave_secreta', 'expira'])
+
+# Credenciales por identificador, para no consultar la BD en cada petición.
+# Cada worker tiene su copia; los cambios se propagan al expirar DEVICE_CACHE_TTL.
+_credenciales = {}
+
+
+def obtener_credencial(identificador):
+    """Devuelve la credencial del dispositivo activo o None"""
+    ahora = time.monotonic()
+    credencial = _credenciales.get(identificador)
+    if credencial is not None and credencial.expira > ahora:
+        return credencial
+
+    fila = (
+        IoTDevice.objects
+        .filter(identificador=identificador, activo=True)
+        .values_list('pk', 'puerta_id', 'puerta__escuela_id', 'clave_secreta')
+        .first()
+    )
+    if fila is None:
+        _credenciales.pop(identificador, None)
+        return None
+    credencial = Credencial(*fila, ahora + settings.DEVICE_CACHE_TTL)
+    _credenciales[identificador] = credencial
+    return credencial
+
+
+def olvidar_credencial(identificador):
+    """Descarta la credencial en caché (cambio de clave o desactivación)"""
+    _credenciales.pop(identificador, None)
+
+
+def cargar_dispositivo(pk):
+    """Carga el dispositivo con su puerta y seguro en una sola consulta"""
+    return IoTDevice.objects.select_related('puerta', 'puerta__seguro').get(pk=pk)
+
+
+def firmar_peticion(clave, timestamp, nonce, metodo, ruta, cuerpo):
+    """
+    Calcula la firma HMAC-SHA256 de una petición de dispositivo.
+    Mensaje firmado: "{timestamp}\\n{nonce}\\n{método}\\n{ruta}\\n" + cuerpo,
+    con la ruta completa (incluida la query string).
+    """
+    mensaje = f'{timestamp}\n{nonce}\n{metodo}\n{ruta}\n'.encode() + cuerpo
+    return hmac.new(clave.encode(), mensaje, hashlib.sha256).hexdigest()
+
+
+class DeviceAuthMiddleware:
+    """
+    Autentica peticiones de controladores mediante las cabeceras:
+    - X-Device-Id: identificador del dispositivo
+    - X-Device-Timestamp: segundos epoch (acota la ventana de repetición)
+    - X-Device-Nonce: valor aleatorio distinto en cada petición (16 a 64
+      caracteres [A-Za-z0-9_-])
+    - X-Device-Signature: HMAC-SHA256 hexadecimal de la petición
+    Los nonces de cada dispositivo se recuerdan en la caché mientras su
+    timestamp siga dentro de la tolerancia: una petición firmada repetida
+    tal cual se rechaza (con caché compartida, en cualquier worker).
+    Si la firma es válida, deja el dispositivo en request.dispositivo
+    (carga diferida: solo consulta la BD si la vista lo usa) y su puerta
+    y escuela en request.puerta_id y request.escuela_id.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.tolerancia = settings.DEVICE_HMAC_MAX_SKEW
+
+    def __call__(self, request):
+        identificador = request.headers.get('X-Device-Id')
+        timestamp = request.headers.get('X-Device-Timestamp', '')
+        nonce = request.headers.get('X-Device-Nonce', '')
+        firma = request.headers.get('X-Device-Signature', '')
+
+        if not identificador or not timestamp or not nonce or not firma:
+            return JsonResponse({'error': 'Faltan credenciales del dispositivo'}, status=401)
+        if not NONCE.match(nonce):
+            return JsonResponse({'error': 'Nonce inválido'}, status=401)
+
+        try:
+            desfase = abs(time.time() - int(timestamp))
+        except ValueError:
+            return JsonResponse({'error': 'Timestamp inválido'}, status=401)
+        if desfase > self.tolerancia:
+            return JsonResponse({'error': 'Timestamp fuera de tolerancia'}, status=401)
+
+        credencial = obtener_credencial(identificador)
+        if credencial is None:
+            return JsonResponse({'error': 'Dispositivo no autorizado'}, status=401)
+
+        esperada = firmar_peticion(
+            credencial.clave_secreta, timestamp, nonce, request.method,
+            request.get_full_path(), request.body
+        )
+        if not hmac.compare_digest(esperada, firma):
+            return JsonResponse({'error': 'Firma inválida'}, status=401)
+
+        # Un timestamp se acepta hasta `tolerancia` segundos después de él
+        if not cache.add(f'dispositivo:{credencial.pk}:nonce:{nonce}', 1, 2 * self.tolerancia):
+            return JsonResponse({'error': 'Petición repetida'}, status=401)
+
+        request.dispositivo_id = credencial.pk
+        request.puerta_id = credencial.puerta_id
+        request.escuela_id = credencial.escuela_id
+        request.dispositivo = SimpleLazyObject(lambda: cargar_dispositivo(credencial.pk))
+        return self.get_response(request)
+
+
+class ProfilerMiddleware:
+    """
+    Perfila con cProfile una muestra de las peticiones (PROFILING['SAMPLE_RATE'])
+    y las de staff que envían la cabecera PROFILING['HEADER'].
+    Si ambas opciones están apagadas se retira de la cadena (costo cero);
+    si no, cada petición no perfilada cuesta una consulta de cabecera y un
+    número aleatorio.
+    """
+
+    def __init__(self, get_response):
+        config = settings.PROFILING
+        self.get_response = get_response
+        self.muestra = config['SAMPLE_RATE']
+        cabecera = config['HEADER']
+        self.clave_meta = 'HTTP_' + cabecera.upper().replace('-', '_') if cabecera else None
+        if not self.muestra and not self.clave_meta:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if not self.debe_perfilar(request):
+            return self.get_response(request)
+
+        perfilador = cProfile.Profile()
+        try:
+            perfilador.enable()
+        except ValueError:
+            # Otro perfilador activo (p. ej. en otro hilo con Python 3.12+)
+            return self.get_response(request)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            perfilador.disable()
+        duracion = time.perf_counter() - inicio
+
+        try:
+            perfilador.create_stats()
+            guardar_perfil(
+                {
+                    'ruta': self.ruta(request),
+                    'metodo': request.method,
+                    'estado': response.status_code,
+                    'duracion': duracion,
+                    'fecha': time.time(),
+                },
+                perfilador.stats,
+            )
+        except OSError:
+            logger.exception('No se pudo guardar el perfil de %s', request.path)
+        return response
+
+    def debe_perfilar(self, request):
+        if self.muestra and random.random() < self.muestra:
+            return True
+        if self.clave_meta and self.clave_meta in request.META:
+            usuario = getattr(request, 'user', None)
+            return bool(usuario is not None and usuario.is_staff)
+        return False
+
+    def ruta(self, request):
+        """Patrón de la URL resuelta (agrupa /usuarios/1/ y /usuarios/2/)"""
+        coincidencia = getattr(request, 'resolver_match', None)
+        if coincidencia is not None and coincidencia.route:
+            return '/' + coincidencia.route.lstrip('^')
+        return request.path
@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-19 02:05
+
+import access_control.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IoTDevice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identificador', models.CharField(help_text='Identificador único del controlador (por ejemplo, MAC del ESP32)', max_length=64, unique=True, verbose_name='Identificador')),
+                ('nombre', models.CharField(max_length=100, verbose_name='Nombre')),
+                ('clave_secreta', models.CharField(default=access_control.models.generar_clave_dispositivo, help_text='Clave compartida para la firma HMAC de las peticiones', max_length=64, verbose_name='Clave Secreta')),
+                ('activo', models.BooleanField(default=True, help_text='El dispositivo puede comunicarse con el servidor', verbose_name='Activo')),
+                ('ultimo_heartbeat', models.DateTimeField(blank=True, null=True, verbose_name='Último Heartbeat')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('puerta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dispositivos', to='access_control.door', verbose_name='Puerta Asignada')),
+            ],
+            options={
+                'verbose_name': 'Dispositivo IoT',
+                'verbose_name_plural': 'Dispositivos IoT',
+                'ordering': ['identificador'],
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.0 on 2026-10-19 02:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0002_iotdevice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Zone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, verbose_name='Nombre')),
+                ('tipo', models.CharField(choices=[('CAMPUS', 'Campus'), ('EDIFICIO', 'Edificio'), ('PISO', 'Piso')], max_length=10, verbose_name='Tipo')),
+                ('bloqueada', models.BooleanField(default=False, help_text='Bloquea todas las puertas de la zona y sus subzonas', verbose_name='Bloqueada')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('padre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='subzonas', to='access_control.zone', verbose_name='Zona Padre')),
+            ],
+            options={
+                'verbose_name': 'Zona',
+                'verbose_name_plural': 'Zonas',
+                'ordering': ['tipo', 'nombre'],
+            },
+        ),
+        migrations.AddField(
+            model_name='door',
+            name='zona',
+            field=models.ForeignKey(blank=True, help_text='Zona (campus, edificio o piso) a la que pertenece la puerta', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='puertas', to='access_control.zone', verbose_name='Zona'),
+        ),
+        migrations.CreateModel(
+            name='ZoneClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profundidad', models.PositiveSmallIntegerField(verbose_name='Profundidad')),
+                ('ancestro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cierre_descendientes', to='access_control.zone', verbose_name='Ancestro')),
+                ('descendiente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cierre_ancestros', to='access_control.zone', verbose_name='Descendiente')),
+            ],
+            options={
+                'verbose_name': 'Cierre de Zona',
+                'verbose_name_plural': 'Cierres de Zonas',
+            },
+        ),
+        migrations.CreateModel(
+            name='ZonePermission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rol', models.CharField(blank=True, choices=[('ADMIN', 'Administrador'), ('DIRECTOR', 'Director'), ('MAESTRO', 'Maestro'), ('ALUMNO', 'Alumno')], help_text='Concede acceso a todos los usuarios del rol', max_length=10, null=True, verbose_name='Rol')),
+                ('perfil', models.ForeignKey(blank=True, help_text='Concede acceso a un usuario específico', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='permisos_zona', to='access_control.userprofile', verbose_name='Perfil')),
+                ('zona', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='permisos', to='access_control.zone', verbose_name='Zona')),
+            ],
+            options={
+                'verbose_name': 'Permiso de Zona',
+                'verbose_name_plural': 'Permisos de Zonas',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='zone',
+            constraint=models.UniqueConstraint(fields=('padre', 'nombre'), name='zona_nombre_unico_por_padre'),
+        ),
+        migrations.AddIndex(
+            model_name='zoneclosure',
+            index=models.Index(fields=['descendiente', 'ancestro'], name='cierre_descendiente_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='zoneclosure',
+            constraint=models.UniqueConstraint(fields=('ancestro', 'descendiente'), name='cierre_zona_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='zonepermission',
+            constraint=models.CheckConstraint(check=models.Q(('rol__isnull', False), ('perfil__isnull', False), _connector='OR'), name='permiso_zona_rol_o_perfil'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.0 on 2026-10-19 02:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Reglas equivalentes a las listas de roles que antes estaban en el código
+POLITICAS_INICIALES = {
+    'ABRIR_PUERTA': ['ADMIN', 'DIRECTOR', 'MAESTRO', 'ALUMNO'],
+    'GESTIONAR_USUARIOS': ['ADMIN', 'DIRECTOR', 'MAESTRO'],
+    'CREAR_USUARIOS': ['ADMIN', 'DIRECTOR'],
+    'ELIMINAR_USUARIOS': ['ADMIN'],
+    'EDITAR_CODIGO': ['ADMIN', 'DIRECTOR'],
+    'EDITAR_PERMISOS_SISTEMA': ['ADMIN', 'DIRECTOR'],
+    'CONTROLAR_SEGURO': ['ADMIN', 'DIRECTOR', 'MAESTRO'],
+    'DESACTIVAR_SEGURO': ['ADMIN', 'DIRECTOR'],
+}
+
+
+def crear_politicas_iniciales(apps, schema_editor):
+    AccessPolicy = apps.get_model('access_control', 'AccessPolicy')
+    AccessPolicy.objects.bulk_create([
+        AccessPolicy(rol=rol, accion=accion, permitido=True)
+        for accion, roles in POLITICAS_INICIALES.items()
+        for rol in roles
+    ])
+
+
+def eliminar_politicas_iniciales(apps, schema_editor):
+    AccessPolicy = apps.get_model('access_control', 'AccessPolicy')
+    AccessPolicy.objects.filter(zona__isnull=True, puerta__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0003_zonas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rol', models.CharField(choices=[('ADMIN', 'Administrador'), ('DIRECTOR', 'Director'), ('MAESTRO', 'Maestro'), ('ALUMNO', 'Alumno')], max_length=10, verbose_name='Rol')),
+                ('accion', models.CharField(choices=[('ABRIR_PUERTA', 'Abrir puerta con código'), ('GESTIONAR_USUARIOS', 'Ver y editar usuarios'), ('CREAR_USUARIOS', 'Crear usuarios'), ('ELIMINAR_USUARIOS', 'Eliminar usuarios'), ('EDITAR_CODIGO', 'Editar código de acceso'), ('EDITAR_PERMISOS_SISTEMA', 'Modificar permisos del sistema'), ('CONTROLAR_SEGURO', 'Controlar el seguro'), ('DESACTIVAR_SEGURO', 'Desactivar el seguro')], max_length=30, verbose_name='Acción')),
+                ('permitido', models.BooleanField(default=True, help_text='Desmarcar para negar explícitamente', verbose_name='Permitido')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Fecha de Modificación')),
+                ('puerta', models.ForeignKey(blank=True, help_text='Limita la regla a una puerta', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='politicas', to='access_control.door', verbose_name='Puerta')),
+                ('zona', models.ForeignKey(blank=True, help_text='Limita la regla a la zona y sus subzonas', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='politicas', to='access_control.zone', verbose_name='Zona')),
+            ],
+            options={
+                'verbose_name': 'Política de Acceso',
+                'verbose_name_plural': 'Políticas de Acceso',
+                'ordering': ['accion', 'rol'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='accesspolicy',
+            constraint=models.CheckConstraint(check=models.Q(('zona__isnull', True), ('puerta__isnull', True), _connector='OR'), name='politica_zona_o_puerta'),
+        ),
+        migrations.RunPython(crear_politicas_iniciales, eliminar_politicas_iniciales),
+    ]
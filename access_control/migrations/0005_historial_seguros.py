@@ -0,0 +1,48 @@
+# Generated by Django 5.0 on 2026-10-19 02:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def registrar_estado_actual(apps, schema_editor):
+    """Punto de partida del historial: el estado actual de cada seguro"""
+    LockState = apps.get_model('access_control', 'LockState')
+    LockStateHistory = apps.get_model('access_control', 'LockStateHistory')
+    LockStateHistory.objects.bulk_create([
+        LockStateHistory(
+            puerta_id=seguro.puerta_id,
+            activo=seguro.activo,
+            usuario_id=seguro.usuario_cambio_id,
+            fecha=seguro.fecha_cambio,
+        )
+        for seguro in LockState.objects.all().iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0004_politicas_acceso'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LockStateHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activo', models.BooleanField(verbose_name='Seguro Activo')),
+                ('fecha', models.DateTimeField(verbose_name='Fecha')),
+                ('puerta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_seguro', to='access_control.door', verbose_name='Puerta')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='historial_seguro', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Historial del Seguro',
+                'verbose_name_plural': 'Historial de Seguros',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['puerta', 'fecha'], name='historial_puerta_fecha_idx'), models.Index(fields=['fecha'], name='historial_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(registrar_estado_actual, migrations.RunPython.noop),
+    ]
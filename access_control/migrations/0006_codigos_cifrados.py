@@ -0,0 +1,56 @@
+# Generated by Django 5.0 on 2026-10-19 02:31
+
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+TAMANO_LOTE = 1000
+
+
+def cifrar_codigos(apps, schema_editor):
+    """Sustituye cada código por su digest HMAC, por lotes de TAMANO_LOTE"""
+    UserProfile = apps.get_model('access_control', 'UserProfile')
+    clave = settings.ACCESS_CODE_KEY.encode()
+    ultimo = 0
+    while True:
+        lote = list(
+            UserProfile.objects
+            .filter(pk__gt=ultimo)
+            .order_by('pk')
+            .only('pk', 'codigo_acceso')[:TAMANO_LOTE]
+        )
+        if not lote:
+            break
+        for perfil in lote:
+            perfil.codigo_hash = hmac.new(clave, perfil.codigo_acceso.encode(), hashlib.sha256).hexdigest()
+        UserProfile.objects.bulk_update(lote, ['codigo_hash'])
+        ultimo = lote[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0005_historial_seguros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='codigo_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        # Sin reversa: los códigos originales no se pueden recuperar del digest
+        migrations.RunPython(cifrar_codigos),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='codigo_acceso',
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='codigo_hash',
+            field=models.CharField(editable=False, help_text='Digest HMAC-SHA256 del código numérico; el código no se guarda', max_length=64, unique=True, verbose_name='Código de Acceso (HMAC)'),
+        ),
+    ]
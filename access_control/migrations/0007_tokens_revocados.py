@@ -0,0 +1,28 @@
+# Generated by Django 5.0 on 2026-10-19 02:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0006_codigos_cifrados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=64, unique=True, verbose_name='JTI')),
+                ('expira', models.DateTimeField(db_index=True, help_text='Fin de vigencia del token; después ya no hace falta recordarlo', verbose_name='Expira')),
+                ('fecha_revocacion', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Fecha de Revocación')),
+            ],
+            options={
+                'verbose_name': 'Token Revocado',
+                'verbose_name_plural': 'Tokens Revocados',
+                'ordering': ['-fecha_revocacion'],
+            },
+        ),
+    ]
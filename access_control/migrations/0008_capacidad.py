@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-19 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0007_tokens_revocados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='door',
+            name='capacidad',
+            field=models.PositiveIntegerField(blank=True, help_text='Personas máximas en el espacio al que da la puerta (vacío: sin límite)', null=True, verbose_name='Capacidad'),
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='capacidad',
+            field=models.PositiveIntegerField(blank=True, help_text='Personas máximas en toda la zona (vacío: sin límite)', null=True, verbose_name='Capacidad'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-19 02:35
+
+from django.db import migrations, models
+
+
+def crear_secuencia(apps, schema_editor):
+    """Fila única que reservan los asignadores de códigos"""
+    AccessCodeSequence = apps.get_model('access_control', 'AccessCodeSequence')
+    AccessCodeSequence.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0008_capacidad'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessCodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('siguiente', models.BigIntegerField(default=0, help_text='Primera posición que aún no se ha reservado', verbose_name='Siguiente posición')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Fecha de Modificación')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Códigos',
+                'verbose_name_plural': 'Secuencia de Códigos',
+            },
+        ),
+        migrations.RunPython(crear_secuencia, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0 on 2026-10-19 02:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0009_secuencia_codigos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(help_text='Ej: "Programación I - Grupo A"', max_length=100, verbose_name='Nombre')),
+                ('periodo', models.CharField(help_text='Ej: "2025-2"', max_length=20, verbose_name='Periodo')),
+                ('fecha_inicio', models.DateField(verbose_name='Inicio de Clases')),
+                ('fecha_fin', models.DateField(verbose_name='Fin de Clases')),
+                ('activo', models.BooleanField(default=True, verbose_name='Activo')),
+                ('alumnos', models.ManyToManyField(blank=True, related_name='grupos', to=settings.AUTH_USER_MODEL, verbose_name='Alumnos')),
+                ('maestro', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='grupos_impartidos', to=settings.AUTH_USER_MODEL, verbose_name='Maestro')),
+            ],
+            options={
+                'verbose_name': 'Grupo',
+                'verbose_name_plural': 'Grupos',
+                'ordering': ['periodo', 'nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ClassSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')], verbose_name='Día')),
+                ('hora_inicio', models.TimeField(verbose_name='Hora de Inicio')),
+                ('hora_fin', models.TimeField(verbose_name='Hora de Fin')),
+                ('grupo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horarios', to='access_control.classgroup', verbose_name='Grupo')),
+                ('puerta', models.ForeignKey(help_text='Entrada al salón o laboratorio', on_delete=django.db.models.deletion.CASCADE, related_name='horarios', to='access_control.door', verbose_name='Puerta')),
+            ],
+            options={
+                'verbose_name': 'Horario',
+                'verbose_name_plural': 'Horarios',
+                'ordering': ['grupo', 'dia_semana', 'hora_inicio'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='classgroup',
+            constraint=models.UniqueConstraint(fields=('nombre', 'periodo'), name='grupo_nombre_periodo_unico'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-19 02:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0010_grupos_horarios'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Lockdown',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motivo', models.CharField(max_length=255, verbose_name='Motivo')),
+                ('fecha_inicio', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Inicio')),
+                ('total_puertas', models.PositiveIntegerField(default=0, help_text='Puertas con el seguro activo al terminar el confinamiento', verbose_name='Puertas')),
+                ('puertas_bloqueadas', models.JSONField(blank=True, default=list, help_text='IDs de las puertas cuyo seguro activó el confinamiento', verbose_name='Puertas bloqueadas')),
+                ('duracion_ms', models.FloatField(blank=True, help_text='Tiempo hasta tener todas las puertas con seguro', null=True, verbose_name='Duración (ms)')),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('iniciado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='confinamientos_iniciados', to=settings.AUTH_USER_MODEL, verbose_name='Iniciado por')),
+                ('levantado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='confinamientos_levantados', to=settings.AUTH_USER_MODEL, verbose_name='Levantado por')),
+            ],
+            options={
+                'verbose_name': 'Confinamiento',
+                'verbose_name_plural': 'Confinamientos',
+                'ordering': ['-fecha_inicio'],
+            },
+        ),
+    ]
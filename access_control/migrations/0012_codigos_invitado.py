@@ -0,0 +1,40 @@
+# Generated by Django 5.0 on 2026-10-19 02:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0011_confinamientos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuestCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(help_text='Nombre del visitante o suplente', max_length=150, verbose_name='Invitado')),
+                ('motivo', models.CharField(blank=True, max_length=255, verbose_name='Motivo')),
+                ('codigo_hash', models.CharField(editable=False, help_text='Digest HMAC-SHA256 del código; el código solo se muestra al crearlo', max_length=64, unique=True, verbose_name='Código (HMAC)')),
+                ('valido_desde', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Válido desde')),
+                ('expira', models.DateTimeField(verbose_name='Expira')),
+                ('usos_maximos', models.PositiveIntegerField(blank=True, help_text='Vacío = sin límite mientras esté vigente', null=True, verbose_name='Usos máximos')),
+                ('usos', models.PositiveIntegerField(default=0, editable=False, verbose_name='Usos')),
+                ('activo', models.BooleanField(default=True, help_text='Desactivar revoca el código antes de que expire', verbose_name='Activo')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='codigos_invitado_creados', to=settings.AUTH_USER_MODEL, verbose_name='Creado por')),
+                ('puertas', models.ManyToManyField(related_name='codigos_invitado', to='access_control.door', verbose_name='Puertas')),
+            ],
+            options={
+                'verbose_name': 'Código de Invitado',
+                'verbose_name_plural': 'Códigos de Invitado',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['activo', 'expira'], name='invitado_vigencia_idx')],
+            },
+        ),
+    ]
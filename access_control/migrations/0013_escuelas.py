@@ -0,0 +1,121 @@
+# Generated by Django 5.0 on 2026-10-19 03:02
+
+import access_control.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0012_codigos_invitado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='School',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=150, unique=True, verbose_name='Nombre')),
+                ('clave', models.SlugField(help_text='Identificador corto (comandos y claves de caché)', unique=True, verbose_name='Clave')),
+                ('activa', models.BooleanField(default=True, verbose_name='Activa')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+            ],
+            options={
+                'verbose_name': 'Escuela',
+                'verbose_name_plural': 'Escuelas',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='classgroup',
+            name='grupo_nombre_periodo_unico',
+        ),
+        migrations.RemoveConstraint(
+            model_name='zone',
+            name='zona_nombre_unico_por_padre',
+        ),
+        migrations.RemoveIndex(
+            model_name='guestcode',
+            name='invitado_vigencia_idx',
+        ),
+        migrations.AlterField(
+            model_name='door',
+            name='nombre',
+            field=models.CharField(help_text='Nombre identificador de la puerta (único en la escuela)', max_length=100, verbose_name='Nombre'),
+        ),
+        migrations.AlterField(
+            model_name='guestcode',
+            name='codigo_hash',
+            field=models.CharField(editable=False, help_text='Digest HMAC-SHA256 del código; el código solo se muestra al crearlo', max_length=64, verbose_name='Código (HMAC)'),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='codigo_hash',
+            field=models.CharField(editable=False, help_text='Digest HMAC-SHA256 del código numérico; el código no se guarda', max_length=64, verbose_name='Código de Acceso (HMAC)'),
+        ),
+        migrations.AddField(
+            model_name='classgroup',
+            name='escuela',
+            field=models.ForeignKey(default=access_control.models.escuela_predeterminada, on_delete=django.db.models.deletion.PROTECT, related_name='grupos', to='access_control.school', verbose_name='Escuela'),
+        ),
+        migrations.AddField(
+            model_name='door',
+            name='escuela',
+            field=models.ForeignKey(default=access_control.models.escuela_predeterminada, on_delete=django.db.models.deletion.PROTECT, related_name='puertas', to='access_control.school', verbose_name='Escuela'),
+        ),
+        migrations.AddField(
+            model_name='guestcode',
+            name='escuela',
+            field=models.ForeignKey(default=access_control.models.escuela_predeterminada, on_delete=django.db.models.deletion.PROTECT, related_name='codigos_invitado', to='access_control.school', verbose_name='Escuela'),
+        ),
+        migrations.AddField(
+            model_name='lockdown',
+            name='escuela',
+            field=models.ForeignKey(blank=True, help_text='Vacío: todas las escuelas del despliegue', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='confinamientos', to='access_control.school', verbose_name='Escuela'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='escuela',
+            field=models.ForeignKey(default=access_control.models.escuela_predeterminada, on_delete=django.db.models.deletion.PROTECT, related_name='perfiles', to='access_control.school', verbose_name='Escuela'),
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='escuela',
+            field=models.ForeignKey(default=access_control.models.escuela_predeterminada, on_delete=django.db.models.deletion.PROTECT, related_name='zonas', to='access_control.school', verbose_name='Escuela'),
+        ),
+        migrations.AddIndex(
+            model_name='door',
+            index=models.Index(fields=['escuela', 'zona'], name='puerta_escuela_zona_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guestcode',
+            index=models.Index(fields=['escuela', 'activo', 'expira'], name='invitado_vigencia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lockdown',
+            index=models.Index(fields=['escuela', 'fecha_fin'], name='confinamiento_escuela_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='classgroup',
+            constraint=models.UniqueConstraint(fields=('escuela', 'nombre', 'periodo'), name='grupo_nombre_periodo_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='door',
+            constraint=models.UniqueConstraint(fields=('escuela', 'nombre'), name='puerta_nombre_unico_por_escuela'),
+        ),
+        migrations.AddConstraint(
+            model_name='guestcode',
+            constraint=models.UniqueConstraint(fields=('escuela', 'codigo_hash'), name='invitado_codigo_unico_por_escuela'),
+        ),
+        migrations.AddConstraint(
+            model_name='userprofile',
+            constraint=models.UniqueConstraint(fields=('escuela', 'codigo_hash'), name='perfil_codigo_unico_por_escuela'),
+        ),
+        migrations.AddConstraint(
+            model_name='zone',
+            constraint=models.UniqueConstraint(fields=('escuela', 'padre', 'nombre'), name='zona_nombre_unico_por_padre'),
+        ),
+    ]
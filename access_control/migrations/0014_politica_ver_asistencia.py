@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-19 03:28
+
+from django.db import migrations, models
+
+
+# Reglas equivalentes a la lista de roles que antes estaba en audit/attendance.py
+ROLES_VER_ASISTENCIA = ['ADMIN', 'DIRECTOR']
+
+
+def crear_politicas(apps, schema_editor):
+    AccessPolicy = apps.get_model('access_control', 'AccessPolicy')
+    AccessPolicy.objects.bulk_create([
+        AccessPolicy(rol=rol, accion='VER_ASISTENCIA', permitido=True)
+        for rol in ROLES_VER_ASISTENCIA
+    ])
+
+
+def eliminar_politicas(apps, schema_editor):
+    AccessPolicy = apps.get_model('access_control', 'AccessPolicy')
+    AccessPolicy.objects.filter(accion='VER_ASISTENCIA').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0013_escuelas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accesspolicy',
+            name='accion',
+            field=models.CharField(choices=[('ABRIR_PUERTA', 'Abrir puerta con código'), ('GESTIONAR_USUARIOS', 'Ver y editar usuarios'), ('CREAR_USUARIOS', 'Crear usuarios'), ('ELIMINAR_USUARIOS', 'Eliminar usuarios'), ('EDITAR_CODIGO', 'Editar código de acceso'), ('EDITAR_PERMISOS_SISTEMA', 'Modificar permisos del sistema'), ('CONTROLAR_SEGURO', 'Controlar el seguro'), ('DESACTIVAR_SEGURO', 'Desactivar el seguro'), ('VER_ASISTENCIA', 'Ver la asistencia de todos los grupos')], max_length=30, verbose_name='Acción'),
+        ),
+        migrations.RunPython(crear_politicas, eliminar_politicas),
+    ]
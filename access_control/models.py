@@ -1,8 +1,81 @@
-from django.db import models
+import hashlib
+import hmac
+import secrets
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, Q
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.core.validators import RegexValidator
 
 
+def hash_codigo(codigo):
+    """
+    Digest HMAC-SHA256 (clave ACCESS_CODE_KEY) de un código de acceso.
+    Es determinista, así que la verificación sigue siendo una búsqueda
+    por índice; sin la clave, los digests no permiten recuperar códigos.
+    """
+    return hmac.new(
+        settings.ACCESS_CODE_KEY.encode(), str(codigo).encode(), hashlib.sha256
+    ).hexdigest()
+
+
+class School(models.Model):
+    """
+    Escuela (inquilino) de un despliegue compartido. Perfiles, puertas,
+    zonas, grupos y códigos de invitado pertenecen a una; los seguros y
+    los controladores, a la de su puerta. Ver access_control/tenancy.py.
+    """
+    
+    nombre = models.CharField(
+        max_length=150,
+        unique=True,
+        verbose_name='Nombre'
+    )
+    
+    clave = models.SlugField(
+        max_length=50,
+        unique=True,
+        verbose_name='Clave',
+        help_text='Identificador corto (comandos y claves de caché)'
+    )
+    
+    activa = models.BooleanField(
+        default=True,
+        verbose_name='Activa'
+    )
+    
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de Creación'
+    )
+    
+    class Meta:
+        verbose_name = 'Escuela'
+        verbose_name_plural = 'Escuelas'
+        ordering = ['nombre']
+    
+    def __str__(self):
+        return self.nombre
+
+
+def escuela_predeterminada():
+    """
+    ID de la escuela de TENANCY['DEFAULT_SCHOOL'] (se crea si no existe).
+    Es el valor por defecto de los campos `escuela`: un despliegue de una
+    sola escuela no necesita indicarla nunca. Se consulta cada vez (índice
+    único de clave): una pk guardada en el proceso quedaría obsoleta si la
+    escuela se elimina o se vuelve a crear.
+    """
+    clave = settings.TENANCY['DEFAULT_SCHOOL']
+    escuela_id = School.objects.filter(clave=clave).values_list('pk', flat=True).first()
+    if escuela_id is None:
+        escuela_id = School.objects.get_or_create(clave=clave, defaults={'nombre': clave.capitalize()})[0].pk
+    return escuela_id
+
+
 class UserProfile(models.Model):
     """
     Perfil extendido del usuario con información de control de acceso.
@@ -23,6 +96,14 @@ class UserProfile(models.Model):
         verbose_name='Usuario'
     )
     
+    escuela = models.ForeignKey(
+        School,
+        on_delete=models.PROTECT,
+        default=escuela_predeterminada,
+        related_name='perfiles',
+        verbose_name='Escuela'
+    )
+    
     rol = models.CharField(
         max_length=10,
         choices=ROLE_CHOICES,
@@ -30,17 +111,11 @@ class UserProfile(models.Model):
         verbose_name='Rol'
     )
     
-    codigo_acceso = models.CharField(
-        max_length=20,
-        unique=True,
-        validators=[
-            RegexValidator(
-                regex=r'^[0-9]+$',
-                message='El código de acceso solo puede contener números',
-            )
-        ],
-        verbose_name='Código de Acceso',
-        help_text='Código numérico para acceso físico'
+    codigo_hash = models.CharField(
+        max_length=64,
+        editable=False,
+        verbose_name='Código de Acceso (HMAC)',
+        help_text='Digest HMAC-SHA256 del código numérico; el código no se guarda'
     )
     
     telefono = models.CharField(
@@ -76,25 +151,53 @@ class UserProfile(models.Model):
         verbose_name = 'Perfil de Usuario'
         verbose_name_plural = 'Perfiles de Usuarios'
         ordering = ['user__username']
+        constraints = [
+            # Búsqueda del código tecleado en una puerta de la escuela
+            models.UniqueConstraint(fields=['escuela', 'codigo_hash'], name='perfil_codigo_unico_por_escuela'),
+        ]
     
     def __str__(self):
         return f"{self.user.get_full_name() or self.user.username} - {self.get_rol_display()}"
     
-    def puede_abrir_puerta(self):
-        """Todos los roles pueden abrir puertas"""
-        return self.activo
+    def establecer_codigo(self, codigo):
+        """Asigna un nuevo código de acceso (se guarda solo su digest)"""
+        self.codigo_hash = hash_codigo(codigo)
+    
+    def verificar_codigo(self, codigo):
+        """Compara un código con el guardado en tiempo constante"""
+        return hmac.compare_digest(self.codigo_hash, hash_codigo(codigo))
+    
+    def puede(self, accion, puerta=None):
+        """
+        Consulta la tabla de políticas compilada (ver AccessPolicy).
+        Con puerta, aplica las reglas de zona/puerta y los permisos de zona.
+        """
+        from .policies import motor_de
+        return motor_de(self).perfil_puede(self, accion, puerta)
+    
+    def puede_abrir_puerta(self, puerta=None):
+        """Por defecto todos los roles pueden abrir puertas"""
+        return self.puede('ABRIR_PUERTA', puerta)
     
     def puede_gestionar_usuarios(self):
-        """Director, Maestro y Admin pueden gestionar usuarios"""
-        return self.rol in ['ADMIN', 'DIRECTOR', 'MAESTRO'] and self.activo
+        """Por defecto Director, Maestro y Admin pueden gestionar usuarios"""
+        return self.puede('GESTIONAR_USUARIOS')
+    
+    def puede_controlar_seguro(self, puerta=None):
+        """Por defecto Director, Maestro y Admin pueden controlar el seguro"""
+        return self.puede('CONTROLAR_SEGURO', puerta)
     
-    def puede_controlar_seguro(self):
-        """Director, Maestro y Admin pueden controlar el seguro"""
-        return self.rol in ['ADMIN', 'DIRECTOR', 'MAESTRO'] and self.activo
+    def puede_desactivar_seguro(self, puerta=None):
+        """Por defecto solo Director y Admin pueden desactivar seguro principal"""
+        return self.puede('DESACTIVAR_SEGURO', puerta)
     
-    def puede_desactivar_seguro(self):
-        """Solo Director y Admin pueden desactivar seguro principal"""
-        return self.rol in ['ADMIN', 'DIRECTOR'] and self.activo
+    def puede_ver_asistencia(self):
+        """Por defecto Director y Admin ven la asistencia de todos los grupos de su escuela"""
+        return self.puede('VER_ASISTENCIA')
+    
+    def recibe_confinamientos(self):
+        """Por defecto Admin, Director y Maestro reciben los avisos de confinamiento"""
+        return self.puede('RECIBIR_CONFINAMIENTO')
 
 
 class Door(models.Model):
@@ -107,11 +210,18 @@ class Door(models.Model):
         ('CERRADA', 'Cerrada'),
     ]
     
+    escuela = models.ForeignKey(
+        School,
+        on_delete=models.PROTECT,
+        default=escuela_predeterminada,
+        related_name='puertas',
+        verbose_name='Escuela'
+    )
+    
     nombre = models.CharField(
         max_length=100,
-        unique=True,
         verbose_name='Nombre',
-        help_text='Nombre identificador de la puerta'
+        help_text='Nombre identificador de la puerta (único en la escuela)'
     )
     
     ubicacion = models.CharField(
@@ -139,6 +249,23 @@ class Door(models.Model):
         help_text='La puerta está operativa'
     )
     
+    zona = models.ForeignKey(
+        'Zone',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='puertas',
+        verbose_name='Zona',
+        help_text='Zona (campus, edificio o piso) a la que pertenece la puerta'
+    )
+    
+    capacidad = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Capacidad',
+        help_text='Personas máximas en el espacio al que da la puerta (vacío: sin límite)'
+    )
+    
     fecha_creacion = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Fecha de Creación'
@@ -153,19 +280,30 @@ class Door(models.Model):
         verbose_name = 'Puerta'
         verbose_name_plural = 'Puertas'
         ordering = ['nombre']
+        constraints = [
+            models.UniqueConstraint(fields=['escuela', 'nombre'], name='puerta_nombre_unico_por_escuela'),
+        ]
+        indexes = [
+            # Compilación de la tabla de políticas de una escuela (pk, zona)
+            models.Index(fields=['escuela', 'zona'], name='puerta_escuela_zona_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.ubicacion}"
     
+    def clean(self):
+        if self.zona_id and self.zona.escuela_id != self.escuela_id:
+            raise ValidationError({'zona': 'La zona debe ser de la misma escuela que la puerta.'})
+    
     def abrir(self):
         """Cambia el estado a ABIERTA"""
         self.estado = 'ABIERTA'
-        self.save()
+        self.save(update_fields=['estado', 'fecha_modificacion'])
     
     def cerrar(self):
         """Cambia el estado a CERRADA"""
         self.estado = 'CERRADA'
-        self.save()
+        self.save(update_fields=['estado', 'fecha_modificacion'])
 
 
 class LockState(models.Model):
@@ -211,10 +349,31 @@ class LockState(models.Model):
         verbose_name_plural = 'Estados de Seguros'
         ordering = ['-fecha_cambio']
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Estado guardado en la BD, para detectar transiciones sin consultarla
+        self._activo_guardado = self.activo if self.pk else None
+    
     def __str__(self):
         estado = "Activo" if self.activo else "Inactivo"
         return f"Seguro {self.puerta.nombre}: {estado}"
     
+    def save(self, *args, **kwargs):
+        """
+        Guarda el estado y, si hubo transición (o es el estado inicial),
+        la registra en LockStateHistory dentro de la misma transacción.
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.activo != self._activo_guardado:
+                LockStateHistory.objects.create(
+                    puerta_id=self.puerta_id,
+                    activo=self.activo,
+                    usuario_id=self.usuario_cambio_id,
+                    fecha=self.fecha_cambio,
+                )
+                self._activo_guardado = self.activo
+    
     def activar(self, usuario=None, observacion=None):
         """Activa el seguro de la puerta"""
         self.activo = True
@@ -230,3 +389,910 @@ class LockState(models.Model):
         if observacion:
             self.observaciones = observacion
         self.save()
+
+
+class LockStateHistory(models.Model):
+    """
+    Historial inmutable (solo inserciones) de las transiciones del seguro.
+    Filas compactas: puerta, estado, usuario y fecha.
+    El índice (puerta, fecha) resuelve "estado de cada puerta en el
+    instante T" y "transiciones de una puerta en un rango" sin recorrer
+    todo el historial.
+    """
+    
+    puerta = models.ForeignKey(
+        Door,
+        on_delete=models.CASCADE,
+        related_name='historial_seguro',
+        verbose_name='Puerta'
+    )
+    
+    activo = models.BooleanField(
+        verbose_name='Seguro Activo'
+    )
+    
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='historial_seguro',
+        verbose_name='Usuario'
+    )
+    
+    fecha = models.DateTimeField(
+        verbose_name='Fecha'
+    )
+    
+    class Meta:
+        verbose_name = 'Historial del Seguro'
+        verbose_name_plural = 'Historial de Seguros'
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['puerta', 'fecha'], name='historial_puerta_fecha_idx'),
+            models.Index(fields=['fecha'], name='historial_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        estado = "Activado" if self.activo else "Desactivado"
+        return f"{estado} - {self.puerta_id} ({self.fecha:%Y-%m-%d %H:%M:%S})"
+    
+    @classmethod
+    def registrar_masivo(cls, puertas_ids, activo, usuario=None, fecha=None):
+        """
+        Registra la misma transición para muchas puertas en un solo INSERT
+        (para cambios hechos con queryset.update(), que no pasan por save()).
+        """
+        fecha = fecha or timezone.now()
+        usuario_id = usuario.pk if usuario else None
+        return cls.objects.bulk_create([
+            cls(puerta_id=puerta_id, activo=activo, usuario_id=usuario_id, fecha=fecha)
+            for puerta_id in puertas_ids
+        ], batch_size=1000)
+    
+    @classmethod
+    def estado_en(cls, momento):
+        """
+        Puertas anotadas con el estado del seguro en `momento`
+        (activo_en es None si aún no había registro). Cada puerta se
+        resuelve con una búsqueda sobre el índice (puerta, fecha).
+        """
+        ultimo = (
+            cls.objects
+            .filter(puerta=models.OuterRef('pk'), fecha__lte=momento)
+            .order_by('-fecha', '-pk')
+        )
+        return Door.objects.annotate(
+            activo_en=models.Subquery(ultimo.values('activo')[:1]),
+            usuario_en=models.Subquery(ultimo.values('usuario_id')[:1]),
+        )
+    
+    @classmethod
+    def transiciones(cls, puerta, desde=None, hasta=None):
+        """Transiciones de una puerta en un rango, en orden cronológico"""
+        historial = cls.objects.filter(puerta=puerta)
+        if desde is not None:
+            historial = historial.filter(fecha__gte=desde)
+        if hasta is not None:
+            historial = historial.filter(fecha__lte=hasta)
+        return historial.order_by('fecha', 'pk')
+
+
+class Zone(models.Model):
+    """
+    Zona física jerárquica: Campus → Edificio → Piso.
+    Los permisos y bloqueos de una zona se heredan a todas sus puertas
+    y subzonas. La ascendencia se guarda precalculada en ZoneClosure.
+    """
+    
+    TIPO_CHOICES = [
+        ('CAMPUS', 'Campus'),
+        ('EDIFICIO', 'Edificio'),
+        ('PISO', 'Piso'),
+    ]
+    
+    escuela = models.ForeignKey(
+        School,
+        on_delete=models.PROTECT,
+        default=escuela_predeterminada,
+        related_name='zonas',
+        verbose_name='Escuela'
+    )
+    
+    nombre = models.CharField(
+        max_length=100,
+        verbose_name='Nombre'
+    )
+    
+    tipo = models.CharField(
+        max_length=10,
+        choices=TIPO_CHOICES,
+        verbose_name='Tipo'
+    )
+    
+    padre = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='subzonas',
+        verbose_name='Zona Padre'
+    )
+    
+    bloqueada = models.BooleanField(
+        default=False,
+        verbose_name='Bloqueada',
+        help_text='Bloquea todas las puertas de la zona y sus subzonas'
+    )
+    
+    capacidad = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Capacidad',
+        help_text='Personas máximas en toda la zona (vacío: sin límite)'
+    )
+    
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de Creación'
+    )
+    
+    class Meta:
+        verbose_name = 'Zona'
+        verbose_name_plural = 'Zonas'
+        ordering = ['tipo', 'nombre']
+        constraints = [
+            models.UniqueConstraint(fields=['escuela', 'padre', 'nombre'], name='zona_nombre_unico_por_padre'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.nombre}"
+    
+    def clean(self):
+        """El padre debe ser de un nivel superior y no puede ser un descendiente"""
+        if self.padre_id is None:
+            return
+        if self.padre.escuela_id != self.escuela_id:
+            raise ValidationError({'padre': 'La zona padre debe ser de la misma escuela.'})
+        niveles = [tipo for tipo, _ in self.TIPO_CHOICES]
+        if niveles.index(self.padre.tipo) >= niveles.index(self.tipo):
+            raise ValidationError({'padre': 'La zona padre debe ser de un nivel superior.'})
+        if self.pk and ZoneClosure.objects.filter(ancestro_id=self.pk, descendiente_id=self.padre_id).exists():
+            raise ValidationError({'padre': 'Una zona no puede colgar de sí misma ni de sus subzonas.'})
+    
+    def save(self, *args, **kwargs):
+        """Guarda la zona y mantiene la tabla de cierre"""
+        with transaction.atomic():
+            nueva = self.pk is None
+            padre_anterior = None
+            if not nueva:
+                padre_anterior = (
+                    Zone.objects.filter(pk=self.pk)
+                    .values_list('padre_id', flat=True)
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            if nueva:
+                self._crear_cierre()
+            elif padre_anterior != self.padre_id:
+                self._mover_subarbol()
+    
+    def _ancestros_padre(self):
+        """Pares (ancestro, profundidad) del padre, incluido el propio padre"""
+        if self.padre_id is None:
+            return []
+        return list(
+            ZoneClosure.objects.filter(descendiente_id=self.padre_id)
+            .values_list('ancestro_id', 'profundidad')
+        )
+    
+    def _crear_cierre(self):
+        """Filas de cierre de una zona nueva: ella misma y los ancestros del padre"""
+        filas = [ZoneClosure(ancestro_id=self.pk, descendiente_id=self.pk, profundidad=0)]
+        filas += [
+            ZoneClosure(ancestro_id=ancestro, descendiente_id=self.pk, profundidad=profundidad + 1)
+            for ancestro, profundidad in self._ancestros_padre()
+        ]
+        ZoneClosure.objects.bulk_create(filas)
+    
+    def _mover_subarbol(self):
+        """Reenlaza el subárbol completo bajo el nuevo padre"""
+        subarbol = list(
+            ZoneClosure.objects.filter(ancestro_id=self.pk)
+            .values_list('descendiente_id', 'profundidad')
+        )
+        ids_subarbol = [descendiente for descendiente, _ in subarbol]
+        if self.padre_id in ids_subarbol:
+            raise ValueError('Una zona no puede colgar de sí misma ni de sus subzonas.')
+        
+        # Quitar los enlaces con los ancestros anteriores
+        ZoneClosure.objects.filter(descendiente_id__in=ids_subarbol).exclude(
+            ancestro_id__in=ids_subarbol
+        ).delete()
+        
+        # Enlazar cada nodo del subárbol con cada ancestro del nuevo padre
+        ZoneClosure.objects.bulk_create([
+            ZoneClosure(
+                ancestro_id=ancestro,
+                descendiente_id=descendiente,
+                profundidad=profundidad_ancestro + profundidad + 1,
+            )
+            for ancestro, profundidad_ancestro in self._ancestros_padre()
+            for descendiente, profundidad in subarbol
+        ])
+    
+    def puertas_en_subarbol(self):
+        """Todas las puertas de la zona y sus subzonas (una consulta)"""
+        return Door.objects.filter(zona__cierre_ancestros__ancestro=self)
+    
+    def bloquear(self):
+        """Bloquea la zona; el bloqueo se hereda a todo el subárbol"""
+        Zone.objects.filter(pk=self.pk).update(bloqueada=True)
+        self.bloqueada = True
+        self._invalidar_resumenes()
+    
+    def desbloquear(self):
+        """Retira el bloqueo propio de la zona"""
+        Zone.objects.filter(pk=self.pk).update(bloqueada=False)
+        self.bloqueada = False
+        self._invalidar_resumenes()
+    
+    def _invalidar_resumenes(self):
+        """update() no dispara signals: el bloqueo heredado cambia en todo el subárbol"""
+        from .summaries import invalidar_puertas_escuelas
+        invalidar_puertas_escuelas([self.escuela_id])
+
+
+class ZoneClosure(models.Model):
+    """
+    Tabla de cierre de la jerarquía de zonas: una fila por cada par
+    (ancestro, descendiente), incluida la fila de cada zona consigo misma.
+    """
+    
+    ancestro = models.ForeignKey(
+        Zone,
+        on_delete=models.CASCADE,
+        related_name='cierre_descendientes',
+        verbose_name='Ancestro'
+    )
+    
+    descendiente = models.ForeignKey(
+        Zone,
+        on_delete=models.CASCADE,
+        related_name='cierre_ancestros',
+        verbose_name='Descendiente'
+    )
+    
+    profundidad = models.PositiveSmallIntegerField(
+        verbose_name='Profundidad'
+    )
+    
+    class Meta:
+        verbose_name = 'Cierre de Zona'
+        verbose_name_plural = 'Cierres de Zonas'
+        constraints = [
+            models.UniqueConstraint(fields=['ancestro', 'descendiente'], name='cierre_zona_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['descendiente', 'ancestro'], name='cierre_descendiente_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.ancestro_id} → {self.descendiente_id} ({self.profundidad})"
+    
+    @staticmethod
+    def evaluar_puerta(puerta, perfil):
+        """
+        Evalúa en una sola consulta sobre el cierre de la zona de la puerta:
+        - bloqueada: algún ancestro (o la propia zona) está bloqueado.
+        - permitido: ningún ancestro restringe con permisos, o alguno
+          concede acceso al perfil o a su rol.
+        """
+        if puerta.zona_id is None:
+            return False, True
+        resultado = ZoneClosure.objects.filter(descendiente_id=puerta.zona_id).aggregate(
+            bloqueos=Count('pk', filter=Q(ancestro__bloqueada=True)),
+            permisos=Count('ancestro__permisos'),
+            concedidos=Count(
+                'ancestro__permisos',
+                filter=Q(ancestro__permisos__perfil=perfil) | Q(ancestro__permisos__rol=perfil.rol),
+            ),
+        )
+        permitido = resultado['permisos'] == 0 or resultado['concedidos'] > 0
+        return resultado['bloqueos'] > 0, permitido
+
+
+class ZonePermission(models.Model):
+    """
+    Permiso de acceso a una zona y a todo su subárbol.
+    Si una puerta queda bajo alguna zona con permisos, solo pueden abrirla
+    los perfiles o roles que tengan un permiso en alguno de sus ancestros.
+    """
+    
+    zona = models.ForeignKey(
+        Zone,
+        on_delete=models.CASCADE,
+        related_name='permisos',
+        verbose_name='Zona'
+    )
+    
+    rol = models.CharField(
+        max_length=10,
+        choices=UserProfile.ROLE_CHOICES,
+        blank=True,
+        null=True,
+        verbose_name='Rol',
+        help_text='Concede acceso a todos los usuarios del rol'
+    )
+    
+    perfil = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='permisos_zona',
+        verbose_name='Perfil',
+        help_text='Concede acceso a un usuario específico'
+    )
+    
+    class Meta:
+        verbose_name = 'Permiso de Zona'
+        verbose_name_plural = 'Permisos de Zonas'
+        constraints = [
+            models.CheckConstraint(
+                check=Q(rol__isnull=False) | Q(perfil__isnull=False),
+                name='permiso_zona_rol_o_perfil',
+            ),
+        ]
+    
+    def __str__(self):
+        destinatario = self.get_rol_display() if self.rol else self.perfil
+        return f"{self.zona.nombre}: {destinatario}"
+
+
+class AccessPolicy(models.Model):
+    """
+    Regla de política: qué puede hacer un rol, de forma global o limitada
+    a una zona (y su subárbol) o a una puerta. La regla más específica
+    gana: puerta > zona más profunda > global. Sin regla, se niega.
+    Se compilan en memoria en access_control.policies.
+    """
+    
+    ACCION_CHOICES = [
+        ('ABRIR_PUERTA', 'Abrir puerta con código'),
+        ('GESTIONAR_USUARIOS', 'Ver y editar usuarios'),
+        ('CREAR_USUARIOS', 'Crear usuarios'),
+        ('ELIMINAR_USUARIOS', 'Eliminar usuarios'),
+        ('EDITAR_CODIGO', 'Editar código de acceso'),
+        ('EDITAR_PERMISOS_SISTEMA', 'Modificar permisos del sistema'),
+        ('CONTROLAR_SEGURO', 'Controlar el seguro'),
+        ('DESACTIVAR_SEGURO', 'Desactivar el seguro'),
+        ('VER_ASISTENCIA', 'Ver la asistencia de todos los grupos'),
+        ('RECIBIR_CONFINAMIENTO', 'Recibir avisos de confinamiento'),
+    ]
+    
+    rol = models.CharField(
+        max_length=10,
+        choices=UserProfile.ROLE_CHOICES,
+        verbose_name='Rol'
+    )
+    
+    accion = models.CharField(
+        max_length=30,
+        choices=ACCION_CHOICES,
+        verbose_name='Acción'
+    )
+    
+    zona = models.ForeignKey(
+        Zone,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='politicas',
+        verbose_name='Zona',
+        help_text='Limita la regla a la zona y sus subzonas'
+    )
+    
+    puerta = models.ForeignKey(
+        Door,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='politicas',
+        verbose_name='Puerta',
+        help_text='Limita la regla a una puerta'
+    )
+    
+    permitido = models.BooleanField(
+        default=True,
+        verbose_name='Permitido',
+        help_text='Desmarcar para negar explícitamente'
+    )
+    
+    fecha_modificacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Fecha de Modificación'
+    )
+    
+    class Meta:
+        verbose_name = 'Política de Acceso'
+        verbose_name_plural = 'Políticas de Acceso'
+        ordering = ['accion', 'rol']
+        constraints = [
+            models.CheckConstraint(
+                check=Q(zona__isnull=True) | Q(puerta__isnull=True),
+                name='politica_zona_o_puerta',
+            ),
+        ]
+    
+    def clean(self):
+        """Una sola regla por rol, acción y alcance"""
+        if self.zona_id and self.puerta_id:
+            raise ValidationError('La regla se limita a una zona o a una puerta, no a ambas.')
+        duplicada = AccessPolicy.objects.filter(
+            rol=self.rol, accion=self.accion, zona=self.zona_id, puerta=self.puerta_id
+        ).exclude(pk=self.pk)
+        if duplicada.exists():
+            raise ValidationError('Ya existe una regla para este rol, acción y alcance.')
+    
+    def __str__(self):
+        alcance = self.puerta or self.zona or 'Global'
+        efecto = 'permite' if self.permitido else 'niega'
+        return f"{self.get_rol_display()} {efecto} {self.get_accion_display()} ({alcance})"
+
+
+def generar_clave_dispositivo():
+    """Genera la clave secreta compartida para firmar peticiones HMAC"""
+    return secrets.token_hex(32)
+
+
+class IoTDevice(models.Model):
+    """
+    Controlador IoT (ESP32) asignado a una puerta.
+    Cada dispositivo firma sus peticiones con su clave secreta (HMAC-SHA256).
+    """
+    
+    identificador = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='Identificador',
+        help_text='Identificador único del controlador (por ejemplo, MAC del ESP32)'
+    )
+    
+    nombre = models.CharField(
+        max_length=100,
+        verbose_name='Nombre'
+    )
+    
+    puerta = models.ForeignKey(
+        Door,
+        on_delete=models.CASCADE,
+        related_name='dispositivos',
+        verbose_name='Puerta Asignada'
+    )
+    
+    clave_secreta = models.CharField(
+        max_length=64,
+        default=generar_clave_dispositivo,
+        verbose_name='Clave Secreta',
+        help_text='Clave compartida para la firma HMAC de las peticiones'
+    )
+    
+    activo = models.BooleanField(
+        default=True,
+        verbose_name='Activo',
+        help_text='El dispositivo puede comunicarse con el servidor'
+    )
+    
+    ultimo_heartbeat = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Último Heartbeat'
+    )
+    
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de Creación'
+    )
+    
+    class Meta:
+        verbose_name = 'Dispositivo IoT'
+        verbose_name_plural = 'Dispositivos IoT'
+        ordering = ['identificador']
+    
+    def __str__(self):
+        return f"{self.nombre} ({self.identificador})"
+
+
+class RevokedToken(models.Model):
+    """
+    Token JWT revocado (logout o rotación), identificado por su JTI.
+    Fila compacta; se elimina sola cuando el token habría expirado.
+    La consulta en cada petición se hace contra la copia en memoria
+    de access_control/revocation.py, no contra esta tabla.
+    """
+    
+    jti = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='JTI'
+    )
+    
+    expira = models.DateTimeField(
+        db_index=True,
+        verbose_name='Expira',
+        help_text='Fin de vigencia del token; después ya no hace falta recordarlo'
+    )
+    
+    fecha_revocacion = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name='Fecha de Revocación'
+    )
+    
+    class Meta:
+        verbose_name = 'Token Revocado'
+        verbose_name_plural = 'Tokens Revocados'
+        ordering = ['-fecha_revocacion']
+    
+    def __str__(self):
+        return f"{self.jti} (expira {self.expira:%Y-%m-%d %H:%M})"
+
+
+class AccessCodeSequence(models.Model):
+    """
+    Contador de posiciones de códigos de acceso ya reservadas (una sola
+    fila). Cada worker reserva bloques de posiciones incrementándolo en
+    una transacción; access_control/codes.py convierte cada posición en
+    un código numérico con una permutación secreta.
+    """
+    
+    siguiente = models.BigIntegerField(
+        default=0,
+        verbose_name='Siguiente posición',
+        help_text='Primera posición que aún no se ha reservado'
+    )
+    
+    fecha_modificacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Fecha de Modificación'
+    )
+    
+    class Meta:
+        verbose_name = 'Secuencia de Códigos'
+        verbose_name_plural = 'Secuencia de Códigos'
+    
+    def __str__(self):
+        return f"Siguiente posición: {self.siguiente}"
+
+
+class ClassGroup(models.Model):
+    """
+    Grupo de una materia en un periodo: su maestro, sus alumnos y sus
+    horarios (ClassSchedule). La asistencia se calcula en audit.attendance
+    a partir de las entradas de los alumnos a la puerta de cada horario.
+    """
+    
+    escuela = models.ForeignKey(
+        School,
+        on_delete=models.PROTECT,
+        default=escuela_predeterminada,
+        related_name='grupos',
+        verbose_name='Escuela'
+    )
+    
+    nombre = models.CharField(
+        max_length=100,
+        verbose_name='Nombre',
+        help_text='Ej: "Programación I - Grupo A"'
+    )
+    
+    periodo = models.CharField(
+        max_length=20,
+        verbose_name='Periodo',
+        help_text='Ej: "2025-2"'
+    )
+    
+    maestro = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='grupos_impartidos',
+        verbose_name='Maestro'
+    )
+    
+    alumnos = models.ManyToManyField(
+        User,
+        blank=True,
+        related_name='grupos',
+        verbose_name='Alumnos'
+    )
+    
+    fecha_inicio = models.DateField(
+        verbose_name='Inicio de Clases'
+    )
+    
+    fecha_fin = models.DateField(
+        verbose_name='Fin de Clases'
+    )
+    
+    activo = models.BooleanField(
+        default=True,
+        verbose_name='Activo'
+    )
+    
+    class Meta:
+        verbose_name = 'Grupo'
+        verbose_name_plural = 'Grupos'
+        ordering = ['periodo', 'nombre']
+        constraints = [
+            models.UniqueConstraint(fields=['escuela', 'nombre', 'periodo'], name='grupo_nombre_periodo_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.nombre} ({self.periodo})"
+    
+    def clean(self):
+        if self.fecha_inicio and self.fecha_fin and self.fecha_fin < self.fecha_inicio:
+            raise ValidationError('El fin de clases debe ser posterior al inicio.')
+
+
+class ClassSchedule(models.Model):
+    """
+    Sesión semanal de un grupo: día, horario y la puerta del salón o
+    laboratorio donde se imparte.
+    """
+    
+    DIA_CHOICES = [
+        (0, 'Lunes'),
+        (1, 'Martes'),
+        (2, 'Miércoles'),
+        (3, 'Jueves'),
+        (4, 'Viernes'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+    
+    grupo = models.ForeignKey(
+        ClassGroup,
+        on_delete=models.CASCADE,
+        related_name='horarios',
+        verbose_name='Grupo'
+    )
+    
+    puerta = models.ForeignKey(
+        Door,
+        on_delete=models.CASCADE,
+        related_name='horarios',
+        verbose_name='Puerta',
+        help_text='Entrada al salón o laboratorio'
+    )
+    
+    dia_semana = models.PositiveSmallIntegerField(
+        choices=DIA_CHOICES,
+        verbose_name='Día'
+    )
+    
+    hora_inicio = models.TimeField(
+        verbose_name='Hora de Inicio'
+    )
+    
+    hora_fin = models.TimeField(
+        verbose_name='Hora de Fin'
+    )
+    
+    class Meta:
+        verbose_name = 'Horario'
+        verbose_name_plural = 'Horarios'
+        ordering = ['grupo', 'dia_semana', 'hora_inicio']
+    
+    def __str__(self):
+        return f"{self.grupo.nombre}: {self.get_dia_semana_display()} {self.hora_inicio:%H:%M}-{self.hora_fin:%H:%M}"
+    
+    def clean(self):
+        if self.hora_inicio and self.hora_fin and self.hora_fin <= self.hora_inicio:
+            raise ValidationError('La hora de fin debe ser posterior a la de inicio.')
+
+
+class Lockdown(models.Model):
+    """
+    Confinamiento de emergencia: activa el seguro de todas las puertas de
+    una escuela (o de todas las escuelas) a la vez (ver
+    access_control/lockdown.py). Cada confinamiento es un solo registro de
+    auditoría, con las puertas que bloqueó para liberarlas al levantarlo.
+    """
+    
+    escuela = models.ForeignKey(
+        School,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='confinamientos',
+        verbose_name='Escuela',
+        help_text='Vacío: todas las escuelas del despliegue'
+    )
+    
+    motivo = models.CharField(
+        max_length=255,
+        verbose_name='Motivo'
+    )
+    
+    iniciado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='confinamientos_iniciados',
+        verbose_name='Iniciado por'
+    )
+    
+    fecha_inicio = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name='Inicio'
+    )
+    
+    total_puertas = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Puertas',
+        help_text='Puertas con el seguro activo al terminar el confinamiento'
+    )
+    
+    puertas_bloqueadas = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='Puertas bloqueadas',
+        help_text='IDs de las puertas cuyo seguro activó el confinamiento'
+    )
+    
+    duracion_ms = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Duración (ms)',
+        help_text='Tiempo hasta tener todas las puertas con seguro'
+    )
+    
+    levantado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='confinamientos_levantados',
+        verbose_name='Levantado por'
+    )
+    
+    fecha_fin = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Fin'
+    )
+    
+    class Meta:
+        verbose_name = 'Confinamiento'
+        verbose_name_plural = 'Confinamientos'
+        ordering = ['-fecha_inicio']
+        indexes = [
+            # Confinamiento en curso de una escuela: fecha_fin IS NULL
+            models.Index(fields=['escuela', 'fecha_fin'], name='confinamiento_escuela_idx'),
+        ]
+    
+    def __str__(self):
+        estado = 'activo' if self.activo else f'levantado {self.fecha_fin:%Y-%m-%d %H:%M}'
+        return f"Confinamiento {self.fecha_inicio:%Y-%m-%d %H:%M} ({estado})"
+    
+    @property
+    def activo(self):
+        return self.fecha_fin is None
+
+
+class GuestCode(models.Model):
+    """
+    Código temporal para visitantes y maestros suplentes: abre solo las
+    puertas indicadas, entre valido_desde y expira, y opcionalmente un
+    número limitado de veces. Como en los perfiles, solo se guarda el
+    digest; la verificación en memoria está en access_control/guests.py.
+    """
+    
+    escuela = models.ForeignKey(
+        School,
+        on_delete=models.PROTECT,
+        default=escuela_predeterminada,
+        related_name='codigos_invitado',
+        verbose_name='Escuela'
+    )
+    
+    nombre = models.CharField(
+        max_length=150,
+        verbose_name='Invitado',
+        help_text='Nombre del visitante o suplente'
+    )
+    
+    motivo = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Motivo'
+    )
+    
+    codigo_hash = models.CharField(
+        max_length=64,
+        editable=False,
+        verbose_name='Código (HMAC)',
+        help_text='Digest HMAC-SHA256 del código; el código solo se muestra al crearlo'
+    )
+    
+    puertas = models.ManyToManyField(
+        Door,
+        related_name='codigos_invitado',
+        verbose_name='Puertas'
+    )
+    
+    valido_desde = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Válido desde'
+    )
+    
+    expira = models.DateTimeField(
+        verbose_name='Expira'
+    )
+    
+    usos_maximos = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Usos máximos',
+        help_text='Vacío = sin límite mientras esté vigente'
+    )
+    
+    usos = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Usos'
+    )
+    
+    activo = models.BooleanField(
+        default=True,
+        verbose_name='Activo',
+        help_text='Desactivar revoca el código antes de que expire'
+    )
+    
+    creado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='codigos_invitado_creados',
+        verbose_name='Creado por'
+    )
+    
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de Creación'
+    )
+    
+    class Meta:
+        verbose_name = 'Código de Invitado'
+        verbose_name_plural = 'Códigos de Invitado'
+        ordering = ['-fecha_creacion']
+        constraints = [
+            models.UniqueConstraint(fields=['escuela', 'codigo_hash'], name='invitado_codigo_unico_por_escuela'),
+        ]
+        indexes = [
+            # Carga de los códigos vigentes de una escuela: activo=True AND expira > ahora
+            models.Index(fields=['escuela', 'activo', 'expira'], name='invitado_vigencia_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.nombre} (hasta {timezone.localtime(self.expira):%Y-%m-%d %H:%M})"
+    
+    def clean(self):
+        if self.valido_desde and self.expira and self.expira <= self.valido_desde:
+            raise ValidationError('La expiración debe ser posterior al inicio de validez.')
+    
+    def establecer_codigo(self, codigo):
+        self.codigo_hash = hash_codigo(codigo)
+    
+    @property
+    def vigente(self):
+        ahora = timezone.now()
+        agotado = self.usos_maximos is not None and self.usos >= self.usos_maximos
+        return self.activo and not agotado and self.valido_desde <= ahora < self.expira
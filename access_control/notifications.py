@@ -0,0 +1,296 @@
+"""
+Avisos por SMS/push a los teléfonos de los perfiles (UserProfile.telefono).
+
+Eventos: intentos negados por seguro activo, aperturas forzadas y el
+inicio y fin de un confinamiento. Durante un incidente llegan decenas
+por minuto, así que no se hace una llamada al proveedor por evento:
+
+- avisar_*() solo encola el evento (al confirmar la transacción) y
+  regresa: la petición que lo disparó no consulta destinatarios ni
+  espera al proveedor.
+- Un hilo por proceso toma los eventos, resuelve los destinatarios y
+  agrupa por teléfono: el primer evento abre una ventana de WINDOW
+  segundos y lo que llega a ese teléfono en la ventana sale en un solo
+  mensaje (los eventos repetidos se cuentan, no se repiten).
+- Los mensajes se envían en paralelo (CONCURRENCY hilos) por el
+  proveedor configurado en PROVIDER. Un fallo se reintenta hasta RETRIES
+  veces con espera exponencial; lo que llegue mientras tanto se suma al
+  reintento.
+- Cada teléfono recibe a lo más RATE_LIMIT mensajes por RATE_PERIOD
+  segundos; lo que exceda se acumula para el siguiente mensaje permitido.
+
+Los intentos cargados en lote por un controlador que estuvo sin
+conexión no generan avisos: ya ocurrieron. La cola vive en la memoria
+del worker: lo pendiente se envía al terminar el proceso, pero un
+cierre abrupto lo pierde (los hechos siguen en el registro de intentos,
+las alertas y los confinamientos).
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import UserProfile
+from .policies import motores
+from .tenancy import escuelas_ids
+
+
+logger = logging.getLogger(__name__)
+
+# destinatarios: ('puerta', puerta_id, escuela_id) → quienes controlan su seguro;
+# ('escuela', escuela_id o None) → quienes tienen la política RECIBIR_CONFINAMIENTO
+# en la escuela (o en todas)
+Evento = namedtuple('Evento', ['texto', 'destinatarios'])
+Reintento = namedtuple('Reintento', ['telefono', 'textos', 'intentos'])
+ALTO = object()
+
+
+class ErrorEnvio(Exception):
+    """Fallo del proveedor al enviar un mensaje; se reintenta"""
+
+
+class Proveedor:
+    """
+    Interfaz de los proveedores de SMS/push: enviar() entrega un mensaje
+    o lanza ErrorEnvio. Se llama desde varios hilos a la vez.
+    """
+
+    def enviar(self, telefono, texto):
+        raise NotImplementedError
+
+
+class ProveedorLocal(Proveedor):
+    """Proveedor de desarrollo y pruebas: guarda los mensajes en memoria y los escribe en el log"""
+
+    def __init__(self):
+        self.enviados = []
+        self._lock = threading.Lock()
+
+    def enviar(self, telefono, texto):
+        with self._lock:
+            self.enviados.append((telefono, texto))
+        logger.info('Aviso a %s: %s', telefono, texto)
+
+
+class Grupo:
+    """Eventos pendientes de un teléfono: {texto: repeticiones} y cuándo salen"""
+
+    def __init__(self, vence, intentos=0):
+        self.textos = {}
+        self.vence = vence
+        self.intentos = intentos
+
+    def agregar(self, texto, veces=1):
+        self.textos[texto] = self.textos.get(texto, 0) + veces
+
+
+def componer(textos):
+    """Un solo mensaje con los eventos agrupados, dentro de MAX_LENGTH"""
+    maximo = settings.NOTIFICATIONS['MAX_LENGTH']
+    lineas = [texto if veces == 1 else f'{texto} (x{veces})' for texto, veces in textos.items()]
+    if len(lineas) == 1:
+        return lineas[0][:maximo]
+    mensaje = f'{len(lineas)} avisos:'
+    for i, linea in enumerate(lineas):
+        resto = f' … y {len(lineas) - i} más'
+        if len(mensaje) + len(linea) + 3 + len(resto) > maximo and i < len(lineas) - 1:
+            return mensaje + resto
+        mensaje += f' | {linea}' if i else f' {linea}'
+    return mensaje[:maximo]
+
+
+class ColaNotificaciones:
+    """Agrupa por teléfono, limita la frecuencia y envía en paralelo"""
+
+    def __init__(self):
+        self._entrada = queue.SimpleQueue()
+        self._grupos = {}                       # teléfono → Grupo pendiente
+        self._enviados = defaultdict(deque)     # teléfono → instantes de los últimos envíos
+        self._hilo = None
+        self._ejecutor = None
+        self._proveedor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def proveedor(self):
+        if self._proveedor is None:
+            self._proveedor = import_string(settings.NOTIFICATIONS['PROVIDER'])()
+        return self._proveedor
+
+    def encolar(self, evento):
+        """Recibe un evento sin esperar a nada (se procesa en el hilo de la cola)"""
+        self._arrancar()
+        self._entrada.put(evento)
+
+    def _arrancar(self):
+        # Tras un fork (workers con preload) el hilo del padre no existe en el hijo
+        if self._pid == os.getpid() and self._hilo is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._hilo is not None:
+                return
+            self._entrada = queue.SimpleQueue()
+            self._grupos = {}
+            self._enviados = defaultdict(deque)
+            self._ejecutor = ThreadPoolExecutor(
+                max_workers=settings.NOTIFICATIONS['CONCURRENCY'], thread_name_prefix='avisos-envio'
+            )
+            self._hilo = threading.Thread(target=self._ciclo, name='avisos', daemon=True)
+            self._pid = os.getpid()
+            self._hilo.start()
+
+    # --- Hilo de la cola --------------------------------------------------
+
+    def _ciclo(self):
+        while True:
+            espera = None
+            if self._grupos:
+                espera = max(0.0, min(grupo.vence for grupo in self._grupos.values()) - time.monotonic())
+            try:
+                elemento = self._entrada.get(timeout=espera)
+            except queue.Empty:
+                elemento = None
+            if elemento is ALTO:
+                self._despachar(todo=True)
+                return
+            try:
+                if isinstance(elemento, Evento):
+                    self._agrupar(elemento)
+                elif isinstance(elemento, Reintento):
+                    self._reagrupar(elemento)
+                self._despachar()
+            except Exception:
+                logger.exception('Error en la cola de avisos')
+
+    def _agrupar(self, evento):
+        ventana = time.monotonic() + settings.NOTIFICATIONS['WINDOW']
+        for telefono in self._telefonos(evento.destinatarios):
+            grupo = self._grupos.get(telefono)
+            if grupo is None:
+                grupo = self._grupos[telefono] = Grupo(ventana)
+            grupo.agregar(evento.texto)
+
+    def _reagrupar(self, reintento):
+        config = settings.NOTIFICATIONS
+        vence = time.monotonic() + config['RETRY_DELAY'] * 2 ** (reintento.intentos - 1)
+        grupo = self._grupos.get(reintento.telefono)
+        if grupo is None:
+            grupo = self._grupos[reintento.telefono] = Grupo(vence)
+        grupo.vence = max(grupo.vence, vence)
+        grupo.intentos = max(grupo.intentos, reintento.intentos)
+        for texto, veces in reintento.textos.items():
+            grupo.agregar(texto, veces)
+
+    def _despachar(self, todo=False):
+        """Envía los grupos cuya ventana terminó (todos al detener la cola)"""
+        config = settings.NOTIFICATIONS
+        ahora = time.monotonic()
+        for telefono, grupo in list(self._grupos.items()):
+            if grupo.vence > ahora and not todo:
+                continue
+            recientes = self._enviados[telefono]
+            while recientes and recientes[0] <= ahora - config['RATE_PERIOD']:
+                recientes.popleft()
+            if len(recientes) >= config['RATE_LIMIT'] and not todo:
+                # Se acumula hasta que salga del periodo el envío más antiguo
+                grupo.vence = recientes[0] + config['RATE_PERIOD']
+                continue
+            recientes.append(ahora)
+            del self._grupos[telefono]
+            if todo:
+                # Al salir del intérprete el ejecutor ya no acepta tareas; sin reintentos
+                self._enviar(telefono, grupo.textos, config['RETRIES'])
+            else:
+                self._ejecutor.submit(self._enviar, telefono, grupo.textos, grupo.intentos)
+        for telefono in [telefono for telefono, recientes in self._enviados.items() if not recientes]:
+            del self._enviados[telefono]
+
+    def _enviar(self, telefono, textos, intentos):
+        try:
+            self.proveedor.enviar(telefono, componer(textos))
+        except Exception:
+            if intentos < settings.NOTIFICATIONS['RETRIES']:
+                logger.warning('Falló el aviso a %s; se reintenta', telefono, exc_info=True)
+                self._entrada.put(Reintento(telefono, textos, intentos + 1))
+            else:
+                logger.exception('Se descartó el aviso a %s tras %d intentos', telefono, intentos + 1)
+
+    def _telefonos(self, destinatarios):
+        close_old_connections()
+        perfiles = UserProfile.objects.filter(activo=True).exclude(telefono__isnull=True).exclude(telefono='')
+        if destinatarios[0] == 'puerta':
+            _, puerta_id, escuela_id = destinatarios
+            ids = motores(escuela_id).quien_puede(puerta_id, 'CONTROLAR_SEGURO')
+            perfiles = perfiles.filter(pk__in=ids.tolist(), escuela_id=escuela_id)
+        else:
+            _, escuela_id = destinatarios
+            ids = []
+            for escuela in escuelas_ids() if escuela_id is None else [escuela_id]:
+                ids.extend(motores(escuela).quien_puede(None, 'RECIBIR_CONFINAMIENTO').tolist())
+            perfiles = perfiles.filter(pk__in=ids)
+        return set(perfiles.values_list('telefono', flat=True))
+
+    def detener(self, espera=10):
+        """Envía lo pendiente sin esperar su ventana y termina el hilo"""
+        if self._hilo is None or self._pid != os.getpid():
+            return
+        self._entrada.put(ALTO)
+        self._hilo.join(espera)
+        self._ejecutor.shutdown(wait=True)
+        self._hilo = None
+
+
+cola = ColaNotificaciones()
+
+
+@atexit.register
+def _enviar_al_salir():
+    cola.detener()
+
+
+def _encolar(texto, destinatarios):
+    if not settings.NOTIFICATIONS['ENABLED']:
+        return
+    evento = Evento(texto, destinatarios)
+    transaction.on_commit(lambda: cola.encolar(evento))
+
+
+def _hora(momento=None):
+    return f'{timezone.localtime(momento):%H:%M}'
+
+
+def avisar_seguro(puerta, intento, perfil=None):
+    """Intento negado por seguro activo: a quienes controlan el seguro de la puerta"""
+    quien = (perfil.user.get_full_name() or perfil.user.username) if perfil else 'código desconocido'
+    _encolar(
+        f'{_hora(intento.fecha_hora)} {puerta.nombre}: acceso negado a {quien} (seguro activo)',
+        ('puerta', puerta.pk, puerta.escuela_id),
+    )
+
+
+def avisar_apertura_forzada(puerta, momento=None):
+    """Puerta abierta sin acceso concedido: a quienes controlan su seguro"""
+    _encolar(
+        f'{_hora(momento)} {puerta.nombre}: apertura forzada',
+        ('puerta', puerta.pk, puerta.escuela_id),
+    )
+
+
+def avisar_confinamiento(confinamiento, iniciado=True):
+    """Inicio o fin de un confinamiento: a quienes lo reciben por política en la escuela (o en todas)"""
+    alcance = confinamiento.escuela.nombre if confinamiento.escuela_id else 'todas las escuelas'
+    if iniciado:
+        texto = f'{_hora(confinamiento.fecha_inicio)} CONFINAMIENTO en {alcance}: {confinamiento.motivo}'
+    else:
+        texto = f'{_hora(confinamiento.fecha_fin)} Fin del confinamiento en {alcance}'
+    _encolar(texto[:200], ('escuela', confinamiento.escuela_id))
@@ -0,0 +1,129 @@
+"""
+Paginación del admin sin COUNT(*) exacto en tablas grandes.
+
+PaginadorAproximado toma el número de filas de las estadísticas de la
+tabla (MySQL: information_schema, PostgreSQL: pg_class, SQLite:
+sqlite_stat1 tras ANALYZE) cuando el listado no tiene filtros y la tabla
+pasa de ADMIN_COUNT_THRESHOLD filas. Con filtros (entre ellos el de la
+escuela, que el personal de una escuela siempre tiene), primero cuenta
+a lo más ADMIN_COUNT_THRESHOLD filas; si llega al umbral, usa la
+estimación de filas del planificador (EXPLAIN en MySQL y PostgreSQL) y,
+sin ella (SQLite), el conteo queda acotado al umbral. Los modelos
+grandes se registran heredando TablaGrandeAdmin.
+"""
+import json
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+CONSULTAS_ESTADISTICAS = {
+    'mysql': (
+        'SELECT TABLE_ROWS FROM information_schema.TABLES '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s'
+    ),
+    'postgresql': 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+    'sqlite': 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+}
+
+
+def filas_estimadas(modelo, alias='default'):
+    """
+    Número de filas según las estadísticas del motor, o None si no hay
+    estadísticas disponibles (tabla nunca analizada o motor sin soporte).
+    """
+    conexion = connections[alias]
+    consulta = CONSULTAS_ESTADISTICAS.get(conexion.vendor)
+    if consulta is None:
+        return None
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute(consulta, [modelo._meta.db_table])
+            fila = cursor.fetchone()
+    except Exception:
+        # sqlite_stat1 no existe hasta el primer ANALYZE
+        return None
+    if not fila or fila[0] is None:
+        return None
+    # SQLite guarda "filas filas_por_clave ..." como texto
+    estimado = int(str(fila[0]).split()[0])
+    return estimado if estimado >= 0 else None
+
+
+def filas_filtradas_estimadas(queryset):
+    """
+    Filas que el planificador espera para la consulta del queryset, o
+    None si el motor no da estimaciones (SQLite) o el EXPLAIN falla.
+    """
+    conexion = connections[queryset.db]
+    if conexion.vendor not in ('mysql', 'postgresql'):
+        return None
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+        with conexion.cursor() as cursor:
+            if conexion.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]['Plan']['Plan Rows'])
+            cursor.execute(f'EXPLAIN {sql}', params)
+            columnas = [columna[0] for columna in cursor.description]
+            filas = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+    except Exception:
+        return None
+    # MySQL: una fila por tabla del plan; el join multiplica rows × filtered
+    estimado = 1.0
+    for fila in filas:
+        if fila.get('rows') is None:
+            continue
+        estimado *= fila['rows'] * float(fila.get('filtered') or 100) / 100
+    return int(estimado) if filas else None
+
+
+class PaginadorAproximado(Paginator):
+    """
+    Paginator con conteo aproximado por encima del umbral.
+    `aproximado` indica si count proviene de estadísticas o está acotado.
+    """
+
+    aproximado = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        umbral = settings.ADMIN_COUNT_THRESHOLD
+
+        if not queryset.query.where:
+            estimado = filas_estimadas(queryset.model, queryset.db)
+            if estimado is not None and estimado >= umbral:
+                self.aproximado = True
+                return estimado
+            return super().count
+
+        # Con filtros: COUNT sobre a lo más `umbral` filas; si se llega al
+        # umbral, la estimación del planificador (nunca menor al umbral)
+        acotado = queryset.order_by()[:umbral].count()
+        if acotado < umbral:
+            return acotado
+        self.aproximado = True
+        estimado = filas_filtradas_estimadas(queryset)
+        return max(estimado, umbral) if estimado is not None else acotado
+
+
+class TablaGrandeAdmin(admin.ModelAdmin):
+    """
+    Base para el admin de modelos con millones de filas: paginador
+    aproximado, sin el conteo total adicional ni conteos por filtro. No
+    deben usar date_hierarchy: sus enlaces por fecha salen de un SELECT
+    DISTINCT sobre todas las filas del listado.
+    """
+    paginator = PaginadorAproximado
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
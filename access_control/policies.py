@@ -0,0 +1,347 @@
+"""
+Motor de políticas de acceso.
+
+Las reglas AccessPolicy (rol × acción × global/zona/puerta) y los
+permisos de zona (ZonePermission) se compilan en una tabla de decisión
+en memoria con arreglos de NumPy:
+
+- Consultas individuales (¿puede este perfil hacer X en esta puerta?) en O(1).
+- Consultas masivas (¿qué puertas de esta lista puede abrir?, ¿quién puede
+  abrir esta puerta?) evaluadas de forma vectorizada, sin ciclos por fila.
+
+La tabla se invalida por signals al cambiar reglas, zonas o puertas; los
+demás workers la descartan al ver un nuevo número de versión en la caché.
+
+Cada escuela tiene su propio motor (tabla, arreglos de usuarios y
+versiones): un cambio en una escuela solo recompila la suya. Las reglas
+sin zona ni puerta son comunes a todas las escuelas y su cambio sube
+una versión general que revisan todos los motores.
+"""
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import UserProfile, Door, ZoneClosure, ZonePermission, AccessPolicy
+from .tenancy import PorEscuela, incrementar_version
+
+
+ROLES = [rol for rol, _ in UserProfile.ROLE_CHOICES]
+ACCIONES = [accion for accion, _ in AccessPolicy.ACCION_CHOICES]
+INDICE_ROL = {rol: i for i, rol in enumerate(ROLES)}
+INDICE_ACCION = {accion: i for i, accion in enumerate(ACCIONES)}
+ABRIR = INDICE_ACCION['ABRIR_PUERTA']
+
+CLAVE_VERSION_GENERAL = 'politicas:version_general'
+
+
+class TablaDecision:
+    """
+    Resultado compilado de las políticas.
+    - globales[accion, rol]: decisión sin puerta.
+    - matriz[accion, rol, puerta]: decisión por puerta (regla más específica).
+    - abrir_rol[rol, puerta]: ABRIR_PUERTA ya combinado con los permisos de zona por rol.
+    - concesiones[fila, puerta]: permisos de zona individuales (una fila por perfil).
+    """
+
+    def __init__(self, puertas_ids, puertas_zonas, globales, matriz, abrir_rol,
+                 concesiones_ids, concesiones):
+        self.puertas_ids = puertas_ids
+        self.puertas_zonas = puertas_zonas
+        self.columnas = {int(pk): i for i, pk in enumerate(puertas_ids)}
+        self.globales = globales
+        self.matriz = matriz
+        self.abrir_rol = abrir_rol
+        self.concesiones_ids = concesiones_ids
+        self.concesiones = concesiones
+        self.filas_concesion = {int(pk): i for i, pk in enumerate(concesiones_ids)}
+
+    def fila_puertas(self, accion, rol, perfil_id=None):
+        """Vector booleano de decisión sobre todas las puertas"""
+        if accion != ABRIR:
+            return self.matriz[accion, rol]
+        fila = self.abrir_rol[rol]
+        indice = self.filas_concesion.get(perfil_id)
+        if indice is not None:
+            fila = fila | (self.matriz[ABRIR, rol] & self.concesiones[indice])
+        return fila
+
+    def columnas_de(self, puertas_ids):
+        """Convierte ids de puerta en columnas; -1 si la puerta no está compilada"""
+        ids = np.asarray(puertas_ids, dtype=np.int64)
+        if len(self.puertas_ids) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        columnas = np.minimum(np.searchsorted(self.puertas_ids, ids), len(self.puertas_ids) - 1)
+        return np.where(self.puertas_ids[columnas] == ids, columnas, -1)
+
+
+def reglas_escuela(escuela_id):
+    """Reglas que aplican en la escuela: las comunes y las de sus zonas o puertas"""
+    return AccessPolicy.objects.filter(
+        Q(zona__isnull=True, puerta__isnull=True) | Q(zona__escuela_id=escuela_id) | Q(puerta__escuela_id=escuela_id)
+    )
+
+
+def compilar_tabla(escuela_id, reglas=None, permisos=None):
+    """
+    Compila reglas, puertas y permisos de zona de una escuela en una
+    TablaDecision. `reglas` (rol, acción, zona, puerta, permitido, pk) y
+    `permisos` (zona, rol, perfil) sustituyen a los de la BD al simular
+    cambios.
+    """
+    puertas = list(Door.objects.filter(escuela_id=escuela_id).order_by('pk').values_list('pk', 'zona_id'))
+    puertas_ids = np.array([pk for pk, _ in puertas], dtype=np.int64)
+    puertas_zonas = np.array([zona or -1 for _, zona in puertas], dtype=np.int64)
+    n_acciones, n_roles, n_puertas = len(ACCIONES), len(ROLES), len(puertas)
+    columnas = {int(pk): i for i, pk in enumerate(puertas_ids)}
+
+    # Subárbol y nivel de cada zona, a partir de la tabla de cierre
+    subarbol = defaultdict(list)
+    nivel = {}
+    for ancestro, descendiente, profundidad in ZoneClosure.objects.filter(
+        ancestro__escuela_id=escuela_id
+    ).values_list('ancestro_id', 'descendiente_id', 'profundidad'):
+        subarbol[ancestro].append(descendiente)
+        nivel[descendiente] = max(nivel.get(descendiente, 0), profundidad)
+
+    def mascara_zona(zona_id):
+        return np.isin(puertas_zonas, subarbol.get(zona_id, [zona_id]))
+
+    globales = np.zeros((n_acciones, n_roles), dtype=bool)
+    matriz = np.zeros((n_acciones, n_roles, n_puertas), dtype=bool)
+
+    # Se aplican de menos a más específica para que la última gane
+    def especificidad(regla):
+        _, _, zona_id, puerta_id, _, pk = regla
+        if puerta_id is not None:
+            return (2, 0, pk)
+        if zona_id is not None:
+            return (1, nivel.get(zona_id, 0), pk)
+        return (0, 0, pk)
+
+    if reglas is None:
+        reglas = reglas_escuela(escuela_id).values_list(
+            'rol', 'accion', 'zona_id', 'puerta_id', 'permitido', 'pk'
+        )
+    for rol, accion, zona_id, puerta_id, permitido, _ in sorted(reglas, key=especificidad):
+        if rol not in INDICE_ROL or accion not in INDICE_ACCION:
+            continue
+        a, r = INDICE_ACCION[accion], INDICE_ROL[rol]
+        if puerta_id is not None:
+            if puerta_id in columnas:
+                matriz[a, r, columnas[puerta_id]] = permitido
+        elif zona_id is not None:
+            matriz[a, r, mascara_zona(zona_id)] = permitido
+        else:
+            globales[a, r] = permitido
+            matriz[a, r, :] = permitido
+
+    # Permisos de zona: restringen ABRIR_PUERTA a sus concesionarios
+    restringidas = np.zeros(n_puertas, dtype=bool)
+    concesiones_rol = np.zeros((n_roles, n_puertas), dtype=bool)
+    concesiones_perfil = defaultdict(lambda: np.zeros(n_puertas, dtype=bool))
+    if permisos is None:
+        permisos = ZonePermission.objects.filter(zona__escuela_id=escuela_id).values_list(
+            'zona_id', 'rol', 'perfil_id'
+        )
+    for zona_id, rol, perfil_id in permisos:
+        mascara = mascara_zona(zona_id)
+        restringidas |= mascara
+        if rol in INDICE_ROL:
+            concesiones_rol[INDICE_ROL[rol]] |= mascara
+        if perfil_id is not None:
+            concesiones_perfil[perfil_id] |= mascara
+
+    abrir_rol = matriz[ABRIR] & (~restringidas | concesiones_rol)
+    concesiones_ids = np.array(sorted(concesiones_perfil), dtype=np.int64)
+    concesiones = (
+        np.vstack([concesiones_perfil[pk] for pk in concesiones_ids])
+        if len(concesiones_ids) else np.zeros((0, n_puertas), dtype=bool)
+    )
+
+    return TablaDecision(
+        puertas_ids, puertas_zonas, globales, matriz, abrir_rol,
+        concesiones_ids, concesiones,
+    )
+
+
+def cargar_usuarios(escuela_id):
+    """Arreglos (ids, índice de rol, activo) de los perfiles de la escuela"""
+    filas = list(
+        UserProfile.objects.filter(escuela_id=escuela_id).order_by('pk').values_list('pk', 'rol', 'activo')
+    )
+    ids = np.array([pk for pk, _, _ in filas], dtype=np.int64)
+    roles = np.array([INDICE_ROL.get(rol, 0) for _, rol, _ in filas], dtype=np.int64)
+    activos = np.array([activo for _, _, activo in filas], dtype=bool)
+    return ids, roles, activos
+
+
+class MotorPoliticas:
+    """
+    Motor de una escuela. Mantiene la tabla compilada y los arreglos de
+    usuarios, y los reconstruye de forma perezosa.
+    """
+
+    def __init__(self, escuela_id):
+        self.escuela_id = escuela_id
+        self._clave_tabla = f'politicas:{escuela_id}:version_tabla'
+        self._clave_usuarios = f'politicas:{escuela_id}:version_usuarios'
+        self._tabla = None
+        self._usuarios = None
+        self._version_tabla = None
+        self._version_usuarios = None
+        self._version_general = None
+        self._ultima_revision = 0.0
+        self._lock = threading.Lock()
+
+    # --- Invalidación -----------------------------------------------------
+
+    def invalidar(self):
+        """Descarta la tabla (reglas, zonas, puertas o permisos cambiaron)"""
+        self._version_tabla = incrementar_version(self._clave_tabla)
+        self._tabla = None
+
+    def invalidar_usuarios(self):
+        """Descarta los arreglos de usuarios (altas, roles o estado cambiaron)"""
+        self._version_usuarios = incrementar_version(self._clave_usuarios)
+        self._usuarios = None
+
+    def _descartar_general(self, version):
+        self._version_general = version
+        self._tabla = None
+
+    def _sincronizar(self):
+        """Revisa, como mucho cada POLICY_SYNC_INTERVAL, si otro worker invalidó"""
+        ahora = time.monotonic()
+        if ahora - self._ultima_revision < settings.POLICY_SYNC_INTERVAL:
+            return
+        self._ultima_revision = ahora
+        versiones = cache.get_many([self._clave_tabla, self._clave_usuarios, CLAVE_VERSION_GENERAL])
+        if (
+            versiones.get(self._clave_tabla) != self._version_tabla
+            or versiones.get(CLAVE_VERSION_GENERAL) != self._version_general
+        ):
+            self._version_tabla = versiones.get(self._clave_tabla)
+            self._version_general = versiones.get(CLAVE_VERSION_GENERAL)
+            self._tabla = None
+        if versiones.get(self._clave_usuarios) != self._version_usuarios:
+            self._version_usuarios = versiones.get(self._clave_usuarios)
+            self._usuarios = None
+
+    def tabla(self):
+        self._sincronizar()
+        tabla = self._tabla
+        if tabla is None:
+            with self._lock:
+                tabla = self._tabla
+                if tabla is None:
+                    tabla = self._tabla = compilar_tabla(self.escuela_id)
+        return tabla
+
+    def usuarios(self):
+        self._sincronizar()
+        usuarios = self._usuarios
+        if usuarios is None:
+            with self._lock:
+                usuarios = self._usuarios
+                if usuarios is None:
+                    usuarios = self._usuarios = cargar_usuarios(self.escuela_id)
+        return usuarios
+
+    # --- Consultas individuales (O(1)) ------------------------------------
+
+    def permite(self, rol, accion):
+        """Decisión global de la política para un rol"""
+        return bool(self.tabla().globales[INDICE_ACCION[accion], INDICE_ROL[rol]])
+
+    def perfil_puede(self, perfil, accion, puerta=None):
+        """Decisión para un perfil, opcionalmente sobre una puerta"""
+        if not perfil.activo or perfil.rol not in INDICE_ROL:
+            return False
+        if puerta is not None and puerta.escuela_id != self.escuela_id:
+            # Las puertas de otra escuela nunca están permitidas
+            return False
+        tabla = self.tabla()
+        a, r = INDICE_ACCION[accion], INDICE_ROL[perfil.rol]
+        if puerta is None:
+            return bool(tabla.globales[a, r])
+
+        columna = tabla.columnas.get(puerta.pk)
+        if columna is None:
+            # Puerta nueva que este worker aún no compiló: regla global y
+            # verificación directa de permisos de zona en la BD
+            if a == ABRIR:
+                _, permitido = ZoneClosure.evaluar_puerta(puerta, perfil)
+                return bool(tabla.globales[a, r]) and permitido
+            return bool(tabla.globales[a, r])
+
+        if a != ABRIR:
+            return bool(tabla.matriz[a, r, columna])
+        if tabla.abrir_rol[r, columna]:
+            return True
+        indice = tabla.filas_concesion.get(perfil.pk)
+        return indice is not None and bool(
+            tabla.matriz[ABRIR, r, columna] and tabla.concesiones[indice, columna]
+        )
+
+    # --- Consultas masivas (vectorizadas) ---------------------------------
+
+    def puertas_permitidas(self, perfil, puertas_ids=None, accion='ABRIR_PUERTA'):
+        """
+        Ids de las puertas (de la lista dada, o todas) sobre las que el
+        perfil puede realizar la acción.
+        """
+        tabla = self.tabla()
+        if puertas_ids is None:
+            puertas_ids = tabla.puertas_ids
+        ids = np.asarray(puertas_ids, dtype=np.int64)
+        if not perfil.activo or perfil.rol not in INDICE_ROL or len(ids) == 0:
+            return ids[:0]
+        fila = tabla.fila_puertas(INDICE_ACCION[accion], INDICE_ROL[perfil.rol], perfil.pk)
+        columnas = tabla.columnas_de(ids)
+        permitidas = (columnas >= 0) & fila[np.maximum(columnas, 0)]
+        return ids[permitidas]
+
+    def quien_puede(self, puerta_id, accion='ABRIR_PUERTA'):
+        """
+        Ids de los perfiles que pueden realizar la acción sobre la puerta
+        (con puerta_id None, según la decisión global de cada rol)
+        """
+        tabla = self.tabla()
+        ids, roles, activos = self.usuarios()
+        if puerta_id is None:
+            return ids[activos & tabla.globales[INDICE_ACCION[accion], roles]]
+        columna = tabla.columnas.get(puerta_id)
+        if columna is None or len(ids) == 0:
+            return ids[:0]
+        a = INDICE_ACCION[accion]
+        if a != ABRIR:
+            return ids[activos & tabla.matriz[a, roles, columna]]
+
+        permitidos = tabla.abrir_rol[roles, columna]
+        if len(tabla.concesiones_ids):
+            concedidos = tabla.concesiones_ids[tabla.concesiones[:, columna]]
+            permitidos |= np.isin(ids, concedidos) & tabla.matriz[ABRIR, roles, columna]
+        return ids[activos & permitidos]
+
+
+motores = PorEscuela(MotorPoliticas)
+
+
+def motor_de(perfil):
+    """Motor de la escuela del perfil"""
+    return motores(perfil.escuela_id)
+
+
+def invalidar_general():
+    """
+    Cambió una regla común (sin zona ni puerta): todos los motores de
+    todos los workers recompilan su tabla.
+    """
+    version = incrementar_version(CLAVE_VERSION_GENERAL)
+    for motor in motores.cargadas().values():
+        motor._descartar_general(version)
@@ -0,0 +1,132 @@
+"""
+Perfilado de peticiones bajo demanda.
+
+ProfilerMiddleware (ver middleware.py) ejecuta con cProfile una muestra
+de las peticiones (SAMPLE_RATE) y las de staff que envían la cabecera
+configurada. Cada perfil se guarda en PROFILING['DIRECTORY'] como un
+archivo marshal con la ruta, la duración y las estadísticas por función;
+el directorio funciona como anillo: al pasar de MAX_FILES se borran los
+más antiguos. La vista del admin agrupa los perfiles por ruta y suma las
+estadísticas para mostrar las funciones más costosas.
+"""
+import marshal
+import os
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+
+EXTENSION = '.perfil'
+
+
+def directorio():
+    return str(settings.PROFILING['DIRECTORY'])
+
+
+def guardar_perfil(metadatos, estadisticas):
+    """
+    Guarda un perfil y recorta el anillo a MAX_FILES archivos.
+    `estadisticas` es Profile.stats tras create_stats():
+    {(archivo, línea, función): (cc, nc, tt, ct, llamadores)}.
+    """
+    ruta_directorio = directorio()
+    os.makedirs(ruta_directorio, exist_ok=True)
+    # Solo lo necesario para el reporte (sin los llamadores)
+    funciones = {clave: valores[:4] for clave, valores in estadisticas.items()}
+    nombre = f'{time.time_ns()}_{os.getpid()}{EXTENSION}'
+    temporal = os.path.join(ruta_directorio, f'.{nombre}.tmp')
+    with open(temporal, 'wb') as archivo:
+        marshal.dump({**metadatos, 'funciones': funciones}, archivo)
+    os.replace(temporal, os.path.join(ruta_directorio, nombre))
+    recortar_anillo(ruta_directorio)
+
+
+def listar_archivos(ruta_directorio=None):
+    """Archivos de perfil del más antiguo al más reciente"""
+    ruta_directorio = ruta_directorio or directorio()
+    try:
+        nombres = [n for n in os.listdir(ruta_directorio) if n.endswith(EXTENSION)]
+    except FileNotFoundError:
+        return []
+    # El nombre empieza con el instante en ns: el orden alfabético no sirve
+    nombres.sort(key=lambda n: int(n.split('_', 1)[0]))
+    return [os.path.join(ruta_directorio, n) for n in nombres]
+
+
+def recortar_anillo(ruta_directorio):
+    archivos = listar_archivos(ruta_directorio)
+    for archivo in archivos[:max(0, len(archivos) - settings.PROFILING['MAX_FILES'])]:
+        try:
+            os.remove(archivo)
+        except FileNotFoundError:
+            pass  # Otro worker ya lo borró
+
+
+def cargar_perfiles():
+    """Perfiles guardados (los ilegibles se ignoran)"""
+    perfiles = []
+    for archivo in listar_archivos():
+        try:
+            with open(archivo, 'rb') as f:
+                perfiles.append(marshal.load(f))
+        except (OSError, EOFError, ValueError, TypeError):
+            continue
+    return perfiles
+
+
+def resumen_por_ruta(perfiles):
+    """Muestras, duración media/máxima y último instante por ruta"""
+    rutas = defaultdict(lambda: {'muestras': 0, 'total': 0.0, 'maxima': 0.0, 'ultima': 0.0})
+    for perfil in perfiles:
+        datos = rutas[perfil['ruta']]
+        datos['muestras'] += 1
+        datos['total'] += perfil['duracion']
+        datos['maxima'] = max(datos['maxima'], perfil['duracion'])
+        datos['ultima'] = max(datos['ultima'], perfil['fecha'])
+    return sorted(
+        (
+            {
+                'ruta': ruta,
+                'muestras': datos['muestras'],
+                'media_ms': datos['total'] / datos['muestras'] * 1000,
+                'maxima_ms': datos['maxima'] * 1000,
+                'ultima': datos['ultima'],
+            }
+            for ruta, datos in rutas.items()
+        ),
+        key=lambda fila: fila['media_ms'] * fila['muestras'],
+        reverse=True,
+    )
+
+
+def funciones_principales(perfiles, ruta, orden='propio', limite=None):
+    """
+    Suma las estadísticas de las muestras de una ruta y devuelve las
+    funciones con más tiempo propio ('propio') o acumulado ('acumulado').
+    """
+    limite = limite or settings.PROFILING['TOP_FUNCTIONS']
+    totales = defaultdict(lambda: [0, 0, 0.0, 0.0])
+    muestras = 0
+    for perfil in perfiles:
+        if perfil['ruta'] != ruta:
+            continue
+        muestras += 1
+        for clave, (cc, nc, tt, ct) in perfil['funciones'].items():
+            total = totales[clave]
+            total[0] += cc
+            total[1] += nc
+            total[2] += tt
+            total[3] += ct
+    indice = 3 if orden == 'acumulado' else 2
+    ordenadas = sorted(totales.items(), key=lambda item: item[1][indice], reverse=True)[:limite]
+    return [
+        {
+            'funcion': funcion,
+            'ubicacion': f'{archivo}:{linea}' if linea else archivo,
+            'llamadas': nc,
+            'propio_ms': tt / muestras * 1000,
+            'acumulado_ms': ct / muestras * 1000,
+        }
+        for (archivo, linea, funcion), (cc, nc, tt, ct) in ordenadas
+    ]
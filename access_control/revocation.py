@@ -0,0 +1,109 @@
+"""
+Registro de tokens JWT revocados.
+
+Sustituye a rest_framework_simplejwt.token_blacklist sin consultar la BD
+en cada petición: cada worker guarda en memoria los JTI revocados (con
+su expiración) y la tabla RevokedToken es la fuente compartida.
+
+- revocar() inserta la fila y sube un número de versión en la caché.
+- Como mucho cada SYNC_INTERVAL segundos, cada worker compara la versión
+  y, si cambió, carga solo las revocaciones recientes (con un margen de
+  OVERLAP segundos por transacciones confirmadas fuera de orden). Cada
+  MAX_STALENESS segundos recarga aunque la versión no cambie, por si la
+  caché no se comparte entre procesos (locmem).
+- Las entradas expiran con el token: se descartan de la memoria y de la
+  tabla cada PURGE_INTERVAL segundos.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevokedToken
+
+
+CLAVE_VERSION = 'revocaciones:version'
+
+
+class RegistroRevocaciones:
+    """Conjunto en memoria de JTI revocados, sincronizado por versión"""
+
+    def __init__(self):
+        self._revocados = {}  # jti → expiración (epoch)
+        self._version = None
+        self._cargado_hasta = None
+        self._ultima_revision = 0.0
+        self._ultima_carga = 0.0
+        self._ultima_purga = time.monotonic()
+        self._lock = threading.Lock()
+
+    def revocar(self, jti, expira):
+        """Revoca un JTI hasta `expira` (epoch del claim exp)"""
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=jti, expira=datetime.fromtimestamp(expira, tz=dt_timezone.utc))],
+            ignore_conflicts=True,
+        )
+        self._revocados[jti] = expira
+        transaction.on_commit(self._publicar)
+
+    def revocar_token(self, token):
+        """Revoca un token de simplejwt (access o refresh)"""
+        self.revocar(token[api_settings.JTI_CLAIM], token['exp'])
+
+    def esta_revocado(self, jti):
+        self._sincronizar()
+        expira = self._revocados.get(jti)
+        return expira is not None and expira > time.time()
+
+    def _publicar(self):
+        try:
+            cache.incr(CLAVE_VERSION)
+        except ValueError:
+            cache.set(CLAVE_VERSION, 1, None)
+
+    def _sincronizar(self):
+        config = settings.TOKEN_REVOCATION
+        ahora = time.monotonic()
+        if ahora - self._ultima_revision < config['SYNC_INTERVAL']:
+            return
+        with self._lock:
+            if ahora - self._ultima_revision < config['SYNC_INTERVAL']:
+                return
+            self._ultima_revision = ahora
+            version = cache.get(CLAVE_VERSION)
+            if (
+                self._cargado_hasta is None
+                or version != self._version
+                or ahora - self._ultima_carga >= config['MAX_STALENESS']
+            ):
+                self._version = version
+                self._cargar(config)
+            if ahora - self._ultima_purga >= config['PURGE_INTERVAL']:
+                self._purgar()
+
+    def _cargar(self, config):
+        inicio = timezone.now()
+        filas = RevokedToken.objects.filter(expira__gt=inicio)
+        if self._cargado_hasta is not None:
+            filas = filas.filter(
+                fecha_revocacion__gte=self._cargado_hasta - timedelta(seconds=config['OVERLAP'])
+            )
+        for jti, expira in filas.values_list('jti', 'expira').iterator():
+            self._revocados[jti] = expira.timestamp()
+        self._cargado_hasta = inicio
+        self._ultima_carga = time.monotonic()
+
+    def _purgar(self):
+        """Olvida los tokens que ya expiraron (en memoria y en la tabla)"""
+        ahora = time.time()
+        self._revocados = {jti: expira for jti, expira in self._revocados.items() if expira > ahora}
+        RevokedToken.objects.filter(expira__lte=timezone.now()).delete()
+        self._ultima_purga = time.monotonic()
+
+
+revocaciones = RegistroRevocaciones()
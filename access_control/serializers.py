@@ -0,0 +1,148 @@
+"""
+Serializers de la app access_control.
+"""
+from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import AccessPolicy, Door, School, UserProfile, Zone
+from .revocation import revocaciones
+
+
+def validar_refresh(valor):
+    """Decodifica un refresh token y verifica que no esté revocado"""
+    try:
+        refresh = RefreshToken(valor)
+    except TokenError as exc:
+        raise InvalidToken(exc.args[0])
+    if revocaciones.esta_revocado(refresh.get(api_settings.JTI_CLAIM)):
+        raise InvalidToken({'detail': 'El token fue revocado', 'code': 'token_revoked'})
+    return refresh
+
+
+class RefreshRevocableSerializer(TokenRefreshSerializer):
+    """
+    Renovación de tokens que respeta las revocaciones y, con
+    ROTATE_REFRESH_TOKENS + BLACKLIST_AFTER_ROTATION, revoca el
+    refresh token anterior.
+    """
+
+    def validate(self, attrs):
+        refresh = validar_refresh(attrs['refresh'])
+        data = super().validate(attrs)
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            revocaciones.revocar_token(refresh)
+        return data
+
+
+class LogoutSerializer(serializers.Serializer):
+    """Refresh token a revocar al cerrar sesión"""
+    refresh = serializers.CharField()
+
+    def validate_refresh(self, valor):
+        return validar_refresh(valor)
+
+
+class CambioPoliticaSerializer(serializers.Serializer):
+    """Alta, cambio (misma clave rol/acción/alcance) o baja de una regla"""
+    rol = serializers.ChoiceField(choices=UserProfile.ROLE_CHOICES)
+    accion = serializers.ChoiceField(choices=AccessPolicy.ACCION_CHOICES)
+    zona = serializers.IntegerField(required=False, allow_null=True)
+    puerta = serializers.IntegerField(required=False, allow_null=True)
+    permitido = serializers.BooleanField(default=True)
+    eliminar = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if attrs.get('zona') is not None and attrs.get('puerta') is not None:
+            raise serializers.ValidationError('La regla se limita a una zona o a una puerta, no a ambas.')
+        return attrs
+
+
+class CambioPermisoZonaSerializer(serializers.Serializer):
+    """Alta o baja de un permiso de zona para un rol o un perfil"""
+    zona = serializers.IntegerField()
+    rol = serializers.ChoiceField(choices=UserProfile.ROLE_CHOICES, required=False, allow_null=True)
+    perfil = serializers.IntegerField(required=False, allow_null=True)
+    eliminar = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if attrs.get('rol') is None and attrs.get('perfil') is None:
+            raise serializers.ValidationError('El permiso necesita un rol o un perfil.')
+        return attrs
+
+
+class CambioUsuariosSerializer(serializers.Serializer):
+    """Mover perfiles a otro rol y/o activarlos o desactivarlos"""
+    perfiles = serializers.ListField(child=serializers.IntegerField(), min_length=1)
+    rol = serializers.ChoiceField(choices=UserProfile.ROLE_CHOICES, required=False)
+    activo = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        if 'rol' not in attrs and 'activo' not in attrs:
+            raise serializers.ValidationError('Indica el nuevo rol o el estado activo.')
+        return attrs
+
+
+class ImpactoCambiosSerializer(serializers.Serializer):
+    """
+    Cambio propuesto para el análisis de impacto (access_control/impact.py).
+    Fuera de los superusuarios, la simulación se limita a la escuela de
+    quien la pide (context['request']).
+    """
+    accion = serializers.ChoiceField(choices=AccessPolicy.ACCION_CHOICES, default='ABRIR_PUERTA')
+    escuela = serializers.PrimaryKeyRelatedField(
+        queryset=School.objects.all(), required=False, allow_null=True, default=None,
+        help_text='Escuela a simular (vacío: todas; la propia si no eres superusuario)',
+    )
+    politicas = CambioPoliticaSerializer(many=True, required=False, default=list)
+    permisos_zona = CambioPermisoZonaSerializer(many=True, required=False, default=list)
+    usuarios = CambioUsuariosSerializer(many=True, required=False, default=list)
+    roles = serializers.DictField(
+        child=serializers.ChoiceField(choices=UserProfile.ROLE_CHOICES),
+        required=False, default=dict,
+        help_text='Todos los perfiles de un rol pasan a otro: {"MAESTRO": "ALUMNO"}',
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.escuela_propia = None
+        request = self.context.get('request')
+        if request is not None and not request.user.is_superuser:
+            try:
+                self.escuela_propia = request.user.profile.escuela_id
+            except UserProfile.DoesNotExist:
+                pass
+            self.fields['escuela'].queryset = School.objects.filter(pk=self.escuela_propia)
+
+    def validate_roles(self, valor):
+        desconocidos = set(valor) - {rol for rol, _ in UserProfile.ROLE_CHOICES}
+        if desconocidos:
+            raise serializers.ValidationError(f'Roles desconocidos: {", ".join(sorted(desconocidos))}')
+        return valor
+
+    def validate(self, attrs):
+        """
+        Las zonas, puertas y perfiles referidos deben existir y, con una
+        escuela, ser de ella (una consulta por modelo)
+        """
+        if attrs['escuela'] is None and self.escuela_propia is not None:
+            attrs['escuela'] = School.objects.get(pk=self.escuela_propia)
+        escuela = attrs['escuela']
+        zonas = {c['zona'] for c in attrs['politicas'] + attrs['permisos_zona'] if c.get('zona') is not None}
+        puertas = {c['puerta'] for c in attrs['politicas'] if c.get('puerta') is not None}
+        perfiles = {c['perfil'] for c in attrs['permisos_zona'] if c.get('perfil') is not None}
+        for cambio in attrs['usuarios']:
+            perfiles.update(cambio['perfiles'])
+        for modelo, ids, nombre in ((Zone, zonas, 'Zonas'), (Door, puertas, 'Puertas'), (UserProfile, perfiles, 'Perfiles')):
+            if ids:
+                existentes = modelo.objects.filter(pk__in=ids)
+                if escuela is not None:
+                    existentes = existentes.filter(escuela=escuela)
+                faltan = ids - set(existentes.values_list('pk', flat=True))
+                if faltan:
+                    raise serializers.ValidationError(
+                        f'{nombre} inexistentes o de otra escuela: {", ".join(map(str, sorted(faltan)))}'
+                    )
+        return attrs
@@ -1,11 +1,18 @@
 """
 Signals para la app access_control.
-Gestión automática de perfiles de usuario.
+Gestión automática de perfiles de usuario, credenciales de dispositivos
+e invalidación de la tabla de políticas y de los resúmenes en caché.
 """
-from django.db.models.signals import post_save
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import m2m_changed, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .middleware import olvidar_credencial
+from .codes import guardar_con_codigo
+from .guests import invitados
+from .models import UserProfile, IoTDevice, Door, LockState, Zone, ZonePermission, AccessPolicy, GuestCode
+from .policies import invalidar_general, motores
+from .summaries import invalidar_perfiles, invalidar_puertas, invalidar_puertas_escuelas
 
 
 @receiver(post_save, sender=User)
@@ -17,12 +24,9 @@ def crear_perfil_usuario(sender, instance, created, **kwargs):
     if created:
         # Solo crear perfil si no existe
         if not hasattr(instance, 'profile'):
-            UserProfile.objects.create(
-                user=instance,
-                rol='ALUMNO',  # Rol por defecto
-                codigo_acceso=f'temp_{instance.id}',  # Temporal, debe cambiarse
-                activo=True
-            )
+            # Rol por defecto; el código se asigna de los bloques reservados
+            # y queda en instance.profile.codigo_generado para entregarlo
+            guardar_con_codigo(UserProfile(user=instance, rol='ALUMNO', activo=True))
 
 
 @receiver(post_save, sender=User)
@@ -34,9 +38,120 @@ def guardar_perfil_usuario(sender, instance, **kwargs):
         instance.profile.save()
     except UserProfile.DoesNotExist:
         # Si no existe el perfil, crearlo
-        UserProfile.objects.create(
-            user=instance,
-            rol='ALUMNO',
-            codigo_acceso=f'temp_{instance.id}',
-            activo=True
-        )
+        guardar_con_codigo(UserProfile(user=instance, rol='ALUMNO', activo=True))
+
+
+@receiver(post_save, sender=IoTDevice)
+@receiver(post_delete, sender=IoTDevice)
+def descartar_credencial_dispositivo(sender, instance, **kwargs):
+    """
+    Descarta la credencial en caché del dispositivo modificado o eliminado.
+    """
+    olvidar_credencial(instance.identificador)
+
+
+@receiver(post_save, sender=AccessPolicy)
+@receiver(post_delete, sender=AccessPolicy)
+def invalidar_politicas_regla(sender, instance, **kwargs):
+    """
+    Una regla de zona o puerta solo afecta la tabla de su escuela; una
+    regla común (sin zona ni puerta), las de todas.
+    """
+    try:
+        alcance = instance.puerta or instance.zona
+    except ObjectDoesNotExist:
+        alcance = None
+    if alcance is None:
+        invalidar_general()
+    else:
+        motores(alcance.escuela_id).invalidar()
+
+
+@receiver(post_save, sender=ZonePermission)
+@receiver(post_delete, sender=ZonePermission)
+def invalidar_politicas_permiso(sender, instance, **kwargs):
+    """Los permisos de zona se compilan en la tabla de la escuela de la zona"""
+    try:
+        motores(instance.zona.escuela_id).invalidar()
+    except ObjectDoesNotExist:
+        invalidar_general()
+
+
+@receiver(post_save, sender=Zone)
+@receiver(post_delete, sender=Zone)
+@receiver(post_delete, sender=Door)
+def invalidar_politicas(sender, instance, **kwargs):
+    """
+    Invalida la tabla de políticas compilada de la escuela cuando cambian
+    la jerarquía de zonas o el conjunto de puertas.
+    """
+    motores(instance.escuela_id).invalidar()
+
+
+@receiver(post_save, sender=Door)
+def invalidar_politicas_puerta(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Una puerta solo afecta la tabla al crearse o al cambiar de zona;
+    abrir()/cerrar() guardan con update_fields y no la invalidan.
+    """
+    if created or update_fields is None or 'zona' in update_fields:
+        motores(instance.escuela_id).invalidar()
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidar_usuarios_politicas(sender, instance, **kwargs):
+    """
+    Invalida los arreglos de usuarios de la escuela usados en las
+    consultas masivas.
+    """
+    motores(instance.escuela_id).invalidar_usuarios()
+
+
+@receiver(post_save, sender=Door)
+@receiver(post_delete, sender=Door)
+def invalidar_resumen_puerta(sender, instance, **kwargs):
+    """Descarta el resumen en caché de la puerta modificada o eliminada"""
+    invalidar_puertas(instance.escuela_id, [instance.pk])
+
+
+@receiver(post_save, sender=LockState)
+@receiver(post_delete, sender=LockState)
+def invalidar_resumen_seguro(sender, instance, **kwargs):
+    """El seguro forma parte del resumen de su puerta"""
+    try:
+        escuela_id = instance.puerta.escuela_id
+    except ObjectDoesNotExist:
+        return  # La puerta se eliminó: su propio signal descarta el resumen
+    invalidar_puertas(escuela_id, [instance.puerta_id])
+
+
+@receiver(post_save, sender=Zone)
+@receiver(post_delete, sender=Zone)
+def invalidar_resumenes_zona(sender, instance, **kwargs):
+    """
+    Un cambio en la jerarquía puede cambiar el bloqueo heredado de
+    cualquier puerta de la escuela (las de otras escuelas no se tocan)
+    """
+    invalidar_puertas_escuelas([instance.escuela_id])
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidar_resumen_perfil(sender, instance, **kwargs):
+    """
+    Descarta el resumen en caché del perfil modificado o eliminado (y el
+    listado de su escuela); guardar el User también guarda el perfil.
+    """
+    invalidar_perfiles(instance.escuela_id, [instance.pk])
+
+
+@receiver(post_save, sender=GuestCode)
+@receiver(post_delete, sender=GuestCode)
+@receiver(m2m_changed, sender=GuestCode.puertas.through)
+def invalidar_invitados(sender, instance, **kwargs):
+    """
+    Los workers recargan los códigos de invitado vigentes de la escuela
+    (instance es el código o, desde el lado de la puerta, la puerta)
+    """
+    invitados(instance.escuela_id).invalidar()
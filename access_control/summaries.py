@@ -0,0 +1,305 @@
+"""
+Resúmenes en caché de puertas (con su seguro) y de perfiles, por escuela.
+
+El estado de cada puerta y su seguro se lee en cada heartbeat y en cada
+allowlist de su controlador, y los listados de puertas y perfiles de la
+API (/api/doors/, /api/profiles/) se leen muchas veces; todo cambia
+poco, así que se guarda en la caché de Django (locmem o file):
+
+- Invalidación precisa: los signals de Door, LockState, Zone y
+  UserProfile descartan el resumen afectado y el listado de su escuela
+  al confirmar la transacción; las acciones del admin con
+  queryset.update(), el bloqueo de zonas y la importación masiva (que no
+  disparan signals) llaman a invalidar_* directamente.
+- Cada escuela tiene su propio número de generación por espacio:
+  descartar todos los resúmenes de una escuela no toca los de las demás.
+- Protección contra estampida: cada entrada tiene un vencimiento suave;
+  vencida, un solo proceso la recalcula (candado con cache.add) y los
+  demás siguen sirviendo el valor anterior durante GRACE segundos. Sin
+  valor anterior, quien no obtiene el candado calcula el suyo sin
+  guardarlo en vez de esperar (la ruta del heartbeat no se detiene).
+- Un recálculo que se cruza con una invalidación (de su entrada o de la
+  escuela completa) no guarda su resultado: podría ser anterior al
+  cambio.
+- Contadores de aciertos/fallos por proceso, publicados cada
+  STATS_INTERVAL segundos en contadores compartidos de la caché.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Door, UserProfile
+
+
+PREFIJO = 'resumenes'
+ESPACIOS = ('puertas', 'perfiles')
+TIPOS_CONTADOR = ('aciertos', 'fallos', 'vencidos', 'concurrentes')
+TODOS = 'todos'
+
+
+def _clave_generacion(espacio, escuela_id):
+    return f'{PREFIJO}:{espacio}:{escuela_id}:generacion'
+
+
+def _clave_contador(espacio, tipo):
+    return f'{PREFIJO}:{espacio}:contador:{tipo}'
+
+
+def _incrementar(clave, delta=1):
+    try:
+        return cache.incr(clave, delta)
+    except ValueError:
+        cache.set(clave, delta, None)
+        return delta
+
+
+class CacheResumenes:
+    """
+    Caché de resúmenes de un espacio ('puertas' o 'perfiles').
+    Las claves llevan la escuela y su número de generación para poder
+    descartar todo lo de una escuela con un solo incremento.
+    """
+
+    def __init__(self, espacio, calcular):
+        self.espacio = espacio
+        self.calcular = calcular
+        self.contadores = Counter()
+        self._publicados = Counter()
+        self._ultima_publicacion = time.monotonic()
+        self._lock = threading.Lock()
+
+    # --- Claves -----------------------------------------------------------
+
+    def _generacion(self, escuela_id):
+        clave = _clave_generacion(self.espacio, escuela_id)
+        generacion = cache.get(clave)
+        if generacion is None:
+            cache.add(clave, 1, None)
+            generacion = cache.get(clave, 1)
+        return generacion
+
+    def _clave(self, escuela_id, identificador, generacion):
+        return f'{PREFIJO}:{self.espacio}:{escuela_id}:{generacion}:{identificador}'
+
+    # --- Lectura ----------------------------------------------------------
+
+    def obtener(self, escuela_id, identificador=TODOS):
+        """Resumen de un objeto de la escuela (o su listado completo con TODOS)"""
+        config = settings.SUMMARY_CACHE
+        generacion = self._generacion(escuela_id)
+        clave = self._clave(escuela_id, identificador, generacion)
+        entrada = cache.get(clave)
+        ahora = time.time()
+
+        if entrada is not None and entrada[0] > ahora:
+            self._contar('aciertos')
+            return entrada[1]
+
+        candado = f'{clave}:calculando'
+        if not cache.add(candado, 1, config['LOCK_TIMEOUT']):
+            # Otro proceso ya lo está recalculando
+            if entrada is not None:
+                self._contar('vencidos')
+                return entrada[1]
+            self._contar('concurrentes')
+            return self.calcular(escuela_id, identificador)
+
+        self._contar('fallos')
+        try:
+            inicio = time.time()
+            valor = self.calcular(escuela_id, identificador)
+            invalidada = cache.get(f'{clave}:invalidada', 0)
+            if self._generacion(escuela_id) == generacion and invalidada < inicio:
+                cache.set(
+                    clave,
+                    (time.time() + config['TTL'], valor),
+                    config['TTL'] + config['GRACE'],
+                )
+        finally:
+            cache.delete(candado)
+        return valor
+
+    # --- Invalidación -----------------------------------------------------
+
+    def invalidar(self, escuela_id, identificadores):
+        """Descarta los resúmenes indicados y el listado de la escuela"""
+        generacion = self._generacion(escuela_id)
+        claves = [
+            self._clave(escuela_id, identificador, generacion)
+            for identificador in [*identificadores, TODOS]
+        ]
+        # Marca para que un recálculo en curso no guarde un valor anterior
+        ahora = time.time()
+        cache.set_many({f'{clave}:invalidada': ahora for clave in claves}, settings.SUMMARY_CACHE['LOCK_TIMEOUT'])
+        cache.delete_many(claves)
+
+    def invalidar_todo(self, escuela_id):
+        """Descarta todos los resúmenes de la escuela"""
+        _incrementar(_clave_generacion(self.espacio, escuela_id))
+
+    # --- Contadores -------------------------------------------------------
+
+    def _contar(self, tipo):
+        with self._lock:
+            self.contadores[tipo] += 1
+        if time.monotonic() - self._ultima_publicacion >= settings.SUMMARY_CACHE['STATS_INTERVAL']:
+            self.publicar_contadores()
+
+    def publicar_contadores(self):
+        """Suma lo acumulado desde la última publicación a los contadores compartidos"""
+        with self._lock:
+            pendientes = self.contadores - self._publicados
+            self._publicados = self.contadores.copy()
+            self._ultima_publicacion = time.monotonic()
+        for tipo, delta in pendientes.items():
+            _incrementar(_clave_contador(self.espacio, tipo), delta)
+
+
+def estadisticas():
+    """
+    Contadores compartidos (todos los procesos) por espacio, con la tasa
+    de aciertos. Incluye lo pendiente de publicar del proceso actual.
+    """
+    for resumenes in _resumenes.values():
+        resumenes.publicar_contadores()
+    valores = cache.get_many([
+        _clave_contador(espacio, tipo) for espacio in ESPACIOS for tipo in TIPOS_CONTADOR
+    ])
+    resultado = {}
+    for espacio in ESPACIOS:
+        datos = {tipo: valores.get(_clave_contador(espacio, tipo), 0) for tipo in TIPOS_CONTADOR}
+        servidos = datos['aciertos'] + datos['vencidos'] + datos['fallos'] + datos['concurrentes']
+        datos['tasa_aciertos'] = (datos['aciertos'] + datos['vencidos']) / servidos if servidos else 0.0
+        resultado[espacio] = datos
+    return resultado
+
+
+def reiniciar_estadisticas():
+    """Pone en cero los contadores compartidos"""
+    cache.delete_many([
+        _clave_contador(espacio, tipo) for espacio in ESPACIOS for tipo in TIPOS_CONTADOR
+    ])
+
+
+# --- Cálculo de resúmenes -------------------------------------------------
+
+def _resumir_puertas(puertas):
+    bloqueadas_por_zona = set(
+        Door.objects
+        .filter(pk__in=puertas.values('pk'), zona__cierre_ancestros__ancestro__bloqueada=True)
+        .values_list('pk', flat=True)
+    )
+    return [
+        {
+            'id': fila['id'],
+            'escuela_id': fila['escuela_id'],
+            'nombre': fila['nombre'],
+            'ubicacion': fila['ubicacion'],
+            'estado': fila['estado'],
+            'activa': fila['activa'],
+            'zona_id': fila['zona_id'],
+            'seguro_activo': bool(fila['seguro__activo']),
+            'seguro_fecha_cambio': fila['seguro__fecha_cambio'],
+            'zona_bloqueada': fila['id'] in bloqueadas_por_zona,
+        }
+        for fila in puertas.values(
+            'id', 'escuela_id', 'nombre', 'ubicacion', 'estado', 'activa', 'zona_id',
+            'seguro__activo', 'seguro__fecha_cambio',
+        )
+    ]
+
+
+def calcular_puertas(escuela_id, identificador):
+    puertas = Door.objects.filter(escuela_id=escuela_id)
+    if identificador == TODOS:
+        return _resumir_puertas(puertas.order_by('nombre'))
+    resumenes = _resumir_puertas(puertas.filter(pk=identificador))
+    return resumenes[0] if resumenes else None
+
+
+def _resumir_perfiles(perfiles):
+    return [
+        {
+            'id': perfil.id,
+            'escuela_id': perfil.escuela_id,
+            'user_id': perfil.user_id,
+            'username': perfil.user.username,
+            'nombre': perfil.user.get_full_name(),
+            'rol': perfil.rol,
+            'activo': perfil.activo,
+        }
+        for perfil in perfiles.select_related('user').only(
+            'id', 'escuela_id', 'rol', 'activo', 'user__username', 'user__first_name', 'user__last_name',
+        )
+    ]
+
+
+def calcular_perfiles(escuela_id, identificador):
+    perfiles = UserProfile.objects.filter(escuela_id=escuela_id)
+    if identificador == TODOS:
+        return _resumir_perfiles(perfiles.order_by('user__username'))
+    resumenes = _resumir_perfiles(perfiles.filter(pk=identificador))
+    return resumenes[0] if resumenes else None
+
+
+_resumenes = {
+    'puertas': CacheResumenes('puertas', calcular_puertas),
+    'perfiles': CacheResumenes('perfiles', calcular_perfiles),
+}
+
+
+# --- API pública ----------------------------------------------------------
+
+def resumen_puerta(escuela_id, puerta_id):
+    """Estado de una puerta de la escuela y su seguro (None si no existe)"""
+    return _resumenes['puertas'].obtener(escuela_id, puerta_id)
+
+
+def listado_puertas(escuela_id):
+    """Puertas de la escuela con su seguro, ordenadas por nombre"""
+    return _resumenes['puertas'].obtener(escuela_id)
+
+
+def resumen_perfil(escuela_id, perfil_id):
+    """Datos básicos de un perfil de la escuela (None si no existe)"""
+    return _resumenes['perfiles'].obtener(escuela_id, perfil_id)
+
+
+def listado_perfiles(escuela_id):
+    """Perfiles de la escuela, ordenados por nombre de usuario"""
+    return _resumenes['perfiles'].obtener(escuela_id)
+
+
+def _invalidar(espacio, escuela_id, identificadores):
+    resumenes = _resumenes[espacio]
+    if identificadores is None:
+        transaction.on_commit(lambda: resumenes.invalidar_todo(escuela_id))
+    else:
+        identificadores = list(identificadores)
+        transaction.on_commit(lambda: resumenes.invalidar(escuela_id, identificadores))
+
+
+def invalidar_puertas(escuela_id, puertas_ids=None):
+    """
+    Descarta los resúmenes de las puertas indicadas de la escuela (todas
+    si es None) cuando la transacción en curso se confirma.
+    """
+    _invalidar('puertas', escuela_id, puertas_ids)
+
+
+def invalidar_puertas_escuelas(escuelas_ids):
+    """
+    Descarta los resúmenes de todas las puertas de esas escuelas (bloqueo
+    o jerarquía de zonas); las demás escuelas conservan los suyos.
+    """
+    for escuela_id in set(escuelas_ids):
+        invalidar_puertas(escuela_id)
+
+
+def invalidar_perfiles(escuela_id, perfiles_ids=None):
+    """Igual que invalidar_puertas(), para los perfiles"""
+    _invalidar('perfiles', escuela_id, perfiles_ids)
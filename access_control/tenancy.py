@@ -0,0 +1,79 @@
+"""
+Varias escuelas (School) en un mismo despliegue.
+
+Los datos se separan con la llave foránea `escuela` (perfiles, puertas,
+zonas, grupos, códigos de invitado y confinamientos; seguros y
+controladores, a través de su puerta). Las restricciones únicas y los
+índices compuestos empiezan por la escuela, así que dos escuelas pueden
+repetir nombres de puerta o códigos de acceso y cada búsqueda recorre
+solo la parte del índice de su escuela.
+
+Las estructuras en memoria de cada worker también se parten: cada
+escuela tiene su propia tabla de políticas, registro de invitados,
+índice de fotos y mapas LRU, con su propia versión en la caché y sus
+propios límites. Así, la recompilación, la recarga o el desalojo por el
+tráfico de una escuela grande no tocan las de las demás.
+
+El controlador IoT no envía su escuela: sale de la credencial
+(dispositivo → puerta → escuela), cargada junto con la clave de firma.
+"""
+import threading
+
+from django.core.cache import cache
+
+from .models import School, UserProfile, escuela_predeterminada
+
+
+class PorEscuela:
+    """
+    Una instancia independiente de `fabrica(escuela_id)` por escuela,
+    creada la primera vez que se usa: particiones(escuela_id).
+    """
+
+    def __init__(self, fabrica):
+        self._fabrica = fabrica
+        self._particiones = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, escuela_id):
+        particion = self._particiones.get(escuela_id)
+        if particion is None:
+            with self._lock:
+                particion = self._particiones.get(escuela_id)
+                if particion is None:
+                    particion = self._particiones[escuela_id] = self._fabrica(escuela_id)
+        return particion
+
+    def cargadas(self):
+        """{escuela_id: partición} de las particiones ya creadas en este worker"""
+        return dict(self._particiones)
+
+    def __len__(self):
+        return len(self._particiones)
+
+
+def incrementar_version(clave):
+    """Sube un número de versión compartido (lo crea si no existe)"""
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, None)
+        return 1
+
+
+def escuelas_ids():
+    """IDs de todas las escuelas (para invalidar o recorrer todas)"""
+    return list(School.objects.order_by('pk').values_list('pk', flat=True))
+
+
+def escuela_limitada(usuario):
+    """
+    Escuela a la que se limita lo que ve y edita `usuario`: None para
+    superusuarios (todas); si no, la de su perfil (o la predeterminada).
+    """
+    if usuario.is_superuser:
+        return None
+    try:
+        return usuario.profile.escuela_id
+    except UserProfile.DoesNotExist:
+        return escuela_predeterminada()
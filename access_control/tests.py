@@ -1,3 +1,333 @@
-from django.test import TestCase
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from . import notifications
+from .models import AccessPolicy, Door, UserProfile, Zone, escuela_predeterminada
+from .notifications import ColaNotificaciones, ErrorEnvio, Evento, ProveedorLocal
+from .paginators import PaginadorAproximado
+from .policies import MotorPoliticas, motores
+
+
+class ProveedorConFallos(ProveedorLocal):
+    """Falla los primeros FALLOS envíos y después entrega"""
+
+    FALLOS = 2
+
+    def __init__(self):
+        super().__init__()
+        self.intentos = 0
+
+    def enviar(self, telefono, texto):
+        with self._lock:
+            self.intentos += 1
+            fallar = self.intentos <= self.FALLOS
+        if fallar:
+            raise ErrorEnvio('proveedor caído')
+        super().enviar(telefono, texto)
+
+
+class ProveedorLento(ProveedorLocal):
+    """Se queda esperando hasta que la prueba libere `continuar`"""
+
+    def __init__(self):
+        super().__init__()
+        self.llamado = threading.Event()
+        self.continuar = threading.Event()
+
+    def enviar(self, telefono, texto):
+        self.llamado.set()
+        self.continuar.wait(5)
+        super().enviar(telefono, texto)
+
+
+def esperar(condicion, limite=3.0):
+    """Espera a que el hilo de la cola cumpla la condición"""
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if condicion():
+            return True
+        time.sleep(0.01)
+    return condicion()
+
+
+class ColaNotificacionesTests(TestCase):
+    """Agrupación, límite por teléfono, reintentos y encolado sin espera"""
+
+    TELEFONOS = {'5550001', '5550002'}
+
+    def crear_cola(self, **config):
+        self.enterContext(override_settings(NOTIFICATIONS={
+            **settings.NOTIFICATIONS,
+            'ENABLED': True,
+            'PROVIDER': 'access_control.notifications.ProveedorLocal',
+            'WINDOW': 0.2,
+            'RETRY_DELAY': 0.05,
+            **config,
+        }))
+        cola = ColaNotificaciones()
+        self.enterContext(mock.patch.object(cola, '_telefonos', return_value=set(self.TELEFONOS)))
+        # Se registra después para detener la cola antes de restaurar los settings
+        self.addCleanup(cola.detener)
+        return cola
+
+    def test_agrupa_los_eventos_de_la_ventana(self):
+        cola = self.crear_cola()
+        for _ in range(3):
+            cola.encolar(Evento('Entrada: apertura forzada', ('puerta', 1, 1)))
+        cola.encolar(Evento('Patio: apertura forzada', ('puerta', 2, 1)))
+
+        self.assertTrue(esperar(lambda: len(cola.proveedor.enviados) == 2))
+        time.sleep(0.3)
+        enviados = sorted(cola.proveedor.enviados)
+        self.assertEqual([telefono for telefono, _ in enviados], sorted(self.TELEFONOS))
+        for _, texto in enviados:
+            self.assertEqual(texto, '2 avisos: Entrada: apertura forzada (x3) | Patio: apertura forzada')
+
+    def test_limita_los_mensajes_por_telefono(self):
+        self.TELEFONOS = {'5550001'}
+        cola = self.crear_cola(WINDOW=0.05, RATE_LIMIT=2, RATE_PERIOD=60)
+        for i in range(4):
+            cola.encolar(Evento(f'aviso {i}', ('puerta', 1, 1)))
+            time.sleep(0.15)
+
+        self.assertEqual([texto for _, texto in cola.proveedor.enviados], ['aviso 0', 'aviso 1'])
+        # Lo que excede el límite se acumula en un solo mensaje pendiente
+        self.assertEqual(set(cola._grupos['5550001'].textos), {'aviso 2', 'aviso 3'})
+
+        cola.detener()
+        self.assertEqual(len(cola.proveedor.enviados), 3)
+        self.assertEqual(cola.proveedor.enviados[-1][1], '2 avisos: aviso 2 | aviso 3')
+
+    def test_reintenta_si_el_proveedor_falla(self):
+        self.TELEFONOS = {'5550001'}
+        cola = self.crear_cola(
+            WINDOW=0.05, RETRIES=3, PROVIDER='access_control.tests.ProveedorConFallos',
+        )
+        with self.assertLogs('access_control.notifications', 'WARNING') as registro:
+            cola.encolar(Evento('CONFINAMIENTO', ('escuela', 1)))
+            self.assertTrue(esperar(lambda: cola.proveedor.enviados))
+        self.assertEqual(len(registro.records), ProveedorConFallos.FALLOS)
+        self.assertEqual(cola.proveedor.intentos, ProveedorConFallos.FALLOS + 1)
+        self.assertEqual(cola.proveedor.enviados, [('5550001', 'CONFINAMIENTO')])
+
+    def test_descarta_tras_agotar_los_reintentos(self):
+        self.TELEFONOS = {'5550001'}
+        cola = self.crear_cola(
+            WINDOW=0.05, RETRIES=1, PROVIDER='access_control.tests.ProveedorConFallos',
+        )
+        with self.assertLogs('access_control.notifications', 'ERROR'):
+            cola.encolar(Evento('CONFINAMIENTO', ('escuela', 1)))
+            self.assertTrue(esperar(lambda: cola.proveedor.intentos == 2))
+            time.sleep(0.2)
+        self.assertEqual(cola.proveedor.intentos, 2)
+        self.assertEqual(cola.proveedor.enviados, [])
+
+    def test_avisar_no_espera_el_envio(self):
+        cola = self.crear_cola(WINDOW=0, PROVIDER='access_control.tests.ProveedorLento')
+        self.enterContext(mock.patch.object(notifications, 'cola', cola))
+        proveedor = cola.proveedor
+        self.addCleanup(proveedor.continuar.set)
+        puerta = SimpleNamespace(pk=1, nombre='Entrada', escuela_id=1)
+
+        inicio = time.monotonic()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            notifications.avisar_apertura_forzada(puerta)
+            # Nada se encola antes de confirmar la transacción
+            self.assertFalse(proveedor.llamado.is_set())
+        duracion = time.monotonic() - inicio
+        self.assertEqual(len(callbacks), 1)
+
+        self.assertTrue(proveedor.llamado.wait(3))
+        # avisar_*() y la confirmación regresaron con el proveedor aún bloqueado
+        self.assertLess(duracion, 0.5)
+        self.assertEqual(proveedor.enviados, [])
+        proveedor.continuar.set()
+        self.assertTrue(esperar(lambda: len(proveedor.enviados) == 2))
+
+
+# Matriz de roles anterior a las políticas (PERMISOS_POR_ROL.md): la
+# migración inicial carga las mismas reglas
+MATRIZ_POR_ROL = {
+    'ABRIR_PUERTA': {'ADMIN', 'DIRECTOR', 'MAESTRO', 'ALUMNO'},
+    'GESTIONAR_USUARIOS': {'ADMIN', 'DIRECTOR', 'MAESTRO'},
+    'CREAR_USUARIOS': {'ADMIN', 'DIRECTOR'},
+    'ELIMINAR_USUARIOS': {'ADMIN'},
+    'EDITAR_CODIGO': {'ADMIN', 'DIRECTOR'},
+    'EDITAR_PERMISOS_SISTEMA': {'ADMIN', 'DIRECTOR'},
+    'CONTROLAR_SEGURO': {'ADMIN', 'DIRECTOR', 'MAESTRO'},
+    'DESACTIVAR_SEGURO': {'ADMIN', 'DIRECTOR'},
+    'VER_ASISTENCIA': {'ADMIN', 'DIRECTOR'},
+    'RECIBIR_CONFINAMIENTO': {'ADMIN', 'DIRECTOR', 'MAESTRO'},
+}
+
+
+class MotorPoliticasTests(TestCase):
+    """La tabla compilada reproduce la matriz de roles, la precedencia y se invalida"""
+
+    def setUp(self):
+        self.escuela_id = escuela_predeterminada()
+        self.perfiles = {}
+        for rol, _ in UserProfile.ROLE_CHOICES:
+            perfil = User.objects.create_user(username=rol.lower()).profile
+            perfil.rol = rol
+            perfil.save()
+            self.perfiles[rol] = perfil
+        self.inactivo = User.objects.create_user(username='inactivo').profile
+        self.inactivo.rol = 'ADMIN'
+        self.inactivo.activo = False
+        self.inactivo.save()
+
+        # Campus → Edificio; una puerta en cada zona y una sin zona
+        self.campus = Zone.objects.create(nombre='Campus', tipo='CAMPUS')
+        self.edificio = Zone.objects.create(nombre='Edificio A', tipo='EDIFICIO', padre=self.campus)
+        self.puerta_libre = Door.objects.create(nombre='Estacionamiento')
+        self.puerta_campus = Door.objects.create(nombre='Patio', zona=self.campus)
+        self.puerta_edificio = Door.objects.create(nombre='Aula 1', zona=self.edificio)
+        self.puertas = [self.puerta_libre, self.puerta_campus, self.puerta_edificio]
+
+        self.motor = motores(self.escuela_id)
+        # La caché de versiones sobrevive entre pruebas: se parte de cero
+        self.motor.invalidar()
+        self.motor.invalidar_usuarios()
+
+    def quienes(self, accion, puerta=None):
+        """Roles de los perfiles que devuelve quien_puede()"""
+        ids = self.motor.quien_puede(puerta.pk if puerta else None, accion)
+        return {perfil.rol for perfil in UserProfile.objects.filter(pk__in=ids.tolist())}
+
+    def abre(self, perfil):
+        """Puertas que el perfil puede abrir, por las tres vías de consulta"""
+        individual = {puerta.pk for puerta in self.puertas if self.motor.perfil_puede(perfil, 'ABRIR_PUERTA', puerta)}
+        masiva = set(self.motor.puertas_permitidas(perfil, [puerta.pk for puerta in self.puertas]).tolist())
+        inversa = {puerta.pk for puerta in self.puertas if perfil.pk in self.motor.quien_puede(puerta.pk)}
+        self.assertEqual(individual, masiva)
+        self.assertEqual(individual, inversa)
+        return individual
+
+    def test_matriz_de_roles(self):
+        for accion, roles in MATRIZ_POR_ROL.items():
+            with self.subTest(accion=accion):
+                for rol, perfil in self.perfiles.items():
+                    self.assertEqual(self.motor.perfil_puede(perfil, accion), rol in roles, rol)
+                    self.assertEqual(
+                        self.motor.puertas_permitidas(perfil, accion=accion).tolist(),
+                        [puerta.pk for puerta in self.puertas] if rol in roles else [],
+                        rol,
+                    )
+                self.assertEqual(self.quienes(accion), roles)
+                for puerta in self.puertas:
+                    self.assertEqual(self.quienes(accion, puerta), roles)
+
+    def test_atajos_del_perfil(self):
+        director, maestro, alumno = (self.perfiles[rol] for rol in ('DIRECTOR', 'MAESTRO', 'ALUMNO'))
+        self.assertTrue(maestro.puede_gestionar_usuarios())
+        self.assertTrue(maestro.puede_controlar_seguro(self.puerta_campus))
+        self.assertFalse(maestro.puede_desactivar_seguro(self.puerta_campus))
+        self.assertTrue(director.puede_desactivar_seguro(self.puerta_campus))
+        self.assertTrue(maestro.recibe_confinamientos())
+        self.assertFalse(maestro.puede_ver_asistencia())
+        self.assertTrue(alumno.puede_abrir_puerta(self.puerta_edificio))
+        self.assertFalse(alumno.puede_gestionar_usuarios())
+
+    def test_perfil_inactivo_no_puede_nada(self):
+        for accion in MATRIZ_POR_ROL:
+            self.assertFalse(self.motor.perfil_puede(self.inactivo, accion))
+            self.assertNotIn(self.inactivo.pk, self.motor.quien_puede(None, accion))
+        self.assertEqual(self.abre(self.inactivo), set())
+
+    def test_precedencia_puerta_zona_profunda_global(self):
+        alumno = self.perfiles['ALUMNO']
+        todas = {puerta.pk for puerta in self.puertas}
+        self.assertEqual(self.abre(alumno), todas)
+
+        # La regla de la zona más profunda gana aunque se haya creado antes
+        AccessPolicy.objects.create(rol='ALUMNO', accion='ABRIR_PUERTA', zona=self.edificio, permitido=True)
+        AccessPolicy.objects.create(rol='ALUMNO', accion='ABRIR_PUERTA', zona=self.campus, permitido=False)
+        self.assertEqual(self.abre(alumno), {self.puerta_libre.pk, self.puerta_edificio.pk})
+
+        # La regla de puerta gana sobre la de su zona
+        AccessPolicy.objects.create(rol='ALUMNO', accion='ABRIR_PUERTA', puerta=self.puerta_edificio, permitido=False)
+        self.assertEqual(self.abre(alumno), {self.puerta_libre.pk})
+        AccessPolicy.objects.create(rol='ALUMNO', accion='ABRIR_PUERTA', puerta=self.puerta_campus, permitido=True)
+        self.assertEqual(self.abre(alumno), {self.puerta_libre.pk, self.puerta_campus.pk})
+
+        # Las reglas de un rol no tocan a los demás
+        self.assertEqual(self.abre(self.perfiles['MAESTRO']), todas)
+
+    def test_invalidacion_al_cambiar_una_regla(self):
+        alumno = self.perfiles['ALUMNO']
+        regla = AccessPolicy.objects.create(
+            rol='ALUMNO', accion='ABRIR_PUERTA', puerta=self.puerta_campus, permitido=False,
+        )
+        self.assertNotIn(self.puerta_campus.pk, self.abre(alumno))
+        regla.permitido = True
+        regla.save()
+        self.assertIn(self.puerta_campus.pk, self.abre(alumno))
+        regla.delete()
+        self.assertIn(self.puerta_campus.pk, self.abre(alumno))
+
+        # Regla común a todas las escuelas
+        comun = AccessPolicy.objects.get(rol='ALUMNO', accion='ABRIR_PUERTA', zona=None, puerta=None)
+        comun.permitido = False
+        comun.save()
+        self.assertEqual(self.abre(alumno), set())
+        self.assertFalse(alumno.puede_abrir_puerta())
+
+        # Cambio de rol: los arreglos de usuarios se recargan
+        alumno.rol = 'MAESTRO'
+        alumno.save()
+        self.assertIn(alumno.pk, self.motor.quien_puede(None, 'CONTROLAR_SEGURO'))
+        self.assertEqual(self.abre(alumno), {puerta.pk for puerta in self.puertas})
+
+    @override_settings(POLICY_SYNC_INTERVAL=0)
+    def test_otro_worker_ve_la_invalidacion(self):
+        # Motor de otro proceso: solo se entera por la versión en la caché
+        otro = MotorPoliticas(self.escuela_id)
+        maestro = self.perfiles['MAESTRO']
+        self.assertTrue(otro.perfil_puede(maestro, 'CONTROLAR_SEGURO', self.puerta_edificio))
+        self.assertIn(maestro.pk, otro.quien_puede(self.puerta_edificio.pk, 'CONTROLAR_SEGURO'))
+
+        AccessPolicy.objects.create(
+            rol='MAESTRO', accion='CONTROLAR_SEGURO', zona=self.edificio, permitido=False,
+        )
+        self.assertFalse(otro.perfil_puede(maestro, 'CONTROLAR_SEGURO', self.puerta_edificio))
+        self.assertTrue(otro.perfil_puede(maestro, 'CONTROLAR_SEGURO', self.puerta_campus))
+
+        maestro.activo = False
+        maestro.save()
+        self.assertNotIn(maestro.pk, otro.quien_puede(self.puerta_campus.pk, 'CONTROLAR_SEGURO'))
+
+
+@override_settings(ADMIN_COUNT_THRESHOLD=3)
+class PaginadorAproximadoTests(TestCase):
+    """Conteo de listados filtrados (p. ej. el personal de una escuela)"""
+
+    def setUp(self):
+        for i in range(5):
+            Door.objects.create(nombre=f'Puerta {i}', activa=i < 2)
+
+    def contar(self, queryset):
+        paginador = PaginadorAproximado(queryset, 25)
+        return paginador.count, paginador.aproximado
+
+    def test_exacto_bajo_el_umbral(self):
+        self.assertEqual(self.contar(Door.objects.filter(activa=True)), (2, False))
+
+    def test_estimacion_del_planificador(self):
+        with mock.patch('access_control.paginators.filas_filtradas_estimadas', return_value=1200) as estimar:
+            self.assertEqual(self.contar(Door.objects.filter(activa=False)), (1200, True))
+        estimar.assert_called_once()
+
+    def test_estimacion_nunca_menor_al_umbral(self):
+        with mock.patch('access_control.paginators.filas_filtradas_estimadas', return_value=1):
+            self.assertEqual(self.contar(Door.objects.filter(activa=False)), (3, True))
+
+    def test_sin_estimacion_queda_acotado(self):
+        # SQLite no da estimaciones del planificador
+        self.assertEqual(self.contar(Door.objects.filter(activa=False)), (3, True))
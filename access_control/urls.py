@@ -0,0 +1,14 @@
+"""
+URLs de autenticación de la API (/api/auth/).
+"""
+from django.urls import path
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from .views import LogoutView, RefreshView
+
+
+urlpatterns = [
+    path('login/', TokenObtainPairView.as_view(), name='auth-login'),
+    path('refresh/', RefreshView.as_view(), name='auth-refresh'),
+    path('logout/', LogoutView.as_view(), name='auth-logout'),
+]
@@ -1,3 +1,170 @@
-from django.shortcuts import render
+"""
+Vistas de la app access_control: API de autenticación, análisis de
+impacto de cambios de políticas y reporte de perfiles del admin.
+"""
+from datetime import datetime
 
-# Create your views here.
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.views import TokenRefreshView
+
+from .impact import por_puerta, simular, totales
+from .models import UserProfile, escuela_predeterminada
+from .profiling import cargar_perfiles, funciones_principales, resumen_por_ruta
+from .revocation import revocaciones
+from .serializers import ImpactoCambiosSerializer, LogoutSerializer, RefreshRevocableSerializer
+from .summaries import listado_perfiles, listado_puertas, resumen_perfil, resumen_puerta
+from .tenancy import escuela_limitada
+
+
+class RefreshView(TokenRefreshView):
+    """POST /api/auth/refresh/: renueva el access token"""
+    serializer_class = RefreshRevocableSerializer
+
+
+class LogoutView(APIView):
+    """
+    POST /api/auth/logout/: revoca el refresh token enviado y el
+    access token con el que se hizo la petición. El refresh token debe
+    ser del mismo usuario (403 si no): no se cierran sesiones ajenas.
+    """
+
+    def post(self, request):
+        serializer = LogoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        refresh = serializer.validated_data['refresh']
+        propietario = refresh.get(api_settings.USER_ID_CLAIM)
+        if str(propietario) != str(getattr(request.user, api_settings.USER_ID_FIELD)):
+            return Response(
+                {'detail': 'El refresh token pertenece a otro usuario'},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        revocaciones.revocar_token(refresh)
+        if request.auth is not None:
+            revocaciones.revocar_token(request.auth)
+        return Response(status=status.HTTP_205_RESET_CONTENT)
+
+
+class PuedeEditarPermisos(BasePermission):
+    """Superusuarios y perfiles con la política EDITAR_PERMISOS_SISTEMA"""
+
+    def has_permission(self, request, view):
+        if request.user.is_superuser:
+            return True
+        try:
+            return request.user.profile.puede('EDITAR_PERMISOS_SISTEMA')
+        except UserProfile.DoesNotExist:
+            return False
+
+
+class ImpactoCambiosView(APIView):
+    """
+    POST /api/policies/impact/: simula un cambio de reglas, permisos de
+    zona, roles o perfiles y devuelve qué accesos se conceden y cuáles se
+    revocan (por bloques de perfiles × puertas). No guarda nada.
+    """
+    permission_classes = [PuedeEditarPermisos]
+
+    def post(self, request):
+        serializer = ImpactoCambiosSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        impacto = simular(serializer.validated_data)
+        conteo = por_puerta(impacto)
+        return Response({
+            'accion': impacto.accion,
+            'usuarios': impacto.usuarios,
+            'puertas': impacto.puertas,
+            **totales(impacto),
+            'por_puerta': [
+                {'puerta': puerta, 'ganan': ganan, 'pierden': pierden}
+                for puerta, (ganan, pierden) in sorted(conteo.items(), key=lambda par: -sum(par[1]))
+            ],
+            'bloques': [
+                {
+                    'perfiles': bloque.perfiles.tolist(),
+                    'concedidas': bloque.concedidas.tolist(),
+                    'revocadas': bloque.revocadas.tolist(),
+                }
+                for bloque in impacto.bloques
+            ],
+            'segundos': round(impacto.segundos, 3),
+        })
+
+
+class PuedeVerModelo(BasePermission):
+    """Usuarios con el permiso de ver del modelo de la vista (staff del admin)"""
+
+    def has_permission(self, request, view):
+        return request.user.has_perm(view.permiso)
+
+
+class ResumenesView(APIView):
+    """
+    Listado (o un elemento con /<id>/) de los resúmenes en caché de la
+    escuela del usuario; los superusuarios eligen otra con ?escuela=<id>.
+    """
+    permission_classes = [PuedeVerModelo]
+    permiso = None
+    listado = None
+    resumen = None
+
+    def get(self, request, pk=None):
+        escuela_id = escuela_limitada(request.user)
+        if escuela_id is None:
+            try:
+                escuela_id = int(request.query_params.get('escuela') or escuela_predeterminada())
+            except ValueError:
+                raise ValidationError({'escuela': 'Usa un ID numérico.'})
+        if pk is None:
+            return Response(self.listado(escuela_id))
+        resumen = self.resumen(escuela_id, pk)
+        if resumen is None:
+            raise NotFound()
+        return Response(resumen)
+
+
+class PuertasView(ResumenesView):
+    """GET /api/doors/[<id>/]: puertas con su seguro y bloqueo heredado"""
+    permiso = 'access_control.view_door'
+    listado = staticmethod(listado_puertas)
+    resumen = staticmethod(resumen_puerta)
+
+
+class PerfilesView(ResumenesView):
+    """GET /api/profiles/[<id>/]: datos básicos de los perfiles"""
+    permiso = 'access_control.view_userprofile'
+    listado = staticmethod(listado_perfiles)
+    resumen = staticmethod(resumen_perfil)
+
+
+def reporte_perfiles(request):
+    """
+    Vista del admin (/admin/perfiles/): rutas perfiladas y, al elegir
+    una, sus funciones más costosas. Solo superusuarios.
+    """
+    if not request.user.is_superuser:
+        raise PermissionDenied
+    perfiles = cargar_perfiles()
+    ruta = request.GET.get('ruta')
+    orden = 'acumulado' if request.GET.get('orden') == 'acumulado' else 'propio'
+
+    rutas = resumen_por_ruta(perfiles)
+    for fila in rutas:
+        fila['ultima'] = datetime.fromtimestamp(fila['ultima'])
+    contexto = {
+        **admin.site.each_context(request),
+        'title': 'Perfiles de peticiones',
+        'rutas': rutas,
+        'ruta': ruta,
+        'orden': orden,
+        'funciones': funciones_principales(perfiles, ruta, orden) if ruta else [],
+        'total_perfiles': len(perfiles),
+    }
+    return TemplateResponse(request, 'admin/access_control/perfiles.html', contexto)
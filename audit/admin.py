@@ -0,0 +1,110 @@
+from django.contrib import admin
+from django.urls import reverse
+from django.utils.html import format_html
+from access_control.admin import PorEscuelaAdmin
+from access_control.paginators import TablaGrandeAdmin
+from .models import AccessAttempt, SecurityAlert, Occupancy
+
+
+@admin.register(AccessAttempt)
+class AccessAttemptAdmin(PorEscuelaAdmin, TablaGrandeAdmin):
+    """
+    Administración de intentos de acceso con vista previa de la fotografía.
+    """
+    campo_escuela = 'puerta__escuela'
+    list_display = [
+        'fecha_hora', 'puerta', 'usuario', 'sentido', 'exitoso',
+        'motivo', 'dispositivo', 'vista_previa'
+    ]
+    list_filter = ['exitoso', 'sentido', 'fecha_hora']
+    search_fields = [
+        'puerta__nombre', 'usuario__username', 'motivo'
+    ]
+    ordering = ['-fecha_hora']
+    readonly_fields = [
+        'usuario', 'puerta', 'dispositivo', 'fecha_hora', 'exitoso', 'sentido',
+        'codigo_usado', 'motivo', 'imagen', 'ip_address', 'clave_idempotencia',
+        'vista_previa', 'buscar_similares'
+    ]
+    list_select_related = ['puerta', 'usuario', 'dispositivo']
+    list_per_page = 25
+    
+    def vista_previa(self, obj):
+        """Miniatura de la fotografía del intento"""
+        if not obj.imagen:
+            return '-'
+        return format_html('<img src="{}" style="max-height: 80px;" />', obj.imagen.url)
+    vista_previa.short_description = 'Foto'
+    
+    def buscar_similares(self, obj):
+        """Enlace a los intentos con una foto parecida"""
+        if obj.phash is None:
+            return '-'
+        url = reverse('admin-fotos-similares-intento', args=[obj.pk])
+        return format_html('<a href="{}">🔍 Buscar fotos similares</a>', url)
+    buscar_similares.short_description = 'Fotos similares'
+    
+    def has_add_permission(self, request):
+        """Los intentos solo los registran los controladores"""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        """Los intentos de acceso no se modifican"""
+        return False
+
+
+@admin.register(SecurityAlert)
+class SecurityAlertAdmin(PorEscuelaAdmin, TablaGrandeAdmin):
+    """
+    Administración de alertas del detector de anomalías.
+    """
+    campo_escuela = 'puerta__escuela'
+    list_display = ['fecha_hora', 'tipo', 'puerta', 'usuario', 'detalle', 'revisada']
+    list_filter = ['tipo', 'revisada', 'fecha_hora']
+    search_fields = ['puerta__nombre', 'usuario__username', 'detalle']
+    ordering = ['-fecha_hora']
+    readonly_fields = [
+        'tipo', 'fecha_hora', 'puerta', 'usuario', 'intento',
+        'detalle', 'fecha_creacion'
+    ]
+    list_select_related = ['puerta', 'usuario']
+    list_per_page = 25
+    
+    actions = ['marcar_revisadas']
+    
+    def marcar_revisadas(self, request, queryset):
+        """Acción para marcar alertas como revisadas"""
+        updated = queryset.update(revisada=True)
+        self.message_user(request, f'{updated} alerta(s) marcada(s) como revisada(s).')
+    marcar_revisadas.short_description = "Marcar como revisadas"
+    
+    def has_add_permission(self, request):
+        """Las alertas solo las genera el detector"""
+        return False
+
+
+@admin.register(Occupancy)
+class OccupancyAdmin(PorEscuelaAdmin, admin.ModelAdmin):
+    """
+    Ocupación por puerta en el periodo actual (la escriben los contadores
+    en memoria de cada worker; se muestra tal como se volcó).
+    """
+    campo_escuela = 'puerta__escuela'
+    list_display = ['puerta', 'personas', 'capacidad', 'periodo', 'fecha_actualizacion']
+    search_fields = ['puerta__nombre']
+    ordering = ['puerta__nombre']
+    list_select_related = ['puerta']
+    list_per_page = 50
+    
+    def capacidad(self, obj):
+        """Capacidad de la puerta"""
+        return obj.puerta.capacidad if obj.puerta.capacidad is not None else '-'
+    capacidad.short_description = 'Capacidad'
+    
+    def has_add_permission(self, request):
+        """La ocupación solo la calculan los contadores"""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        """La ocupación solo la calculan los contadores"""
+        return False
@@ -0,0 +1,289 @@
+"""
+Detección de anomalías en flujo sobre los intentos de acceso.
+
+El detector procesa cada intento en cuanto se registra (y, en modo
+reproducción, sobre el historial) manteniendo estadísticas por usuario,
+código y puerta en ventanas deslizantes de tamaño fijo:
+
+- DENEGACIONES: un mismo código o una misma puerta acumula demasiados
+  intentos denegados dentro de la ventana.
+- HORARIO: acceso concedido fuera del horario general o a una hora que
+  el usuario casi nunca usa (histograma de 24 horas por usuario).
+- DESPLAZAMIENTO: el mismo usuario/código en edificios distintos con
+  menos segundos de diferencia de los que toma desplazarse.
+
+La memoria está acotada: cada mapa conserva como máximo MAX_TRACKED_KEYS
+claves y descarta las menos usadas. En vivo hay un detector por escuela,
+así que el tráfico de una escuela grande no desaloja las estadísticas de
+las demás.
+
+En vivo cada worker tiene su propio detector, así que las ventanas de
+DENEGACIONES y el último acceso de DESPLAZAMIENTO se guardan en la caché
+compartida (compartido=True): los intentos de un código que llegan a
+workers distintos cuentan en la misma ventana y la alerta sale una sola
+vez (el enfriamiento es un cache.add). La ventana compartida cuenta por
+cubetas de DENIED_WINDOW / SHARED_BUCKETS segundos, así que puede incluir
+hasta una cubeta de más. El histograma de horas de cada usuario sigue
+siendo por worker: es un perfil que se aprende, no un umbral. Con la
+caché local en memoria (desarrollo) cada worker ve solo lo suyo. La
+reproducción del historial usa ventanas en memoria.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from access_control.models import Door
+from access_control.tenancy import PorEscuela
+from .models import SecurityAlert
+
+
+logger = logging.getLogger(__name__)
+
+Evento = namedtuple('Evento', ['fecha_hora', 'puerta_id', 'usuario_id', 'codigo', 'exitoso', 'intento_id'])
+
+
+def evento_desde_intento(intento):
+    """Convierte un AccessAttempt en un evento del detector"""
+    return Evento(
+        intento.fecha_hora, intento.puerta_id, intento.usuario_id,
+        intento.codigo_usado, intento.exitoso, intento.pk,
+    )
+
+
+def cargar_edificios(escuela_id=None):
+    """
+    Mapa puerta → edificio, a partir de la tabla de cierre de zonas
+    (solo las puertas de la escuela, si se indica)
+    """
+    puertas = Door.objects.filter(zona__cierre_ancestros__ancestro__tipo='EDIFICIO')
+    if escuela_id is not None:
+        puertas = puertas.filter(escuela_id=escuela_id)
+    return dict(puertas.values_list('pk', 'zona__cierre_ancestros__ancestro_id'))
+
+
+class MapaAcotado:
+    """Diccionario LRU con un número máximo de claves"""
+
+    def __init__(self, maximo, fabrica):
+        self.maximo = maximo
+        self.fabrica = fabrica
+        self.datos = OrderedDict()
+
+    def obtener(self, clave):
+        valor = self.datos.get(clave)
+        if valor is None:
+            valor = self.datos[clave] = self.fabrica()
+            if len(self.datos) > self.maximo:
+                self.datos.popitem(last=False)
+        else:
+            self.datos.move_to_end(clave)
+        return valor
+
+    def __len__(self):
+        return len(self.datos)
+
+
+class VentanaDeslizante:
+    """Últimos N instantes de un contador, con enfriamiento de alertas"""
+
+    __slots__ = ('instantes', 'ultima_alerta')
+
+    def __init__(self, tamano):
+        self.instantes = deque(maxlen=tamano)
+        self.ultima_alerta = None
+
+    def agregar(self, instante, ventana):
+        """Agrega un instante; True si la ventana se llenó dentro del plazo"""
+        self.instantes.append(instante)
+        return (
+            len(self.instantes) == self.instantes.maxlen
+            and instante - self.instantes[0] <= ventana
+        )
+
+
+class EstadoUsuario:
+    """Histograma de horas y último acceso de un usuario o código"""
+
+    __slots__ = ('horas', 'total', 'ultimo_instante', 'ultimo_edificio', 'ultima_puerta')
+
+    def __init__(self):
+        self.horas = [0] * 24
+        self.total = 0
+        self.ultimo_instante = None
+        self.ultimo_edificio = None
+        self.ultima_puerta = None
+
+
+class DetectorAnomalias:
+    """
+    Detector incremental. procesar() devuelve las alertas (sin guardar)
+    que dispara cada evento; los eventos deben llegar en orden temporal.
+    """
+
+    def __init__(self, configuracion=None, edificios=None, escuela_id=None, compartido=False):
+        config = dict(settings.ANOMALY_DETECTION)
+        config.update(configuracion or {})
+        self.config = config
+        maximo = config['MAX_TRACKED_KEYS']
+
+        self.denegaciones_codigo = MapaAcotado(maximo, lambda: VentanaDeslizante(config['DENIED_THRESHOLD']))
+        self.denegaciones_puerta = MapaAcotado(maximo, lambda: VentanaDeslizante(config['DOOR_DENIED_THRESHOLD']))
+        self.usuarios = MapaAcotado(maximo, EstadoUsuario)
+
+        # Ventanas y último acceso en la caché compartida (detector en vivo)
+        self.compartido = compartido
+
+        # Con un mapa fijo (reproducción) no se refresca desde la BD
+        self.escuela_id = escuela_id
+        self._edificios = edificios
+        self._edificios_fijos = edificios is not None
+        self._edificios_cargados = 0.0
+        self._lock = threading.Lock()
+
+    def edificio_de(self, puerta_id):
+        if not self._edificios_fijos:
+            ahora = time.monotonic()
+            if self._edificios is None or ahora - self._edificios_cargados > self.config['ZONE_REFRESH']:
+                self._edificios = cargar_edificios(self.escuela_id)
+                self._edificios_cargados = ahora
+        return self._edificios.get(puerta_id)
+
+    def _en_enfriamiento(self, estado, instante):
+        if estado.ultima_alerta is not None and instante - estado.ultima_alerta < self.config['ALERT_COOLDOWN']:
+            return True
+        estado.ultima_alerta = instante
+        return False
+
+    def _alerta(self, tipo, evento, detalle):
+        return SecurityAlert(
+            tipo=tipo,
+            fecha_hora=evento.fecha_hora,
+            puerta_id=evento.puerta_id,
+            usuario_id=evento.usuario_id,
+            intento_id=evento.intento_id,
+            detalle=detalle[:255],
+        )
+
+    def procesar(self, evento):
+        """Actualiza las estadísticas con el evento y devuelve sus alertas"""
+        instante = evento.fecha_hora.timestamp()
+        alertas = []
+        with self._lock:
+            if evento.exitoso:
+                alertas += self._horario(evento, instante)
+            else:
+                alertas += self._denegaciones(evento, instante)
+            alertas += self._desplazamiento(evento, instante)
+        return alertas
+
+    def _supera(self, mapa, nombre, clave, umbral, instante):
+        """True si la clave llenó su ventana de denegaciones y no está en enfriamiento"""
+        ventana = self.config['DENIED_WINDOW']
+        if not self.compartido:
+            estado = mapa.obtener(clave)
+            return estado.agregar(instante, ventana) and not self._en_enfriamiento(estado, instante)
+
+        paso = max(1, ventana // self.config['SHARED_BUCKETS'])
+        base = f'anomalias:{self.escuela_id}:{nombre}:{clave}'
+        cubeta = int(instante // paso)
+        actual = f'{base}:{cubeta}'
+        if not cache.add(actual, 1, ventana + paso):
+            try:
+                cache.incr(actual)
+            except ValueError:
+                cache.set(actual, 1, ventana + paso)
+        cubetas = [f'{base}:{c}' for c in range(cubeta - ventana // paso, cubeta + 1)]
+        return (
+            sum(cache.get_many(cubetas).values()) >= umbral
+            and cache.add(f'{base}:alerta', 1, self.config['ALERT_COOLDOWN'])
+        )
+
+    def _denegaciones(self, evento, instante):
+        alertas = []
+        ventana = self.config['DENIED_WINDOW']
+        umbral = self.config['DENIED_THRESHOLD']
+        if evento.codigo and self._supera(self.denegaciones_codigo, 'codigo', evento.codigo, umbral, instante):
+            alertas.append(self._alerta(
+                'DENEGACIONES', evento,
+                f'{umbral} intentos denegados con el mismo código en {ventana} s',
+            ))
+        umbral = self.config['DOOR_DENIED_THRESHOLD']
+        if self._supera(self.denegaciones_puerta, 'puerta', evento.puerta_id, umbral, instante):
+            alertas.append(self._alerta(
+                'DENEGACIONES', evento,
+                f'{umbral} intentos denegados en la puerta en {ventana} s',
+            ))
+        return alertas
+
+    def _horario(self, evento, instante):
+        if evento.usuario_id is None:
+            return []
+        hora = timezone.localtime(evento.fecha_hora).hour
+        estado = self.usuarios.obtener(evento.usuario_id)
+        inicio, fin = self.config['BUSINESS_HOURS']
+        detalle = None
+        if not inicio <= hora < fin:
+            detalle = f'Acceso a las {hora:02d} h, fuera del horario {inicio:02d}-{fin:02d} h'
+        elif (
+            estado.total >= self.config['UNUSUAL_HOUR_MIN_EVENTS']
+            and estado.horas[hora] / estado.total < self.config['UNUSUAL_HOUR_RATIO']
+        ):
+            detalle = f'Acceso a las {hora:02d} h, hora poco habitual para el usuario'
+        estado.horas[hora] += 1
+        estado.total += 1
+        return [self._alerta('HORARIO', evento, detalle)] if detalle else []
+
+    def _desplazamiento(self, evento, instante):
+        clave = evento.usuario_id if evento.usuario_id is not None else evento.codigo
+        if not clave:
+            return []
+        edificio = self.edificio_de(evento.puerta_id)
+        actual = (instante, edificio, evento.puerta_id)
+        if self.compartido:
+            clave_cache = f'anomalias:{self.escuela_id}:ultimo:{clave}'
+            anterior = cache.get(clave_cache)
+            cache.set(clave_cache, actual, self.config['TRAVEL_WINDOW'])
+        else:
+            estado = self.usuarios.obtener(clave)
+            anterior = (
+                (estado.ultimo_instante, estado.ultimo_edificio, estado.ultima_puerta)
+                if estado.ultimo_instante is not None else None
+            )
+            estado.ultimo_instante, estado.ultimo_edificio, estado.ultima_puerta = actual
+
+        alertas = []
+        if anterior is not None:
+            ultimo_instante, ultimo_edificio, ultima_puerta = anterior
+            if (
+                edificio is not None
+                and ultimo_edificio is not None
+                and ultimo_edificio != edificio
+                and instante - ultimo_instante < self.config['TRAVEL_WINDOW']
+            ):
+                segundos = int(instante - ultimo_instante)
+                alertas.append(self._alerta(
+                    'DESPLAZAMIENTO', evento,
+                    f'Mismo código en otro edificio {segundos} s después (puerta {ultima_puerta})',
+                ))
+        return alertas
+
+
+detectores = PorEscuela(lambda escuela_id: DetectorAnomalias(escuela_id=escuela_id, compartido=True))
+
+
+def analizar_intento(intento):
+    """
+    Pasa un intento recién registrado por el detector en vivo de la
+    escuela de su puerta y guarda las alertas que dispare.
+    """
+    alertas = detectores(intento.puerta.escuela_id).procesar(evento_desde_intento(intento))
+    if alertas:
+        SecurityAlert.objects.bulk_create(alertas)
+        for alerta in alertas:
+            logger.warning('Alerta de seguridad %s: %s', alerta.tipo, alerta.detalle)
+    return alertas
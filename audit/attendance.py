@@ -0,0 +1,252 @@
+"""
+Asistencia por grupo y sesión de clase a partir de los intentos de acceso.
+
+Una sesión es un horario (ClassSchedule) en una fecha concreta dentro de
+las fechas del grupo. Un alumno asistió si entró por la puerta del
+horario entre EARLY_MINUTES antes del inicio y el fin de la clase; si su
+primera entrada fue más de LATE_MINUTES después del inicio, es retardo.
+
+El cálculo es en bloque, no por alumno ni por sesión:
+
+1. Una consulta trae las entradas exitosas de las puertas involucradas en
+   el rango de fechas (puerta, usuario, instante) como arreglos NumPy.
+2. Se ordenan por (puerta, instante); cada sesión es un corte del arreglo
+   encontrado con searchsorted, y la primera entrada de cada usuario en
+   el corte sale de np.unique.
+
+El resultado por sesión ({usuario: primera entrada}) se guarda en la caché
+cuando la sesión ya terminó. La clave depende de la puerta, del horario
+y de un número de versión por puerta, y no se filtra por alumnos
+inscritos (eso se hace al leer), así que cambiar la lista de un grupo no
+la invalida. Una entrada que llega después de su sesión (lote de un
+controlador que estuvo sin conexión) sube la versión de su puerta con
+invalidar_puerta() y las sesiones guardadas se recalculan. Los reportes largos se
+recorren por bloques de CHUNK_DAYS días para no tener el semestre en memoria.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from access_control.models import ClassGroup, ClassSchedule, UserProfile
+from access_control.tenancy import incrementar_version
+from .models import AccessAttempt
+
+
+Sesion = namedtuple('Sesion', ['horario', 'fecha', 'inicio', 'fin'])
+
+PRESENTE, RETARDO, FALTA = 'Presente', 'Retardo', 'Falta'
+ENCABEZADOS = [
+    'Grupo', 'Periodo', 'Fecha', 'Inicio', 'Fin', 'Puerta',
+    'Usuario', 'Nombre', 'Asistencia', 'Hora de entrada',
+]
+
+
+def grupos_visibles(usuario):
+    """
+    Superusuarios ven todos los grupos; los perfiles con la política
+    VER_ASISTENCIA (por defecto administradores y directores), los de su
+    escuela; los demás, los suyos
+    """
+    grupos = ClassGroup.objects.all()
+    if usuario.is_superuser:
+        return grupos
+    try:
+        perfil = usuario.profile
+    except UserProfile.DoesNotExist:
+        return grupos.filter(maestro=usuario)
+    grupos = grupos.filter(escuela_id=perfil.escuela_id)
+    if perfil.puede_ver_asistencia():
+        return grupos
+    return grupos.filter(maestro=usuario)
+
+
+def horarios_de(grupos):
+    return list(ClassSchedule.objects.filter(grupo__in=grupos).select_related('grupo', 'puerta'))
+
+
+def sesiones(grupos, desde, hasta, horarios=None):
+    """Sesiones de los grupos entre dos fechas (inclusive) que ya empezaron, en orden"""
+    ahora = timezone.now()
+    resultado = []
+    for horario in horarios if horarios is not None else horarios_de(grupos):
+        inicio_rango = max(desde, horario.grupo.fecha_inicio)
+        fin_rango = min(hasta, horario.grupo.fecha_fin)
+        # Primer día de la semana del horario dentro del rango
+        fecha = inicio_rango + timedelta(days=(horario.dia_semana - inicio_rango.weekday()) % 7)
+        while fecha <= fin_rango:
+            inicio = timezone.make_aware(datetime.combine(fecha, horario.hora_inicio))
+            if inicio > ahora:
+                break
+            fin = timezone.make_aware(datetime.combine(fecha, horario.hora_fin))
+            resultado.append(Sesion(horario, fecha, inicio, fin))
+            fecha += timedelta(days=7)
+    resultado.sort(key=lambda sesion: (sesion.inicio, sesion.horario.grupo_id))
+    return resultado
+
+
+def _clave(sesion):
+    return f'asistencia:{sesion.horario.puerta_id}:{sesion.inicio:%Y%m%d%H%M}:{sesion.fin:%H%M}'
+
+
+def clave_version(puerta_id):
+    return f'asistencia:{puerta_id}:version'
+
+
+def invalidar_puerta(puerta_id):
+    """
+    Descarta las sesiones guardadas de la puerta cuando la transacción en
+    curso se confirma (llegaron entradas a sesiones ya terminadas)
+    """
+    transaction.on_commit(lambda: incrementar_version(clave_version(puerta_id)))
+
+
+def _ventana(sesion):
+    return sesion.inicio - timedelta(minutes=settings.ATTENDANCE['EARLY_MINUTES']), sesion.fin
+
+
+def _calcular(pendientes):
+    """
+    {clave: {usuario_id: primera entrada (epoch)}} de las sesiones con una
+    sola consulta de entradas y cortes sobre arreglos ordenados.
+    """
+    ventanas = [_ventana(sesion) for sesion in pendientes]
+    filas = list(
+        AccessAttempt.objects
+        .filter(
+            exitoso=True,
+            sentido='ENTRADA',
+            usuario__isnull=False,
+            puerta_id__in={sesion.horario.puerta_id for sesion in pendientes},
+            fecha_hora__gte=min(desde for desde, _ in ventanas),
+            fecha_hora__lt=max(hasta for _, hasta in ventanas),
+        )
+        .values_list('puerta_id', 'usuario_id', 'fecha_hora')
+        .order_by()
+    )
+    puertas = np.fromiter((fila[0] for fila in filas), dtype=np.int64, count=len(filas))
+    usuarios = np.fromiter((fila[1] for fila in filas), dtype=np.int64, count=len(filas))
+    instantes = np.fromiter((fila[2].timestamp() for fila in filas), dtype=np.float64, count=len(filas))
+    del filas
+    orden = np.lexsort((instantes, puertas))
+    puertas, usuarios, instantes = puertas[orden], usuarios[orden], instantes[orden]
+
+    resultados = {}
+    for sesion, (desde, hasta) in zip(pendientes, ventanas):
+        puerta = sesion.horario.puerta_id
+        a, b = np.searchsorted(puertas, [puerta, puerta + 1])
+        i, j = np.searchsorted(instantes[a:b], [desde.timestamp(), hasta.timestamp()])
+        # Ordenados por instante: la primera aparición es la primera entrada
+        ids, primeras = np.unique(usuarios[a + i:a + j], return_index=True)
+        resultados[_clave(sesion)] = dict(zip(ids.tolist(), instantes[a + i + primeras].tolist()))
+    return resultados
+
+
+def entradas_por_sesion(lista_sesiones):
+    """{clave de sesión: {usuario_id: primera entrada}}, usando la caché para las terminadas"""
+    versiones = cache.get_many({clave_version(sesion.horario.puerta_id) for sesion in lista_sesiones})
+    en_cache = {
+        _clave(sesion): f'{_clave(sesion)}:v{versiones.get(clave_version(sesion.horario.puerta_id), 0)}'
+        for sesion in lista_sesiones
+    }
+    guardados = cache.get_many(en_cache.values())
+    resultados = {clave: guardados[version] for clave, version in en_cache.items() if version in guardados}
+    pendientes = {}
+    for sesion in lista_sesiones:
+        clave = _clave(sesion)
+        if clave not in resultados:
+            pendientes.setdefault(clave, sesion)
+    if pendientes:
+        calculados = _calcular(list(pendientes.values()))
+        resultados.update(calculados)
+        ahora = timezone.now()
+        terminadas = {
+            en_cache[clave]: entradas for clave, entradas in calculados.items()
+            if pendientes[clave].fin <= ahora
+        }
+        cache.set_many(terminadas, settings.ATTENDANCE['CACHE_TIMEOUT'])
+    return resultados
+
+
+def _alumnos(grupos):
+    """{grupo_id: [(id, usuario, nombre), ...]} ordenados por usuario"""
+    alumnos = {grupo.pk: [] for grupo in grupos}
+    filas = (
+        ClassGroup.alumnos.through.objects
+        .filter(classgroup__in=grupos)
+        .order_by('user__username')
+        .values_list('classgroup_id', 'user_id', 'user__username', 'user__first_name', 'user__last_name')
+    )
+    for grupo_id, usuario_id, username, nombre, apellido in filas:
+        alumnos[grupo_id].append((usuario_id, username, f'{nombre} {apellido}'.strip()))
+    return alumnos
+
+
+def _estado(sesion, entrada):
+    if entrada is None:
+        return FALTA
+    limite = sesion.inicio + timedelta(minutes=settings.ATTENDANCE['LATE_MINUTES'])
+    return RETARDO if entrada > limite.timestamp() else PRESENTE
+
+
+def _bloques(grupos, desde, hasta):
+    """(sesiones, entradas) por bloques de CHUNK_DAYS días"""
+    paso = timedelta(days=settings.ATTENDANCE['CHUNK_DAYS'])
+    horarios = horarios_de(grupos)
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(hasta, inicio + paso - timedelta(days=1))
+        lista = sesiones(grupos, inicio, fin, horarios)
+        if lista:
+            yield lista, entradas_por_sesion(lista)
+        inicio = fin + timedelta(days=1)
+
+
+def resumen(grupos, desde, hasta):
+    """Por sesión: inscritos, presentes, retardos y porcentaje de asistencia"""
+    grupos = list(grupos)
+    alumnos = _alumnos(grupos)
+    filas = []
+    for lista, entradas in _bloques(grupos, desde, hasta):
+        for sesion in lista:
+            inscritos = alumnos[sesion.horario.grupo_id]
+            por_usuario = entradas[_clave(sesion)]
+            estados = [_estado(sesion, por_usuario.get(usuario_id)) for usuario_id, _, _ in inscritos]
+            asistieron = len(estados) - estados.count(FALTA)
+            filas.append({
+                'sesion': sesion,
+                'inscritos': len(inscritos),
+                'presentes': estados.count(PRESENTE),
+                'retardos': estados.count(RETARDO),
+                'porcentaje': asistieron / len(inscritos) * 100 if inscritos else 0,
+            })
+    return filas
+
+
+def filas_reporte(grupos, desde, hasta):
+    """Una fila por alumno inscrito y sesión (generador, en orden cronológico)"""
+    grupos = list(grupos)
+    alumnos = _alumnos(grupos)
+    zona = timezone.get_current_timezone()
+    for lista, entradas in _bloques(grupos, desde, hasta):
+        for sesion in lista:
+            horario = sesion.horario
+            por_usuario = entradas[_clave(sesion)]
+            for usuario_id, username, nombre in alumnos[horario.grupo_id]:
+                entrada = por_usuario.get(usuario_id)
+                yield [
+                    horario.grupo.nombre,
+                    horario.grupo.periodo,
+                    sesion.fecha,
+                    f'{horario.hora_inicio:%H:%M}',
+                    f'{horario.hora_fin:%H:%M}',
+                    horario.puerta.nombre,
+                    username,
+                    nombre,
+                    _estado(sesion, entrada),
+                    f'{datetime.fromtimestamp(entrada, zona):%H:%M:%S}' if entrada is not None else '',
+                ]
@@ -0,0 +1,140 @@
+"""
+Exportación en flujo a CSV y XLSX.
+
+Ambos generadores reciben las filas como un iterable y producen bytes a
+medida que las consumen, para usarse con StreamingHttpResponse o para
+escribir a un archivo: un reporte de un semestre nunca está completo en
+memoria. El XLSX se arma a mano (una hoja con cadenas en línea) dentro de
+un ZIP escrito sobre un búfer que se vacía después de cada bloque de filas.
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+
+FILAS_POR_BLOQUE = 500
+
+TIPOS_CONTENIDO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+RELACIONES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+LIBRO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+RELACIONES_LIBRO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+INICIO_HOJA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+FIN_HOJA = '</sheetData></worksheet>'
+
+# Caracteres de control que XML no admite
+CONTROL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _Bufer:
+    """Destino de escritura que acumula bytes hasta que se vacía"""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes.clear()
+        return datos
+
+
+class _Texto:
+    """Adaptador de texto a bytes para csv.writer"""
+
+    def __init__(self, bufer):
+        self.bufer = bufer
+
+    def write(self, texto):
+        return self.bufer.write(texto.encode())
+
+
+def csv_en_flujo(encabezados, filas):
+    """Líneas CSV codificadas en UTF-8 (con BOM para que Excel respete acentos)"""
+    bufer = _Bufer()
+    escritor = csv.writer(_Texto(bufer))
+    bufer.write('\ufeff'.encode())
+    escritor.writerow(encabezados)
+    for numero, fila in enumerate(filas, start=1):
+        escritor.writerow(fila)
+        if numero % FILAS_POR_BLOQUE == 0:
+            yield bufer.vaciar()
+    yield bufer.vaciar()
+
+
+def _celda(valor):
+    if valor is None or valor == '':
+        return '<c/>'
+    if isinstance(valor, bool):
+        valor = 'Sí' if valor else 'No'
+    elif isinstance(valor, (int, float)):
+        return f'<c><v>{valor}</v></c>'
+    elif isinstance(valor, datetime):
+        valor = valor.strftime('%Y-%m-%d %H:%M:%S')
+    elif isinstance(valor, date):
+        valor = valor.isoformat()
+    texto = escape(CONTROL.sub('', str(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila(valores):
+    return '<row>' + ''.join(_celda(valor) for valor in valores) + '</row>'
+
+
+def xlsx_en_flujo(encabezados, filas, hoja='Reporte'):
+    """Libro XLSX de una hoja, producido en bloques de FILAS_POR_BLOQUE filas"""
+    bufer = _Bufer()
+    with zipfile.ZipFile(bufer, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        libro.writestr('[Content_Types].xml', TIPOS_CONTENIDO)
+        libro.writestr('_rels/.rels', RELACIONES)
+        libro.writestr('xl/workbook.xml', LIBRO.format(hoja=escape(hoja[:31])))
+        libro.writestr('xl/_rels/workbook.xml.rels', RELACIONES_LIBRO)
+        yield bufer.vaciar()
+        with libro.open('xl/worksheets/sheet1.xml', 'w') as hoja_xml:
+            hoja_xml.write((INICIO_HOJA + _fila(encabezados)).encode())
+            for numero, fila in enumerate(filas, start=1):
+                hoja_xml.write(_fila(fila).encode())
+                if numero % FILAS_POR_BLOQUE == 0:
+                    yield bufer.vaciar()
+            hoja_xml.write(FIN_HOJA.encode())
+    yield bufer.vaciar()
@@ -0,0 +1,241 @@
+"""
+Mapa de uso por hora de la semana de cada puerta, por semestre.
+
+Cada puerta tiene en la tabla DoorUsage un arreglo fijo de 7 × 24
+contadores uint32 (672 bytes) por semestre, con los intentos exitosos
+(entradas y salidas) de cada hora de la semana en hora local. Nunca se
+agrupa el registro de intentos al consultar:
+
+- registrar() suma 1 a la celda del intento en un arreglo pendiente en
+  memoria del worker (uno por puerta y semestre) y regresa.
+- Un hilo por proceso, cada FLUSH_INTERVAL segundos (aunque el worker no
+  reciba más peticiones), bloquea las filas de esas puertas, les suma
+  sus pendientes con NumPy y las guarda; los contadores solo crecen, así
+  que el orden entre workers no importa.
+- mapa_de() lee los arreglos de las puertas pedidas (una consulta sobre
+  el índice único periodo, puerta) y los suma con NumPy.
+
+El semestre de un intento se deriva de su fecha: "AAAA-1" de enero al
+mes anterior a SECOND_SEMESTER_MONTH y "AAAA-2" desde ese mes, igual que
+ClassGroup.periodo. reconstruir_desde_registro() rehace un semestre
+desde los intentos (arranque o corrección manual) y sube la versión del
+semestre en la caché al empezar y al confirmar: el volcado de cualquier
+worker que la vea cambiar se deshace y descarta los pendientes de ese
+semestre, que el registro ya incluye.
+"""
+import atexit
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from access_control.tenancy import incrementar_version
+
+from .models import AccessAttempt, DoorUsage
+
+
+logger = logging.getLogger(__name__)
+
+DIAS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+CELDAS = 7 * 24
+PERIODO = re.compile(r'^\d{4}-[12]$')
+TIPO = np.dtype('<u4')
+
+
+def clave_version(periodo):
+    return f'mapa_uso:{periodo}:version'
+
+
+def periodo_de(momento=None):
+    """Semestre ("AAAA-1" o "AAAA-2") al que pertenece `momento`"""
+    local = timezone.localtime(momento)
+    semestre = 2 if local.month >= settings.HEATMAP['SECOND_SEMESTER_MONTH'] else 1
+    return f'{local.year}-{semestre}'
+
+
+def celda(momento):
+    """Posición de `momento` en el arreglo: día de la semana × 24 + hora local"""
+    local = timezone.localtime(momento)
+    return local.weekday() * 24 + local.hour
+
+
+def a_arreglo(conteos):
+    return np.frombuffer(bytes(conteos), dtype=TIPO) if conteos else np.zeros(CELDAS, dtype=TIPO)
+
+
+def rango_periodo(periodo):
+    """(inicio, fin) del semestre en hora local"""
+    anio, semestre = (int(parte) for parte in periodo.split('-'))
+    mes = settings.HEATMAP['SECOND_SEMESTER_MONTH']
+    if semestre == 1:
+        inicio, fin = datetime(anio, 1, 1), datetime(anio, mes, 1)
+    else:
+        inicio, fin = datetime(anio, mes, 1), datetime(anio + 1, 1, 1)
+    return timezone.make_aware(inicio), timezone.make_aware(fin)
+
+
+def reconstruir_desde_registro(periodo):
+    """
+    Recalcula los mapas del semestre desde los intentos exitosos (por
+    bloques de pk, sin agrupar en SQL) y devuelve cuántos contó.
+    """
+    # Antes de leer el registro: los volcados en curso del semestre se deshacen
+    incrementar_version(clave_version(periodo))
+    inicio, fin = rango_periodo(periodo)
+    intentos = AccessAttempt.objects.filter(exitoso=True, fecha_hora__gte=inicio, fecha_hora__lt=fin)
+    tamano = settings.HEATMAP['REBUILD_BATCH_SIZE']
+    mapas = {}
+    ultimo = 0
+    total = 0
+    while True:
+        bloque = list(
+            intentos.filter(pk__gt=ultimo).order_by('pk').values_list('pk', 'puerta_id', 'fecha_hora')[:tamano]
+        )
+        if not bloque:
+            break
+        ultimo = bloque[-1][0]
+        for _, puerta_id, fecha_hora in bloque:
+            if puerta_id not in mapas:
+                mapas[puerta_id] = np.zeros(CELDAS, dtype=TIPO)
+            mapas[puerta_id][celda(fecha_hora)] += 1
+        total += len(bloque)
+    with transaction.atomic():
+        DoorUsage.objects.filter(periodo=periodo).delete()
+        DoorUsage.objects.bulk_create([
+            DoorUsage(puerta_id=puerta_id, periodo=periodo, conteos=conteos.tobytes())
+            for puerta_id, conteos in mapas.items()
+        ], batch_size=1000)
+        transaction.on_commit(lambda: incrementar_version(clave_version(periodo)))
+    return total
+
+
+def mapa_de(puertas_ids, periodo):
+    """Suma de los mapas de las puertas en el semestre: arreglo 7 × 24 (uint64)"""
+    filas = DoorUsage.objects.filter(periodo=periodo, puerta_id__in=puertas_ids).values_list('conteos', flat=True)
+    datos = b''.join(bytes(conteos) for conteos in filas)
+    arreglos = np.frombuffer(datos, dtype=TIPO).reshape(-1, CELDAS)
+    return arreglos.sum(axis=0, dtype=np.uint64).reshape(7, 24)
+
+
+class AcumuladorUso:
+    """Conteos pendientes en memoria, volcados por suma a la tabla DoorUsage"""
+
+    def __init__(self):
+        self._pendiente = {}            # (periodo, puerta_id) → arreglo de 168 contadores
+        self._versiones = {}            # periodo → versión con la que se acumularon sus pendientes
+        self._pid = None
+        self._lock = threading.Lock()
+        self._volcando = threading.Lock()
+
+    def registrar(self, puerta_id, momento):
+        """Cuenta un intento exitoso por la puerta en `momento`"""
+        self._arrancar()
+        periodo = periodo_de(momento)
+        if periodo not in self._versiones:
+            self._versiones.setdefault(periodo, cache.get(clave_version(periodo)))
+        with self._lock:
+            arreglo = self._pendiente.get((periodo, puerta_id))
+            if arreglo is None:
+                arreglo = self._pendiente[periodo, puerta_id] = np.zeros(CELDAS, dtype=TIPO)
+            arreglo[celda(momento)] += 1
+
+    def _arrancar(self):
+        # Tras un fork (workers con preload) el hilo del padre no existe en el hijo
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pendiente = {}
+            self._versiones = {}
+            self._pid = os.getpid()
+            threading.Thread(target=self._ciclo, name='mapa-uso', daemon=True).start()
+
+    def _ciclo(self):
+        while True:
+            time.sleep(settings.HEATMAP['FLUSH_INTERVAL'])
+            try:
+                close_old_connections()
+                self.volcar()
+            except Exception:
+                logger.exception('Error en el volcado periódico de los mapas de uso')
+
+    def volcar(self):
+        """Suma los conteos pendientes a la tabla"""
+        with self._volcando:
+            self._volcar()
+
+    def _volcar(self):
+        with self._lock:
+            pendientes, self._pendiente = self._pendiente, {}
+        if not pendientes:
+            return
+        periodos = sorted({periodo for periodo, _ in pendientes})
+        versiones = {periodo: self._versiones.get(periodo) for periodo in periodos}
+        try:
+            with transaction.atomic():
+                DoorUsage.objects.bulk_create(
+                    [
+                        DoorUsage(puerta_id=puerta_id, periodo=periodo, conteos=bytes(CELDAS * TIPO.itemsize))
+                        for periodo, puerta_id in pendientes
+                    ],
+                    ignore_conflicts=True,
+                )
+                ahora = timezone.now()
+                cambios = []
+                for periodo in periodos:
+                    puertas_ids = [puerta_id for p, puerta_id in pendientes if p == periodo]
+                    filas = (
+                        DoorUsage.objects
+                        .select_for_update()
+                        .filter(periodo=periodo, puerta_id__in=puertas_ids)
+                        .order_by('pk')  # Mismo orden de bloqueo en todos los workers
+                    )
+                    for fila in filas:
+                        fila.conteos = (a_arreglo(fila.conteos) + pendientes[periodo, fila.puerta_id]).tobytes()
+                        fila.fecha_actualizacion = ahora
+                        cambios.append(fila)
+                DoorUsage.objects.bulk_update(cambios, ['conteos', 'fecha_actualizacion'])
+                actuales = cache.get_many([clave_version(periodo) for periodo in periodos])
+                reconstruidos = {
+                    periodo for periodo in periodos
+                    if actuales.get(clave_version(periodo)) != versiones[periodo]
+                }
+                if reconstruidos:
+                    # Semestres reconstruidos desde el registro, que ya incluye
+                    # estos conteos: no se suman y el resto se reintenta
+                    transaction.set_rollback(True)
+        except Exception:
+            reconstruidos = set()
+            logger.exception('No se pudieron volcar los mapas de uso')
+        else:
+            if not reconstruidos:
+                return
+            for periodo in reconstruidos:
+                self._versiones[periodo] = actuales.get(clave_version(periodo))
+        # Se reintenta en el siguiente volcado (sin los semestres reconstruidos)
+        with self._lock:
+            for clave, arreglo in pendientes.items():
+                if clave[0] in reconstruidos:
+                    continue
+                if clave in self._pendiente:
+                    self._pendiente[clave] += arreglo
+                else:
+                    self._pendiente[clave] = arreglo
+
+
+acumulador = AcumuladorUso()
+
+
+@atexit.register
+def _volcar_al_salir():
+    if acumulador._pendiente:
+        acumulador.volcar()
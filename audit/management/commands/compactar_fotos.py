@@ -0,0 +1,115 @@
+"""
+Management command para recomprimir y empaquetar por día las fotos de
+intentos de acceso más antiguas que PHOTO_ARCHIVE['AGE_DAYS'].
+Cada día se procesa en un proceso del pool (la recompresión con Pillow
+es trabajo de CPU); ver audit/photos.py para el formato del paquete.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from audit.photos import compactar_dia
+
+
+DIRECTORIO_FOTOS = 'access_attempts'
+
+
+def dias_con_fotos(raiz):
+    """(fecha, ruta) de cada directorio AAAA/MM/DD con archivos sueltos"""
+    for anio in sorted(os.listdir(raiz)):
+        for mes in sorted(os.listdir(os.path.join(raiz, anio))):
+            ruta_mes = os.path.join(raiz, anio, mes)
+            if not os.path.isdir(ruta_mes):
+                continue
+            for dia in sorted(os.listdir(ruta_mes)):
+                ruta_dia = os.path.join(ruta_mes, dia)
+                if not os.path.isdir(ruta_dia):
+                    continue  # Paquetes ya creados
+                try:
+                    fecha = date(int(anio), int(mes), int(dia))
+                except ValueError:
+                    continue
+                yield fecha, ruta_dia
+
+
+class Command(BaseCommand):
+    help = 'Recomprime y empaqueta por día las fotos antiguas de intentos de acceso'
+
+    def add_arguments(self, parser):
+        config = settings.PHOTO_ARCHIVE
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=config['AGE_DAYS'],
+            help=f'Antigüedad mínima en días (default: {config["AGE_DAYS"]})',
+        )
+        parser.add_argument(
+            '--calidad',
+            type=int,
+            default=config['QUALITY'],
+            help=f'Calidad JPEG al recomprimir (default: {config["QUALITY"]})',
+        )
+        parser.add_argument(
+            '--max-lado',
+            type=int,
+            default=config['MAX_SIDE'],
+            help=f'Lado mayor en píxeles, 0 = sin redimensionar (default: {config["MAX_SIDE"]})',
+        )
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Procesos en paralelo (default: número de CPUs)',
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Solo mostrar los días que se compactarían',
+        )
+
+    def handle(self, *args, **kwargs):
+        if not 1 <= kwargs['calidad'] <= 95:
+            raise CommandError('La calidad debe estar entre 1 y 95')
+        raiz = os.path.join(settings.MEDIA_ROOT, DIRECTORIO_FOTOS)
+        limite = timezone.localdate() - timedelta(days=kwargs['dias'])
+        self.stdout.write(self.style.SUCCESS(f'🗜️  Compactando fotos anteriores al {limite:%Y-%m-%d}'))
+
+        if not os.path.isdir(raiz):
+            self.stdout.write('No hay fotos almacenadas')
+            return
+        pendientes = [(fecha, ruta) for fecha, ruta in dias_con_fotos(raiz) if fecha < limite]
+        if kwargs['simular']:
+            for fecha, ruta in pendientes:
+                self.stdout.write(f'  {fecha:%Y-%m-%d}: {len(os.listdir(ruta))} archivos')
+            self.stdout.write(f'\n📊 Días por compactar: {len(pendientes)}')
+            return
+
+        archivos = antes = despues = errores = 0
+        with ProcessPoolExecutor(max_workers=max(1, kwargs['procesos'])) as pool:
+            tareas = {
+                pool.submit(compactar_dia, ruta, kwargs['calidad'], kwargs['max_lado']): fecha
+                for fecha, ruta in pendientes
+            }
+            for tarea in as_completed(tareas):
+                fecha = tareas[tarea]
+                try:
+                    n, bytes_antes, bytes_despues = tarea.result()
+                except Exception as e:
+                    errores += 1
+                    self.stdout.write(self.style.ERROR(f'  ❌ {fecha:%Y-%m-%d}: {e}'))
+                    continue
+                archivos += n
+                antes += bytes_antes
+                despues += bytes_despues
+                self.stdout.write(f'  ✓ {fecha:%Y-%m-%d}: {n} fotos, {bytes_antes / 2**20:.1f} → {bytes_despues / 2**20:.1f} MB')
+
+        self.stdout.write('\n📊 RESUMEN:')
+        self.stdout.write(f'  Días compactados: {len(pendientes) - errores}')
+        self.stdout.write(f'  Fotos empaquetadas: {archivos}')
+        self.stdout.write(f'  Tamaño: {antes / 2**20:.1f} MB → {despues / 2**20:.1f} MB')
+        if errores:
+            self.stdout.write(self.style.WARNING(f'  Días con error: {errores}'))
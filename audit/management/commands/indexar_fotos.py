@@ -0,0 +1,73 @@
+"""
+Management command para calcular el hash perceptual de las fotos de
+intentos registrados antes de que existiera el índice (o de todas, con
+--reindexar). Lee las fotos sueltas o dentro de los paquetes diarios;
+ver audit/similarity.py.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from access_control.tenancy import escuelas_ids
+from audit.models import AccessAttempt
+from audit.photos import almacenamiento_fotos
+from audit.similarity import hash_perceptual, indices
+
+
+class Command(BaseCommand):
+    help = 'Calcula el hash perceptual de las fotos de intentos que no lo tienen'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=500,
+            help='Intentos por consulta y por actualización (default: 500)',
+        )
+        parser.add_argument(
+            '--reindexar',
+            action='store_true',
+            help='Recalcular también los que ya tienen hash',
+        )
+
+    def handle(self, *args, **kwargs):
+        lote = max(1, kwargs['lote'])
+        intentos = AccessAttempt.objects.exclude(imagen='').exclude(imagen__isnull=True)
+        if not kwargs['reindexar']:
+            intentos = intentos.filter(phash__isnull=True)
+        total = intentos.count()
+        self.stdout.write(self.style.SUCCESS(f'🔍 Indexando {total} foto(s)...\n'))
+
+        almacenamiento = almacenamiento_fotos()
+        inicio = time.perf_counter()
+        ultimo = 0
+        indexadas = sin_foto = 0
+        while True:
+            bloque = list(intentos.filter(pk__gt=ultimo).order_by('pk').only('pk', 'imagen')[:lote])
+            if not bloque:
+                break
+            ultimo = bloque[-1].pk
+            cambios = []
+            for intento in bloque:
+                try:
+                    with almacenamiento.open(intento.imagen.name) as archivo:
+                        intento.phash = hash_perceptual(archivo)
+                except (FileNotFoundError, ValueError):
+                    intento.phash = None
+                if intento.phash is None:
+                    sin_foto += 1
+                    continue
+                cambios.append(intento)
+            AccessAttempt.objects.bulk_update(cambios, ['phash'])
+            indexadas += len(cambios)
+            self.stdout.write(f'  ✓ {indexadas + sin_foto}/{total}')
+
+        # Los hashes nuevos tienen pk antiguos: los workers recargan los índices completos
+        for escuela_id in escuelas_ids():
+            indices(escuela_id).invalidar()
+
+        self.stdout.write('\n📊 RESUMEN:')
+        self.stdout.write(f'  Fotos indexadas: {indexadas}')
+        self.stdout.write(f'  Sin foto legible: {sin_foto}')
+        self.stdout.write(f'  Tiempo: {time.perf_counter() - inicio:.1f} s')
+        self.stdout.write(self.style.SUCCESS('✅ Índice de fotos actualizado'))
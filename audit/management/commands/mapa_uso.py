@@ -0,0 +1,61 @@
+"""
+Management command para consultar el mapa de uso por hora de la semana
+de un semestre o reconstruirlo desde el registro de intentos (al
+activarlo en un despliegue con historial o tras corregir intentos).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from access_control.models import Door
+from audit.heatmaps import DIAS, PERIODO, acumulador, mapa_de, periodo_de, reconstruir_desde_registro
+from audit.models import DoorUsage
+
+
+class Command(BaseCommand):
+    help = 'Muestra las horas de más uso de un semestre o reconstruye sus mapas de uso'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--periodo',
+            help='Semestre AAAA-1 o AAAA-2 (default: el actual)',
+        )
+        parser.add_argument(
+            '--reconstruir',
+            action='store_true',
+            help='Recalcular los mapas del semestre desde los intentos de acceso',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Horas de la semana con más uso a mostrar (default: 10)',
+        )
+
+    def handle(self, *args, **kwargs):
+        periodo = kwargs['periodo'] or periodo_de()
+        if not PERIODO.match(periodo):
+            raise CommandError('El periodo debe tener el formato AAAA-1 o AAAA-2')
+        self.stdout.write(self.style.SUCCESS(f'🗓️  Mapa de uso del semestre {periodo}'))
+
+        if kwargs['reconstruir']:
+            acumulador.volcar()
+            inicio = time.perf_counter()
+            total = reconstruir_desde_registro(periodo)
+            self.stdout.write(self.style.SUCCESS(
+                f'🔄 Reconstruido desde el registro: {total} intentos '
+                f'en {time.perf_counter() - inicio:.1f} s'
+            ))
+
+        puertas_ids = list(Door.objects.values_list('pk', flat=True))
+        matriz = mapa_de(puertas_ids, periodo)
+        self.stdout.write('\n🔥 HORAS CON MÁS USO:')
+        for posicion in matriz.ravel().argsort()[::-1][:max(0, kwargs['top'])]:
+            dia, hora = divmod(int(posicion), 24)
+            if not matriz[dia, hora]:
+                break
+            self.stdout.write(f'  {DIAS[dia]} {hora:02d}:00: {matriz[dia, hora]}')
+
+        self.stdout.write('\n📊 RESUMEN:')
+        self.stdout.write(f'  Puertas con registro: {DoorUsage.objects.filter(periodo=periodo).count()}')
+        self.stdout.write(f'  Intentos exitosos: {int(matriz.sum())}')
@@ -0,0 +1,86 @@
+"""
+Management command para consultar la ocupación actual por puerta y por
+zona frente a su capacidad, o reconstruirla desde el registro de intentos.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from access_control.models import Door, School, Zone
+from audit.occupancy import contadores, periodo_actual, reconstruir_desde_registro
+
+
+class Command(BaseCommand):
+    help = 'Muestra la ocupación actual de puertas y zonas con capacidad'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reconstruir',
+            action='store_true',
+            help='Recalcular la ocupación del periodo desde los intentos de acceso',
+        )
+        parser.add_argument(
+            '--todas',
+            action='store_true',
+            help='Incluir puertas y zonas sin capacidad configurada',
+        )
+        parser.add_argument(
+            '--escuela',
+            help='Clave de la escuela (default: todas)',
+        )
+
+    def handle(self, *args, **kwargs):
+        periodo = periodo_actual()
+        self.stdout.write(self.style.SUCCESS(f'👥 Ocupación del periodo {periodo:%Y-%m-%d}'))
+
+        escuelas = School.objects.order_by('pk')
+        if kwargs['escuela']:
+            escuelas = escuelas.filter(clave=kwargs['escuela'])
+            if not escuelas.exists():
+                raise CommandError(f'No existe la escuela "{kwargs["escuela"]}"')
+
+        total_puertas = total_zonas = llenas = 0
+        for escuela in escuelas:
+            contador = contadores(escuela.pk)
+            self.stdout.write(self.style.SUCCESS(f'\n🏫 {escuela.nombre}'))
+            if kwargs['reconstruir']:
+                personas = reconstruir_desde_registro(escuela.pk, periodo)
+                contador.reiniciar()
+                self.stdout.write(self.style.SUCCESS(
+                    f'🔄 Reconstruida desde el registro: {sum(personas.values())} personas '
+                    f'en {len(personas)} puertas'
+                ))
+
+            puertas = Door.objects.filter(escuela=escuela).order_by('nombre')
+            zonas = Zone.objects.filter(escuela=escuela).order_by('nombre')
+            if not kwargs['todas']:
+                puertas = puertas.filter(capacidad__isnull=False)
+                zonas = zonas.filter(capacidad__isnull=False)
+
+            self.stdout.write('\n🚪 PUERTAS:')
+            for puerta in puertas:
+                personas = contador.personas_puerta(puerta.pk)
+                llenas += self.linea(puerta.nombre, personas, puerta.capacidad)
+                total_puertas += 1
+
+            self.stdout.write('\n🏢 ZONAS:')
+            for zona in zonas:
+                personas = contador.personas_zona(zona.pk)
+                llenas += self.linea(f'{zona.nombre} ({zona.get_tipo_display()})', personas, zona.capacidad)
+                total_zonas += 1
+
+        self.stdout.write('\n📊 RESUMEN:')
+        self.stdout.write(f'  Escuelas: {escuelas.count()}')
+        self.stdout.write(f'  Puertas: {total_puertas}')
+        self.stdout.write(f'  Zonas: {total_zonas}')
+        self.stdout.write(f'  En capacidad máxima: {llenas}')
+
+    def linea(self, nombre, personas, capacidad):
+        """Escribe una fila; devuelve 1 si está en su capacidad máxima"""
+        if capacidad is None:
+            self.stdout.write(f'  {nombre}: {personas}')
+            return 0
+        texto = f'  {nombre}: {personas}/{capacidad}'
+        if personas >= capacidad:
+            self.stdout.write(self.style.WARNING(f'{texto} ⚠️  completo'))
+            return 1
+        self.stdout.write(texto)
+        return 0
@@ -0,0 +1,75 @@
+"""
+Management command para exportar la asistencia por alumno y sesión de
+un periodo completo a CSV o XLSX (se escribe en flujo, por bloques).
+"""
+import os
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from access_control.models import ClassGroup
+from audit.attendance import ENCABEZADOS, filas_reporte
+from audit.exports import csv_en_flujo, xlsx_en_flujo
+
+
+class Command(BaseCommand):
+    help = 'Exporta la asistencia de los grupos de un periodo a CSV o XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('salida', help='Archivo de salida (.csv o .xlsx)')
+        parser.add_argument('--periodo', help='Periodo de los grupos (ej: 2025-2)')
+        parser.add_argument('--grupo', type=int, action='append', help='ID de grupo (se puede repetir)')
+        parser.add_argument('--desde', help='Fecha inicial (AAAA-MM-DD, default: inicio del grupo más antiguo)')
+        parser.add_argument('--hasta', help='Fecha final inclusive (AAAA-MM-DD, default: fin del último grupo)')
+
+    def fecha(self, valor):
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Fecha inválida: {valor} (formato AAAA-MM-DD)')
+
+    def handle(self, *args, **kwargs):
+        salida = kwargs['salida']
+        extension = os.path.splitext(salida)[1].lower()
+        if extension not in ('.csv', '.xlsx'):
+            raise CommandError('La salida debe terminar en .csv o .xlsx')
+
+        grupos = ClassGroup.objects.filter(activo=True)
+        if kwargs['periodo']:
+            grupos = grupos.filter(periodo=kwargs['periodo'])
+        if kwargs['grupo']:
+            grupos = grupos.filter(pk__in=kwargs['grupo'])
+        grupos = list(grupos)
+        if not grupos:
+            raise CommandError('No hay grupos que coincidan')
+
+        desde = self.fecha(kwargs['desde']) if kwargs['desde'] else min(g.fecha_inicio for g in grupos)
+        hasta = self.fecha(kwargs['hasta']) if kwargs['hasta'] else max(g.fecha_fin for g in grupos)
+        self.stdout.write(self.style.SUCCESS(
+            f'📋 Asistencia de {len(grupos)} grupo(s), {desde:%Y-%m-%d} a {hasta:%Y-%m-%d}'
+        ))
+
+        contador = {'filas': 0}
+
+        def contar(filas):
+            for fila in filas:
+                contador['filas'] += 1
+                yield fila
+
+        filas = contar(filas_reporte(grupos, desde, hasta))
+        if extension == '.csv':
+            partes = csv_en_flujo(ENCABEZADOS, filas)
+        else:
+            partes = xlsx_en_flujo(ENCABEZADOS, filas, hoja='Asistencia')
+
+        inicio = time.perf_counter()
+        with open(salida, 'wb') as archivo:
+            for parte in partes:
+                archivo.write(parte)
+
+        self.stdout.write('\n📊 RESUMEN:')
+        self.stdout.write(f'  Filas (alumno × sesión): {contador["filas"]}')
+        self.stdout.write(f'  Tamaño: {os.path.getsize(salida) / 1024:.1f} KB')
+        self.stdout.write(f'  Tiempo: {time.perf_counter() - inicio:.2f} s')
+        self.stdout.write(self.style.SUCCESS(f'✅ Reporte escrito en {salida}'))
@@ -0,0 +1,100 @@
+"""
+Management command para ejecutar los detectores de anomalías sobre el
+historial de intentos de acceso (modo reproducción). Como en vivo, hay un
+detector por escuela (el de la escuela de la puerta de cada intento).
+"""
+from collections import Counter
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from access_control.tenancy import PorEscuela
+from audit.anomalies import DetectorAnomalias, Evento, cargar_edificios
+from audit.models import AccessAttempt, SecurityAlert
+
+
+class Command(BaseCommand):
+    help = 'Reproduce el historial de intentos de acceso a través del detector de anomalías'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', help='Fecha final inclusive (AAAA-MM-DD)')
+        parser.add_argument(
+            '--guardar',
+            action='store_true',
+            help='Guardar las alertas encontradas (por defecto solo se muestran); '
+                 'se omiten los intentos que ya tienen alertas',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=5000,
+            help='Intentos leídos por consulta (default: 5000)',
+        )
+
+    def fecha(self, valor, hora):
+        try:
+            dia = datetime.strptime(valor, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Fecha inválida: {valor} (formato AAAA-MM-DD)')
+        return timezone.make_aware(datetime.combine(dia, hora))
+
+    def handle(self, *args, **kwargs):
+        intentos = AccessAttempt.objects.order_by('fecha_hora', 'pk')
+        if kwargs['desde']:
+            intentos = intentos.filter(fecha_hora__gte=self.fecha(kwargs['desde'], time.min))
+        if kwargs['hasta']:
+            intentos = intentos.filter(fecha_hora__lte=self.fecha(kwargs['hasta'], time.max))
+
+        self.stdout.write(self.style.SUCCESS('🔎 Reproduciendo intentos de acceso...'))
+
+        detectores = PorEscuela(
+            lambda escuela_id: DetectorAnomalias(edificios=cargar_edificios(escuela_id), escuela_id=escuela_id)
+        )
+        filas = intentos.values_list(
+            'puerta__escuela_id', 'fecha_hora', 'puerta_id', 'usuario_id', 'codigo_usado', 'exitoso', 'pk'
+        ).iterator(chunk_size=kwargs['lote'])
+
+        procesados = 0
+        omitidas = 0
+        por_tipo = Counter()
+        pendientes = []
+        for escuela_id, *fila in filas:
+            procesados += 1
+            for alerta in detectores(escuela_id).procesar(Evento(*fila)):
+                por_tipo[alerta.tipo] += 1
+                if kwargs['guardar']:
+                    pendientes.append(alerta)
+                else:
+                    self.stdout.write(
+                        f'  ⚠️  {timezone.localtime(alerta.fecha_hora):%Y-%m-%d %H:%M:%S} '
+                        f'[{alerta.tipo}] puerta {alerta.puerta_id}: {alerta.detalle}'
+                    )
+            if len(pendientes) >= kwargs['lote']:
+                omitidas += self.guardar(pendientes)
+                pendientes = []
+        if pendientes:
+            omitidas += self.guardar(pendientes)
+
+        self.stdout.write('\n📊 RESUMEN:')
+        self.stdout.write(f'  Intentos procesados: {procesados}')
+        self.stdout.write(f'  Escuelas: {len(detectores)}')
+        etiquetas = dict(SecurityAlert.TIPO_CHOICES)
+        for tipo, total in por_tipo.most_common():
+            self.stdout.write(f'  {etiquetas[tipo]}: {total}')
+        if kwargs['guardar']:
+            self.stdout.write(self.style.SUCCESS(f'  ✅ {sum(por_tipo.values()) - omitidas} alerta(s) guardada(s)'))
+            if omitidas:
+                self.stdout.write(f'  ⏭️  {omitidas} alerta(s) omitida(s): el intento ya tenía alertas')
+
+    def guardar(self, alertas):
+        """Guarda las alertas de intentos que aún no tienen ninguna; devuelve cuántas omitió"""
+        con_alertas = set(
+            SecurityAlert.objects
+            .filter(intento_id__in={alerta.intento_id for alerta in alertas})
+            .values_list('intento_id', flat=True)
+        )
+        nuevas = [alerta for alerta in alertas if alerta.intento_id not in con_alertas]
+        SecurityAlert.objects.bulk_create(nuevas)
+        return len(alertas) - len(nuevas)
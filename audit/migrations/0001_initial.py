@@ -0,0 +1,40 @@
+# Generated by Django 5.0 on 2026-10-19 02:05
+
+import audit.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('access_control', '0002_iotdevice'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_hora', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Fecha y Hora')),
+                ('exitoso', models.BooleanField(default=False, verbose_name='Exitoso')),
+                ('codigo_usado', models.CharField(blank=True, max_length=20, verbose_name='Código Usado')),
+                ('motivo', models.CharField(blank=True, help_text='Razón de la decisión de acceso', max_length=100, verbose_name='Motivo')),
+                ('imagen', models.ImageField(blank=True, null=True, upload_to=audit.models.ruta_imagen_intento, verbose_name='Fotografía')),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True, verbose_name='Dirección IP')),
+                ('dispositivo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='intentos_acceso', to='access_control.iotdevice', verbose_name='Dispositivo')),
+                ('puerta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='intentos_acceso', to='access_control.door', verbose_name='Puerta')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='intentos_acceso', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Intento de Acceso',
+                'verbose_name_plural': 'Intentos de Acceso',
+                'ordering': ['-fecha_hora'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-19 02:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0004_politicas_acceso'),
+        ('audit', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecurityAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('DENEGACIONES', 'Denegaciones repetidas'), ('HORARIO', 'Acceso en horario inusual'), ('DESPLAZAMIENTO', 'Mismo código en puertas distantes')], max_length=15, verbose_name='Tipo')),
+                ('fecha_hora', models.DateTimeField(db_index=True, help_text='Momento del intento que disparó la alerta', verbose_name='Fecha y Hora')),
+                ('detalle', models.CharField(max_length=255, verbose_name='Detalle')),
+                ('revisada', models.BooleanField(default=False, verbose_name='Revisada')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('intento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alertas', to='audit.accessattempt', verbose_name='Intento')),
+                ('puerta', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alertas', to='access_control.door', verbose_name='Puerta')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alertas', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Alerta de Seguridad',
+                'verbose_name_plural': 'Alertas de Seguridad',
+                'ordering': ['-fecha_hora'],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0 on 2026-10-19 02:23
+
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+TAMANO_LOTE = 5000
+
+
+def cifrar_codigos_usados(apps, schema_editor):
+    """Sustituye los códigos del historial por su digest HMAC, por lotes"""
+    AccessAttempt = apps.get_model('audit', 'AccessAttempt')
+    clave = settings.ACCESS_CODE_KEY.encode()
+    ultimo = 0
+    while True:
+        lote = list(
+            AccessAttempt.objects
+            .filter(pk__gt=ultimo)
+            .order_by('pk')
+            .only('pk', 'codigo_usado')[:TAMANO_LOTE]
+        )
+        if not lote:
+            break
+        cifrados = [intento for intento in lote if intento.codigo_usado]
+        for intento in cifrados:
+            intento.codigo_usado = hmac.new(clave, intento.codigo_usado.encode(), hashlib.sha256).hexdigest()
+        AccessAttempt.objects.bulk_update(cifrados, ['codigo_usado'])
+        ultimo = lote[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0002_alertas_seguridad'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accessattempt',
+            name='codigo_usado',
+            field=models.CharField(blank=True, help_text='Digest HMAC del código ingresado (el código no se guarda)', max_length=64, verbose_name='Código Usado'),
+        ),
+        # Sin reversa: los códigos originales no se pueden recuperar del digest
+        migrations.RunPython(cifrar_codigos_usados),
+    ]
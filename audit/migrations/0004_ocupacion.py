@@ -0,0 +1,35 @@
+# Generated by Django 5.0 on 2026-10-19 02:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0008_capacidad'),
+        ('audit', '0003_codigos_usados_cifrados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessattempt',
+            name='sentido',
+            field=models.CharField(choices=[('ENTRADA', 'Entrada'), ('SALIDA', 'Salida')], default='ENTRADA', help_text='Entrada o salida del espacio al que da la puerta', max_length=7, verbose_name='Sentido'),
+        ),
+        migrations.CreateModel(
+            name='Occupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('personas', models.IntegerField(default=0, help_text='Entradas menos salidas en el periodo', verbose_name='Personas')),
+                ('periodo', models.DateField(verbose_name='Periodo')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('puerta', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacion', to='access_control.door', verbose_name='Puerta')),
+            ],
+            options={
+                'verbose_name': 'Ocupación',
+                'verbose_name_plural': 'Ocupación',
+                'ordering': ['puerta__nombre'],
+            },
+        ),
+    ]
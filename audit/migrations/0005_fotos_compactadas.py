@@ -0,0 +1,20 @@
+# Generated by Django 5.0 on 2026-10-19 02:32
+
+import audit.models
+import audit.photos
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0004_ocupacion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accessattempt',
+            name='imagen',
+            field=models.ImageField(blank=True, null=True, storage=audit.photos.almacenamiento_fotos, upload_to=audit.models.ruta_imagen_intento, verbose_name='Fotografía'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-19 02:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0011_confinamientos'),
+        ('audit', '0005_fotos_compactadas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessattempt',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, help_text='Clave generada por el controlador para intentos registrados sin conexión', max_length=64, null=True, verbose_name='Clave de Idempotencia'),
+        ),
+        migrations.AddConstraint(
+            model_name='accessattempt',
+            constraint=models.UniqueConstraint(fields=('dispositivo', 'clave_idempotencia'), name='intento_clave_idempotencia_unica'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0006_intentos_sin_conexion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessattempt',
+            name='phash',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='dHash de 64 bits de la fotografía para buscar fotos parecidas', null=True, verbose_name='Hash Perceptual'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-19 03:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0013_escuelas'),
+        ('audit', '0007_hash_perceptual_fotos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoorUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.CharField(help_text='Semestre, ej: "2025-2"', max_length=20, verbose_name='Periodo')),
+                ('conteos', models.BinaryField(help_text='168 enteros uint32 little-endian: lunes 0 h … domingo 23 h', verbose_name='Conteos')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('puerta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mapas_uso', to='access_control.door', verbose_name='Puerta')),
+            ],
+            options={
+                'verbose_name': 'Mapa de Uso',
+                'verbose_name_plural': 'Mapas de Uso',
+                'ordering': ['periodo', 'puerta__nombre'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='doorusage',
+            constraint=models.UniqueConstraint(fields=('periodo', 'puerta'), name='mapa_uso_periodo_puerta_unico'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0008_mapas_uso'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='securityalert',
+            name='tipo',
+            field=models.CharField(choices=[('DENEGACIONES', 'Denegaciones repetidas'), ('HORARIO', 'Acceso en horario inusual'), ('DESPLAZAMIENTO', 'Mismo código en puertas distantes'), ('FORZADA', 'Apertura forzada')], max_length=15, verbose_name='Tipo'),
+        ),
+    ]
@@ -0,0 +1,289 @@
+from django.db import models
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from access_control.models import Door, IoTDevice
+from .photos import almacenamiento_fotos
+
+
+def ruta_imagen_intento(instance, filename):
+    """
+    Ruta de almacenamiento de la foto de cada intento:
+    access_attempts/{año}/{mes}/{día}/{archivo}
+    """
+    fecha = instance.fecha_hora or timezone.now()
+    return f'access_attempts/{fecha:%Y/%m/%d}/{filename}'
+
+
+class AccessAttempt(models.Model):
+    """
+    Registro de cada intento de acceso físico (exitoso o fallido)
+    con la fotografía capturada por el controlador.
+    """
+    
+    SENTIDO_CHOICES = [
+        ('ENTRADA', 'Entrada'),
+        ('SALIDA', 'Salida'),
+    ]
+    
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='intentos_acceso',
+        verbose_name='Usuario'
+    )
+    
+    puerta = models.ForeignKey(
+        Door,
+        on_delete=models.CASCADE,
+        related_name='intentos_acceso',
+        verbose_name='Puerta'
+    )
+    
+    dispositivo = models.ForeignKey(
+        IoTDevice,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='intentos_acceso',
+        verbose_name='Dispositivo'
+    )
+    
+    fecha_hora = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name='Fecha y Hora'
+    )
+    
+    exitoso = models.BooleanField(
+        default=False,
+        verbose_name='Exitoso'
+    )
+    
+    sentido = models.CharField(
+        max_length=7,
+        choices=SENTIDO_CHOICES,
+        default='ENTRADA',
+        verbose_name='Sentido',
+        help_text='Entrada o salida del espacio al que da la puerta'
+    )
+    
+    codigo_usado = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='Código Usado',
+        help_text='Digest HMAC del código ingresado (el código no se guarda)'
+    )
+    
+    motivo = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Motivo',
+        help_text='Razón de la decisión de acceso'
+    )
+    
+    imagen = models.ImageField(
+        upload_to=ruta_imagen_intento,
+        storage=almacenamiento_fotos,
+        blank=True,
+        null=True,
+        verbose_name='Fotografía'
+    )
+    
+    ip_address = models.GenericIPAddressField(
+        blank=True,
+        null=True,
+        verbose_name='Dirección IP'
+    )
+    
+    phash = models.BigIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Hash Perceptual',
+        help_text='dHash de 64 bits de la fotografía para buscar fotos parecidas'
+    )
+    
+    clave_idempotencia = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        verbose_name='Clave de Idempotencia',
+        help_text='Clave generada por el controlador para intentos registrados sin conexión'
+    )
+    
+    class Meta:
+        verbose_name = 'Intento de Acceso'
+        verbose_name_plural = 'Intentos de Acceso'
+        ordering = ['-fecha_hora']
+        constraints = [
+            # Un lote reenviado no duplica intentos (NULL en los registrados en línea)
+            models.UniqueConstraint(
+                fields=['dispositivo', 'clave_idempotencia'],
+                name='intento_clave_idempotencia_unica',
+            ),
+        ]
+    
+    def __str__(self):
+        resultado = "Exitoso" if self.exitoso else "Fallido"
+        return f"{self.puerta.nombre} - {resultado} ({self.fecha_hora:%Y-%m-%d %H:%M:%S})"
+
+
+class SecurityAlert(models.Model):
+    """
+    Alerta emitida por el detector de anomalías sobre los intentos de
+    acceso, o por un controlador que detectó una apertura forzada.
+    """
+    
+    TIPO_CHOICES = [
+        ('DENEGACIONES', 'Denegaciones repetidas'),
+        ('HORARIO', 'Acceso en horario inusual'),
+        ('DESPLAZAMIENTO', 'Mismo código en puertas distantes'),
+        ('FORZADA', 'Apertura forzada'),
+    ]
+    
+    tipo = models.CharField(
+        max_length=15,
+        choices=TIPO_CHOICES,
+        verbose_name='Tipo'
+    )
+    
+    fecha_hora = models.DateTimeField(
+        db_index=True,
+        verbose_name='Fecha y Hora',
+        help_text='Momento del intento que disparó la alerta'
+    )
+    
+    puerta = models.ForeignKey(
+        Door,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='alertas',
+        verbose_name='Puerta'
+    )
+    
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='alertas',
+        verbose_name='Usuario'
+    )
+    
+    intento = models.ForeignKey(
+        AccessAttempt,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='alertas',
+        verbose_name='Intento'
+    )
+    
+    detalle = models.CharField(
+        max_length=255,
+        verbose_name='Detalle'
+    )
+    
+    revisada = models.BooleanField(
+        default=False,
+        verbose_name='Revisada'
+    )
+    
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de Creación'
+    )
+    
+    class Meta:
+        verbose_name = 'Alerta de Seguridad'
+        verbose_name_plural = 'Alertas de Seguridad'
+        ordering = ['-fecha_hora']
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} - {self.fecha_hora:%Y-%m-%d %H:%M:%S}"
+
+
+class Occupancy(models.Model):
+    """
+    Ocupación compartida por puerta en el periodo actual (un día que
+    empieza a OCCUPANCY['RESET_HOUR']). Cada worker suma aquí sus
+    entradas/salidas pendientes; ver audit/occupancy.py.
+    """
+    
+    puerta = models.OneToOneField(
+        Door,
+        on_delete=models.CASCADE,
+        related_name='ocupacion',
+        verbose_name='Puerta'
+    )
+    
+    personas = models.IntegerField(
+        default=0,
+        verbose_name='Personas',
+        help_text='Entradas menos salidas en el periodo'
+    )
+    
+    periodo = models.DateField(
+        verbose_name='Periodo'
+    )
+    
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Última Actualización'
+    )
+    
+    class Meta:
+        verbose_name = 'Ocupación'
+        verbose_name_plural = 'Ocupación'
+        ordering = ['puerta__nombre']
+    
+    def __str__(self):
+        return f"{self.puerta_id}: {self.personas} persona(s) ({self.periodo})"
+
+
+class DoorUsage(models.Model):
+    """
+    Mapa de uso de una puerta en un semestre: intentos exitosos por hora
+    de la semana (7 días × 24 horas), guardados como 168 contadores uint32
+    en 672 bytes. Cada worker suma aquí sus conteos pendientes; ver
+    audit/heatmaps.py.
+    """
+    
+    puerta = models.ForeignKey(
+        Door,
+        on_delete=models.CASCADE,
+        related_name='mapas_uso',
+        verbose_name='Puerta'
+    )
+    
+    periodo = models.CharField(
+        max_length=20,
+        verbose_name='Periodo',
+        help_text='Semestre, ej: "2025-2"'
+    )
+    
+    conteos = models.BinaryField(
+        editable=False,
+        verbose_name='Conteos',
+        help_text='168 enteros uint32 little-endian: lunes 0 h … domingo 23 h'
+    )
+    
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Última Actualización'
+    )
+    
+    class Meta:
+        verbose_name = 'Mapa de Uso'
+        verbose_name_plural = 'Mapas de Uso'
+        ordering = ['periodo', 'puerta__nombre']
+        constraints = [
+            models.UniqueConstraint(fields=['periodo', 'puerta'], name='mapa_uso_periodo_puerta_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.puerta_id} ({self.periodo})"
@@ -0,0 +1,307 @@
+"""
+Ocupación en tiempo real por puerta y por zona.
+
+Cada intento exitoso lleva un sentido (ENTRADA/SALIDA). Cada escuela
+tiene su propio contador en cada worker (contadores(escuela_id)): el
+volcado o la reconstrucción de una escuela no detienen las peticiones de
+las demás. El contador guarda en memoria la última ocupación compartida
+(tabla Occupancy) más sus propios cambios pendientes, así que consultar
+la ocupación o verificar la capacidad no hace consultas agregadas:
+
+- registrar() suma ±1 a la puerta (la zona se deriva de sus puertas).
+- Cada FLUSH_INTERVAL segundos el worker suma sus pendientes a la tabla
+  con UPDATE ... personas = personas + delta y relee los totales, con
+  lo que ve también los cambios de los demás workers.
+- La ocupación es por periodo (un día que empieza a RESET_HOUR, cuando
+  se asume que los espacios están vacíos). Si la tabla no corresponde al
+  periodo actual (arranque tras el corte o primer uso) se reconstruye
+  desde el registro de intentos; solo un worker por escuela lo hace a la
+  vez.
+- Las filas de cada escuela tienen una versión en la caché que sube al
+  empezar y al confirmar cada reconstrucción. Un volcado que la ve cambiar se
+  deshace y descarta sus cambios (el registro ya los incluye) en lugar
+  de sumarlos dos veces sobre la tabla nueva.
+
+Las consultas a la BD se hacen fuera del lock de los contadores: una
+petición que solo consulta no espera al volcado de otra.
+
+Cada puerta comunica su zona (Door.zona) con la zona padre: cruzarla
+solo cambia la ocupación de su propia zona. La ocupación de una zona es
+la suma de las puertas cuya zona es esa, no la de todo el subárbol: quien
+entra al edificio y luego a un salón interior cuenta una vez en el
+edificio (por su acceso) y una en el salón, y la capacidad del edificio
+no se agota antes de tiempo.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from access_control.models import Door, Zone
+from access_control.tenancy import PorEscuela, incrementar_version
+from .models import AccessAttempt, Occupancy
+
+
+logger = logging.getLogger(__name__)
+
+DELTA = {'ENTRADA': 1, 'SALIDA': -1}
+
+
+def clave_version(escuela_id):
+    return f'ocupacion:{escuela_id}:version'
+
+
+def clave_reconstruccion(escuela_id):
+    return f'ocupacion:{escuela_id}:reconstruyendo'
+
+
+def periodo_actual(momento=None):
+    """Fecha del periodo de ocupación al que pertenece `momento`"""
+    local = timezone.localtime(momento)
+    return (local - timedelta(hours=settings.OCCUPANCY['RESET_HOUR'])).date()
+
+
+def inicio_periodo(periodo):
+    inicio = datetime.combine(periodo, datetime.min.time()) + timedelta(hours=settings.OCCUPANCY['RESET_HOUR'])
+    return timezone.make_aware(inicio)
+
+
+def reconstruir_desde_registro(escuela_id, periodo=None):
+    """
+    Recalcula las filas Occupancy de las puertas de la escuela con los
+    intentos exitosos del periodo (entradas menos salidas por puerta) y
+    devuelve {puerta_id: personas}. Solo reemplaza las filas de ese
+    periodo (y las de periodos anteriores, que ocuparían la fila de la
+    puerta); las de un periodo posterior se conservan.
+    """
+    periodo = periodo or periodo_actual()
+    # Antes de leer el registro: los volcados en curso se deshacen
+    incrementar_version(clave_version(escuela_id))
+    personas = Counter()
+    filas = (
+        AccessAttempt.objects
+        .filter(
+            puerta__escuela_id=escuela_id,
+            exitoso=True,
+            fecha_hora__gte=inicio_periodo(periodo),
+            fecha_hora__lt=inicio_periodo(periodo + timedelta(days=1)),
+        )
+        .values('puerta_id', 'sentido')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for fila in filas:
+        personas[fila['puerta_id']] += DELTA[fila['sentido']] * fila['total']
+    with transaction.atomic():
+        de_la_escuela = Occupancy.objects.filter(puerta__escuela_id=escuela_id)
+        de_la_escuela.filter(periodo__lte=periodo).delete()
+        posteriores = set(de_la_escuela.filter(periodo__gt=periodo).values_list('puerta_id', flat=True))
+        Occupancy.objects.bulk_create([
+            Occupancy(puerta_id=puerta_id, personas=max(0, total), periodo=periodo)
+            for puerta_id, total in personas.items()
+            if puerta_id not in posteriores
+        ], batch_size=1000)
+        transaction.on_commit(lambda: incrementar_version(clave_version(escuela_id)))
+    return {puerta_id: max(0, total) for puerta_id, total in personas.items()}
+
+
+class ContadorOcupacion:
+    """Contadores en memoria de una escuela, sincronizados con la tabla Occupancy"""
+
+    def __init__(self, escuela_id):
+        self.escuela_id = escuela_id
+        self._base = {}                 # puerta_id → personas (último valor compartido)
+        self._pendiente = Counter()     # puerta_id → cambios aún no volcados
+        self._en_vuelo = Counter()      # cambios que se están volcando (aún no están en _base)
+        self._periodo = None
+        self._version = None            # versión de la tabla a la que corresponde _base
+        self._zona_de_puerta = {}       # puerta_id → zona a la que da la puerta
+        self._puertas_de_zona = defaultdict(set)    # zona_id → puertas que dan a ella
+        self._capacidad_puerta = {}
+        self._capacidad_zona = {}
+        self._ultimo_volcado = 0.0
+        self._ultima_estructura = 0.0
+        self._lock = threading.Lock()               # contadores en memoria (sin E/S)
+        self._sincronizando = threading.Lock()      # cargas y volcados (con E/S)
+
+    # --- Estructura (zonas y capacidades) -------------------------------
+
+    def _cargar_estructura(self):
+        puertas = Door.objects.filter(escuela_id=self.escuela_id)
+        zona_de_puerta = dict(puertas.filter(zona__isnull=False).values_list('pk', 'zona_id'))
+        puertas_de_zona = defaultdict(set)
+        for puerta_id, zona_id in zona_de_puerta.items():
+            puertas_de_zona[zona_id].add(puerta_id)
+        capacidad_puerta = dict(
+            puertas.filter(capacidad__isnull=False).values_list('pk', 'capacidad')
+        )
+        capacidad_zona = dict(
+            Zone.objects.filter(escuela_id=self.escuela_id, capacidad__isnull=False).values_list('pk', 'capacidad')
+        )
+        with self._lock:
+            self._zona_de_puerta = zona_de_puerta
+            self._puertas_de_zona = puertas_de_zona
+            self._capacidad_puerta = capacidad_puerta
+            self._capacidad_zona = capacidad_zona
+        self._ultima_estructura = time.monotonic()
+
+    # --- Sincronización -------------------------------------------------
+
+    def _pendiente_sincronizar(self):
+        ahora = time.monotonic()
+        config = settings.OCCUPANCY
+        return (
+            ahora - self._ultima_estructura >= config['REFRESH']
+            or self._periodo != periodo_actual()
+            or ahora - self._ultimo_volcado >= config['FLUSH_INTERVAL']
+        )
+
+    def _al_dia(self):
+        """Carga, vuelca o cambia de periodo cuando corresponde (sin el lock de los contadores)"""
+        if not self._pendiente_sincronizar():
+            return
+        with self._sincronizando:
+            ahora = time.monotonic()
+            config = settings.OCCUPANCY
+            if ahora - self._ultima_estructura >= config['REFRESH']:
+                self._cargar_estructura()
+            if self._periodo != periodo_actual():
+                self._cargar()
+            elif ahora - self._ultimo_volcado >= config['FLUSH_INTERVAL']:
+                self._volcar()
+
+    def _cargar(self):
+        """Toma la tabla del periodo actual, reconstruyéndola si hace falta"""
+        periodo = periodo_actual()
+        version = cache.get(clave_version(self.escuela_id))
+        filas = self._filas(periodo)
+        if not filas:
+            if cache.add(clave_reconstruccion(self.escuela_id), 1, 60):
+                try:
+                    filas = reconstruir_desde_registro(self.escuela_id, periodo)
+                finally:
+                    cache.delete(clave_reconstruccion(self.escuela_id))
+                version = cache.get(clave_version(self.escuela_id))
+            else:
+                # Otro worker está reconstruyendo: se toma su resultado al volcar
+                filas = {}
+        with self._lock:
+            self._pendiente.clear()  # Cambios de un periodo que ya terminó
+            self._base = filas
+            self._periodo = periodo
+            self._version = version
+        self._ultimo_volcado = time.monotonic()
+
+    def _filas(self, periodo):
+        return dict(
+            Occupancy.objects
+            .filter(puerta__escuela_id=self.escuela_id, periodo=periodo)
+            .values_list('puerta_id', 'personas')
+        )
+
+    def volcar(self):
+        """Suma los cambios pendientes a la tabla y relee los totales"""
+        with self._sincronizando:
+            self._volcar()
+
+    def _volcar(self):
+        with self._lock:
+            self._en_vuelo, self._pendiente = self._pendiente, Counter()
+            pendientes = {puerta_id: delta for puerta_id, delta in self._en_vuelo.items() if delta}
+            periodo, version = self._periodo, self._version
+        self._ultimo_volcado = time.monotonic()
+        try:
+            with transaction.atomic():
+                if pendientes:
+                    Occupancy.objects.bulk_create(
+                        [Occupancy(puerta_id=puerta_id, personas=0, periodo=periodo) for puerta_id in pendientes],
+                        ignore_conflicts=True,
+                    )
+                    for puerta_id, delta in pendientes.items():
+                        Occupancy.objects.filter(puerta_id=puerta_id, periodo=periodo).update(
+                            personas=F('personas') + delta
+                        )
+                base = self._filas(periodo)
+                actual = cache.get(clave_version(self.escuela_id))
+                if actual != version:
+                    # La tabla se reconstruyó (o se está reconstruyendo) desde el
+                    # registro, que ya incluye estos cambios: no se suman
+                    transaction.set_rollback(True)
+        except Exception:
+            # Se reintenta en el siguiente volcado
+            with self._lock:
+                self._pendiente.update(self._en_vuelo)
+                self._en_vuelo = Counter()
+            logger.exception('No se pudo volcar la ocupación')
+            return
+        if actual != version:
+            base = self._filas(periodo)
+        with self._lock:
+            self._base = base
+            self._version = actual
+            self._en_vuelo = Counter()
+
+    # --- API ------------------------------------------------------------
+
+    def registrar(self, puerta_id, sentido):
+        """Cuenta una entrada o salida exitosa por la puerta"""
+        self._al_dia()
+        with self._lock:
+            self._pendiente[puerta_id] += DELTA[sentido]
+
+    def _personas(self, puerta_id):
+        return max(0, self._base.get(puerta_id, 0) + self._en_vuelo[puerta_id] + self._pendiente[puerta_id])
+
+    def personas_puerta(self, puerta_id):
+        self._al_dia()
+        with self._lock:
+            return self._personas(puerta_id)
+
+    def personas_zona(self, zona_id):
+        """Personas en la zona: las que entraron por las puertas que dan a ella"""
+        self._al_dia()
+        with self._lock:
+            return sum(self._personas(puerta_id) for puerta_id in self._puertas_de_zona.get(zona_id, ()))
+
+    def verificar_cupo(self, puerta_id):
+        """
+        None si cabe una persona más por la puerta; si no, el motivo.
+        Revisa la capacidad de la puerta y la de la zona a la que da (quien
+        la cruza ya estaba en las zonas que la contienen).
+        """
+        self._al_dia()
+        with self._lock:
+            capacidad = self._capacidad_puerta.get(puerta_id)
+            if capacidad is not None and self._personas(puerta_id) >= capacidad:
+                return f'Capacidad completa (máximo {capacidad})'
+            zona_id = self._zona_de_puerta.get(puerta_id)
+            capacidad = self._capacidad_zona.get(zona_id)
+            if capacidad is not None and sum(
+                self._personas(otra) for otra in self._puertas_de_zona.get(zona_id, ())
+            ) >= capacidad:
+                return f'Capacidad de la zona completa (máximo {capacidad})'
+        return None
+
+    def reiniciar(self):
+        """Descarta el estado en memoria (tras reconstruir la tabla a mano)"""
+        with self._sincronizando, self._lock:
+            self._periodo = None
+            self._ultima_estructura = 0.0
+
+
+contadores = PorEscuela(ContadorOcupacion)
+
+
+@atexit.register
+def _volcar_al_salir():
+    for contador in contadores.cargadas().values():
+        if contador._pendiente:
+            contador.volcar()
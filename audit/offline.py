@@ -0,0 +1,268 @@
+"""
+Carga masiva de intentos que los controladores registraron sin conexión.
+
+Sin red, el controlador decide con la allowlist (digests HMAC de los
+códigos) y guarda cada intento en una cola local con una clave de
+idempotencia que él mismo genera. Al reconectarse envía la cola en lotes
+JSON, normalmente comprimidos con gzip, y la borra cuando el servidor
+responde 200: si la respuesta se pierde, reenvía el mismo lote.
+
+Un lote cuesta un número fijo de consultas, no una por intento:
+
+1. Las claves que este proceso ya guardó se descartan con un conjunto
+   LRU en memoria (RECENT_KEYS por escuela, para que los reenvíos de
+   una escuela grande no desalojen las claves de otra), sin tocar la BD;
+   es el caso común de un reenvío inmediato.
+2. Los usuarios se resuelven por digest en una sola consulta, entre los
+   perfiles de la escuela de la puerta.
+3. En una transacción que bloquea la fila del dispositivo (si dos
+   workers reciben el mismo lote a la vez, el segundo espera al
+   primero), las demás se buscan en una sola consulta sobre el índice
+   único (dispositivo, clave_idempotencia), las nuevas se insertan con
+   bulk_create(ignore_conflicts=True) y se vuelven a leer: solo las
+   claves que esta transacción insertó cuentan como guardadas y para la
+   ocupación y el mapa de uso. Un conflicto en el INSERT (una fila que
+   apareció sin pasar por el candado) no descarta el resto del lote.
+4. Si se insertó alguna entrada exitosa de un usuario conocido, sube la
+   versión de asistencia de la puerta (audit/attendance.py): las
+   sesiones terminadas que ya estaban en la caché se recalculan con las
+   entradas que llegaron tarde.
+
+La decisión ya ocurrió en la puerta, así que se registra tal cual la
+tomó el controlador (no se vuelve a evaluar). Los intentos cuentan para
+el mapa de uso de su semestre y para la ocupación si son del periodo
+actual; no pasan por el detector de anomalías en vivo, que espera
+eventos en orden (el historial se puede revisar con
+reproducir_anomalias). Las fotos no viajan en el lote.
+"""
+import json
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from access_control.models import IoTDevice, UserProfile
+from access_control.tenancy import PorEscuela
+from .attendance import invalidar_puerta
+from .heatmaps import acumulador
+from .models import AccessAttempt
+from .occupancy import DELTA, contadores, inicio_periodo, periodo_actual
+
+
+DIGEST = re.compile(r'^[0-9a-f]{64}$')
+MOTIVO_POR_DEFECTO = 'Sin conexión'
+
+
+class LoteInvalido(Exception):
+    """El lote completo no se puede procesar (el dispositivo no debe borrarlo)"""
+
+    def __init__(self, mensaje, estado=400):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+class ClavesRecientes:
+    """Conjunto LRU acotado de (dispositivo, clave) ya guardadas por este proceso"""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self.datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def vistas(self, dispositivo_id, claves):
+        """Subconjunto de `claves` que ya se guardaron"""
+        with self._lock:
+            vistas = {clave for clave in claves if (dispositivo_id, clave) in self.datos}
+            for clave in vistas:
+                self.datos.move_to_end((dispositivo_id, clave))
+        return vistas
+
+    def agregar(self, dispositivo_id, claves):
+        with self._lock:
+            for clave in claves:
+                self.datos[(dispositivo_id, clave)] = None
+                self.datos.move_to_end((dispositivo_id, clave))
+            while len(self.datos) > self.maximo:
+                self.datos.popitem(last=False)
+
+    def __len__(self):
+        return len(self.datos)
+
+
+recientes = PorEscuela(lambda escuela_id: ClavesRecientes(settings.OFFLINE_UPLOAD['RECENT_KEYS']))
+
+
+def leer_lote(cuerpo, codificacion=''):
+    """
+    Lista de intentos del cuerpo de la petición: JSON con la clave
+    "intentos", sin comprimir o con Content-Encoding gzip/deflate. La
+    descompresión se corta en MAX_BYTES (protege contra bombas zip).
+    """
+    config = settings.OFFLINE_UPLOAD
+    codificacion = codificacion.strip().lower()
+    if codificacion in ('gzip', 'deflate'):
+        # wbits 32 + 15: detecta cabecera gzip o zlib
+        descompresor = zlib.decompressobj(wbits=47)
+        try:
+            datos = descompresor.decompress(cuerpo, config['MAX_BYTES'] + 1)
+        except zlib.error:
+            raise LoteInvalido('Cuerpo comprimido inválido')
+    elif codificacion in ('', 'identity'):
+        datos = cuerpo
+    else:
+        raise LoteInvalido(f'Content-Encoding no soportado: {codificacion}', 415)
+    if len(datos) > config['MAX_BYTES']:
+        raise LoteInvalido(f'Lote demasiado grande (máximo {config["MAX_BYTES"]} bytes)', 413)
+
+    try:
+        intentos = json.loads(datos)['intentos']
+    except (ValueError, KeyError, TypeError):
+        raise LoteInvalido('Se esperaba JSON con la lista "intentos"')
+    if not isinstance(intentos, list):
+        raise LoteInvalido('"intentos" debe ser una lista')
+    if len(intentos) > config['MAX_ATTEMPTS']:
+        raise LoteInvalido(f'Demasiados intentos en el lote (máximo {config["MAX_ATTEMPTS"]})', 413)
+    return intentos
+
+
+def _fecha(valor, limite):
+    """Instante del intento: epoch en segundos o ISO 8601; no puede ser futuro"""
+    if isinstance(valor, bool):
+        return None
+    if isinstance(valor, (int, float)):
+        try:
+            fecha = datetime.fromtimestamp(valor, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    elif isinstance(valor, str):
+        try:
+            fecha = parse_datetime(valor)
+        except ValueError:
+            return None
+        if fecha is None:
+            return None
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+    else:
+        return None
+    return fecha if fecha <= limite else None
+
+
+def _validar(item, limite):
+    """(clave, datos) de un intento, o (clave, mensaje de error)"""
+    if not isinstance(item, dict):
+        return None, 'El intento debe ser un objeto'
+    clave = item.get('clave')
+    if not isinstance(clave, str) or not 0 < len(clave) <= 64:
+        return None, 'Falta la clave o excede 64 caracteres'
+    fecha = _fecha(item.get('fecha_hora'), limite)
+    if fecha is None:
+        return clave, 'fecha_hora inválida o futura'
+    sentido = str(item.get('sentido', 'ENTRADA')).upper()
+    if sentido not in DELTA:
+        return clave, 'Sentido inválido'
+    acceso = item.get('acceso')
+    if not isinstance(acceso, bool):
+        return clave, 'acceso debe ser true o false'
+    codigo = str(item.get('codigo_hash') or '').lower()
+    if codigo and not DIGEST.match(codigo):
+        return clave, 'codigo_hash debe ser un digest HMAC-SHA256 en hexadecimal'
+    motivo = str(item.get('motivo') or MOTIVO_POR_DEFECTO)[:100]
+    return clave, {
+        'fecha_hora': fecha,
+        'sentido': sentido,
+        'exitoso': acceso,
+        'codigo_usado': codigo,
+        'motivo': motivo,
+    }
+
+
+def cargar_lote(dispositivo_id, puerta_id, escuela_id, intentos, ip=None):
+    """
+    Guarda los intentos nuevos del lote y devuelve los conteos
+    {'recibidos', 'guardados', 'duplicados', 'rechazados': [{clave, error}]}.
+    Los rechazados no se van a aceptar nunca: el dispositivo puede borrar
+    el lote completo al recibir la respuesta.
+    """
+    limite = timezone.now() + timedelta(seconds=settings.DEVICE_HMAC_MAX_SKEW)
+    validos = {}
+    rechazados = []
+    duplicados = 0
+    for item in intentos:
+        clave, datos = _validar(item, limite)
+        if isinstance(datos, str):
+            rechazados.append({'clave': clave, 'error': datos})
+        elif clave in validos:
+            duplicados += 1
+        else:
+            validos[clave] = datos
+
+    vistas = recientes(escuela_id).vistas(dispositivo_id, validos)
+    pendientes = [clave for clave in validos if clave not in vistas]
+    existentes = set()
+    insertadas = []
+    if pendientes:
+        digests = {validos[clave]['codigo_usado'] for clave in pendientes} - {''}
+        usuarios = dict(
+            UserProfile.objects
+            .filter(escuela_id=escuela_id, codigo_hash__in=digests)
+            .values_list('codigo_hash', 'user_id')
+        ) if digests else {}
+        with transaction.atomic():
+            # Serializa las cargas del mismo dispositivo (el único que puede repetir sus claves)
+            list(IoTDevice.objects.select_for_update().filter(pk=dispositivo_id).values_list('pk', flat=True))
+            existentes = set(
+                AccessAttempt.objects
+                .filter(dispositivo_id=dispositivo_id, clave_idempotencia__in=pendientes)
+                .values_list('clave_idempotencia', flat=True)
+            )
+            nuevas = [clave for clave in pendientes if clave not in existentes]
+            if nuevas:
+                AccessAttempt.objects.bulk_create(
+                    [
+                        AccessAttempt(
+                            usuario_id=usuarios.get(validos[clave]['codigo_usado']),
+                            puerta_id=puerta_id,
+                            dispositivo_id=dispositivo_id,
+                            ip_address=ip,
+                            clave_idempotencia=clave,
+                            **validos[clave],
+                        )
+                        for clave in nuevas
+                    ],
+                    batch_size=settings.OFFLINE_UPLOAD['INSERT_BATCH_SIZE'],
+                    ignore_conflicts=True,
+                )
+                guardadas = set(
+                    AccessAttempt.objects
+                    .filter(dispositivo_id=dispositivo_id, clave_idempotencia__in=nuevas)
+                    .values_list('clave_idempotencia', flat=True)
+                )
+                insertadas = [clave for clave in nuevas if clave in guardadas]
+
+        desde = inicio_periodo(periodo_actual())
+        entradas = False
+        for clave in insertadas:
+            datos = validos[clave]
+            if not datos['exitoso']:
+                continue
+            entradas = entradas or (datos['sentido'] == 'ENTRADA' and datos['codigo_usado'] in usuarios)
+            acumulador.registrar(puerta_id, datos['fecha_hora'])
+            if datos['fecha_hora'] >= desde:
+                contadores(escuela_id).registrar(puerta_id, datos['sentido'])
+        if entradas:
+            invalidar_puerta(puerta_id)
+
+    recientes(escuela_id).agregar(dispositivo_id, validos)
+    return {
+        'recibidos': len(intentos),
+        'guardados': len(insertadas),
+        'duplicados': len(validos) - len(insertadas) + duplicados,
+        'rechazados': rechazados,
+    }
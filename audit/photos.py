@@ -0,0 +1,226 @@
+"""
+Almacenamiento escalonado de las fotos de los intentos de acceso.
+
+Las fotos recientes son archivos sueltos en MEDIA_ROOT
+(access_attempts/AAAA/MM/DD/archivo). El comando compactar_fotos toma
+los días más antiguos que PHOTO_ARCHIVE['AGE_DAYS'], recomprime cada foto
+con menor calidad y junta las del día en un solo paquete
+access_attempts/AAAA/MM/DD.paq:
+
+    [foto][foto]...[índice JSON {archivo: [desplazamiento, tamaño]}]
+    [desplazamiento del índice: 8 bytes][MAGIA: 8 bytes]
+
+El paquete se escribe en un temporal y se renombra (os.replace) antes
+de borrar los archivos sueltos, así que en todo momento la foto existe
+en uno de los dos sitios. AlmacenamientoFotos busca primero el archivo
+suelto y después el paquete, que lee con mmap (un mapa por paquete,
+reutilizado entre peticiones); el nombre guardado en la base de datos no
+cambia, por lo que el admin no distingue dónde está la foto.
+"""
+import io
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.urls import reverse
+
+
+MAGIA = b'PAQFOTO1'
+PIE = struct.Struct('<Q8s')
+EXTENSION_PAQUETE = '.paq'
+
+
+# --- Formato del paquete -------------------------------------------------
+
+def ruta_paquete(ruta_dia):
+    """access_attempts/2025/08/01 → access_attempts/2025/08/01.paq"""
+    return ruta_dia.rstrip('/\\') + EXTENSION_PAQUETE
+
+
+def leer_indice(datos):
+    """Índice {archivo: (desplazamiento, tamaño)} de un paquete (bytes o mmap)"""
+    if len(datos) < PIE.size:
+        raise ValueError('Paquete truncado')
+    inicio_indice, magia = PIE.unpack_from(datos, len(datos) - PIE.size)
+    if magia != MAGIA:
+        raise ValueError('No es un paquete de fotos')
+    indice = json.loads(bytes(datos[inicio_indice:len(datos) - PIE.size]))
+    return {nombre: tuple(posicion) for nombre, posicion in indice.items()}
+
+
+def recomprimir(contenido, calidad, max_lado):
+    """
+    JPEG con la calidad indicada y el lado mayor acotado a `max_lado`.
+    Si la foto no se puede leer o no se reduce, se conserva la original.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(contenido)) as imagen:
+            imagen = imagen.convert('RGB')
+            if max_lado:
+                imagen.thumbnail((max_lado, max_lado))
+            salida = io.BytesIO()
+            imagen.save(salida, format='JPEG', quality=calidad, optimize=True)
+    except (UnidentifiedImageError, OSError, ValueError):
+        return contenido
+    resultado = salida.getvalue()
+    return resultado if len(resultado) < len(contenido) else contenido
+
+
+def compactar_dia(ruta_dia, calidad, max_lado):
+    """
+    Empaqueta los archivos sueltos de un día (y lo que ya hubiera en su
+    paquete). Se ejecuta en los procesos del pool: no usa la base de datos
+    ni la configuración de Django, solo rutas absolutas.
+    Devuelve (archivos compactados, bytes antes, bytes después).
+    """
+    destino = ruta_paquete(ruta_dia)
+    sueltos = sorted(
+        nombre for nombre in os.listdir(ruta_dia)
+        if os.path.isfile(os.path.join(ruta_dia, nombre))
+    )
+    if not sueltos:
+        return 0, 0, 0
+
+    temporal = f'{destino}.{os.getpid()}.tmp'
+    indice = {}
+    antes = despues = 0
+    with open(temporal, 'wb') as salida:
+        # Lo ya empaquetado se copia tal cual
+        if os.path.exists(destino):
+            with open(destino, 'rb') as anterior:
+                datos = anterior.read()
+            for nombre, (desplazamiento, tamano) in leer_indice(datos).items():
+                if nombre in sueltos:
+                    continue
+                indice[nombre] = (salida.tell(), tamano)
+                salida.write(datos[desplazamiento:desplazamiento + tamano])
+            del datos
+
+        for nombre in sueltos:
+            with open(os.path.join(ruta_dia, nombre), 'rb') as archivo:
+                contenido = archivo.read()
+            comprimido = recomprimir(contenido, calidad, max_lado)
+            antes += len(contenido)
+            despues += len(comprimido)
+            indice[nombre] = (salida.tell(), len(comprimido))
+            salida.write(comprimido)
+
+        inicio_indice = salida.tell()
+        salida.write(json.dumps(indice, separators=(',', ':')).encode())
+        salida.write(PIE.pack(inicio_indice, MAGIA))
+        salida.flush()
+        os.fsync(salida.fileno())
+    os.replace(temporal, destino)
+
+    for nombre in sueltos:
+        os.remove(os.path.join(ruta_dia, nombre))
+    try:
+        os.rmdir(ruta_dia)
+    except OSError:
+        pass  # Llegó otro archivo mientras tanto: queda para la próxima pasada
+    return len(sueltos), antes, despues
+
+
+# --- Lectura -------------------------------------------------------------
+
+class _Paquete:
+    """Paquete abierto con mmap y su índice"""
+
+    def __init__(self, ruta):
+        with open(ruta, 'rb') as archivo:
+            estado = os.fstat(archivo.fileno())
+            self.mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        self.firma = (estado.st_ino, estado.st_mtime_ns)
+        self.indice = leer_indice(self.mapa)
+
+    def leer(self, nombre):
+        desplazamiento, tamano = self.indice[nombre]
+        return self.mapa[desplazamiento:desplazamiento + tamano]
+
+
+class PaquetesAbiertos:
+    """
+    Mapas de los paquetes usados más recientemente (a lo más
+    PHOTO_ARCHIVE['OPEN_PACKS']). Si un paquete se recompactó, su firma
+    (inodo, mtime) cambia y se vuelve a abrir.
+    """
+
+    def __init__(self):
+        self._paquetes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, ruta):
+        try:
+            estado = os.stat(ruta)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            paquete = self._paquetes.get(ruta)
+            if paquete is None or paquete.firma != (estado.st_ino, estado.st_mtime_ns):
+                paquete = _Paquete(ruta)
+                self._paquetes[ruta] = paquete
+            self._paquetes.move_to_end(ruta)
+            while len(self._paquetes) > settings.PHOTO_ARCHIVE['OPEN_PACKS']:
+                # El mapa se libera cuando no queda ninguna referencia
+                self._paquetes.popitem(last=False)
+            return paquete
+
+
+paquetes = PaquetesAbiertos()
+
+
+class AlmacenamientoFotos(FileSystemStorage):
+    """
+    FileSystemStorage que además encuentra las fotos compactadas. Las
+    empaquetadas se sirven por la vista del admin (solo staff), ya que el
+    servidor web no puede leerlas dentro del paquete.
+    """
+
+    def _en_paquete(self, name):
+        directorio, archivo = os.path.split(name)
+        if not directorio:
+            return None, None
+        paquete = paquetes.obtener(ruta_paquete(self.path(directorio)))
+        if paquete is None or archivo not in paquete.indice:
+            return None, None
+        return paquete, archivo
+
+    def _open(self, name, mode='rb'):
+        if 'w' in mode or super().exists(name):
+            return super()._open(name, mode)
+        paquete, archivo = self._en_paquete(name)
+        if paquete is None:
+            return super()._open(name, mode)  # FileNotFoundError habitual
+        return ContentFile(paquete.leer(archivo), name=name)
+
+    def exists(self, name):
+        return super().exists(name) or self._en_paquete(name)[0] is not None
+
+    def size(self, name):
+        if super().exists(name):
+            return super().size(name)
+        paquete, archivo = self._en_paquete(name)
+        if paquete is None:
+            return super().size(name)
+        return paquete.indice[archivo][1]
+
+    def url(self, name):
+        if name and not super().exists(name) and self._en_paquete(name)[0] is not None:
+            return reverse('admin-foto-archivada', args=[name])
+        return super().url(name)
+
+
+def almacenamiento_fotos():
+    """Storage del campo AccessAttempt.imagen"""
+    return _almacenamiento
+
+
+_almacenamiento = AlmacenamientoFotos()
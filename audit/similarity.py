@@ -0,0 +1,186 @@
+"""
+Búsqueda de fotos de intentos parecidas a una dada (código compartido,
+"colarse" detrás de otra persona).
+
+Cada foto se resume al registrarse en un hash perceptual de 64 bits
+(dHash: la imagen en gris reducida a 9×8 y un bit por cada par de
+píxeles vecinos, 1 si el de la derecha es más claro). Fotos parecidas
+dan hashes con pocos bits distintos, aunque la foto se haya recomprimido
+al compactarla. Se guarda en AccessAttempt.phash (8 bytes por intento).
+
+Buscar no decodifica ningún JPEG: cada worker tiene el índice en memoria
+como arreglos NumPy (id, instante, hash uint64) y una consulta es un XOR
+del hash buscado contra todos y un conteo de bits, vectorizado. Un año
+de fotos (millones de hashes) se recorre en decenas de milisegundos.
+
+Hay un índice por escuela (intentos de sus puertas): una búsqueda solo
+recorre los hashes de su escuela. Cada índice carga solo los intentos
+nuevos (pk mayor al último cargado) cada REFRESH segundos; el comando
+indexar_fotos, que calcula el hash de fotos antiguas, sube la versión en
+la caché de cada escuela para que se recarguen completos.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from access_control.tenancy import PorEscuela, incrementar_version
+from .models import AccessAttempt
+
+
+ANCHO, ALTO = 9, 8
+
+# Bits en 1 de cada valor de 16 bits (numpy < 2.0 no tiene bitwise_count)
+_BITS16 = np.array([bin(valor).count('1') for valor in range(1 << 16)], dtype=np.uint8)
+
+
+def hash_perceptual(archivo):
+    """
+    dHash de 64 bits de una foto (archivo o UploadedFile) como entero con
+    signo, listo para BigIntegerField; None si no es una imagen válida.
+    Deja el archivo en la posición 0 para poder guardarlo después.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        archivo.seek(0)
+        with Image.open(archivo) as imagen:
+            # En JPEG decodifica directamente a escala reducida (mucho más rápido)
+            imagen.draft('L', (ANCHO * 8, ALTO * 8))
+            pequena = imagen.convert('L').resize((ANCHO, ALTO), Image.Resampling.BOX)
+            pixeles = np.asarray(pequena, dtype=np.int16)
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+    finally:
+        archivo.seek(0)
+    bits = (pixeles[:, 1:] > pixeles[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>i8')[0])
+
+
+def distancias(hashes, valor):
+    """Distancia de Hamming de cada hash (uint64) al valor dado"""
+    diferencia = hashes ^ np.uint64(valor & 0xFFFFFFFFFFFFFFFF)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(diferencia)
+    return _BITS16[diferencia.view(np.uint16)].reshape(-1, 4).sum(axis=1, dtype=np.uint8)
+
+
+class IndiceFotos:
+    """Hashes perceptuales de los intentos con foto de una escuela, en memoria"""
+
+    def __init__(self, escuela_id):
+        self.escuela_id = escuela_id
+        self._clave_version = f'fotos:{escuela_id}:version_indice'
+        # (ids, instantes, hashes): se reemplaza completa en una sola
+        # asignación para que buscar() nunca vea arreglos de largos distintos
+        self._datos = self._vacio()
+        self._ultimo_pk = 0
+        self._version = None
+        self._ultima_revision = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _vacio():
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+
+    def invalidar(self):
+        """Fuerza una recarga completa en todos los workers"""
+        incrementar_version(self._clave_version)
+
+    def _sincronizar(self):
+        ahora = time.monotonic()
+        if self._ultima_revision is not None and ahora - self._ultima_revision < settings.PHOTO_SIMILARITY['REFRESH']:
+            return
+        with self._lock:
+            if self._ultima_revision is not None and ahora - self._ultima_revision < settings.PHOTO_SIMILARITY['REFRESH']:
+                return
+            version = cache.get(self._clave_version)
+            if version != self._version:
+                self._version = version
+                self._datos = self._vacio()
+                self._ultimo_pk = 0
+            self._cargar_nuevos()
+            self._ultima_revision = ahora
+
+    def _cargar_nuevos(self):
+        filas = (
+            AccessAttempt.objects
+            .filter(pk__gt=self._ultimo_pk, phash__isnull=False, puerta__escuela_id=self.escuela_id)
+            .order_by('pk')
+            .values_list('pk', 'fecha_hora', 'phash')
+        )
+        ids, instantes, hashes = [], [], []
+        for pk, fecha_hora, phash in filas.iterator(chunk_size=10_000):
+            ids.append(pk)
+            instantes.append(int(fecha_hora.timestamp()))
+            hashes.append(phash)
+        if not ids:
+            return
+        actuales_ids, actuales_instantes, actuales_hashes = self._datos
+        self._datos = (
+            np.concatenate([actuales_ids, np.array(ids, dtype=np.int64)]),
+            np.concatenate([actuales_instantes, np.array(instantes, dtype=np.int64)]),
+            np.concatenate([actuales_hashes, np.array(hashes, dtype=np.int64).view(np.uint64)]),
+        )
+        self._ultimo_pk = ids[-1]
+
+    def buscar(self, valor, distancia=None, limite=None, desde=None, hasta=None, excluir=None):
+        """
+        [(intento_id, distancia)] de las fotos a lo más a `distancia` bits
+        del hash dado, de la más parecida a la menos (y de la más reciente
+        a la más antigua entre iguales), opcionalmente entre dos instantes.
+        """
+        config = settings.PHOTO_SIMILARITY
+        distancia = config['MAX_DISTANCE'] if distancia is None else distancia
+        limite = limite or config['LIMIT']
+        self._sincronizar()
+        ids, instantes, hashes = self._datos
+
+        mascara = np.ones(len(ids), dtype=bool)
+        if desde is not None:
+            mascara &= instantes >= int(desde.timestamp())
+        if hasta is not None:
+            mascara &= instantes < int(hasta.timestamp())
+        if excluir is not None:
+            mascara &= ids != excluir
+        bits = distancias(hashes, valor)
+        candidatos = np.flatnonzero(mascara & (bits <= distancia))
+        # Los ids crecen con el tiempo: -id ordena de más reciente a más antiguo
+        orden = np.lexsort((-ids[candidatos], bits[candidatos]))[:limite]
+        elegidos = candidatos[orden]
+        return list(zip(ids[elegidos].tolist(), bits[elegidos].tolist()))
+
+    def __len__(self):
+        return len(self._datos[0])
+
+
+indices = PorEscuela(IndiceFotos)
+
+
+def fotos_similares(intento, **opciones):
+    """
+    Intentos de la misma escuela (con su distancia) cuya foto se parece
+    a la del intento dado
+    """
+    if intento.phash is None:
+        return []
+    encontrados = indices(intento.puerta.escuela_id).buscar(intento.phash, excluir=intento.pk, **opciones)
+    return _con_intentos(encontrados)
+
+
+def _con_intentos(encontrados):
+    """[(AccessAttempt, distancia)] en el orden dado; omite intentos borrados"""
+    intentos = AccessAttempt.objects.select_related('puerta', 'usuario').in_bulk(
+        [pk for pk, _ in encontrados]
+    )
+    return [(intentos[pk], bits) for pk, bits in encontrados if pk in intentos]
+
+
+def buscar_por_imagen(archivo, escuela_id, **opciones):
+    """Como fotos_similares, pero a partir de una foto subida"""
+    valor = hash_perceptual(archivo)
+    if valor is None:
+        return None
+    return _con_intentos(indices(escuela_id).buscar(valor, **opciones))
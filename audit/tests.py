@@ -0,0 +1,180 @@
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from access_control.models import ClassGroup, ClassSchedule, Door, IoTDevice, escuela_predeterminada
+from .anomalies import DetectorAnomalias, Evento
+from .attendance import resumen
+from .models import AccessAttempt
+from .offline import cargar_lote, recientes
+
+
+class CargaLoteTests(TestCase):
+    """Idempotencia de los lotes sin conexión y su efecto en la asistencia"""
+
+    def setUp(self):
+        self.escuela_id = escuela_predeterminada()
+        self.puerta = Door.objects.create(nombre='Aula 1')
+        self.dispositivo = IoTDevice.objects.create(identificador='esp-prueba', nombre='ESP', puerta=self.puerta)
+        self.alumno = User.objects.create_user(username='alumno')
+        self.digest = self.alumno.profile.codigo_hash
+        # Claves que otra prueba dejó en el conjunto LRU de este proceso
+        recientes(self.escuela_id).datos.clear()
+
+        self.contadores = mock.patch('audit.offline.contadores').start()
+        self.acumulador = mock.patch('audit.offline.acumulador').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def intento(self, clave, acceso=True, sentido='ENTRADA', fecha_hora=None):
+        return {
+            'clave': clave,
+            'fecha_hora': (fecha_hora or timezone.now() - timedelta(minutes=5)).isoformat(),
+            'sentido': sentido,
+            'acceso': acceso,
+            'codigo_hash': self.digest,
+        }
+
+    def cargar(self, intentos):
+        return cargar_lote(self.dispositivo.pk, self.puerta.pk, self.escuela_id, intentos, '10.0.0.2')
+
+    def lote(self):
+        return [
+            self.intento('a'),
+            self.intento('b', sentido='SALIDA'),
+            self.intento('c', acceso=False),
+        ]
+
+    def registrados(self):
+        return self.contadores.return_value.registrar.call_count
+
+    def test_guarda_el_lote(self):
+        resultado = self.cargar([*self.lote(), self.intento('a'), {'clave': 'd', 'acceso': True}])
+
+        self.assertEqual(resultado['recibidos'], 5)
+        self.assertEqual(resultado['guardados'], 3)
+        self.assertEqual(resultado['duplicados'], 1)
+        self.assertEqual(resultado['rechazados'], [{'clave': 'd', 'error': 'fecha_hora inválida o futura'}])
+        intentos = AccessAttempt.objects.filter(dispositivo=self.dispositivo)
+        self.assertEqual(set(intentos.values_list('clave_idempotencia', flat=True)), {'a', 'b', 'c'})
+        self.assertEqual(set(intentos.values_list('usuario_id', flat=True)), {self.alumno.pk})
+        # Solo los exitosos cuentan para la ocupación y el mapa de uso
+        self.assertEqual(self.registrados(), 2)
+        self.assertEqual(self.acumulador.registrar.call_count, 2)
+
+    def test_reenvio_con_claves_recientes(self):
+        self.cargar(self.lote())
+        with self.assertNumQueries(0):
+            resultado = self.cargar(self.lote())
+
+        self.assertEqual((resultado['guardados'], resultado['duplicados']), (0, 3))
+        self.assertEqual(AccessAttempt.objects.count(), 3)
+        self.assertEqual(self.registrados(), 2)
+
+    def test_reenvio_a_otro_proceso(self):
+        self.cargar(self.lote())
+        # Otro worker no tiene las claves en memoria: las encuentra en la BD
+        recientes(self.escuela_id).datos.clear()
+        resultado = self.cargar([*self.lote(), self.intento('e')])
+
+        self.assertEqual((resultado['guardados'], resultado['duplicados']), (1, 3))
+        self.assertEqual(AccessAttempt.objects.count(), 4)
+        self.assertEqual(self.registrados(), 3)
+
+    def insertar_b(self):
+        """Lo que haría otro worker que recibió el mismo lote"""
+        AccessAttempt.objects.create(
+            puerta=self.puerta, dispositivo=self.dispositivo, clave_idempotencia='b',
+            fecha_hora=timezone.now(), exitoso=True, sentido='SALIDA',
+        )
+
+    def test_espera_al_otro_proceso(self):
+        select_for_update = IoTDevice.objects.select_for_update
+
+        def bloquear(*args, **kwargs):
+            # El otro worker guarda 'b' y confirma mientras este espera el candado del dispositivo
+            self.insertar_b()
+            return select_for_update(*args, **kwargs)
+
+        with mock.patch.object(IoTDevice.objects, 'select_for_update', side_effect=bloquear):
+            resultado = self.cargar(self.lote())
+
+        self.assertEqual((resultado['guardados'], resultado['duplicados']), (2, 1))
+        self.assertEqual(AccessAttempt.objects.filter(clave_idempotencia='b').count(), 1)
+        # La salida la contó quien la insertó, no este lote
+        self.assertEqual(self.registrados(), 1)
+
+    def test_conflicto_al_insertar_no_descarta_el_lote(self):
+        bulk_create = AccessAttempt.objects.bulk_create
+
+        def insertar_antes(filas, **kwargs):
+            # Una fila con la misma clave aparece entre la consulta y el INSERT
+            self.insertar_b()
+            return bulk_create(filas, **kwargs)
+
+        with mock.patch.object(AccessAttempt.objects, 'bulk_create', side_effect=insertar_antes):
+            self.cargar(self.lote())
+
+        self.assertEqual(
+            sorted(AccessAttempt.objects.values_list('clave_idempotencia', flat=True)), ['a', 'b', 'c'],
+        )
+
+    def test_entrada_tardia_invalida_la_asistencia(self):
+        fecha = timezone.localdate() - timedelta(days=7)
+        grupo = ClassGroup.objects.create(
+            nombre='1A', periodo='2026-1', fecha_inicio=fecha - timedelta(days=7), fecha_fin=fecha,
+        )
+        grupo.alumnos.add(self.alumno)
+        ClassSchedule.objects.create(
+            grupo=grupo, puerta=self.puerta, dia_semana=fecha.weekday(),
+            hora_inicio=time(8), hora_fin=time(9),
+        )
+        [sesion] = resumen([grupo], fecha, fecha)
+        self.assertEqual(sesion['presentes'], 0)
+
+        # La sesión ya terminó y quedó en la caché; llega la entrada del controlador
+        entrada = timezone.make_aware(datetime.combine(fecha, time(8, 5)))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cargar([self.intento('tarde', fecha_hora=entrada)])
+
+        [sesion] = resumen([grupo], fecha, fecha)
+        self.assertEqual(sesion['presentes'], 1)
+
+
+class DetectorCompartidoTests(TestCase):
+    """Dos workers en vivo comparten las ventanas por la caché"""
+
+    def workers(self, compartido=True):
+        return [
+            DetectorAnomalias(edificios={1: 10, 2: 20}, escuela_id=1, compartido=compartido)
+            for _ in range(2)
+        ]
+
+    def evento(self, segundos, codigo, puerta_id=1, exitoso=False, usuario_id=None):
+        fecha_hora = timezone.localtime().replace(hour=10) + timedelta(seconds=segundos)
+        return Evento(fecha_hora, puerta_id, usuario_id, codigo, exitoso, None)
+
+    def denegar(self, workers, codigo):
+        """Cinco denegaciones del mismo código repartidas entre los workers"""
+        alertas = []
+        for i in range(5):
+            alertas += workers[i % 2].procesar(self.evento(i, codigo))
+        return [alerta for alerta in alertas if 'mismo código' in alerta.detalle]
+
+    def test_denegaciones_entre_workers(self):
+        alertas = self.denegar(self.workers(), 'compartido-1')
+        self.assertEqual(len(alertas), 1)
+        self.assertEqual(alertas[0].detalle, '5 intentos denegados con el mismo código en 300 s')
+        # El enfriamiento también es compartido
+        self.assertEqual(self.denegar(self.workers(), 'compartido-1'), [])
+
+    def test_en_memoria_cada_worker_cuenta_lo_suyo(self):
+        self.assertEqual(self.denegar(self.workers(compartido=False), 'local-1'), [])
+
+    def test_desplazamiento_entre_workers(self):
+        uno, otro = self.workers()
+        self.assertEqual(uno.procesar(self.evento(0, 'c', puerta_id=1, exitoso=True, usuario_id=9001)), [])
+        alertas = otro.procesar(self.evento(30, 'c', puerta_id=2, exitoso=True, usuario_id=9001))
+        self.assertEqual([alerta.tipo for alerta in alertas], ['DESPLAZAMIENTO'])
@@ -0,0 +1,241 @@
+"""
+Vistas de la app audit.
+"""
+import hashlib
+from datetime import date, datetime, timedelta, timezone as tz
+
+from django.contrib import admin
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from access_control.models import Door, School, UserProfile, escuela_predeterminada
+from access_control.tenancy import escuela_limitada
+from .attendance import ENCABEZADOS, filas_reporte, grupos_visibles, resumen
+from .exports import csv_en_flujo, xlsx_en_flujo
+from .heatmaps import DIAS, PERIODO, mapa_de, periodo_de
+from .models import AccessAttempt
+from .photos import almacenamiento_fotos
+from .similarity import buscar_por_imagen, fotos_similares
+
+
+def foto_archivada(request, nombre):
+    """
+    Vista del admin (/admin/fotos/<nombre>): sirve una foto que ya está
+    dentro de un paquete diario. Solo staff, igual que el listado de
+    intentos, y fuera de los superusuarios solo fotos de intentos de la
+    propia escuela.
+    """
+    if not request.user.has_perm('audit.view_accessattempt'):
+        raise PermissionDenied
+    intentos = _intentos_de_foto(nombre)
+    escuela_id = escuela_limitada(request.user)
+    if escuela_id is not None:
+        intentos = intentos.filter(puerta__escuela_id=escuela_id)
+    almacenamiento = almacenamiento_fotos()
+    if not intentos.exists() or not almacenamiento.exists(nombre):
+        raise Http404('Foto no encontrada')
+    with almacenamiento.open(nombre) as archivo:
+        respuesta = HttpResponse(archivo.read(), content_type='image/jpeg')
+    # El contenido de un paquete no cambia
+    respuesta['Cache-Control'] = 'private, max-age=86400'
+    return respuesta
+
+
+def _intentos_de_foto(nombre):
+    """
+    Intentos con la foto `nombre` (access_attempts/AAAA/MM/DD/archivo). El
+    día de la ruta acota la búsqueda al índice de fecha_hora (un día de
+    margen por la zona horaria).
+    """
+    partes = nombre.split('/')
+    try:
+        if len(partes) != 5 or partes[0] != 'access_attempts':
+            raise ValueError
+        dia = datetime(int(partes[1]), int(partes[2]), int(partes[3]), tzinfo=tz.utc)
+    except ValueError:
+        return AccessAttempt.objects.none()
+    return AccessAttempt.objects.filter(
+        imagen=nombre,
+        fecha_hora__gte=dia - timedelta(days=1),
+        fecha_hora__lt=dia + timedelta(days=2),
+    )
+
+
+def _entero(valor, predeterminado, minimo, maximo):
+    try:
+        return min(max(int(valor), minimo), maximo)
+    except (TypeError, ValueError):
+        return predeterminado
+
+
+def buscar_fotos_similares(request, intento_id=None):
+    """
+    Vista del admin (/admin/fotos/similares/[<id>/]): intentos cuya foto
+    se parece a la de un intento o a una foto subida, por distancia de
+    Hamming entre hashes perceptuales (?distancia=bits, ?dias=antigüedad).
+    Solo se comparan fotos de la misma escuela: la del intento o, con una
+    foto subida, la del usuario (los superusuarios pueden elegir otra).
+    Fuera de los superusuarios, solo se ven intentos de la propia escuela.
+    """
+    if not request.user.has_perm('audit.view_accessattempt'):
+        raise PermissionDenied
+    distancia = _entero(request.GET.get('distancia'), settings.PHOTO_SIMILARITY['MAX_DISTANCE'], 0, 32)
+    dias = _entero(request.GET.get('dias'), 365, 1, 3650)
+    opciones = {'distancia': distancia, 'desde': timezone.now() - timedelta(days=dias)}
+    # Solo los superusuarios eligen escuela; el resto busca en la suya
+    escuelas = School.objects.all()
+    escuela_id = _escuela_de(request.user)
+    if request.user.is_superuser:
+        escuela_id = _entero(request.POST.get('escuela'), None, 1, 2 ** 62) or escuela_id
+    else:
+        escuelas = escuelas.filter(pk=escuela_id)
+
+    referencia = None
+    resultados = []
+    error = None
+    if intento_id is not None:
+        intentos = AccessAttempt.objects.select_related('puerta', 'usuario')
+        if not request.user.is_superuser:
+            intentos = intentos.filter(puerta__escuela_id=escuela_id)
+        referencia = get_object_or_404(intentos, pk=intento_id)
+        if referencia.phash is None:
+            error = 'El intento no tiene foto o aún no se calcula su hash (comando indexar_fotos).'
+        else:
+            resultados = fotos_similares(referencia, **opciones)
+    elif request.method == 'POST' and request.FILES.get('imagen'):
+        resultados = buscar_por_imagen(request.FILES['imagen'], escuela_id, **opciones)
+        if resultados is None:
+            resultados, error = [], 'El archivo no es una imagen válida.'
+
+    contexto = {
+        **admin.site.each_context(request),
+        'title': 'Fotos similares',
+        'referencia': referencia,
+        'resultados': resultados,
+        'distancia': distancia,
+        'dias': dias,
+        'error': error,
+        'escuelas': escuelas,
+        'escuela': escuela_id,
+    }
+    return TemplateResponse(request, 'admin/audit/similares.html', contexto)
+
+
+def _escuela_de(usuario):
+    try:
+        return usuario.profile.escuela_id
+    except UserProfile.DoesNotExist:
+        return escuela_predeterminada()
+
+
+def _fecha(valor, predeterminada):
+    try:
+        return date.fromisoformat(valor) if valor else predeterminada
+    except ValueError:
+        return predeterminada
+
+
+def reporte_asistencia(request):
+    """
+    Vista del admin (/admin/asistencia/): asistencia por sesión de los
+    grupos visibles para el usuario y exportación en CSV o XLSX
+    (?formato=csv|xlsx), que se genera en flujo.
+    """
+    grupos = grupos_visibles(request.user).filter(activo=True)
+    hoy = timezone.localdate()
+    hasta = _fecha(request.GET.get('hasta'), hoy)
+    desde = _fecha(request.GET.get('desde'), hasta - timedelta(days=30))
+    grupo_id = request.GET.get('grupo')
+    seleccion = grupos.filter(pk=grupo_id) if grupo_id else grupos
+
+    formato = request.GET.get('formato')
+    if formato in ('csv', 'xlsx'):
+        filas = filas_reporte(seleccion, desde, hasta)
+        nombre = f'asistencia_{desde:%Y%m%d}_{hasta:%Y%m%d}.{formato}'
+        if formato == 'csv':
+            respuesta = StreamingHttpResponse(csv_en_flujo(ENCABEZADOS, filas), content_type='text/csv; charset=utf-8')
+        else:
+            respuesta = StreamingHttpResponse(
+                xlsx_en_flujo(ENCABEZADOS, filas, hoja='Asistencia'),
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            )
+        respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        return respuesta
+
+    contexto = {
+        **admin.site.each_context(request),
+        'title': 'Asistencia por sesión',
+        'grupos': grupos,
+        'grupo_id': grupo_id or '',
+        'desde': desde,
+        'hasta': hasta,
+        'sesiones': resumen(seleccion, desde, hasta) if grupo_id else [],
+    }
+    return TemplateResponse(request, 'admin/audit/asistencia.html', contexto)
+
+
+class PuedeVerIntentos(BasePermission):
+    """Usuarios con permiso de ver los intentos de acceso (staff del admin)"""
+
+    def has_permission(self, request, view):
+        return request.user.has_perm('audit.view_accessattempt')
+
+
+class MapaUsoView(APIView):
+    """
+    GET /api/heatmaps/?puertas=1,2&zona=3&periodo=2025-2: intentos
+    exitosos por hora de la semana (7 × 24, lunes primero, hora local)
+    sumados sobre las puertas pedidas y las de la zona (edificio) con su
+    subárbol; sin ninguna de las dos, todas. Solo puertas de la escuela
+    del usuario, salvo superusuarios. Responde con ETag y Cache-Control.
+    """
+    permission_classes = [PuedeVerIntentos]
+
+    def get(self, request):
+        periodo = request.query_params.get('periodo') or periodo_de()
+        if not PERIODO.match(periodo):
+            raise ValidationError({'periodo': 'Formato esperado: AAAA-1 o AAAA-2.'})
+        puertas = Door.objects.all()
+        if not request.user.is_superuser:
+            puertas = puertas.filter(escuela_id=_escuela_de(request.user))
+        try:
+            ids = [int(valor) for valor in request.query_params.get('puertas', '').split(',') if valor.strip()]
+            zona = int(request.query_params['zona']) if request.query_params.get('zona') else None
+        except ValueError:
+            raise ValidationError({'puertas': 'Usa IDs numéricos separados por comas.'})
+        if ids or zona is not None:
+            seleccion = puertas.none()
+            if ids:
+                seleccion |= puertas.filter(pk__in=ids)
+            if zona is not None:
+                seleccion |= puertas.filter(zona__cierre_ancestros__ancestro_id=zona)
+            puertas = seleccion
+        puertas_ids = sorted(set(puertas.values_list('pk', flat=True)))
+
+        matriz = mapa_de(puertas_ids, periodo)
+        etag = '"{}"'.format(hashlib.md5(f'{periodo}:{puertas_ids}'.encode() + matriz.tobytes()).hexdigest())
+        if etag in request.headers.get('If-None-Match', ''):
+            respuesta = Response(status=304)
+        else:
+            respuesta = Response({
+                'periodo': periodo,
+                'puertas': puertas_ids,
+                'dias': DIAS,
+                'total': int(matriz.sum()),
+                'por_dia': matriz.sum(axis=1).tolist(),
+                'por_hora': matriz.sum(axis=0).tolist(),
+                'matriz': matriz.tolist(),
+            })
+        # El semestre en curso cambia con cada volcado; los anteriores, casi nunca
+        max_age = settings.HEATMAP['MAX_AGE'] if periodo == periodo_de() else 86400
+        respuesta['ETag'] = etag
+        respuesta['Cache-Control'] = f'private, max-age={max_age}'
+        return respuesta
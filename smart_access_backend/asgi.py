@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_access_backend.settings')
 
 application = get_asgi_application()
+
+# Los controladores IoT se atienden con una cadena de middleware mínima
+from access_control.device_handler import DeviceASGIDispatcher, DeviceASGIHandler  # noqa: E402
+
+application = DeviceASGIDispatcher(application, DeviceASGIHandler())
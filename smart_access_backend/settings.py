@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 
 # Load environment variables
 load_dotenv()
@@ -52,7 +53,7 @@ INSTALLED_APPS = [
     
     # Local apps
     'access_control',
-    # 'audit',  # Se agregará en Fase 3
+    'audit',
 ]
 
 MIDDLEWARE = [
@@ -62,12 +63,199 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'access_control.middleware.ProfilerMiddleware',  # Después de auth: usa request.user
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'smart_access_backend.urls'
 
+# Ruta ligera para controladores IoT (ver access_control/device_handler.py).
+# Estas peticiones no pasan por MIDDLEWARE, solo por DEVICE_MIDDLEWARE.
+DEVICE_URL_PREFIX = '/api/device/'
+DEVICE_URLCONF = 'access_control.device_urls'
+DEVICE_MIDDLEWARE = [
+    'access_control.middleware.DeviceAuthMiddleware',
+]
+DEVICE_HMAC_MAX_SKEW = int(os.getenv('DEVICE_HMAC_MAX_SKEW', 300))  # segundos
+DEVICE_CACHE_TTL = int(os.getenv('DEVICE_CACHE_TTL', 60))  # segundos que se reutiliza una credencial
+
+# Motor de políticas (access_control/policies.py): cada cuántos segundos
+# revisa si otro worker invalidó la tabla compilada
+POLICY_SYNC_INTERVAL = float(os.getenv('POLICY_SYNC_INTERVAL', 1.0))
+
+# Caché: locmem por defecto (por proceso); "file" la comparte entre los
+# workers del mismo servidor (versiones del motor de políticas, resúmenes)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 50_000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'smart-access',
+            'OPTIONS': {'MAX_ENTRIES': 50_000},
+        }
+    }
+
+# Resúmenes en caché de puertas (con su seguro) y perfiles, por escuela (access_control/summaries.py)
+SUMMARY_CACHE = {
+    'TTL': int(os.getenv('SUMMARY_CACHE_TTL', 300)),  # segundos que un resumen está vigente
+    'GRACE': 30,             # segundos extra en que se sirve vencido mientras otro lo recalcula
+    'LOCK_TIMEOUT': 5,       # segundos máximos de un recálculo (protección contra estampida)
+    'STATS_INTERVAL': 10,    # segundos entre publicaciones de aciertos/fallos en la caché
+}
+
+# Clave HMAC de los códigos de acceso (UserProfile.codigo_hash). Cambiarla
+# invalida todos los códigos guardados; los controladores la necesitan
+# para comparar contra la allowlist sin conexión, así que se considera
+# expuesta: es obligatoria y no puede ser la SECRET_KEY (firma JWT y sesiones).
+ACCESS_CODE_KEY = os.getenv('ACCESS_CODE_KEY', '')
+if not ACCESS_CODE_KEY:
+    raise ImproperlyConfigured('Define ACCESS_CODE_KEY (clave HMAC de los códigos, distinta de SECRET_KEY)')
+if ACCESS_CODE_KEY == SECRET_KEY:
+    raise ImproperlyConfigured('ACCESS_CODE_KEY no puede ser igual a SECRET_KEY: viaja a los controladores')
+
+# Secreto solo del servidor del que se deriva (HKDF) la clave de la
+# permutación que genera los códigos (access_control/codes.py); nunca
+# sale a los controladores
+ACCESS_CODE_PERMUTATION_SECRET = os.getenv('ACCESS_CODE_PERMUTATION_SECRET', SECRET_KEY)
+
+# Asignación de códigos de acceso (access_control/codes.py): cada worker
+# reserva bloques de posiciones y los entrega sin consultar la BD
+ACCESS_CODES = {
+    'DIGITS': int(os.getenv('ACCESS_CODE_DIGITS', 6)),  # longitud de los códigos generados
+    'BLOCK_SIZE': 100,         # posiciones reservadas por consulta
+}
+
+# Revocación de tokens JWT (access_control/revocation.py); sustituye a
+# rest_framework_simplejwt.token_blacklist sin consultar la BD por petición
+TOKEN_REVOCATION = {
+    'SYNC_INTERVAL': 1.0,      # segundos entre revisiones de la versión en la caché
+    'MAX_STALENESS': 30,       # segundos máximos sin recargar (caché no compartida)
+    'OVERLAP': 300,            # segundos de margen al cargar revocaciones recientes
+    'PURGE_INTERVAL': 3600,    # segundos entre limpiezas de tokens ya expirados
+}
+
+# Perfilado bajo demanda (access_control/profiling.py). Con SAMPLE_RATE 0
+# y sin HEADER el middleware se retira de la cadena.
+PROFILING = {
+    'SAMPLE_RATE': float(os.getenv('PROFILING_SAMPLE_RATE', 0.0)),  # fracción de peticiones
+    'HEADER': os.getenv('PROFILING_HEADER', 'X-Profile'),  # cabecera que activa el perfil (solo staff)
+    'DIRECTORY': os.getenv('PROFILING_DIRECTORY', os.path.join(BASE_DIR, 'profiles')),
+    'MAX_FILES': 500,          # tamaño del anillo de archivos
+    'TOP_FUNCTIONS': 30,       # funciones por ruta en el reporte
+}
+
+# Listados del admin de tablas grandes (access_control/paginators.py): por
+# encima de este número de filas se usan conteos aproximados
+ADMIN_COUNT_THRESHOLD = int(os.getenv('ADMIN_COUNT_THRESHOLD', 50_000))
+
+# Compactación de fotos de intentos (audit/photos.py, comando compactar_fotos)
+PHOTO_ARCHIVE = {
+    'AGE_DAYS': int(os.getenv('PHOTO_ARCHIVE_AGE_DAYS', 90)),  # días antes de empaquetar
+    'QUALITY': 60,             # calidad JPEG al recomprimir
+    'MAX_SIDE': 640,           # lado mayor en píxeles (0 = sin redimensionar)
+    'OPEN_PACKS': 64,          # paquetes mapeados en memoria por proceso
+}
+
+# Códigos temporales de invitado (access_control/guests.py)
+GUEST_CODES = {
+    'DEFAULT_HOURS': 8,        # vigencia por defecto de un código nuevo
+    'SYNC_INTERVAL': 1.0,      # segundos entre revisiones de la versión en la caché
+    'MAX_STALENESS': 30,       # segundos máximos sin recargar (caché no compartida)
+}
+
+# Carga de intentos registrados sin conexión (audit/offline.py,
+# POST /api/device/attempts/batch/)
+OFFLINE_UPLOAD = {
+    'MAX_ATTEMPTS': 1000,      # intentos por lote
+    'MAX_BYTES': 2 * 1024 * 1024,  # tamaño del JSON ya descomprimido
+    'INSERT_BATCH_SIZE': 500,  # filas por INSERT
+    'RECENT_KEYS': 200_000,    # claves recientes en memoria por escuela y proceso
+}
+
+# Búsqueda de fotos parecidas por hash perceptual (audit/similarity.py)
+PHOTO_SIMILARITY = {
+    'MAX_DISTANCE': 10,        # bits distintos (de 64) para considerar dos fotos parecidas
+    'LIMIT': 100,              # resultados por búsqueda
+    'REFRESH': 30,             # segundos entre cargas de hashes nuevos al índice
+}
+
+# Varias escuelas en un despliegue (access_control/tenancy.py). Las
+# tablas, índices y LRU en memoria se parten por escuela; los límites
+# (MAX_TRACKED_KEYS, RECENT_KEYS) se aplican a cada partición
+TENANCY = {
+    'DEFAULT_SCHOOL': os.getenv('DEFAULT_SCHOOL', 'principal'),  # clave de la escuela por defecto
+}
+
+# Mapas de uso por hora de la semana (audit/heatmaps.py, GET /api/heatmaps/)
+HEATMAP = {
+    'SECOND_SEMESTER_MONTH': 7,  # mes en que empieza el semestre "AAAA-2"
+    'FLUSH_INTERVAL': 10,      # segundos entre volcados de cada worker a la tabla
+    'MAX_AGE': 60,             # Cache-Control del semestre en curso (los anteriores: 1 día)
+    'REBUILD_BATCH_SIZE': 5000,  # intentos por consulta al reconstruir un semestre
+}
+
+# Avisos por SMS/push a UserProfile.telefono (access_control/notifications.py).
+# PROVIDER es la ruta de una subclase de notifications.Proveedor
+NOTIFICATIONS = {
+    'ENABLED': os.getenv('NOTIFICATIONS_ENABLED', 'True') == 'True',
+    'PROVIDER': os.getenv('NOTIFICATIONS_PROVIDER', 'access_control.notifications.ProveedorLocal'),
+    'WINDOW': 30,              # segundos en que se agrupan los eventos de un mismo teléfono
+    'CONCURRENCY': 8,          # envíos simultáneos al proveedor por proceso
+    'RETRIES': 3,              # reintentos de un mensaje fallido
+    'RETRY_DELAY': 5,          # segundos antes del primer reintento (se duplica en cada uno)
+    'RATE_LIMIT': 6,           # mensajes máximos por teléfono en RATE_PERIOD
+    'RATE_PERIOD': 3600,       # segundos
+    'MAX_LENGTH': 320,         # caracteres por mensaje
+}
+
+# Confinamiento de emergencia (access_control/lockdown.py)
+LOCKDOWN = {
+    'BUDGET_SECONDS': 1.0,     # objetivo de tiempo hasta el bloqueo total
+    'CHECK_INTERVAL': 2,       # s entre consultas a la BD sin caché compartida
+    # s entre heartbeats que se pide a los controladores: retraso máximo
+    # hasta que un controlador conectado ve un confinamiento
+    'POLL_INTERVAL': int(os.getenv('DEVICE_POLL_INTERVAL', 5)),
+}
+
+# Reportes de asistencia (audit/attendance.py)
+ATTENDANCE = {
+    'EARLY_MINUTES': 15,       # entradas válidas desde antes del inicio de la clase
+    'LATE_MINUTES': 10,        # después del inicio cuenta como retardo
+    'CACHE_TIMEOUT': 7 * 24 * 3600,  # sesiones ya terminadas en caché
+    'CHUNK_DAYS': 7,           # días por consulta al exportar
+}
+
+# Ocupación en tiempo real (audit/occupancy.py)
+OCCUPANCY = {
+    'RESET_HOUR': 4,           # hora local en que empieza cada periodo (espacios vacíos)
+    'FLUSH_INTERVAL': 5,       # segundos entre volcados de cada worker a la tabla
+    'REFRESH': 300,            # segundos entre recargas de zonas y capacidades
+}
+
+# Detector de anomalías en flujo (audit/anomalies.py)
+ANOMALY_DETECTION = {
+    'DENIED_WINDOW': 300,            # segundos de la ventana de denegaciones
+    'DENIED_THRESHOLD': 5,           # denegaciones del mismo código en la ventana
+    'DOOR_DENIED_THRESHOLD': 15,     # denegaciones en la misma puerta en la ventana
+    'BUSINESS_HOURS': (6, 22),       # horario general [inicio, fin) en hora local
+    'UNUSUAL_HOUR_MIN_EVENTS': 20,   # accesos previos antes de juzgar la hora del usuario
+    'UNUSUAL_HOUR_RATIO': 0.02,      # fracción mínima de accesos a esa hora
+    'TRAVEL_WINDOW': 120,            # segundos mínimos entre edificios distintos
+    'ALERT_COOLDOWN': 600,           # segundos sin repetir la misma alerta
+    'SHARED_BUCKETS': 10,            # cubetas de la ventana de denegaciones en la caché compartida
+    'MAX_TRACKED_KEYS': 100_000,     # claves por mapa (memoria acotada)
+    'ZONE_REFRESH': 300,             # segundos entre recargas del mapa de edificios
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -155,7 +343,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'access_control.authentication.JWTRevocableAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -3,17 +3,32 @@ URL configuration for smart_access_backend project.
 Sistema de Control de Accesos Inteligente para Entornos Educativos
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from access_control.views import ImpactoCambiosView, PerfilesView, PuertasView, reporte_perfiles
+from audit.views import MapaUsoView, buscar_fotos_similares, foto_archivada, reporte_asistencia
+
 # Personalización del panel de administración
 admin.site.site_header = "Sistema de Control de Accesos Inteligente"
 admin.site.site_title = "Control de Accesos"
 admin.site.index_title = "Panel de Administración"
 
 urlpatterns = [
+    path('admin/perfiles/', admin.site.admin_view(reporte_perfiles), name='admin-perfiles'),
+    path('admin/asistencia/', admin.site.admin_view(reporte_asistencia), name='admin-asistencia'),
+    path('admin/fotos/similares/', admin.site.admin_view(buscar_fotos_similares), name='admin-fotos-similares'),
+    path('admin/fotos/similares/<int:intento_id>/', admin.site.admin_view(buscar_fotos_similares), name='admin-fotos-similares-intento'),
+    path('admin/fotos/<path:nombre>', admin.site.admin_view(foto_archivada, cacheable=True), name='admin-foto-archivada'),
     path('admin/', admin.site.urls),
+    path('api/auth/', include('access_control.urls')),
+    path('api/policies/impact/', ImpactoCambiosView.as_view(), name='policies-impact'),
+    path('api/heatmaps/', MapaUsoView.as_view(), name='heatmaps'),
+    path('api/doors/', PuertasView.as_view(), name='doors'),
+    path('api/doors/<int:pk>/', PuertasView.as_view(), name='door'),
+    path('api/profiles/', PerfilesView.as_view(), name='profiles'),
+    path('api/profiles/<int:pk>/', PerfilesView.as_view(), name='profile'),
 ]
 
 # Servir archivos media en desarrollo
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_access_backend.settings')
 
 application = get_wsgi_application()
+
+# Los controladores IoT se atienden con una cadena de middleware mínima
+from access_control.device_handler import DeviceDispatcher, DeviceWSGIHandler  # noqa: E402
+
+application = DeviceDispatcher(application, DeviceWSGIHandler())